@@ -0,0 +1 @@
+"""Self-benchmarks of the agent's execution and parsing paths, run against stand-in load generators."""
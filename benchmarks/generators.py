@@ -0,0 +1,180 @@
+"""Realistic, high-volume result files for the stand-in load generators.
+
+Each writer produces the file format the real tool writes, with a few
+endpoints, log-normal response times, an occasional failure and a steady
+request rate, so the parsers see the same shape of data as in production.
+Rows are generated with NumPy and written in chunks, which keeps memory
+flat even for tens of millions of rows.
+"""
+import json
+import time
+from pathlib import Path
+from typing import Iterator, Sequence, Union
+
+import numpy as np
+
+CHUNK_ROWS = 200_000
+START_MS = 1_700_000_000_000
+REQUESTS_PER_SECOND = 2_000
+
+DEFAULT_LABELS = ("GET /", "GET /products", "GET /products/{id}", "POST /cart", "POST /checkout",
+                  "GET /search", "POST /login", "GET /account")
+
+JTL_HEADER = ("timeStamp,elapsed,label,responseCode,responseMessage,threadName,dataType,success,"
+              "failureMessage,bytes,sentBytes,grpThreads,allThreads,URL,Latency,IdleTime,Connect")
+
+PERCENTILE_HEADER = "50%,66%,75%,80%,90%,95%,98%,99%,99.9%,99.99%,100%"
+PERCENTILES = (50, 66, 75, 80, 90, 95, 98, 99, 99.9, 99.99, 100)
+
+
+def _samples(rows: int, n_labels: int, error_rate: float, seed: int) -> Iterator[tuple]:
+    """Yield chunks of (start_ms, elapsed_ms, label_index, success) columns."""
+    rng = np.random.default_rng(seed)
+    for offset in range(0, rows, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, rows - offset)
+        index = np.arange(offset, offset + n)
+        labels = rng.integers(0, n_labels, n)
+        # Each endpoint gets its own median, between 40 and 180 ms
+        elapsed = rng.lognormal(np.log(40 + 20 * labels), 0.5).astype(np.int64) + 1
+        success = rng.random(n) >= error_rate
+        start = START_MS + index * 1000 // REQUESTS_PER_SECOND
+        yield start.tolist(), elapsed.tolist(), labels.tolist(), success.tolist()
+
+
+def write_jtl(path: Union[str, Path], rows: int, labels: Sequence[str] = DEFAULT_LABELS,
+              error_rate: float = 0.01, threads: int = 50, seed: int = 0) -> int:
+    """Write a CSV JTL as JMeter does with the properties set by ``run_jmeter_result``.
+
+    Returns:
+        int: Number of bytes written
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(JTL_HEADER + "\n")
+        for start, elapsed, label_index, success in _samples(rows, len(labels), error_rate, seed):
+            f.write("".join([
+                f"{t},{e},{labels[i]},{200 if ok else 500},{'OK' if ok else 'Internal Server Error'},"
+                f"Thread Group 1-{t % threads + 1},text,{'true' if ok else 'false'},,"
+                f"{1024 + e},180,{threads},{threads},http://localhost:8080/,{e // 2},0,{e // 10}\n"
+                for t, e, i, ok in zip(start, elapsed, label_index, success)
+            ]))
+        return f.tell()
+
+
+def write_k6_ndjson(path: Union[str, Path], requests: int, labels: Sequence[str] = DEFAULT_LABELS,
+                    error_rate: float = 0.01, seed: int = 0) -> int:
+    """Write a k6 ``--out json`` stream with three points per HTTP request.
+
+    Returns:
+        int: Number of bytes written
+    """
+    definitions = [("http_req_duration", "trend"), ("http_reqs", "counter"), ("http_req_failed", "rate"),
+                   ("vus", "gauge")]
+    with open(path, "w", encoding="utf-8") as f:
+        for name, kind in definitions:
+            f.write(json.dumps({"type": "Metric", "metric": name, "data": {"name": name, "type": kind}}) + "\n")
+        names = [json.dumps(label) for label in labels]
+        prefixes: dict[int, str] = {}
+        for start, elapsed, label_index, success in _samples(requests, len(labels), error_rate, seed):
+            lines = []
+            for t, e, i, ok in zip(start, elapsed, label_index, success):
+                seconds, ms = divmod(t + e, 1000)
+                prefix = prefixes.get(seconds)
+                if prefix is None:
+                    prefix = prefixes[seconds] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+                timestamp = f"{prefix}.{ms:03d}Z"
+                status = "200" if ok else "500"
+                tags = f'"name":{names[i]},"method":"GET","status":"{status}"'
+                lines.append(
+                    f'{{"type":"Point","metric":"http_req_duration","data":{{"time":"{timestamp}","value":{e},'
+                    f'"tags":{{{tags},"expected_response":"{"true" if ok else "false"}"}}}}}}\n'
+                    f'{{"type":"Point","metric":"http_reqs","data":{{"time":"{timestamp}","value":1,"tags":{{{tags}}}}}}}\n'
+                    f'{{"type":"Point","metric":"http_req_failed","data":{{"time":"{timestamp}","value":{0 if ok else 1},'
+                    f'"tags":{{{tags}}}}}}}\n'
+                )
+            f.write("".join(lines))
+        return f.tell()
+
+
+def write_k6_summary(path: Union[str, Path], requests: int, duration_s: float) -> None:
+    """Write a k6 ``--summary-export`` file for a run of ``requests`` requests."""
+    summary = {
+        "metrics": {
+            "http_reqs": {"count": requests, "rate": requests / max(duration_s, 1e-9)},
+            "http_req_duration": {"avg": 80.0, "min": 2.0, "med": 60.0, "max": 2400.0,
+                                  "p(90)": 160.0, "p(95)": 210.0},
+            "http_req_failed": {"passes": requests // 100, "fails": requests - requests // 100, "value": 0.01},
+        },
+        "root_group": {"name": "", "path": "", "id": "d41d8cd98f00b204e9800998ecf8427e", "groups": {}, "checks": {}},
+    }
+    Path(path).write_text(json.dumps(summary, indent=2), encoding="utf-8")
+
+
+def write_simulation_log(path: Union[str, Path], requests: int, simulation: str = "benchmark.BenchmarkSimulation",
+                         labels: Sequence[str] = DEFAULT_LABELS, error_rate: float = 0.01, seed: int = 0) -> int:
+    """Write a Gatling 3.9 text ``simulation.log``.
+
+    Returns:
+        int: Number of bytes written
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"RUN\t{simulation}\t{simulation.rsplit('.', 1)[-1].lower()}\t{START_MS}\t \t3.9.5\n")
+        for start, elapsed, label_index, success in _samples(requests, len(labels), error_rate, seed):
+            lines = []
+            for n, (t, e, i, ok) in enumerate(zip(start, elapsed, label_index, success)):
+                if n % 100 == 0:
+                    lines.append(f"USER\tScenario\tSTART\t{t}\n")
+                if ok:
+                    lines.append(f"REQUEST\t\t{labels[i]}\t{t}\t{t + e}\tOK\t \n")
+                else:
+                    lines.append(f"REQUEST\t\t{labels[i]}\t{t}\t{t + e}\tKO\tstatus.find.is(200), but actually found 500\n")
+            f.write("".join(lines))
+        return f.tell()
+
+
+def write_locust_csv(prefix: Union[str, Path], history_rows: int, labels: Sequence[str] = DEFAULT_LABELS,
+                     users: int = 100, seed: int = 0) -> int:
+    """Write the ``_stats.csv``, ``_failures.csv`` and full ``_stats_history.csv`` files Locust writes.
+
+    The history has one row per endpoint plus an ``Aggregated`` row per second,
+    ``history_rows`` rows in total.
+
+    Returns:
+        int: Number of bytes written to the history file
+    """
+    rng = np.random.default_rng(seed)
+    names = [label.split(" ", 1) for label in labels]
+    stats_header = ("Type,Name,Request Count,Failure Count,Median Response Time,Average Response Time,"
+                    "Min Response Time,Max Response Time,Average Content Size,Requests/s,Failures/s,")
+    with open(f"{prefix}_stats.csv", "w", encoding="utf-8") as f:
+        f.write(stats_header + PERCENTILE_HEADER + "\n")
+        for i, (method, name) in enumerate(names + [["", "Aggregated"]]):
+            median = 40 + 20 * (i % len(labels))
+            percentiles = ",".join(str(int(median * (1 + p / 50))) for p in PERCENTILES)
+            f.write(f"{method},{name},{history_rows * 10},{history_rows // 10},{median},{median * 1.1:.2f},"
+                    f"2,{median * 20},1024,250.0,2.5,{percentiles}\n")
+    with open(f"{prefix}_failures.csv", "w", encoding="utf-8") as f:
+        f.write("Method,Name,Error,Occurrences\n")
+        f.write(f"POST,/checkout,HTTPError('500 Server Error'),{history_rows // 10}\n")
+
+    history_header = (f"Timestamp,User Count,Type,Name,Requests/s,Failures/s,{PERCENTILE_HEADER},"
+                      "Total Request Count,Total Failure Count,Total Median Response Time,"
+                      "Total Average Response Time,Total Min Response Time,Total Max Response Time,"
+                      "Total Average Content Size")
+    seconds = max(1, history_rows // (len(labels) + 1))
+    with open(f"{prefix}_stats_history.csv", "w", encoding="utf-8") as f:
+        f.write(history_header + "\n")
+        for offset in range(0, seconds, CHUNK_ROWS // (len(labels) + 1)):
+            lines = []
+            n = min(CHUNK_ROWS // (len(labels) + 1), seconds - offset)
+            rps = rng.normal(250, 20, (n, len(labels) + 1)).round(2).tolist()
+            for second in range(n):
+                timestamp = START_MS // 1000 + offset + second
+                active = min(users, offset + second + 1)
+                for i, (method, name) in enumerate(names + [["", "Aggregated"]]):
+                    median = 40 + 20 * (i % len(labels))
+                    percentiles = ",".join(str(int(median * (1 + p / 50))) for p in PERCENTILES)
+                    total = (offset + second + 1) * 250
+                    lines.append(f"{timestamp},{active},{method},{name},{rps[second][i]},0.5,{percentiles},"
+                                 f"{total},{total // 100},{median},{median * 1.1:.1f},2,{median * 20},1024\n")
+            f.write("".join(lines))
+        return f.tell()
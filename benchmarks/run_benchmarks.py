@@ -0,0 +1,508 @@
+"""Benchmark the agent's own execution and parsing paths.
+
+The load generators are replaced by the stand-ins in ``benchmarks.standins``,
+so every number here is the cost of our layer rather than of JMeter, k6,
+Locust or Maven:
+
+* ``parse_*``: throughput and peak memory of each result parser on a large
+  generated file (JTL, k6 NDJSON, Gatling simulation.log, Locust history);
+* ``run_*``: a full background job (runner, line consumers, live metrics,
+  run store, digest and history) compared with running the same stand-in
+  command bare, the difference being the wrapper overhead;
+* ``analyze_results``: a large JTL analysed from its path, cold (hashed,
+  parsed, saved and digested) and again from the report cache;
+* ``server``: concurrent sessions submitting tests and polling their
+  status through the agent tools while live-metrics clients hit the HTTP
+  endpoints, with latency percentiles per call;
+* ``startup``: cold start in fresh interpreters, from process start to
+  the agent imported, to its first tool answer and to the first HTTP
+  response of the web server, plus the import time of our own modules
+  with the ADK already loaded.
+
+Every scenario runs in its own process so its peak RSS is its own. Results
+are written as JSON; with ``--baseline`` they are compared against an
+earlier results file and the exit status is 1 when a metric regressed by
+more than ``--tolerance``.
+
+Usage:
+    python -m benchmarks.run_benchmarks --rows 10000000
+    python -m benchmarks.run_benchmarks --scenarios parse_jtl,run_jmeter --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+from benchmarks.generators import write_jtl, write_k6_ndjson, write_locust_csv, write_simulation_log
+from benchmarks.standins import DEFAULT_CONSOLE_LINES, DEFAULT_ROWS, ROOT, install_standins, make_gatling_project
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_SESSIONS = 8
+DEFAULT_STARTUP_RUNS = 5
+
+# Metrics compared against a baseline, and whether higher values are better
+TRACKED_METRICS = {
+    "seconds": False, "rows_per_s": True, "mb_per_s": True, "peak_rss_mb": False, "rss_growth_mb": False,
+    "wrapper_s": False, "overhead_s": False,
+    "submit_p95_ms": False, "status_p95_ms": False, "live_p95_ms": False, "jobs_per_s": True,
+    "cold_s": False, "warm_ms": False,
+    "import_s": False, "first_tool_s": False, "server_first_response_s": False, "own_import_s": False,
+}
+
+# Differences below these are noise, whatever their relative size
+_ABSOLUTE_NOISE = {"seconds": 0.05, "wrapper_s": 0.05, "overhead_s": 0.1, "peak_rss_mb": 5.0, "rss_growth_mb": 5.0,
+                   "submit_p95_ms": 2.0, "status_p95_ms": 2.0, "live_p95_ms": 2.0,
+                   "import_s": 0.05, "first_tool_s": 0.05, "server_first_response_s": 0.05, "own_import_s": 0.01}
+
+# Modules imported before a scenario's memory baseline is taken, so imports do not count as growth
+_PRELOAD = ("multi_tool_agent.jmeter_utils", "multi_tool_agent.k6_utils", "multi_tool_agent.locust_utils",
+            "multi_tool_agent.gatling_utils", "multi_tool_agent.job_utils", "multi_tool_agent.live_utils")
+_SCENARIO_PRELOAD = {"server": ("multi_tool_agent.agent", "fastapi", "httpx")}
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentiles(values: list[float], prefix: str) -> dict:
+    if not values:
+        return {}
+    ms = np.array(values) * 1000
+    return {f"{prefix}_p50_ms": round(float(np.percentile(ms, 50)), 2),
+            f"{prefix}_p95_ms": round(float(np.percentile(ms, 95)), 2),
+            f"{prefix}_max_ms": round(float(ms.max()), 2)}
+
+
+def _throughput(seconds: float, rows: int, path: Path) -> dict:
+    size_mb = path.stat().st_size / (1024 * 1024)
+    return {"seconds": round(seconds, 3), "rows": rows, "file_mb": round(size_mb, 1),
+            "rows_per_s": round(rows / seconds), "mb_per_s": round(size_mb / seconds, 1)}
+
+
+# Data files -------------------------------------------------------------------------------------
+
+def prepare_data(workdir: Path, rows: int) -> dict:
+    """Generate the parser inputs once, shared by the ``parse_*`` scenarios."""
+    data = workdir / "data"
+    data.mkdir(parents=True, exist_ok=True)
+    timings = {}
+    for name, write in (("results.jtl", lambda path: write_jtl(path, rows)),
+                        ("results.ndjson", lambda path: write_k6_ndjson(path, rows)),
+                        ("simulation.log", lambda path: write_simulation_log(path, rows)),
+                        ("locust", lambda path: write_locust_csv(path, rows))):
+        path = data / name
+        if not (path.exists() or Path(f"{path}_stats_history.csv").exists()):
+            started = time.perf_counter()
+            write(path)
+            timings[name] = round(time.perf_counter() - started, 1)
+    return timings
+
+
+# Scenarios --------------------------------------------------------------------------------------
+
+def parse_jtl_scenario(workdir: Path, rows: int, args: argparse.Namespace) -> dict:
+    from multi_tool_agent.jmeter_results import parse_jtl
+    path = workdir / "data" / "results.jtl"
+    started = time.perf_counter()
+    report = parse_jtl(path)
+    result = _throughput(time.perf_counter() - started, rows, path)
+    assert report["total"]["samples"] == rows, report["total"]
+    return result
+
+
+def parse_k6_json_scenario(workdir: Path, rows: int, args: argparse.Namespace) -> dict:
+    from multi_tool_agent.k6_results import parse_k6_json
+    path = workdir / "data" / "results.ndjson"
+    started = time.perf_counter()
+    report = parse_k6_json(path)
+    result = _throughput(time.perf_counter() - started, rows, path)
+    assert report["total"]["samples"] == rows, report["total"]
+    return result
+
+
+def parse_simulation_log_scenario(workdir: Path, rows: int, args: argparse.Namespace) -> dict:
+    from multi_tool_agent.gatling_results import parse_simulation_log
+    path = workdir / "data" / "simulation.log"
+    started = time.perf_counter()
+    report = parse_simulation_log(path)
+    result = _throughput(time.perf_counter() - started, rows, path)
+    assert report["total"]["samples"] == rows, report["total"]
+    return result
+
+
+def parse_locust_csv_scenario(workdir: Path, rows: int, args: argparse.Namespace) -> dict:
+    from multi_tool_agent.locust_results import parse_locust_csv
+    prefix = workdir / "data" / "locust"
+    started = time.perf_counter()
+    report = parse_locust_csv(prefix)
+    result = _throughput(time.perf_counter() - started, rows, Path(f"{prefix}_stats_history.csv"))
+    assert report["timeline"]["rps"], "empty Locust timeline"
+    return result
+
+
+def _tool_command(tool: str, workdir: Path, bins: dict) -> tuple[list[str], Optional[str], Callable]:
+    """The command a runner builds for ``tool``, its working directory and the matching job factory."""
+    from multi_tool_agent.gatling_utils import run_gatling_result
+    from multi_tool_agent.jmeter_results import JTL_PROPERTIES
+    from multi_tool_agent.jmeter_utils import run_jmeter_result
+    from multi_tool_agent.k6_utils import run_k6_result
+    from multi_tool_agent.locust_utils import run_locust_result
+
+    sample = ROOT / "multi_tool_agent" / "sample"
+    bare = workdir / "bare"
+    bare.mkdir(parents=True, exist_ok=True)
+    if tool == "jmeter":
+        return ([str(bins["jmeter"]), "-n", "-t", str(sample / "hello.jmx"), "-l", str(bare / "bare.jtl"),
+                 *JTL_PROPERTIES], None,
+                lambda consumers: run_jmeter_result(str(sample / "hello.jmx"), True, consumers))
+    if tool == "k6":
+        return ([str(bins["k6"]), "run", "-d", "30s", "-u", "10", "--summary-export", str(bare / "summary.json"),
+                 "--out", f"json={bare / 'bare.ndjson'}", str(sample / "hello.js")], None,
+                lambda consumers: run_k6_result(str(sample / "hello.js"), "30s", 10, json_output=True,
+                                                consumers=consumers))
+    if tool == "locust":
+        return ([str(bins["locust"]), "-f", str(sample / "hello.py"), "--host", "http://localhost:8089",
+                 "--headless", "-u", "100", "-r", "10", "-t", "30s", "--csv", str(bare / "bare"),
+                 "--csv-full-history"], None,
+                lambda consumers: run_locust_result(str(sample / "hello.py"), "http://localhost:8089", 100, 10,
+                                                    "30s", True, csv_full_history=True, consumers=consumers))
+    project = workdir / "gatling"
+    if not (project / "mvnw").exists():
+        make_gatling_project(project, bins["mvnw"])
+    return ([str(project / "mvnw"), "io.gatling:gatling-maven-plugin:test", f"-Dgatling.directory={project}"],
+            str(project),
+            lambda consumers: run_gatling_result(str(project), runner="mvn", consumers=consumers))
+
+
+def _run_scenario(tool: str) -> Callable:
+    def scenario(workdir: Path, rows: int, args: argparse.Namespace) -> dict:
+        from multi_tool_agent.cache_utils import report_cache
+        from multi_tool_agent.job_utils import Job, JobManager
+
+        bins = install_standins(workdir / "bin")
+        # The stand-ins write the same results every time: time the parse, not a cache hit
+        report_cache().clear()
+        cmd, cwd, run = _tool_command(tool, workdir, bins)
+        started = time.perf_counter()
+        bare = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+        process_s = time.perf_counter() - started
+        if bare.returncode != 0:
+            raise RuntimeError(f"Stand-in {tool} failed: {bare.stderr}")
+
+        async def run_job() -> tuple[float, Job]:
+            jobs = JobManager()
+            started = time.perf_counter()
+            job = jobs.submit(tool, f"benchmark {tool}", run, params={"script": f"benchmark-{tool}"})
+            await job.task
+            return time.perf_counter() - started, job
+
+        wrapper_s, job = asyncio.run(run_job())
+        if job.status != "success":
+            raise RuntimeError(f"Benchmark job for {tool} failed: {job.digest}")
+        return {"rows": rows, "process_s": round(process_s, 3), "wrapper_s": round(wrapper_s, 3),
+                "overhead_s": round(wrapper_s - process_s, 3),
+                "overhead_ratio": round(wrapper_s / process_s, 2),
+                "output_lines": job.output_lines}
+    return scenario
+
+
+def analyze_results_scenario(workdir: Path, rows: int, args: argparse.Namespace) -> dict:
+    from multi_tool_agent.cache_utils import analyze_results, report_cache
+    path = workdir / "data" / "results.jtl"
+    report_cache().clear()
+    started = time.perf_counter()
+    cold = analyze_results(str(path))
+    cold_s = time.perf_counter() - started
+    warm = []
+    for _ in range(5):
+        started = time.perf_counter()
+        digest = analyze_results(str(path))
+        warm.append(time.perf_counter() - started)
+    assert not cold["cached"] and digest["cached"] and digest["total"]["samples"] == rows, digest
+    return {"rows": rows, "cold_s": round(cold_s, 3), "warm_ms": round(float(np.median(warm)) * 1000, 2)}
+
+
+def server_scenario(workdir: Path, rows: int, args: argparse.Namespace) -> dict:
+    """Concurrent sessions driving the agent tools and the live-metrics endpoints.
+
+    The ADK web app is not built here: what it adds per request is the
+    model round trip, which is not ours to benchmark. The tools and the
+    live router are what our code contributes to every server request.
+    """
+    import httpx
+    from fastapi import FastAPI
+
+    from multi_tool_agent import agent
+    from multi_tool_agent.live_utils import live_router
+
+    install_standins(workdir / "bin")
+    sample = ROOT / "multi_tool_agent" / "sample" / "hello.js"
+    latencies: dict[str, list[float]] = {"submit": [], "status": [], "live": []}
+
+    async def timed(kind: str, call):
+        started = time.perf_counter()
+        result = await call
+        latencies[kind].append(time.perf_counter() - started)
+        return result
+
+    async def session(client: httpx.AsyncClient) -> None:
+        for _ in range(args.jobs_per_session):
+            submitted = await timed("submit", agent.execute_k6_test_with_options(str(sample), "30s", 10, json_output=True))
+            job_id = submitted["job_id"]
+            while True:
+                status = await timed("status", agent.get_test_status(job_id))
+                await timed("live", client.get("/live/runs"))
+                if status["status"] in ("success", "error", "cancelled"):
+                    break
+                await asyncio.sleep(0.05)
+            if status["status"] != "success":
+                raise RuntimeError(f"Benchmark job failed: {status.get('result')}")
+
+    async def run_sessions() -> float:
+        app = FastAPI()
+        app.include_router(live_router(agent.jobs))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(session(client) for _ in range(args.sessions)))
+            return time.perf_counter() - started
+
+    elapsed = asyncio.run(run_sessions())
+    jobs = args.sessions * args.jobs_per_session
+    result = {"sessions": args.sessions, "jobs": jobs, "rows_per_job": rows, "seconds": round(elapsed, 3),
+              "jobs_per_s": round(jobs / elapsed, 2)}
+    for kind, values in latencies.items():
+        result.update(_percentiles(values, kind))
+    return result
+
+
+# Cold start probes, each timed from process start to exit
+_STARTUP_PROBES = {
+    "interpreter": "pass",
+    # What ADK's agent loader does
+    "import": "import multi_tool_agent.agent",
+    "first_tool": "import asyncio\nfrom multi_tool_agent import agent\nasyncio.run(agent.list_tests())",
+    "server_first_response": ("from fastapi.testclient import TestClient\nimport main\n"
+                              "with TestClient(main.app) as client:\n"
+                              "    client.get('/live/runs').raise_for_status()"),
+}
+# Prints the import time of our modules alone
+_OWN_IMPORT_PROBE = ("import time\nimport fastapi, google.adk.events, google.adk.flows.llm_flows.auto_flow\n"
+                     "from google.adk.agents import Agent\n"
+                     "started = time.perf_counter()\nimport multi_tool_agent.agent\n"
+                     "print(time.perf_counter() - started)")
+
+
+def startup_scenario(workdir: Path, rows: int, args: argparse.Namespace) -> dict:
+    """Cold start of the agent and the web server, median of ``--startup-runs`` fresh interpreters."""
+    env = {**os.environ, "SESSION_SERVICE_URI": f"sqlite+wal:///{workdir / 'sessions.db'}"}
+
+    def probe(code: str) -> tuple[float, str]:
+        started = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        if completed.returncode != 0:
+            raise RuntimeError(f"Start-up probe failed: {completed.stderr.strip().splitlines()[-1:]}")
+        return elapsed, completed.stdout
+
+    result = {"runs": args.startup_runs}
+    for name, code in _STARTUP_PROBES.items():
+        result[f"{name}_s"] = round(float(np.median([probe(code)[0] for _ in range(args.startup_runs)])), 3)
+    own = [float(probe(_OWN_IMPORT_PROBE)[1].strip().splitlines()[-1]) for _ in range(args.startup_runs)]
+    result["own_import_s"] = round(float(np.median(own)), 3)
+    return result
+
+
+SCENARIOS: dict[str, Callable] = {
+    "parse_jtl": parse_jtl_scenario,
+    "parse_k6_json": parse_k6_json_scenario,
+    "parse_simulation_log": parse_simulation_log_scenario,
+    "parse_locust_csv": parse_locust_csv_scenario,
+    "analyze_results": analyze_results_scenario,
+    "run_jmeter": _run_scenario("jmeter"),
+    "run_k6": _run_scenario("k6"),
+    "run_locust": _run_scenario("locust"),
+    "run_gatling": _run_scenario("gatling"),
+    "server": server_scenario,
+    "startup": startup_scenario,
+}
+
+
+# Running and comparing --------------------------------------------------------------------------
+
+def _child_env(workdir: Path, rows: int, args: argparse.Namespace) -> dict:
+    bin_dir = workdir / "bin"
+    env = os.environ.copy()
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")])),
+        "BENCH_ROWS": str(rows),
+        "BENCH_CONSOLE_LINES": str(args.console_lines),
+        "JMETER_BIN": str(bin_dir / "jmeter"),
+        "K6_BIN": str(bin_dir / "k6"),
+        "LOCUST_BIN": str(bin_dir / "locust"),
+        "JMETER_RESULTS_DIR": str(workdir / "results"),
+        "K6_RESULTS_DIR": str(workdir / "results"),
+        "LOCUST_RESULTS_DIR": str(workdir / "results"),
+        "FEATHERWAND_RUNS_DIR": str(workdir / "runs"),
+        "FEATHERWAND_HISTORY_DB": str(workdir / "history.db"),
+        "GATLING_BUILD_CACHE_DIR": str(workdir / "gatling-build"),
+        "REPORT_CACHE_DIR": str(workdir / "report-cache"),
+    })
+    return env
+
+
+def run_scenario(name: str, workdir: Path, rows: int, args: argparse.Namespace) -> dict:
+    """Run one scenario in a fresh interpreter and return its metrics."""
+    cmd = [sys.executable, "-m", "benchmarks.run_benchmarks", "--child", name, "--workdir", str(workdir),
+           "--rows", str(rows), "--console-lines", str(args.console_lines), "--sessions", str(args.sessions),
+           "--jobs-per-session", str(args.jobs_per_session), "--startup-runs", str(args.startup_runs)]
+    completed = subprocess.run(cmd, cwd=ROOT, env=_child_env(workdir, rows, args), capture_output=True, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {"error": (completed.stderr.strip().splitlines() or ["no output"])[-1]}
+    return json.loads(lines[-1])
+
+
+def _child(name: str, workdir: Path, rows: int, args: argparse.Namespace) -> None:
+    for module in (*_PRELOAD, *_SCENARIO_PRELOAD.get(name, ())):
+        importlib.import_module(module)
+    rss_before = _rss_mb()
+    result = SCENARIOS[name](workdir, rows, args)
+    peak = _peak_rss_mb()
+    result.update({"peak_rss_mb": round(peak, 1), "rss_growth_mb": round(peak - rss_before, 1)})
+    print(json.dumps(result))
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare_results(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list[dict]:
+    """Find the tracked metrics that got worse than the baseline by more than ``tolerance``.
+
+    Args:
+        current: Results of this run
+        baseline: Results of an earlier run
+        tolerance: Allowed relative change, e.g. 0.25 for 25%
+
+    Returns:
+        list: One entry per regressed metric, worst first
+    """
+    regressions = []
+    for name, metrics in current.get("scenarios", {}).items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or "error" in before or "error" in metrics:
+            continue
+        for metric, higher_is_better in TRACKED_METRICS.items():
+            old, new = before.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            if worse > tolerance and abs(new - old) > _ABSOLUTE_NOISE.get(metric, 0):
+                regressions.append({"scenario": name, "metric": metric, "baseline": old, "current": new,
+                                    "change_pct": round(change * 100, 1)})
+    return sorted(regressions, key=lambda entry: -abs(entry["change_pct"]))
+
+
+def run_benchmarks(scenarios: list[str], rows: int, args: argparse.Namespace, workdir: Path) -> dict:
+    """Run the given scenarios and collect their results with the environment they ran in."""
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "rows": rows,
+        "console_lines": args.console_lines,
+        "scenarios": {},
+    }
+    if any(name.startswith("parse_") or name == "analyze_results" for name in scenarios):
+        results["data_generation_s"] = prepare_data(workdir, rows)
+    for name in scenarios:
+        # A server session runs many jobs; keep each of them small
+        scenario_rows = max(1, rows // 100) if name == "server" else rows
+        results["scenarios"][name] = metrics = run_scenario(name, workdir, scenario_rows, args)
+        print(f"{name}: {json.dumps(metrics)}", file=sys.stderr)
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS,
+                        help="Requests per result file, e.g. 10000000 for a 10M-row JTL")
+    parser.add_argument("--console-lines", type=int, default=DEFAULT_CONSOLE_LINES,
+                        help="Console lines printed by each stand-in run")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS, help="Concurrent server sessions")
+    parser.add_argument("--jobs-per-session", type=int, default=2, help="Tests each server session runs")
+    parser.add_argument("--startup-runs", type=int, default=DEFAULT_STARTUP_RUNS,
+                        help="Fresh interpreters each start-up probe is timed in")
+    parser.add_argument("--workdir", help="Folder for generated data, reused across runs (default: a temp folder)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative change of a metric that counts as a regression (default: 0.25)")
+    parser.add_argument("--child", choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.child, Path(args.workdir), args.rows, args)
+        return 0
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory(prefix="featherwand-bench-") as tmp:
+        workdir = Path(args.workdir or tmp)
+        results = run_benchmarks(scenarios, args.rows, args, workdir)
+
+    output = Path(args.output or RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    if args.baseline:
+        results["baseline"] = args.baseline
+        results["regressions"] = compare_results(results, json.loads(Path(args.baseline).read_text()),
+                                                 args.tolerance)
+    output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    print(f"Results written to {output}", file=sys.stderr)
+
+    failed = [name for name, metrics in results["scenarios"].items() if "error" in metrics]
+    for name in failed:
+        print(f"Scenario {name} failed: {results['scenarios'][name]['error']}", file=sys.stderr)
+    for entry in results.get("regressions", []):
+        print(f"Regression in {entry['scenario']}.{entry['metric']}: {entry['baseline']} -> {entry['current']} "
+              f"({entry['change_pct']:+.1f}%)", file=sys.stderr)
+    return 1 if failed or results.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
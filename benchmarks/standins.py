@@ -0,0 +1,163 @@
+"""Stand-in load generator executables.
+
+Each stand-in accepts the command line our runners build for the real tool,
+prints a realistic volume of console output and writes the result files the
+real tool would, sized by ``BENCH_ROWS`` (requests, or history rows for
+Locust) with ``BENCH_CONSOLE_LINES`` lines of console output. No load is
+generated, so everything measured around them is the cost of our own layer.
+
+``install_standins`` writes small executables that dispatch here, with the
+running interpreter in their shebang, so they work from any virtualenv.
+"""
+import os
+import re
+import stat
+import sys
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+from benchmarks.generators import (
+    write_jtl, write_k6_ndjson, write_k6_summary, write_locust_csv, write_simulation_log,
+)
+
+DEFAULT_ROWS = 100_000
+DEFAULT_CONSOLE_LINES = 5_000
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_SCRIPT = """#!{python}
+import sys
+sys.path.insert(0, {root!r})
+from benchmarks.standins import main
+sys.exit(main({tool!r}, sys.argv[1:]))
+"""
+
+
+def _scale() -> tuple[int, int]:
+    return (int(os.getenv("BENCH_ROWS", DEFAULT_ROWS)),
+            int(os.getenv("BENCH_CONSOLE_LINES", DEFAULT_CONSOLE_LINES)))
+
+
+def _option(args: Sequence[str], name: str, default: Optional[str] = None) -> Optional[str]:
+    """Value of ``name value`` or ``name=value`` in ``args``."""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            return args[i + 1]
+        if arg.startswith(name + "="):
+            return arg[len(name) + 1:]
+    return default
+
+
+def _emit(lines: int, render) -> None:
+    out = sys.stdout
+    for i in range(lines):
+        out.write(render(i))
+    out.flush()
+
+
+def jmeter(args: Sequence[str]) -> int:
+    rows, console_lines = _scale()
+    jtl_file = _option(args, "-l")
+    if "-n" not in args or _option(args, "-t") is None:
+        print("An error occurred: the stand-in only supports non-GUI runs with -t", file=sys.stderr)
+        return 1
+    print(f"Creating summariser <summary>\nCreated the tree successfully using {_option(args, '-t')}")
+    if jtl_file:
+        write_jtl(jtl_file, rows)
+    step = max(1, rows // max(console_lines, 1))
+    _emit(console_lines, lambda i: (
+        f"summary + {step:6d} in 00:00:06 = {step / 6:6.1f}/s Avg:   120 Min:     3 Max:  2400 "
+        f"Err:     {step // 100} ({1.0:.2f}%) Active: 50 Started: 50 Finished: 0\n"))
+    print(f"summary = {rows:7d} in 00:10:00 = {rows / 600:6.1f}/s Avg:   120 Min:     3 Max:  2400 "
+          f"Err: {rows // 100:6d} (1.00%)\nTidying up ...\n... end of run")
+    return 0
+
+
+def k6(args: Sequence[str]) -> int:
+    rows, console_lines = _scale()
+    if not args or args[0] != "run":
+        print("the stand-in only supports k6 run", file=sys.stderr)
+        return 1
+    vus = _option(args, "-u", "1")
+    started = time.monotonic()
+    json_out = _option(args, "--out")
+    if json_out and json_out.startswith("json="):
+        write_k6_ndjson(json_out[len("json="):], rows)
+    _emit(console_lines, lambda i: (
+        f"running (0m{i % 60:02d}.0s), {vus}/{vus} VUs, {i * 10} complete and 0 interrupted iterations\n"))
+    summary = _option(args, "--summary-export")
+    if summary:
+        write_k6_summary(summary, rows, time.monotonic() - started)
+    print(f"     http_reqs......................: {rows}\n     vus............................: {vus}")
+    return 0
+
+
+def locust(args: Sequence[str]) -> int:
+    rows, console_lines = _scale()
+    if "--worker" in args:
+        return 0
+    users = int(_option(args, "-u", "100"))
+    prefix = _option(args, "--csv")
+    _emit(console_lines, lambda i: (
+        f"[2023-11-14 22:13:20,{i % 1000:03d}] bench/INFO/locust.runners: Ramping to {users} users at a rate of "
+        f"10.00 per second\n"))
+    if prefix:
+        write_locust_csv(prefix, rows, users=users)
+    print("[2023-11-14 22:23:20,000] bench/INFO/locust.main: Shutting down (exit code 0)", file=sys.stderr)
+    return 0
+
+
+def mvnw(args: Sequence[str]) -> int:
+    rows, console_lines = _scale()
+    simulation = "benchmark.BenchmarkSimulation"
+    for arg in args:
+        match = re.match(r"-Dgatling\.simulationClass=(.+)", arg)
+        if match:
+            simulation = match.group(1)
+    _emit(console_lines // 2, lambda i: f"[INFO] Downloaded from central: io/gatling/gatling-core/{i}.jar\n")
+    Path("target/test-classes").mkdir(parents=True, exist_ok=True)
+    results_dir = Path("target/gatling") / f"{simulation.rsplit('.', 1)[-1].lower()}-{time.time_ns() // 1_000_000}"
+    results_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Simulation {simulation} started...")
+    write_simulation_log(results_dir / "simulation.log", rows, simulation=simulation)
+    _emit(console_lines - console_lines // 2, lambda i: (
+        f"> Global{' ' * 60}(OK={i * 100:<7d} KO={i:<7d})\n"))
+    print(f"Simulation {simulation} completed in 600 seconds\n[INFO] BUILD SUCCESS")
+    return 0
+
+
+TOOLS = {"jmeter": jmeter, "k6": k6, "locust": locust, "mvnw": mvnw}
+
+
+def main(tool: str, args: Sequence[str]) -> int:
+    return TOOLS[tool](args)
+
+
+def install_standins(bin_dir: Path) -> dict[str, Path]:
+    """Write an executable per stand-in into ``bin_dir``.
+
+    Returns:
+        dict: Tool name to executable path
+    """
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for tool in TOOLS:
+        path = bin_dir / tool
+        path.write_text(_SCRIPT.format(python=sys.executable, root=str(ROOT), tool=tool), encoding="utf-8")
+        path.chmod(path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+        paths[tool] = path
+    return paths
+
+
+def make_gatling_project(project_dir: Path, mvnw_path: Path) -> Path:
+    """Create a minimal Maven Gatling project whose ``mvnw`` is the stand-in."""
+    sources = project_dir / "src" / "test" / "java" / "benchmark"
+    sources.mkdir(parents=True, exist_ok=True)
+    (project_dir / "pom.xml").write_text("<project><artifactId>benchmark</artifactId></project>\n", encoding="utf-8")
+    (sources / "BenchmarkSimulation.java").write_text("package benchmark;\nclass BenchmarkSimulation {}\n",
+                                                      encoding="utf-8")
+    wrapper = project_dir / "mvnw"
+    wrapper.write_bytes(mvnw_path.read_bytes())
+    wrapper.chmod(mvnw_path.stat().st_mode)
+    return project_dir
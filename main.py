@@ -1,33 +1,60 @@
 import os
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
 from google.adk.cli.fast_api import get_fast_api_app
 
+from multi_tool_agent.agent import jobs
+from multi_tool_agent.jobstore_utils import default_job_state_db
+from multi_tool_agent.live_utils import live_router
+from multi_tool_agent.session_utils import flush_sessions, register_session_service
+
 # Get the directory where main.py is located
 AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
-# Example session DB URL (e.g., SQLite)
-SESSION_DB_URL = "sqlite:///./sessions.db"
+# Session storage: WAL-mode SQLite with connection pooling, an LRU cache and batched writes,
+# safe to share between workers. Any ADK session URI works too (e.g. postgresql://...)
+SESSION_SERVICE_URI = os.getenv("SESSION_SERVICE_URI", "sqlite+wal:///./sessions.db")
 # Example allowed origins for CORS
 ALLOWED_ORIGINS = ["http://localhost", "http://localhost:8080", "*"]
 # Set web=True if you intend to serve a web interface, False otherwise
 SERVE_WEB_INTERFACE = True
+# Worker processes; each one serves chat sessions from the shared session database, and
+# test jobs, their admission slots and live metrics through the shared job table
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Write session events still buffered by write-behind before the worker exits
+    await flush_sessions()
+
+
+register_session_service()
 
 # Call the function to get the FastAPI app instance
 # Ensure the agent directory name ('multi_tool_agent') matches your agent folder
 app: FastAPI = get_fast_api_app(
-    agent_dir=AGENT_DIR,
-    session_db_url=SESSION_DB_URL,
+    agents_dir=AGENT_DIR,
+    session_service_uri=SESSION_SERVICE_URI,
     allow_origins=ALLOWED_ORIGINS,
     web=SERVE_WEB_INTERFACE,
+    lifespan=lifespan,
 )
 
-# You can add more FastAPI routes or configurations below if needed
-# Example:
-# @app.get("/hello")
-# async def read_root():
-#     return {"Hello": "World"}
+# Live per-second metrics of in-flight runs, as Server-Sent Events:
+#   GET /live/runs            queued and running jobs
+#   GET /live/runs/{job_id}   metrics stream of one job
+app.include_router(live_router(jobs))
 
 if __name__ == "__main__":
     # Use the PORT environment variable provided by Cloud Run, defaulting to 8000
-    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
\ No newline at end of file
+    port = int(os.environ.get("PORT", 8000))
+    if WORKERS > 1:
+        # Inherited by the workers, so that they admit, report and cancel jobs host-wide
+        os.environ.setdefault("JOB_STATE_DB", default_job_state_db())
+        # Every worker imports the app itself
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
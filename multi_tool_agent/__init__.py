@@ -1 +1,14 @@
-from . import agent
+import importlib
+
+from .config_utils import load_config
+
+load_config()
+
+
+def __getattr__(name: str):
+    # The agent, and the ADK with it, is imported on first use rather than by
+    # every import of a tool module; ADK's agent loader asks for root_agent
+    if name in ("agent", "root_agent"):
+        agent = importlib.import_module(f"{__name__}.agent")
+        return agent if name == "agent" else agent.root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,94 +1,431 @@
 from google.adk.agents import Agent
-from typing import Any, Awaitable, Optional
+from typing import Any, Optional
+import asyncio
 import os
 import logging
-from .jmeter_utils import run_jmeter
-from .k6_utils import run_k6_script
-from .locust_utils import run_locust_test
-from .gatling_utils import run_gatling_simulation
-from dotenv import load_dotenv
+from .job_utils import FINISHED_STATES, JobManager, RunFactory
+from .registry_utils import get_runner
+from .run_utils import read_artifact
 from . import prompt
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Tool modules are imported by the tools using them (runners through the
+# registry), keeping the ADK's start-up free of the parsers and numpy
 
-async def execute_jmeter_test(test_file: str, gui_mode: bool = False) -> str:
-    """Execute a JMeter test.
+# Load tests run as background jobs, admitted by CPU and memory limits
+jobs = JobManager()
+
+# Test plans are analysed before they run, see preflight_utils
+PLAN_TOOLS = {".jmx": "jmeter", ".js": "k6", ".py": "locust"}
+
+def _submit(tool: str, description: str, run: RunFactory, processes: int = 1, plan: Any = None,
+            guardrails: Optional[str] = "", **params) -> dict:
+    """Queue a run and return its job status at once; ``params`` are recorded in the run history.
+
+    ``guardrails`` is a spec overriding the ``GUARDRAIL_*`` defaults, or None for a run without any.
+    """
+    limits = None
+    if guardrails is not None:
+        from .guardrail_utils import parse_guardrails
+        try:
+            limits = parse_guardrails(guardrails)
+        except ValueError as e:
+            return {"status": "error", "error": str(e)}
+    job = jobs.submit(tool, description, run, processes, params, memory_mb=plan.memory_mb if plan else None,
+                      guardrails=limits)
+    status = jobs.status(job.job_id)
+    if plan is not None:
+        status["preflight"] = plan.to_dict()
+    return status
+
+async def _preflight(tool: str, script: str, **options) -> Any:
+    """Size a run from its test plan; None if the plan cannot be analysed, leaving the run to report it."""
+    from .preflight_utils import preflight
+    try:
+        return await asyncio.to_thread(preflight, tool, script, **options)
+    except (ValueError, OSError) as e:
+        logger.warning(f"No pre-flight analysis of {script}: {e}")
+        return None
+
+def _refused(plan: Any) -> dict:
+    return {"status": "error", "error": f"Run refused by the pre-flight check: {'; '.join(plan.reasons)}",
+            "preflight": plan.to_dict()}
+
+async def execute_jmeter_test(test_file: str, gui_mode: bool = False, guardrails: str = "") -> dict:
+    """Start a JMeter test in the background.
 
     Args:
         test_file: Path to the JMeter test file (.jmx)
         gui_mode: Whether to run in GUI mode (default: False)
+        guardrails: Limits that stop the test early once breached for a sustained period, e.g. "error_rate=5,p95=800,p99=2000,min_rps=50,window=30s" (default: "", the GUARDRAIL_* settings)
+
+    Returns:
+        dict: The job id and status of the submitted test, and the pre-flight estimate sizing its JMeter heap
     """
-    return await run_jmeter(test_file, non_gui=not gui_mode)  # Run in non-GUI mode by default
+    plan = None if gui_mode else await _preflight("jmeter", test_file)
+    if plan is not None and plan.refused:
+        return _refused(plan)
+    heap_mb = plan.heap_mb if plan else None
+    duration_s = plan.duration_s if plan else None
+    return _submit("jmeter", f"JMeter {test_file}",
+                   lambda consumers: get_runner("jmeter")(test_file, not gui_mode, consumers, heap_mb=heap_mb,  # Run in non-GUI mode by default
+                                                       duration_s=duration_s),
+                   plan=plan, guardrails=None if gui_mode else guardrails, script=test_file, gui_mode=gui_mode)
 
-async def execute_jmeter_test_non_gui(test_file: str) -> str:
-    """Execute a JMeter test in non-GUI mode.
+async def execute_jmeter_test_non_gui(test_file: str, remote_hosts: str = "", guardrails: str = "") -> dict:
+    """Start a JMeter test in non-GUI mode in the background.
 
     Args:
         test_file: Path to the JMeter test file (.jmx)
+        remote_hosts: Comma-separated JMeter server engines (host or host:port) to generate the load from (default: "", run locally)
+        guardrails: Limits that stop the test early once breached for a sustained period, e.g. "error_rate=5,p95=800,p99=2000,min_rps=50,window=30s" (default: "", the GUARDRAIL_* settings)
+
+    Returns:
+        dict: The job id and status of the submitted test, and the pre-flight estimate sizing its JMeter heap
     """
-    return await run_jmeter(test_file, non_gui=True)
+    hosts = [host.strip() for host in remote_hosts.split(",") if host.strip()]
+    plan = await _preflight("jmeter", test_file, remote_hosts=len(hosts))
+    if plan is not None and plan.refused:
+        return _refused(plan)
+    heap_mb = plan.heap_mb if plan else None
+    duration_s = plan.duration_s if plan else None
+    description = f"JMeter {test_file}" + (f" on {len(hosts)} remote engines" if hosts else "")
+    return _submit("jmeter", description,
+                   lambda consumers: get_runner("jmeter")(test_file, True, consumers, remote_hosts=hosts,
+                                                       heap_mb=heap_mb, duration_s=duration_s),
+                   plan=plan, guardrails=guardrails, script=test_file, remote_hosts=hosts)
 
-async def execute_k6_test(script_file: str, duration: str = "30s", vus: int = 10) -> str:
-    """Execute a k6 load test.
+async def execute_k6_test(script_file: str, duration: str = "30s", vus: int = 10, guardrails: str = "") -> dict:
+    """Start a k6 load test in the background.
 
     Args:
         script_file: Path to the k6 test script (.js)
         duration: Duration of the test (e.g., "30s", "1m", "5m")
         vus: Number of virtual users to simulate
+        guardrails: Limits that stop the test early once breached for a sustained period, e.g. "error_rate=5,p95=800,p99=2000,min_rps=50,window=30s" (default: "", the GUARDRAIL_* settings)
+
+    Returns:
+        dict: The job id and status of the submitted test, and the pre-flight estimate picking its shards
     """
-    return await run_k6_script(script_file, duration, vus)
+    return await execute_k6_test_with_options(script_file, duration, vus, guardrails=guardrails)
 
-async def execute_k6_test_with_options(script_file: str, duration: str, vus: int) -> str:
-    """Execute a k6 load test with custom duration and VUs.
+async def execute_k6_test_with_options(script_file: str, duration: str, vus: int, json_output: bool = False,
+                                       shards: Optional[int] = None, guardrails: str = "") -> dict:
+    """Start a k6 load test with custom duration and VUs in the background.
 
     Args:
         script_file: Path to the k6 test script (.js)
         duration: Duration of the test (e.g., "30s", "1m", "5m")
         vus: Number of virtual users to simulate
+        json_output: Whether to stream every metric point to a JSON file for a per-request breakdown (default: False)
+        shards: Number of local k6 processes to split the test across, for more load than one process can generate (default: picked from the pre-flight estimate)
+        guardrails: Limits that stop the test early once breached for a sustained period, e.g. "error_rate=5,p95=800,p99=2000,min_rps=50,window=30s" (default: "", the GUARDRAIL_* settings)
+
+    Returns:
+        dict: The job id and status of the submitted test, and the pre-flight estimate picking its shards
     """
-    return await run_k6_script(script_file, duration, vus)
+    plan = await _preflight("k6", script_file, users=vus, duration=duration, shards=shards)
+    if plan is not None and plan.refused:
+        return _refused(plan)
+    shards = plan.shards if plan else shards or 1
+    return _submit("k6", f"k6 {script_file} ({vus} VUs, {duration}, {shards} shards)",
+                   lambda consumers: get_runner("k6")(script_file, duration, vus, json_output, consumers, shards),
+                   processes=shards, plan=plan, guardrails=guardrails, script=script_file, users=vus, duration=duration,
+                   shards=shards)
 
-async def execute_locust_test(test_file: str, host: str = os.getenv("LOCUST_HOST", "http://localhost:8089"), 
-                    users: int = int(os.getenv("LOCUST_USERS", "100")), 
-                    spawn_rate: int = int(os.getenv("LOCUST_SPAWN_RATE", "10")), 
-                    runtime: str = os.getenv("LOCUST_RUNTIME", "30s"), 
-                    headless: bool = os.getenv("LOCUST_HEADLESS", "true").lower() == "true") -> dict:
+async def execute_locust_test(test_file: str, host: Optional[str] = None, users: Optional[int] = None,
+                              spawn_rate: Optional[int] = None, runtime: Optional[str] = None,
+                              headless: Optional[bool] = None, csv_full_history: bool = False,
+                              workers: Optional[int] = None, guardrails: str = "") -> dict:
     """
-    Run Locust with the given configuration.
+    Start Locust with the given configuration in the background.
     
     Args:
         test_file: Path to the Locust test file
-        host: Target host URL to load test
-        users: Number of concurrent users to simulate
-        spawn_rate: Rate at which users are spawned per second
-        runtime: Duration of the test (e.g., "30s", "1m", "5m")
-        headless: Whether to run in headless mode (no web UI)
+        host: Target host URL to load test (default: LOCUST_HOST)
+        users: Number of concurrent users to simulate (default: LOCUST_USERS)
+        spawn_rate: Rate at which users are spawned per second (default: LOCUST_SPAWN_RATE)
+        runtime: Duration of the test (e.g., "30s", "1m", "5m") (default: LOCUST_RUNTIME)
+        headless: Whether to run in headless mode (no web UI) (default: LOCUST_HEADLESS)
+        csv_full_history: Whether to record a per-endpoint throughput history (default: False)
+        workers: Number of Locust worker processes to generate the load from, for more load than one process can generate; 0 runs a single process (default: picked from the pre-flight estimate)
+        guardrails: Limits that stop the test early once breached for a sustained period, e.g. "error_rate=5,p95=800,p99=2000,min_rps=50,window=30s" (default: "", the GUARDRAIL_* settings)
         
     Returns:
-        dict: A dictionary containing status, output, and error information
+        dict: The job id and status of the submitted test, and the pre-flight estimate picking its workers
     """
-    return await run_locust_test(test_file, host, users, spawn_rate, runtime, headless)
+    from .locust_utils import locust_options
+    host, users, spawn_rate, runtime, headless = locust_options(host, users, spawn_rate, runtime, headless)
+    plan = await _preflight("locust", test_file, users=users, duration=runtime, workers=workers)
+    if plan is not None and plan.refused:
+        return _refused(plan)
+    workers = plan.workers if plan else workers or 0
+    return _submit("locust", f"Locust {test_file} ({users} users, {runtime})",
+                   lambda consumers: get_runner("locust")(test_file, host, users, spawn_rate, runtime, headless,
+                                                       csv_full_history, consumers, workers),
+                   processes=max(1, workers), plan=plan, guardrails=guardrails, script=test_file, users=users,
+                   duration=runtime, host=host, spawn_rate=spawn_rate, workers=workers)
 
-async def execute_gatling_test(directory_name: str, class_name: Optional[str] = None, runner: str = os.getenv("GATLING_RUNNER", "mvn")) -> str:
-    """Run a Gatling simulation.
+async def execute_gatling_test(directory_name: str, class_name: Optional[str] = None, runner: Optional[str] = None,
+                               guardrails: str = "") -> dict:
+    """Start a Gatling simulation in the background.
 
     Args:
         directory_name: Name of the Gatling simulation directory
         class_name: Optional name of the Gatling simulation class (default: None)
-        runner: Optional runner to use (default: mvn) other option: gradle
+        runner: Optional runner to use (default: GATLING_RUNNER, else mvn) other option: gradle
+        guardrails: Limits that stop the test early once breached for a sustained period, e.g. "error_rate=5,p95=800,p99=2000,min_rps=50,window=30s" (default: "", the GUARDRAIL_* settings)
+
+    Returns:
+        dict: The job id and status of the submitted test
+    """
+    runner = runner or os.getenv("GATLING_RUNNER", "mvn")
+    return _submit("gatling", f"Gatling {directory_name} {class_name or ''}".strip(),
+                   lambda consumers: get_runner("gatling")(directory_name, class_name, runner, consumers),
+                   guardrails=guardrails, script=directory_name, simulation=class_name, runner=runner)
+
+async def find_max_capacity(test_file: str, latency_ms: float = 500, percentile: str = "p95",
+                            max_error_rate: float = 1.0, start_users: int = 10, max_users: int = 1000,
+                            mode: str = "binary", host: str = "") -> dict:
+    """Start a search in the background for the highest concurrency and throughput a k6 script or locustfile sustains within latency and error SLOs.
+
+    Short probes at increasing concurrency replace full-length trial runs; probes close to an SLO run longer.
+
+    Args:
+        test_file: Path to the k6 script (.js) or locustfile (.py)
+        latency_ms: Highest latency allowed at the percentile, in milliseconds (default: 500)
+        percentile: Latency percentile checked: p50, p90, p95 or p99 (default: p95)
+        max_error_rate: Highest error rate allowed, in percent (default: 1.0)
+        start_users: VUs or users of the first probe, and the step of the step mode (default: 10)
+        max_users: Highest VUs or users probed (default: 1000)
+        mode: "binary" doubles the users until an SLO breaks, then bisects; "step" adds start_users per probe (default: binary)
+        host: Target host of a locustfile (default: "", LOCUST_HOST)
+
+    Returns:
+        dict: The job id and status of the search; once finished, its digest holds the max sustainable users and throughput and every probe
+    """
+    from pathlib import Path
+    from .capacity_utils import MODES, PERCENTILES, SLO
+    tool = PLAN_TOOLS.get(Path(test_file).suffix.lower())
+    if tool not in ("k6", "locust"):
+        return {"status": "error", "error": f"Capacity search runs k6 scripts (.js) or locustfiles (.py), not {test_file}"}
+    if mode not in MODES:
+        return {"status": "error", "error": f"Unknown mode {mode!r}, expected one of {', '.join(MODES)}"}
+    if percentile not in PERCENTILES:
+        return {"status": "error", "error": f"Unknown percentile {percentile!r}, expected one of {', '.join(PERCENTILES)}"}
+    if not 0 < start_users <= max_users:
+        return {"status": "error", "error": "start_users must be positive and no higher than max_users"}
+    slo = SLO(latency_ms, percentile, max_error_rate)
+    # The generators are sized for the highest concurrency a probe may reach
+    plan = await _preflight(tool, test_file, users=max_users)
+    if plan is not None and plan.refused:
+        return _refused(plan)
+    processes = (plan.shards if tool == "k6" else plan.workers) if plan else (1 if tool == "k6" else 0)
+
+    async def search(consumers):
+        from .capacity_utils import search_capacity
+        return await search_capacity(tool, test_file, slo, start_users, max_users, mode, consumers,
+                                     host=host or None, processes=processes)
+
+    return _submit(tool, f"Capacity search {test_file} ({mode}, {percentile} <= {latency_ms:g} ms, "
+                         f"errors <= {max_error_rate:g}%, {start_users}-{max_users} users)",
+                   # Probes breach the SLOs on purpose; guardrails would stop the search
+                   search, processes=max(1, processes), plan=plan, guardrails=None, script=test_file,
+                   capacity_mode=mode, slo=f"{percentile}<={latency_ms:g}ms,errors<={max_error_rate:g}%",
+                   max_users=max_users)
+
+async def analyze_test_plan(test_file: str, tool: str = "", users: int = 0, duration: str = "") -> dict:
+    """Estimate the load a test plan generates and the load generators it needs, without running it.
+
+    Args:
+        test_file: Path to the JMeter test plan (.jmx), k6 script (.js) or locustfile (.py)
+        tool: jmeter, k6 or locust (default: "", from the file extension)
+        users: Virtual users or users the k6 or Locust test would run with (default: 0, the script's or LOCUST_USERS)
+        duration: Duration the test would run for, e.g. "5m" (default: "")
+
+    Returns:
+        dict: Peak concurrency, request rate, memory, the JMeter heap, k6 shards or Locust workers picked, and whether the run would be refused
+    """
+    from pathlib import Path
+    from .preflight_utils import preflight
+    tool = tool or PLAN_TOOLS.get(Path(test_file).suffix.lower(), "")
+    if not tool:
+        return {"status": "error", "error": f"Cannot tell the tool of {test_file}; pass jmeter, k6 or locust"}
+    if tool == "locust" and not users:
+        from .locust_utils import locust_options
+        users = locust_options()[1]
+    try:
+        plan = await asyncio.to_thread(preflight, tool, test_file, users=users or None, duration=duration or None)
+    except (ValueError, OSError) as e:
+        return {"status": "error", "error": str(e)}
+    return {"status": "success", **plan.to_dict()}
+
+async def get_test_status(job_id: str, wait_seconds: int = 0) -> dict:
+    """Get the status of a submitted test, with its progress so far or, once finished, its result digest.
+
+    Args:
+        job_id: The job_id returned when the test was started
+        wait_seconds: Wait up to this many seconds for the test to finish before answering (default: 0, max: 600)
+
+    Returns:
+        dict: The job status; "result" holds the run digest once the test has finished
+    """
+    try:
+        await jobs.wait(job_id, min(max(wait_seconds, 0), 600))
+        return jobs.status(job_id)
+    except KeyError:
+        return {"status": "error", "error": f"Unknown job id: {job_id}"}
+
+async def cancel_test(job_id: str) -> dict:
+    """Cancel a queued or running test; its load generator is stopped.
+
+    Args:
+        job_id: The job_id returned when the test was started
+
+    Returns:
+        dict: The final job status
+    """
+    try:
+        await jobs.cancel(job_id)
+        return jobs.status(job_id)
+    except KeyError:
+        return {"status": "error", "error": f"Unknown job id: {job_id}"}
+
+async def list_tests() -> list:
+    """List the submitted tests and their status.
+
+    Returns:
+        list: Status of every known job, most recent first
+    """
+    return jobs.statuses(tail_lines=0)
+
+async def get_test_timeline(test_id: str, resolution: int = 0, start: str = "", end: str = "", max_points: int = 60,
+                            metrics: str = "rps,error_rate,p95,users") -> dict:
+    """Get how throughput, errors, latency and users evolved over a running or finished test, at a chosen resolution.
+
+    Args:
+        test_id: The job_id of a running or finished test, or the run_id of a previous run
+        resolution: Window length in seconds: 1, 10 or 60 (default: 0, the finest that fits max_points over the range)
+        start: Start of the range since the test started, e.g. "2h" (default: "", the oldest data kept)
+        end: End of the range since the test started, e.g. "2h30m" (default: "", now or the end of the test)
+        max_points: Points per metric; longer series are reduced keeping their peaks and dips (default: 60)
+        metrics: Comma-separated: rps, errors_per_s, error_rate, mean, p50, p90, p95, p99, max, users (default: "rps,error_rate,p95,users")
+
+    Returns:
+        dict: The resolution used, totals and merged percentiles over the range, and each metric's points as seconds since the start and values
+    """
+    from .rollup_utils import run_rollup
+    from .run_utils import duration_seconds
+    job = jobs.jobs.get(test_id)
+    # A job another worker runs is followed from its live snapshots until it has a saved run
+    shared = jobs.shared(test_id) if job is None else None
+    try:
+        if job is not None and job.live.rollup is not None:
+            rollup = job.live.rollup
+        elif shared is not None and shared["status"] not in FINISHED_STATES:
+            rollup = jobs.live(test_id).rollup
+            if rollup is None:
+                return {"status": "error", "error": f"Test {test_id} has no metrics yet"}
+        else:
+            run_id = (job.run_id if job is not None
+                      else (shared.get("result") or {}).get("run_id") if shared is not None else test_id)
+            if run_id is None:
+                return {"status": "error", "error": f"Test {test_id} has no metrics yet"}
+            rollup = await asyncio.to_thread(run_rollup, run_id)
+        return await asyncio.to_thread(rollup.query, resolution or None, duration_seconds(start),
+                                       duration_seconds(end), max_points,
+                                       [metric.strip() for metric in metrics.split(",") if metric.strip()])
+    except (ValueError, FileNotFoundError) as e:
+        return {"status": "error", "error": str(e)}
+
+async def fetch_run_artifact(run_id: str, artifact: str = "output", offset: int = 0, max_bytes: int = 16384) -> dict:
+    """Fetch part of a raw artifact of a previous run, such as its output or result file.
+
+    Args:
+        run_id: The run_id from a test run digest
+        artifact: Artifact name listed in the digest (e.g. "output", "error", "report", "jtl")
+        offset: Byte offset to start reading at; a negative offset reads from the end (default: 0)
+        max_bytes: Maximum number of bytes to return (default: 16384)
+
+    Returns:
+        dict: The requested part of the artifact and the offset to continue from
+    """
+    try:
+        return await asyncio.to_thread(read_artifact, run_id, artifact, offset, max_bytes)
+    except (ValueError, FileNotFoundError) as e:
+        return {"status": "error", "error": str(e)}
+
+async def analyze_test_results(results: str, tool: str = "") -> dict:
+    """Digest the results of a previous run, or a result file written by a load testing tool, without running a test.
+
+    Parsed reports and digests are cached by the content of the result files, so analysing the same results again is instant.
+
+    Args:
+        results: A run_id, or the path of a JMeter JTL, k6 NDJSON output, Locust _stats.csv file or Gatling results folder or simulation.log
+        tool: jmeter, k6, locust or gatling (default: "", from the file name)
+
+    Returns:
+        dict: The run digest: key percentiles, errors, slowest endpoints and anomalies, and the run_id the results are saved under
+    """
+    from .cache_utils import analyze_results
+    try:
+        return await asyncio.to_thread(analyze_results, results, tool or None)
+    except (ValueError, OSError) as e:
+        return {"status": "error", "error": str(e)}
+
+async def query_run_history(script: str = "", endpoint: str = "", metric: str = "p95", last: int = 50,
+                            tool: str = "", same_version: bool = False) -> dict:
+    """Show how a statistic evolved over previous runs, from the run history.
+
+    Args:
+        script: Only runs of this test script or Gatling directory (default: "", all scripts)
+        endpoint: Endpoint or request name, e.g. "/checkout"; the run total if empty (default: "")
+        metric: samples, errors, error_rate, throughput, mean, p50, p90, p95, p99 or max (default: "p95")
+        last: Number of most recent runs (default: 50)
+        tool: Only runs of this tool: jmeter, k6, locust or gatling (default: "", all tools)
+        same_version: Only runs of the script's current content (default: False)
+
+    Returns:
+        dict: The runs, oldest first, with the metric value of each and its min, median, max and latest value
+    """
+    from .history_utils import query_history
+    try:
+        return await asyncio.to_thread(query_history, script or None, tool or None, endpoint or None,
+                                       metric, last, same_version)
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+
+async def compare_test_runs(run_id: str, baseline_run_id: str = "") -> dict:
+    """Compare a finished run with a baseline run to detect performance regressions.
+
+    Args:
+        run_id: The run_id of the run to check
+        baseline_run_id: The run_id to compare with (default: "", the baseline set for the script, else its previous run)
+
+    Returns:
+        dict: Overall verdict, percentile, throughput and error rate changes, and significance tests per endpoint
+    """
+    from .compare_utils import compare_runs
+    try:
+        return await asyncio.to_thread(compare_runs, run_id, baseline_run_id or None)
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+
+async def set_baseline_run(run_id: str) -> dict:
+    """Make a run the baseline that later runs of the same script are compared with.
+
+    Args:
+        run_id: The run_id of the run to use as baseline
 
     Returns:
-        str: Gatling simulation output
+        dict: The script and its new baseline run
     """
-    return await run_gatling_simulation(directory_name, class_name, runner)
+    from .history_utils import set_baseline
+    try:
+        return await asyncio.to_thread(set_baseline, run_id)
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
 
 root_agent = Agent(
     name=os.getenv('FEATHERWAND_NAME', 'featherwand_agent'),
@@ -105,6 +442,17 @@ root_agent = Agent(
         execute_k6_test, 
         execute_k6_test_with_options, 
         execute_locust_test, 
-        execute_gatling_test
+        execute_gatling_test,
+        find_max_capacity,
+        analyze_test_plan,
+        analyze_test_results,
+        compare_test_runs,
+        set_baseline_run,
+        get_test_status,
+        cancel_test,
+        list_tests,
+        get_test_timeline,
+        fetch_run_artifact,
+        query_run_history
     ],
 )
\ No newline at end of file
@@ -0,0 +1,436 @@
+"""Content-addressed cache of parsed and digested run reports.
+
+Parsing a multi-GB JTL, NDJSON stream or ``simulation.log`` takes minutes,
+and the same results are often analysed again, later in a conversation, in
+another session or by another server worker. A report is cached under a key
+made of the SHA-256 of the content of the files it was parsed from, the
+parser and the parser module's ``PARSER_VERSION``, so:
+
+- the same content is parsed at most once, whatever its file name or path,
+- a file that changed, or a parser whose output changed (and whose version
+  was bumped), is parsed again.
+
+Files are only hashed again when their size, modification time or inode
+changed. Result files a run has just written cannot be in the cache yet, so
+the runners parse them with ``parse_fresh``, which skips the extra read of
+hashing them and caches the report under the files' path, size and
+modification time instead; ``cached_report`` looks there first. Entries are kept in memory (``REPORT_CACHE_MEMORY_MB``, default 64)
+and as JSON files in ``REPORT_CACHE_DIR`` (default: a ``featherwand-cache``
+folder in the temp directory, up to ``REPORT_CACHE_MB``, default 512), both
+evicting the least recently used entries first. ``REPORT_CACHE_MB=0``
+turns the cache off.
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence, Union
+
+from .run_utils import RunResult, load_manifest, save_run
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DISK_MB = 512
+DEFAULT_MEMORY_MB = 64
+HASH_CHUNK_BYTES = 4 * 1024 * 1024
+# Bumped when the layout of cache entries changes
+CACHE_FORMAT = 1
+
+PathLike = Union[str, Path]
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+class ReportCache:
+    """Least recently used cache of JSON values, in memory and on disk.
+
+    Args:
+        directory: Folder of the on-disk entries (default: ``REPORT_CACHE_DIR``)
+        max_disk_mb: Size bound of the on-disk entries (default: ``REPORT_CACHE_MB`` or 512)
+        max_memory_mb: Size bound of the in-memory entries (default: ``REPORT_CACHE_MEMORY_MB`` or 64)
+    """
+
+    def __init__(self, directory: Optional[PathLike] = None, max_disk_mb: Optional[float] = None,
+                 max_memory_mb: Optional[float] = None):
+        self.directory = Path(directory or os.getenv(
+            "REPORT_CACHE_DIR", Path(tempfile.gettempdir()) / "featherwand-cache"))
+        self.max_disk_bytes = int((max_disk_mb if max_disk_mb is not None
+                                   else _env_float("REPORT_CACHE_MB", DEFAULT_DISK_MB)) * 2**20)
+        self.max_memory_bytes = int((max_memory_mb if max_memory_mb is not None
+                                     else _env_float("REPORT_CACHE_MEMORY_MB", DEFAULT_MEMORY_MB)) * 2**20)
+        self.enabled = self.max_disk_bytes > 0
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+        # Content hashes of files by (path, size, mtime, inode)
+        self._file_hashes: OrderedDict[tuple, str] = OrderedDict()
+        self.hits = self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Any]:
+        """The value cached under a key, or None; a copy, so callers may change it."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+        if text is None:
+            path = self._path(key)
+            try:
+                text = path.read_text(encoding="utf-8")
+                # The modification time orders the on-disk entries for eviction
+                os.utime(path)
+            except OSError:
+                return None
+            self._remember(key, text)
+        return json.loads(text)
+
+    def put(self, key: str, value: Any) -> None:
+        """Cache a JSON-serialisable value under a key."""
+        if not self.enabled:
+            return
+        text = json.dumps(value, separators=(",", ":"), default=str)
+        self._remember(key, text)
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Written under a temporary name so that other processes never read half an entry
+            temporary = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}")
+            temporary.write_text(text, encoding="utf-8")
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning(f"Could not write report cache entry {path}: {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(text)
+        self._evict_disk()
+
+    def _remember(self, key: str, text: str) -> None:
+        if len(text) > self.max_memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            self._memory_bytes += len(text) - (len(previous) if previous is not None else 0)
+            self._memory[key] = text
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.directory.glob("??/*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict_disk(self) -> None:
+        with self._lock:
+            if self._disk_bytes is not None and self._disk_bytes <= self.max_disk_bytes:
+                return
+            # Other processes share the folder: only a full scan tells its real size
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_disk_bytes:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                except OSError:
+                    pass
+            self._disk_bytes = total
+
+    def file_hash(self, path: PathLike) -> str:
+        """SHA-256 of a file's content, or of the files in a folder; recomputed only when they changed."""
+        path = Path(path)
+        if path.is_dir():
+            digest = hashlib.sha256()
+            for child in sorted(child for child in path.rglob("*") if child.is_file()):
+                digest.update(f"{child.relative_to(path).as_posix()}\0{self.file_hash(child)}\n".encode())
+            return digest.hexdigest()
+        stat = path.stat()
+        stamp = (str(path.resolve()), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        with self._lock:
+            known = self._file_hashes.get(stamp)
+        if known is not None:
+            return known
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(HASH_CHUNK_BYTES):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        with self._lock:
+            self._file_hashes[stamp] = content_hash
+            if len(self._file_hashes) > 10_000:
+                self._file_hashes.popitem(last=False)
+        return content_hash
+
+    def clear(self) -> None:
+        """Drop every entry, in memory and on disk."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for _, _, path in self._entries():
+                path.unlink(missing_ok=True)
+            self._disk_bytes = 0
+
+
+_cache: Optional[ReportCache] = None
+_cache_lock = threading.Lock()
+
+
+def report_cache() -> ReportCache:
+    """The process-wide cache, configured from the environment on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ReportCache()
+        return _cache
+
+
+def cache_key(*parts: Any) -> str:
+    """A cache key from JSON-serialisable parts."""
+    text = json.dumps([CACHE_FORMAT, *parts], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def parser_id(parser: Callable) -> str:
+    """The name and ``PARSER_VERSION`` of a parser's module, part of the keys of its reports."""
+    version = getattr(sys.modules.get(parser.__module__), "PARSER_VERSION", 0)
+    return f"{parser.__module__}.{parser.__qualname__}:{version}"
+
+
+def report_key(parser: Callable, inputs: Sequence[PathLike], **kwargs: Any) -> str:
+    """The content-addressed key of the report ``parser`` makes of the files ``inputs``."""
+    cache = report_cache()
+    hashes = [cache.file_hash(path) if Path(path).exists() else None for path in inputs]
+    return cache_key("report", parser_id(parser), hashes, kwargs)
+
+
+def stamp_key(parser: Callable, inputs: Sequence[PathLike], **kwargs: Any) -> str:
+    """The key of the report ``parser`` makes of the files ``inputs``, by their path, size and modification time."""
+    stamps = []
+    for path in inputs:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stamps.append(None)
+            continue
+        stamps.append((str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns, stat.st_ino))
+    return cache_key("stamp", parser_id(parser), stamps, kwargs)
+
+
+def _inputs(source: Any, inputs: Optional[Sequence[PathLike]]) -> Sequence[PathLike]:
+    if inputs is not None:
+        return inputs
+    return list(source) if isinstance(source, (list, tuple)) else [source]
+
+
+def parse_fresh(parser: Callable[..., dict], source: Any, inputs: Optional[Sequence[PathLike]] = None,
+                **kwargs: Any) -> dict:
+    """``parser(source, **kwargs)`` for result files a run has just written.
+
+    They cannot be in the cache yet, so they are not hashed; the report is
+    cached under their path, size and modification time, so analysing the
+    same files later does not parse them again.
+
+    Args:
+        parser: Parser function returning a report
+        source: The parser's first argument: a result file, folder, list of files or file prefix
+        inputs: The files the report is made of (default: ``source`` itself, or its items)
+        **kwargs: Further parser arguments, part of the key
+
+    Returns:
+        dict: The report, which the caller may change
+    """
+    report = parser(source, **kwargs)
+    cache = report_cache()
+    if cache.enabled:
+        cache.put(stamp_key(parser, _inputs(source, inputs), **kwargs), report)
+    return report
+
+
+def cached_report(parser: Callable[..., dict], source: Any, inputs: Optional[Sequence[PathLike]] = None,
+                  **kwargs: Any) -> dict:
+    """``parser(source, **kwargs)``, from the cache when the same content was parsed before.
+
+    Args:
+        parser: Parser function returning a report
+        source: The parser's first argument: a result file, folder, list of files or file prefix
+        inputs: The files the report is made of (default: ``source`` itself, or its items)
+        **kwargs: Further parser arguments, part of the key
+
+    Returns:
+        dict: The report, which the caller may change
+    """
+    cache = report_cache()
+    if not cache.enabled:
+        return parser(source, **kwargs)
+    inputs = _inputs(source, inputs)
+    key = report_key(parser, inputs, **kwargs)
+    report = cache.get(key)
+    if report is None:
+        # Files a run wrote and parsed, unchanged since; filed under their content from now on
+        report = cache.get(stamp_key(parser, inputs, **kwargs))
+        if report is not None:
+            cache.put(key, report)
+    if report is not None:
+        cache.hits += 1
+        logger.info(f"Report of {source} served from the cache")
+        return report
+    cache.misses += 1
+    report = parser(source, **kwargs)
+    cache.put(key, report)
+    return report
+
+
+def results_source(path: PathLike, tool: Optional[str] = None) -> tuple[str, Callable[..., dict], Any, list[Path], dict]:
+    """How to parse a result file or folder a tool wrote.
+
+    Args:
+        path: JMeter JTL, k6 NDJSON, a Locust ``_stats.csv`` file (or any of its CSV files),
+            a Gatling results folder or its ``simulation.log``
+        tool: jmeter, k6, locust or gatling (default: from the file name)
+
+    Returns:
+        tuple: The tool, the parser and its first argument, the files the report is made of,
+        and the artifacts to save with the run
+
+    Raises:
+        ValueError: If the tool of the file cannot be told or is not supported
+    """
+    path = Path(path)
+    name = path.name.lower()
+    if tool is None:
+        if path.is_dir() or name == "simulation.log":
+            tool = "gatling"
+        elif name.endswith(("_stats.csv", "_stats_history.csv", "_failures.csv")):
+            tool = "locust"
+        elif path.suffix.lower() in (".jtl", ".csv"):
+            tool = "jmeter"
+        elif path.suffix.lower() in (".ndjson", ".json"):
+            tool = "k6"
+        else:
+            raise ValueError(f"Cannot tell the tool that wrote {path}; pass jmeter, k6, locust or gatling")
+    if tool == "jmeter":
+        from .jmeter_results import parse_jtl
+        return tool, parse_jtl, path, [path], {"jtl": str(path)}
+    if tool == "k6":
+        from .k6_results import parse_k6_json
+        return tool, parse_k6_json, path, [path], {"json": str(path)}
+    if tool == "locust":
+        from .locust_results import locust_csv_files, parse_locust_csv
+        prefix = str(path)
+        for suffix in ("_stats_history.csv", "_failures.csv", "_stats.csv"):
+            if prefix.endswith(suffix):
+                prefix = prefix[:-len(suffix)]
+                break
+        inputs = locust_csv_files(prefix)
+        artifacts = {f"{csv_file.name[len(Path(prefix).name) + 1:-4]}_csv": str(csv_file)
+                     for csv_file in inputs if csv_file.exists()}
+        return tool, parse_locust_csv, prefix, inputs, artifacts
+    if tool == "gatling":
+        from .gatling_results import parse_results_dir, results_files
+        results_dir = path if path.is_dir() else path.parent
+        inputs = results_files(results_dir)
+        artifacts = {"results_dir": str(results_dir)}
+        artifacts.update({name: str(file) for name, file in zip(("simulation_log", "stats_json"), inputs)
+                          if file.exists()})
+        return tool, parse_results_dir, results_dir, inputs, artifacts
+    raise ValueError(f"Unsupported tool: {tool}")
+
+
+def _saved_run(run_id: str) -> tuple[RunResult, list[str]]:
+    """A saved run rebuilt from its manifest, and the files it was rebuilt from."""
+    manifest = load_manifest(run_id)
+    artifacts = dict(manifest["artifacts"])
+    read = [path for name, path in artifacts.items()
+            if name in ("output", "error", "report", "health") and Path(path).is_file()]
+    texts = {name: Path(artifacts.pop(name)).read_text(encoding="utf-8", errors="replace")
+             for name in ("output", "error", "report", "health") if artifacts.get(name) in read}
+    result = RunResult(manifest["tool"], manifest["status"], output=texts.get("output", ""),
+                       error=texts.get("error", ""), artifacts=artifacts,
+                       report=json.loads(texts["report"]) if "report" in texts else None,
+                       health=json.loads(texts["health"]) if "health" in texts else None)
+    return result, read
+
+
+def analyze_results(source: str, tool: Optional[str] = None, token_budget: Optional[int] = None) -> dict:
+    """The digest of a saved run or of a result file, parsed and digested at most once per content.
+
+    A result file is saved as a run, so its artifacts can be fetched and
+    the run compared like any other; the same content maps to the same
+    run as long as that run is kept.
+
+    Args:
+        source: A run id, or the path of a result file or folder (see ``results_source``)
+        tool: Tool that wrote the result file (default: from the file name)
+        token_budget: Approximate token budget of the digest (default: ``DIGEST_TOKEN_BUDGET``)
+
+    Returns:
+        dict: The run digest; ``cached`` tells whether it was served from the cache
+
+    Raises:
+        ValueError: If the source is neither a saved run nor a supported result file
+        FileNotFoundError: If the run is not saved anymore
+    """
+    # Digesting needs numpy, imported on first use rather than at start-up
+    from .digest_utils import DEFAULT_TOKEN_BUDGET, digest_run
+    if token_budget is None:
+        token_budget = int(os.getenv("DIGEST_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+    cache = report_cache()
+    path = Path(source)
+
+    if not path.exists():
+        result, inputs = _saved_run(source)
+        digest_key = report_key(digest_run, inputs, run_id=source, token_budget=token_budget)
+        digest = cache.get(digest_key)
+        if digest is None:
+            digest = digest_run(result, source, token_budget)
+            cache.put(digest_key, digest)
+            return {**digest, "cached": False}
+        return {**digest, "cached": True}
+
+    tool, parser, parse_source, inputs, artifacts = results_source(path, tool)
+    content_key = report_key(parser, inputs)
+    run_id = cache.get(cache_key("run", content_key))
+    if run_id is not None:
+        try:
+            load_manifest(run_id)
+        except (ValueError, FileNotFoundError):
+            run_id = None
+    if run_id is not None:
+        digest = cache.get(cache_key("digest", content_key, run_id, token_budget))
+        if digest is not None:
+            return {**digest, "cached": True}
+        result, _ = _saved_run(run_id)
+    else:
+        result = RunResult(tool, "success", report=cached_report(parser, parse_source, inputs),
+                           artifacts=artifacts)
+        run_id = save_run(result)
+        cache.put(cache_key("run", content_key), run_id)
+        from .history_utils import record_run
+        try:
+            record_run(run_id, result, {"results": str(path.resolve())})
+        except Exception as e:
+            logger.warning(f"Could not record run {run_id} in the history: {e}")
+    digest = digest_run(result, run_id, token_budget)
+    cache.put(cache_key("digest", content_key, run_id, token_budget), digest)
+    return {**digest, "cached": False}
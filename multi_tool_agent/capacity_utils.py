@@ -0,0 +1,377 @@
+"""Automated search for the highest load a service sustains within its SLOs.
+
+Finding a service's knee with full-length runs at guessed user counts takes
+many runs of many minutes. A capacity search runs short probes instead,
+through the k6 or Locust runner, each at a fixed concurrency:
+
+* ``binary`` (default): the concurrency doubles from the start value until a
+  probe breaches the SLOs, then the range between the last passing and the
+  first failing concurrency is halved until its ends are within
+  ``CAPACITY_TOLERANCE`` (default 10%) of each other;
+* ``step``: the concurrency grows by the start value at every probe until
+  one breaches the SLOs, for a finer picture of how latency degrades.
+
+A probe breaches the SLOs when its latency percentile or error rate is over
+the limit. A probe whose throughput per user fell below ``CAPACITY_EFFICIENCY``
+(default 90%) of the best seen is saturated: more users only queue up, so
+it counts as a breach too.
+
+Probe windows adapt: a probe runs for ``CAPACITY_PROBE_S`` seconds (default
+15) and is run again for twice as long, up to ``CAPACITY_MAX_PROBE_S``
+(default 60), while it has fewer than ``CAPACITY_MIN_SAMPLES`` samples
+(default 200) or its figures are within ``CAPACITY_MARGIN`` (default 20%) of
+a limit, where a short window cannot tell a pass from a breach. At most
+``CAPACITY_MAX_PROBES`` probes (default 12) are run.
+"""
+import logging
+import math
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Optional, Sequence
+
+from .process_utils import LineConsumer
+from .registry_utils import get_runner
+from .run_utils import RunResult
+
+logger = logging.getLogger(__name__)
+
+MODES = ("binary", "step")
+# Latency percentiles a report's total carries
+PERCENTILES = ("p50", "p90", "p95", "p99")
+# Trend statistics k6 probes export, so every percentile can be checked without NDJSON output
+K6_TREND_STATS = ("avg", "min", "med", "max", "p(90)", "p(95)", "p(99)")
+
+# Runs a probe at a concurrency for a number of seconds: probe(users, seconds)
+ProbeRunner = Callable[[int, int], Awaitable[RunResult]]
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+@dataclass
+class SLO:
+    """Limits a probe must stay within.
+
+    Attributes:
+        latency_ms: Highest latency percentile allowed, in milliseconds
+        percentile: Latency percentile checked, e.g. "p95"
+        max_error_rate: Highest error rate allowed, in percent
+    """
+
+    latency_ms: float = 500.0
+    percentile: str = "p95"
+    max_error_rate: float = 1.0
+
+
+@dataclass
+class Probe:
+    """Outcome of a run at one concurrency.
+
+    Attributes:
+        users: Concurrent VUs or users
+        duration_s: Window of the measurement kept
+        samples: Requests completed
+        throughput: Requests per second
+        latency_ms: The SLO's latency percentile
+        error_rate: Failed requests, in percent
+        passed: Whether the probe stayed within the SLOs without saturating
+        reason: Why it did not pass
+        generator_bottleneck: Whether the load generator itself was saturated
+    """
+
+    users: int
+    duration_s: int
+    samples: int = 0
+    throughput: Optional[float] = None
+    latency_ms: Optional[float] = None
+    error_rate: Optional[float] = None
+    passed: bool = False
+    reason: Optional[str] = None
+    generator_bottleneck: bool = False
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class CapacityResult:
+    """Outcome of a capacity search.
+
+    Attributes:
+        mode: "binary" or "step"
+        slo: The limits searched against
+        max_users: Highest concurrency that passed, None if none did
+        max_throughput: Throughput at that concurrency
+        limited_by: Why the next concurrency up did not pass
+        probes: The probes run, in order
+        probe_seconds: Seconds of load generated, extended probes included
+        elapsed_s: Wall-clock time of the search
+    """
+
+    mode: str
+    slo: SLO
+    max_users: Optional[int] = None
+    max_throughput: Optional[float] = None
+    limited_by: Optional[str] = None
+    probes: list[Probe] = field(default_factory=list)
+    probe_seconds: int = 0
+    elapsed_s: float = 0.0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class ProbeError(Exception):
+    """A probe produced no report to judge it by."""
+
+    def __init__(self, result: RunResult):
+        super().__init__(result.error or "the probe produced no report")
+        self.result = result
+
+
+def judge(users: int, seconds: int, result: RunResult, slo: SLO) -> Probe:
+    """Check the report of a probe run against the SLOs."""
+    total = (result.report or {}).get("total") or {}
+    probe = Probe(users, seconds, samples=int(total.get("samples") or 0), throughput=total.get("throughput"),
+                  latency_ms=total.get(slo.percentile), error_rate=total.get("error_rate"),
+                  generator_bottleneck=bool((result.health or {}).get("findings")))
+    if not probe.samples:
+        probe.reason = "no requests completed"
+    elif probe.error_rate is not None and probe.error_rate > slo.max_error_rate:
+        probe.reason = f"error rate {probe.error_rate:g}% over {slo.max_error_rate:g}%"
+    elif (result.report or {}).get("thresholds_crossed"):
+        probe.reason = f"k6 thresholds crossed: {', '.join(result.report['thresholds_crossed'])}"
+    elif probe.latency_ms is None:
+        probe.reason = f"no {slo.percentile} latency in the report"
+    elif probe.latency_ms > slo.latency_ms:
+        probe.reason = f"{slo.percentile} {probe.latency_ms} ms over {slo.latency_ms:g} ms"
+    else:
+        probe.passed = True
+    return probe
+
+
+def _uncertain(probe: Probe, slo: SLO, margin: float, min_samples: int) -> bool:
+    """Whether a probe's window was too short to tell a pass from a breach."""
+    if probe.samples < min_samples:
+        return True
+    near = lambda value, limit: value is not None and abs(value - limit) <= margin * limit  # noqa: E731
+    return near(probe.latency_ms, slo.latency_ms) or (slo.max_error_rate > 0
+                                                      and near(probe.error_rate, slo.max_error_rate))
+
+
+class CapacitySearch:
+    """Search for the highest concurrency a service sustains within its SLOs.
+
+    Args:
+        probe: Runs the test at a concurrency for a number of seconds
+        slo: Limits a probe must stay within
+        start_users: Concurrency of the first probe, and the step of the step mode
+        max_users: Highest concurrency probed
+        mode: "binary" or "step"
+    """
+
+    def __init__(self, probe: ProbeRunner, slo: SLO, start_users: int = 10, max_users: int = 1000,
+                 mode: str = "binary"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown capacity search mode {mode!r}, expected one of {', '.join(MODES)}")
+        if slo.percentile not in PERCENTILES:
+            raise ValueError(f"Unknown percentile {slo.percentile!r}, expected one of {', '.join(PERCENTILES)}")
+        if not 0 < start_users <= max_users:
+            raise ValueError("start_users must be positive and no higher than max_users")
+        self.probe = probe
+        self.slo = slo
+        self.start_users = start_users
+        self.max_users = max_users
+        self.mode = mode
+        self.probe_s = int(_env_float("CAPACITY_PROBE_S", 15))
+        self.max_probe_s = int(_env_float("CAPACITY_MAX_PROBE_S", 60))
+        self.min_samples = int(_env_float("CAPACITY_MIN_SAMPLES", 200))
+        self.margin = _env_float("CAPACITY_MARGIN", 0.2)
+        self.tolerance = _env_float("CAPACITY_TOLERANCE", 0.1)
+        self.efficiency = _env_float("CAPACITY_EFFICIENCY", 0.9)
+        self.max_probes = int(_env_float("CAPACITY_MAX_PROBES", 12))
+        self.result = CapacityResult(mode, slo)
+        # Highest throughput per user seen, the service's unsaturated rate
+        self.peak_per_user = 0.0
+        # Report of the best passing probe, and of the last probe
+        self.best: Optional[tuple[Probe, RunResult]] = None
+        self.last: Optional[RunResult] = None
+
+    async def run(self) -> CapacityResult:
+        """Run the probes until the capacity is bracketed or the probe budget is spent.
+
+        Raises:
+            ProbeError: If a probe produced no report
+        """
+        started = time.monotonic()
+        failed: Optional[Probe] = None
+        users = self.start_users
+        # Grow until a probe fails
+        while len(self.result.probes) < self.max_probes:
+            probe = await self._measure(users)
+            if not probe.passed:
+                failed = probe
+                break
+            if users >= self.max_users:
+                break
+            users = min(self.max_users, users * 2 if self.mode == "binary" else users + self.start_users)
+        # Halve the range between the last pass and the first failure
+        if self.mode == "binary" and failed is not None:
+            low = self.result.max_users or 0
+            high = failed.users
+            while (len(self.result.probes) < self.max_probes and high - low > 1
+                   and high - low > self.tolerance * max(low, 1)):
+                probe = await self._measure((low + high) // 2)
+                if probe.passed:
+                    low = probe.users
+                else:
+                    high, failed = probe.users, probe
+        if failed is not None:
+            self.result.limited_by = f"{failed.reason} at {failed.users} users"
+        elif self.result.max_users == self.max_users:
+            self.result.limited_by = f"max_users {self.max_users} reached"
+        else:
+            self.result.limited_by = f"probe budget of {self.max_probes} spent"
+        self.result.elapsed_s = round(time.monotonic() - started, 1)
+        return self.result
+
+    async def _measure(self, users: int) -> Probe:
+        """Probe a concurrency, extending the window while the outcome is uncertain."""
+        seconds = self.probe_s
+        while True:
+            result = await self.probe(users, seconds)
+            self.last = result
+            self.result.probe_seconds += seconds
+            if not (result.report or {}).get("total"):
+                raise ProbeError(result)
+            probe = judge(users, seconds, result, self.slo)
+            if seconds * 2 > self.max_probe_s or not _uncertain(probe, self.slo, self.margin, self.min_samples):
+                break
+            logger.info(f"Probe at {users} users is close to the SLOs, extending it to {seconds * 2}s")
+            seconds *= 2
+        self._check_scaling(probe)
+        self.result.probes.append(probe)
+        logger.info(f"Probe at {users} users: {probe.throughput} req/s, {self.slo.percentile} "
+                    f"{probe.latency_ms} ms, {probe.error_rate}% errors, {'pass' if probe.passed else probe.reason}")
+        if probe.passed and (self.best is None or users > self.best[0].users):
+            self.best = (probe, result)
+            self.result.max_users, self.result.max_throughput = users, probe.throughput
+        return probe
+
+    def _check_scaling(self, probe: Probe) -> None:
+        """Fail a probe whose throughput stopped growing with its users: the service is saturated."""
+        if not probe.passed or not probe.throughput:
+            return
+        per_user = probe.throughput / probe.users
+        if per_user < self.efficiency * self.peak_per_user:
+            probe.passed = False
+            probe.reason = (f"throughput saturated: {probe.throughput:g} req/s at {probe.users} users, "
+                            f"{per_user / self.peak_per_user:.0%} of the best per user")
+        self.peak_per_user = max(self.peak_per_user, per_user)
+
+    def run_result(self, tool: str) -> RunResult:
+        """The search as a run: the report of the best probe, with the search under ``capacity``."""
+        probe, result = self.best if self.best is not None else (None, self.last)
+        report = dict(result.report or {}) if result is not None else {}
+        report["capacity"] = self.result.to_dict()
+        return RunResult(tool, "success", output=format_capacity(self.result),
+                         error=result.error if result is not None else "", report=report,
+                         artifacts=dict(result.artifacts) if result is not None else {},
+                         health=result.health if result is not None else None)
+
+
+def format_capacity(capacity: CapacityResult) -> str:
+    """Render the probes of a search as a table, with its conclusion."""
+    slo = capacity.slo
+    lines = [f"Capacity search ({capacity.mode}) against {slo.percentile} <= {slo.latency_ms:g} ms "
+             f"and errors <= {slo.max_error_rate:g}%",
+             f"{'users':>8} {'window':>7} {'req/s':>10} {slo.percentile + ' ms':>10} {'errors %':>9}  outcome"]
+    for probe in capacity.probes:
+        outcome = "pass" if probe.passed else probe.reason
+        if probe.generator_bottleneck:
+            outcome += " (load generator saturated)"
+        lines.append(f"{probe.users:>8} {probe.duration_s:>6}s {_cell(probe.throughput):>10} "
+                     f"{_cell(probe.latency_ms):>10} {_cell(probe.error_rate):>9}  {outcome}")
+    if capacity.max_users is None:
+        lines.append("No concurrency met the SLOs.")
+    else:
+        lines.append(f"Max sustainable: {capacity.max_users} users, {capacity.max_throughput} req/s")
+    lines.append(f"Limited by: {capacity.limited_by}")
+    lines.append(f"{len(capacity.probes)} probes, {capacity.probe_seconds}s of load in {capacity.elapsed_s}s")
+    return "\n".join(lines) + "\n"
+
+
+def _cell(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:g}"
+
+
+def k6_probe(script_file: str, consumers: Optional[Sequence[LineConsumer]] = None, shards: int = 1) -> ProbeRunner:
+    """Probes running a k6 script with the given VUs and duration.
+
+    The summary export carries every percentile the SLO may check, and a
+    probe that crosses the script's own thresholds (k6 exit code 99) keeps
+    its report, so it is judged as failing rather than stopping the search.
+    """
+    async def probe(users: int, seconds: int) -> RunResult:
+        return await get_runner("k6")(script_file, f"{seconds}s", users, False, consumers, shards,
+                                      summary_trend_stats=K6_TREND_STATS, fail_on_thresholds=False)
+    return probe
+
+
+def locust_probe(test_file: str, host: Optional[str] = None,
+                 consumers: Optional[Sequence[LineConsumer]] = None, workers: int = 0) -> ProbeRunner:
+    """Probes running a locustfile headless with the given users and run time.
+
+    The users are spawned within ``CAPACITY_RAMP_S`` seconds (default 5).
+    The run is longer by the ramp and Locust resets its statistics once
+    every user is spawned, so the probe's window is measured at full
+    concurrency only.
+    """
+    ramp_s = _env_float("CAPACITY_RAMP_S", 5)
+
+    async def probe(users: int, seconds: int) -> RunResult:
+        spawn_rate = max(1, math.ceil(users / ramp_s)) if ramp_s > 0 else users
+        runtime = seconds + math.ceil(users / spawn_rate)
+        return await get_runner("locust")(test_file, host, users, spawn_rate, f"{runtime}s", True, False,
+                                          consumers, workers, reset_stats=True)
+    return probe
+
+
+async def search_capacity(tool: str, script: str, slo: SLO, start_users: int = 10, max_users: int = 1000,
+                          mode: str = "binary", consumers: Optional[Sequence[LineConsumer]] = None,
+                          host: Optional[str] = None, processes: int = 1) -> RunResult:
+    """Search for the highest concurrency a k6 script or locustfile sustains within the SLOs.
+
+    Args:
+        tool: k6 or locust
+        script: Path to the k6 script or locustfile
+        slo: Limits a probe must stay within
+        start_users: Concurrency of the first probe, and the step of the step mode
+        max_users: Highest concurrency probed
+        mode: "binary" or "step"
+        consumers: Callables invoked with (stream_name, line) for every output line
+        host: Target host of a locustfile (default: LOCUST_HOST)
+        processes: k6 shards or Locust workers (0 for a single Locust process)
+
+    Returns:
+        RunResult: The report of the best probe, with the search under ``capacity``
+    """
+    if tool == "k6":
+        probe = k6_probe(script, consumers, max(1, processes))
+    elif tool == "locust":
+        probe = locust_probe(script, host, consumers, processes)
+    else:
+        return RunResult(tool, "error", error=f"Capacity search supports k6 and locust, not {tool}")
+    try:
+        search = CapacitySearch(probe, slo, start_users, max_users, mode)
+    except ValueError as e:
+        return RunResult(tool, "error", error=str(e))
+    try:
+        await search.run()
+    except ProbeError as e:
+        return RunResult(tool, "error", output=format_capacity(search.result) + e.result.output,
+                         error=f"Capacity search stopped, a probe failed:\n{e}", health=e.result.health)
+    return search.run_result(tool)
+
@@ -0,0 +1,252 @@
+"""Statistical run-to-run regression comparison.
+
+Two recorded runs are compared endpoint by endpoint: percentile, throughput
+and error rate deltas, plus significance tests on the latency
+distributions. The tests work on the runs' log-bucketed histograms (see
+``stats_utils``) rather than on raw samples. All endpoints are stacked
+into one ``(endpoints, buckets)`` matrix per run and tested at once, so
+the cost depends on the number of endpoints, not the number of samples:
+
+* Mann-Whitney U (with tie correction for samples sharing a bucket) tells
+  whether latencies of one run tend to be larger than the other's;
+* two-sample Kolmogorov-Smirnov catches changes in the shape of the
+  distribution, such as a new slow mode, that shift few ranks;
+* a two-proportion z-test compares error rates.
+
+With hundreds of thousands of samples even negligible differences are
+significant, so an endpoint only counts as a regression when a change is
+both significant (``COMPARE_ALPHA``, default 0.01) and large enough to
+matter (``COMPARE_MIN_CHANGE_PCT``, default 5% of a percentile, or
+``COMPARE_MIN_ERROR_RATE_CHANGE``, default 1 percentage point of errors).
+Throughput changes are reported alongside; they depend on the load model
+as much as on the system under test.
+"""
+import math
+import os
+from typing import Optional
+
+import numpy as np
+
+from .history_utils import find_baseline, load_run
+from .stats_utils import NUM_BUCKETS, round_stat
+
+DEFAULT_ALPHA = 0.01
+DEFAULT_MIN_CHANGE_PCT = 5.0
+DEFAULT_MIN_ERROR_RATE_CHANGE = 1.0
+COMPARED_PERCENTILES = ("p50", "p95", "p99")
+MAX_LISTED_ENDPOINTS = 20
+
+REGRESSION = "regression"
+IMPROVEMENT = "improvement"
+NO_CHANGE = "no significant change"
+INCONCLUSIVE = "inconclusive"
+
+_KS_TERMS = np.arange(1, 101, dtype=np.float64)
+
+
+def _two_sided_p(z: np.ndarray) -> np.ndarray:
+    """Two-sided p-value of standard normal scores."""
+    return np.vectorize(math.erfc, otypes=[np.float64])(np.abs(z) / math.sqrt(2.0))
+
+
+def mann_whitney(a: np.ndarray, b: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Mann-Whitney U test on bucketed samples, one test per row.
+
+    Args:
+        a: Bucket counts of the baseline, shape (rows, buckets)
+        b: Bucket counts of the compared run, same shape
+
+    Returns:
+        tuple: ``effect`` (Cliff's delta in [-1, 1], positive when ``b`` is
+        slower), normal score ``z`` and two-sided ``p`` value per row
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    n1, n2 = a.sum(axis=1), b.sum(axis=1)
+    n = n1 + n2
+    # U of b: for each b sample, the a samples below it plus half the ties in its bucket
+    a_below = np.cumsum(a, axis=1) - a
+    u = (b * (a_below + 0.5 * a)).sum(axis=1)
+    ties = a + b
+    tie_term = (ties ** 3 - ties).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = n1 * n2 / 12.0 * ((n + 1) - tie_term / (n * (n - 1)))
+        z = (u - n1 * n2 / 2.0) / np.sqrt(variance)
+        effect = 2.0 * u / (n1 * n2) - 1.0
+    z = np.where(variance > 0, z, 0.0)
+    return effect, z, np.where(np.isfinite(z), _two_sided_p(np.nan_to_num(z)), 1.0)
+
+
+def ks_test(a: np.ndarray, b: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Two-sample Kolmogorov-Smirnov test on bucketed samples, one test per row.
+
+    Args:
+        a: Bucket counts of the baseline, shape (rows, buckets)
+        b: Bucket counts of the compared run, same shape
+
+    Returns:
+        tuple: Statistic ``d`` (largest gap between the two CDFs) and
+        asymptotic ``p`` value per row
+    """
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    n1, n2 = a.sum(axis=1), b.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        d = np.abs(np.cumsum(a, axis=1) / n1[:, None] - np.cumsum(b, axis=1) / n2[:, None]).max(axis=1)
+        en = np.sqrt(n1 * n2 / (n1 + n2))
+        lam = (en + 0.12 + 0.11 / en) * d
+    lam = np.nan_to_num(lam)
+    signs = np.where(_KS_TERMS % 2 == 1, 1.0, -1.0)
+    p = 2.0 * (signs * np.exp(-2.0 * (_KS_TERMS * lam[:, None]) ** 2)).sum(axis=1)
+    p = np.where(lam < 0.3, 1.0, np.clip(p, 0.0, 1.0))
+    return np.nan_to_num(d), p
+
+
+def proportions_test(errors_a: np.ndarray, n_a: np.ndarray, errors_b: np.ndarray,
+                     n_b: np.ndarray) -> np.ndarray:
+    """Two-sided p-value of a two-proportion z-test per row."""
+    errors_a, n_a, errors_b, n_b = (np.asarray(x, dtype=np.float64) for x in (errors_a, n_a, errors_b, n_b))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pooled = (errors_a + errors_b) / (n_a + n_b)
+        se = np.sqrt(pooled * (1 - pooled) * (1 / n_a + 1 / n_b))
+        z = (errors_b / n_b - errors_a / n_a) / se
+    return np.where((se > 0) & np.isfinite(z), _two_sided_p(np.nan_to_num(z)), 1.0)
+
+
+def _dense(histograms: list[Optional[dict]]) -> np.ndarray:
+    """Stack sparse histograms into a (rows, buckets) count matrix; missing ones stay zero."""
+    matrix = np.zeros((len(histograms), NUM_BUCKETS), dtype=np.int64)
+    for row, histogram in enumerate(histograms):
+        if histogram and histogram["buckets"]:
+            matrix[row, np.asarray(histogram["buckets"], dtype=np.int64)] = histogram["counts"]
+    return matrix
+
+
+def _pct_change(base: Optional[float], current: Optional[float]) -> Optional[float]:
+    if base is None or current is None or base == 0:
+        return None
+    return round_stat(100.0 * (current - base) / base, 1)
+
+
+def _settings() -> tuple[float, float, float]:
+    return (float(os.getenv("COMPARE_ALPHA", DEFAULT_ALPHA)),
+            float(os.getenv("COMPARE_MIN_CHANGE_PCT", DEFAULT_MIN_CHANGE_PCT)),
+            float(os.getenv("COMPARE_MIN_ERROR_RATE_CHANGE", DEFAULT_MIN_ERROR_RATE_CHANGE)))
+
+
+def compare_stats(names: list[str], base_rows: list[dict], current_rows: list[dict],
+                  base_histograms: np.ndarray, current_histograms: np.ndarray) -> list[dict]:
+    """Compare matching rows of two runs and classify each change.
+
+    Args:
+        names: Row names (endpoints, or "total")
+        base_rows: Key statistics of the baseline per row
+        current_rows: Key statistics of the compared run per row
+        base_histograms: Baseline bucket counts, shape (rows, buckets)
+        current_histograms: Compared run bucket counts, same shape
+
+    Returns:
+        list: One comparison per row
+    """
+    alpha, min_change, min_error_change = _settings()
+    has_histograms = (base_histograms.sum(axis=1) > 0) & (current_histograms.sum(axis=1) > 0)
+    effect, _, mw_p = mann_whitney(base_histograms, current_histograms)
+    ks_d, ks_p = ks_test(base_histograms, current_histograms)
+
+    def column(rows: list[dict], key: str) -> np.ndarray:
+        return np.array([row.get(key) or 0 for row in rows], dtype=np.float64)
+
+    errors_p = proportions_test(column(base_rows, "errors"), column(base_rows, "samples"),
+                                column(current_rows, "errors"), column(current_rows, "samples"))
+
+    comparisons = []
+    for i, name in enumerate(names):
+        base, current = base_rows[i], current_rows[i]
+        comparison = {"endpoint": name, "samples": [base.get("samples"), current.get("samples")]}
+        for key in COMPARED_PERCENTILES:
+            comparison[key] = [base.get(key), current.get(key)]
+            comparison[f"{key}_change_pct"] = _pct_change(base.get(key), current.get(key))
+        comparison["throughput_change_pct"] = _pct_change(base.get("throughput"), current.get("throughput"))
+        error_change = None
+        if base.get("error_rate") is not None and current.get("error_rate") is not None:
+            error_change = round_stat(current["error_rate"] - base["error_rate"])
+        comparison["error_rate"] = [base.get("error_rate"), current.get("error_rate")]
+        comparison["error_rate_change"] = error_change
+        comparison["errors_p"] = float(f"{errors_p[i]:.3g}")
+
+        latency_changes = [comparison[f"{key}_change_pct"] for key in COMPARED_PERCENTILES
+                           if comparison[f"{key}_change_pct"] is not None]
+        slower = any(change >= min_change for change in latency_changes)
+        faster = any(change <= -min_change for change in latency_changes) and not slower
+        if has_histograms[i]:
+            comparison.update(effect_size=round(float(effect[i]), 3), mann_whitney_p=float(f"{mw_p[i]:.3g}"),
+                              ks_d=round(float(ks_d[i]), 3), ks_p=float(f"{ks_p[i]:.3g}"))
+            significant = min(mw_p[i], ks_p[i]) < alpha
+        else:
+            # Without distributions only the size of the change can be judged
+            significant = None
+        more_errors = error_change is not None and error_change >= min_error_change and errors_p[i] < alpha
+        fewer_errors = error_change is not None and error_change <= -min_error_change and errors_p[i] < alpha
+
+        if more_errors or (slower and significant):
+            verdict = REGRESSION
+        elif (faster and significant) or fewer_errors:
+            verdict = IMPROVEMENT
+        elif (slower or faster) and significant is None:
+            verdict = INCONCLUSIVE
+        else:
+            verdict = NO_CHANGE
+        comparison["verdict"] = verdict
+        comparisons.append(comparison)
+    return comparisons
+
+
+def compare_runs(run_id: str, baseline_run_id: Optional[str] = None, db_path: Optional[str] = None) -> dict:
+    """Compare a recorded run against a baseline run.
+
+    Args:
+        run_id: Run to check
+        baseline_run_id: Run to compare against (default: the baseline set for
+            the script, else the script's previous successful run)
+        db_path: History database (default: ``FEATHERWAND_HISTORY_DB``)
+
+    Returns:
+        dict: Overall verdict, the comparison of the run totals and of the
+        changed endpoints (regressions first), and endpoints found in only one run
+    """
+    baseline_run_id = baseline_run_id or find_baseline(run_id, db_path)
+    if baseline_run_id is None:
+        raise ValueError(f"No baseline to compare run {run_id} with; pass baseline_run_id or set a baseline")
+    base, current = load_run(baseline_run_id, db_path), load_run(run_id, db_path)
+
+    names = sorted(set(base["endpoints"]) & set(current["endpoints"]))
+    base_histograms = _dense([base["endpoints"][name]["histogram"] for name in names])
+    current_histograms = _dense([current["endpoints"][name]["histogram"] for name in names])
+    # The total compares the merged distributions of the endpoints both runs have
+    all_names = ["total", *names]
+    base_histograms = np.vstack([base_histograms.sum(axis=0, keepdims=True), base_histograms])
+    current_histograms = np.vstack([current_histograms.sum(axis=0, keepdims=True), current_histograms])
+    comparisons = compare_stats(all_names, [base, *(base["endpoints"][name] for name in names)],
+                                [current, *(current["endpoints"][name] for name in names)],
+                                base_histograms, current_histograms)
+    total, endpoints = comparisons[0], comparisons[1:]
+
+    order = {REGRESSION: 0, INCONCLUSIVE: 1, IMPROVEMENT: 2, NO_CHANGE: 3}
+    changed = sorted((row for row in endpoints if row["verdict"] != NO_CHANGE),
+                     key=lambda row: (order[row["verdict"]], -(row["p95_change_pct"] or 0)))
+    verdicts = {row["verdict"] for row in comparisons}
+    verdict = next((v for v in (REGRESSION, INCONCLUSIVE, IMPROVEMENT) if v in verdicts), NO_CHANGE)
+    return {
+        "run_id": run_id,
+        "baseline_run_id": baseline_run_id,
+        "verdict": verdict,
+        "settings": dict(zip(("users", "duration_s"), (current["users"], current["duration_s"]))),
+        "baseline_settings": dict(zip(("users", "duration_s"), (base["users"], base["duration_s"]))),
+        "total": total,
+        "endpoints_compared": len(names),
+        "regressions": sum(row["verdict"] == REGRESSION for row in endpoints),
+        "improvements": sum(row["verdict"] == IMPROVEMENT for row in endpoints),
+        "changed_endpoints": changed[:MAX_LISTED_ENDPOINTS],
+        "only_in_baseline": sorted(set(base["endpoints"]) - set(current["endpoints"]))[:MAX_LISTED_ENDPOINTS],
+        "only_in_run": sorted(set(current["endpoints"]) - set(base["endpoints"]))[:MAX_LISTED_ENDPOINTS],
+    }
@@ -0,0 +1,33 @@
+"""Process-wide configuration: the ``.env`` file and logging, set up once.
+
+Every entry point (the ADK agent loader, ``main.py``, the benchmarks) imports
+the ``multi_tool_agent`` package, which calls ``load_config``; modules read
+their settings from the environment when they need them, not at import time,
+so a value set in ``.env`` applies wherever it is used.
+"""
+import logging
+import threading
+
+from dotenv import load_dotenv
+
+_lock = threading.Lock()
+_loaded = False
+
+
+def load_config() -> None:
+    """Load ``.env`` into the environment and configure logging, once per process.
+
+    Variables already set in the environment win over the ``.env`` file.
+    """
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if _loaded:
+            return
+        load_dotenv()
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+        _loaded = True
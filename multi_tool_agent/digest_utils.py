@@ -0,0 +1,217 @@
+"""Compact, token-budgeted digests of load test runs.
+
+The runners capture up to thousands of output lines and a report row per
+endpoint, which is far more than a model needs to analyse a run. A digest
+keeps the overall key percentiles, the error breakdown, the slowest
+endpoints, the load generator's health and anomalies detected in the
+results; a generator that was itself the bottleneck is listed first, as
+it makes the other figures unreliable. It is then trimmed until
+its JSON form fits a token budget (``DIGEST_TOKEN_BUDGET``, default 1500).
+The raw artifacts stay on disk, see ``run_utils``.
+"""
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+from .run_utils import RunResult
+
+DEFAULT_TOKEN_BUDGET = 1500
+# Part of the keys of cached digests: bump when the digests this module makes change
+PARSER_VERSION = 2
+# Rough size of a token in JSON text, used to estimate a digest's cost without a tokenizer
+CHARS_PER_TOKEN = 4
+
+KEY_STATS = ("samples", "errors", "error_rate", "throughput", "mean", "p50", "p90", "p95", "p99", "max")
+
+# Anomaly thresholds
+ERROR_RATE_WARN = 1.0
+ENDPOINT_ERROR_RATE_WARN = 5.0
+LONG_TAIL_RATIO = 5.0
+MIN_SAMPLES = 20
+THROUGHPUT_DIP_RATIO = 0.5
+LATENCY_DRIFT_RATIO = 2.0
+
+# Successive limits tried while trimming a digest to its budget
+_LIMITS = (
+    {"endpoints": 10, "errors": 10, "anomalies": 10, "output_lines": 20},
+    {"endpoints": 5, "errors": 5, "anomalies": 8, "output_lines": 10},
+    {"endpoints": 3, "errors": 3, "anomalies": 5, "output_lines": 0},
+    {"endpoints": 1, "errors": 1, "anomalies": 3, "output_lines": 0},
+    {"endpoints": 0, "errors": 0, "anomalies": 1, "output_lines": 0},
+)
+
+
+def estimate_tokens(value) -> int:
+    return len(json.dumps(value, separators=(",", ":"), default=str)) // CHARS_PER_TOKEN + 1
+
+
+def key_stats(stats: Optional[dict]) -> dict:
+    """The statistics of a report row worth showing, without empty values."""
+    return {key: stats[key] for key in KEY_STATS if stats and stats.get(key) is not None}
+
+
+def slowest_endpoints(report: dict, limit: int) -> list[dict]:
+    """Endpoints by descending p95 (mean when percentiles are missing)."""
+    def latency(stats: dict) -> float:
+        return stats.get("p95") if stats.get("p95") is not None else (stats.get("mean") or 0.0)
+
+    rows = sorted((report.get("labels") or {}).items(), key=lambda item: latency(item[1]), reverse=True)
+    return [{"endpoint": name, **{key: stats[key] for key in ("samples", "error_rate", "mean", "p95", "p99")
+                                  if stats.get(key) is not None}}
+            for name, stats in rows[:limit]]
+
+
+def error_breakdown(report: dict, limit: int) -> list[dict]:
+    """The most frequent errors; Locust reports them per error message, other tools per endpoint."""
+    if report.get("failures"):
+        return report["failures"][:limit]
+    rows = sorted(((name, stats) for name, stats in (report.get("labels") or {}).items() if stats.get("errors")),
+                  key=lambda item: item[1]["errors"], reverse=True)
+    return [{"endpoint": name, "errors": stats["errors"], "error_rate": stats["error_rate"]}
+            for name, stats in rows[:limit]]
+
+
+def _timeline_series(timeline: Optional[dict]) -> tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """Per-second throughput, errors and (Locust only) p95 of a report timeline."""
+    if not timeline:
+        return np.zeros(0), np.zeros(0), None
+    if "rps" in timeline:
+        p95 = np.array([np.nan if value is None else value for value in timeline.get("p95", [])], dtype=np.float64)
+        return (np.asarray(timeline["rps"], dtype=np.float64),
+                np.asarray(timeline["failures_per_s"], dtype=np.float64), p95)
+    return (np.asarray(timeline.get("requests", []), dtype=np.float64),
+            np.asarray(timeline.get("errors", []), dtype=np.float64), None)
+
+
+def _timeline_anomalies(timeline: Optional[dict]) -> list[str]:
+    rps, errors, p95 = _timeline_series(timeline)
+    anomalies = []
+    # Ignore the first and last interval, which only partly overlap the run
+    steady = rps[1:-1]
+    if steady.size >= 5:
+        median = float(np.median(steady))
+        dips = np.flatnonzero(steady < THROUGHPUT_DIP_RATIO * median)
+        if median > 0 and dips.size:
+            anomalies.append(f"throughput fell below {THROUGHPUT_DIP_RATIO:.0%} of its median ({median:.1f}/s) "
+                             f"in {dips.size} of {steady.size} seconds, first at second {int(dips[0]) + 1} of the run")
+    if errors.size and errors.sum() > 0 and rps.size >= 5:
+        peak = int(np.argmax(errors))
+        if errors[peak] >= 0.5 * errors.sum():
+            anomalies.append(f"{errors[peak] / errors.sum():.0%} of all errors happened in second {peak} of the run")
+    if p95 is not None and np.isfinite(p95).sum() >= 6:
+        finite = p95[np.isfinite(p95)]
+        third = finite.size // 3
+        first, last = float(np.median(finite[:third])), float(np.median(finite[-third:]))
+        if first > 0 and last >= LATENCY_DRIFT_RATIO * first:
+            anomalies.append(f"p95 latency rose from {first:.0f} ms to {last:.0f} ms over the run")
+    return anomalies
+
+
+def detect_anomalies(report: dict) -> list[str]:
+    """Short descriptions of the suspicious patterns in a report, most important first."""
+    anomalies = []
+    total = report.get("total") or {}
+    if total.get("error_rate", 0) >= ERROR_RATE_WARN:
+        anomalies.append(f"overall error rate is {total['error_rate']}%")
+    if report.get("summary_metrics"):
+        failed = [f"{metric}: {threshold}"
+                  for metric, values in sorted(report["summary_metrics"].items())
+                  for threshold, breached in (values.get("thresholds") or {}).items() if breached]
+        if failed:
+            anomalies.append(f"k6 thresholds breached: {'; '.join(failed)}")
+    anomalies.extend(_timeline_anomalies(report.get("timeline")))
+
+    for name, stats in sorted((report.get("labels") or {}).items(),
+                              key=lambda item: item[1].get("errors") or 0, reverse=True):
+        if (stats.get("samples") or 0) >= MIN_SAMPLES and (stats.get("error_rate") or 0) >= ENDPOINT_ERROR_RATE_WARN:
+            anomalies.append(f"{name}: {stats['error_rate']}% errors")
+    for name, stats in [("overall", total), *(report.get("labels") or {}).items()]:
+        p50, tail = stats.get("p50"), stats.get("p99") or stats.get("p95")
+        if (stats.get("samples") or 0) >= MIN_SAMPLES and p50 and tail and tail >= LONG_TAIL_RATIO * p50:
+            percentile = "p99" if stats.get("p99") else "p95"
+            anomalies.append(f"{name}: long latency tail, {percentile} {tail} ms vs p50 {p50} ms")
+    return anomalies
+
+
+def generator_health(health: Optional[dict]) -> dict:
+    """The load generator's CPU, memory and GC figures of a run, without its samples."""
+    if not health:
+        return {}
+    summary = {key: health[key] for key in ("cpu_percent", "host_cpu_percent", "gc_cpu_percent", "rss_mb")
+               if health.get(key)}
+    summary["usable_cpus"] = health.get("usable_cpus")
+    summary["bottleneck"] = health.get("bottleneck", False)
+    return summary
+
+
+def capacity_summary(capacity: dict) -> dict:
+    """The conclusion of a capacity search and one row per probe: users, req/s, latency, errors %, passed."""
+    summary = {key: capacity[key] for key in ("max_users", "max_throughput", "limited_by", "slo", "elapsed_s")}
+    summary["probes"] = [[probe["users"], probe["throughput"], probe["latency_ms"], probe["error_rate"],
+                          probe["passed"]] for probe in capacity["probes"]]
+    return summary
+
+
+def _output_tail(text: str, lines: int) -> list[str]:
+    if lines <= 0 or not text:
+        return []
+    return [line[:200] for line in text.rstrip().splitlines()[-lines:]]
+
+
+def digest_run(result: RunResult, run_id: Optional[str] = None, token_budget: Optional[int] = None) -> dict:
+    """Reduce a run to a compact summary that fits a token budget.
+
+    Args:
+        result: The run to digest
+        run_id: Id of the saved run, so that artifacts can be fetched later
+        token_budget: Approximate token budget (default: ``DIGEST_TOKEN_BUDGET`` or 1500)
+
+    Returns:
+        dict: The digest. ``truncated`` is set when lists were shortened to fit the budget
+    """
+    if token_budget is None:
+        token_budget = int(os.getenv("DIGEST_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+    report = result.report or {}
+    # When the generator was saturated, latencies include its own queueing
+    anomalies = [f"load generator bottleneck: {finding}" for finding in (result.health or {}).get("findings", [])]
+    anomalies += detect_anomalies(report) if report else []
+    timeline = report.get("timeline") or {}
+
+    digest = {}
+    for limits in _LIMITS:
+        digest = {"run_id": run_id, "tool": result.tool, "status": result.status}
+        if result.status != "success":
+            digest["error"] = "\n".join(_output_tail(result.error, max(limits["output_lines"], 3)))
+        if report.get("capacity"):
+            digest["capacity"] = capacity_summary(report["capacity"])
+        if report:
+            digest["total"] = key_stats(report.get("total"))
+            if timeline.get("peak_rps") is not None:
+                digest["throughput"] = {"mean_rps": timeline["mean_rps"], "peak_rps": timeline["peak_rps"]}
+            digest["endpoints"] = len(report.get("labels") or {})
+            digest["slowest"] = slowest_endpoints(report, limits["endpoints"])
+            digest["errors"] = error_breakdown(report, limits["errors"])
+            digest["anomalies"] = anomalies[:limits["anomalies"]]
+        elif result.status == "success":
+            digest["output_tail"] = _output_tail(result.output, limits["output_lines"])
+        if result.health:
+            digest["generator"] = generator_health(result.health)
+            if not report and anomalies:
+                digest["anomalies"] = anomalies[:limits["anomalies"]]
+        if run_id:
+            digest["artifacts"] = sorted(_artifact_names(result))
+        if estimate_tokens(digest) <= token_budget:
+            break
+    if limits is not _LIMITS[0]:
+        digest["truncated"] = True
+    return digest
+
+
+def _artifact_names(result: RunResult) -> list[str]:
+    names = set(result.artifacts)
+    names.update(name for name, present in (("output", result.output), ("error", result.error),
+                                            ("report", result.report is not None),
+                                            ("health", result.health is not None)) if present)
+    return list(names)
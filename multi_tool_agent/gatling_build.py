@@ -0,0 +1,174 @@
+"""Build cache for Gatling simulation projects.
+
+Every Gatling run goes through Maven or Gradle, which resolve dependencies
+and compile the simulations before any load is generated. This module keeps
+a small stamp per project, recording content hashes of its build files and
+simulation sources after each successful run:
+
+* when the build files are unchanged, dependencies are already in the local
+  repository, so the build runs offline (``-o`` / ``--offline``) and skips
+  remote metadata checks;
+* when the sources are unchanged too and the compiled classes are still
+  there, Maven skips compilation altogether. Gradle already skips
+  up-to-date compile tasks and is given ``--build-cache`` instead.
+
+Stamps are kept under ``GATLING_BUILD_CACHE_DIR`` (default: a
+``featherwand-gatling-build`` folder in the temp directory), so nothing is
+written into the simulation project itself.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+BUILD_FILES = ("pom.xml", "build.gradle", "build.gradle.kts", "settings.gradle", "settings.gradle.kts",
+               "gradle.properties")
+BUILD_DIRS = (".mvn", "gradle")
+SOURCE_DIRS = ("src",)
+
+# Folders holding the compiled simulations; compilation is only skipped while they exist
+COMPILED_DIRS = {"mvn": "target/test-classes", "gradle": "build/classes"}
+
+# Both Maven and Gradle mention offline mode when a dependency is missing from the local cache
+OFFLINE_FAILURE_MARKER = "offline mode"
+
+
+@dataclass
+class BuildPlan:
+    """How to build a Gatling project for one run.
+
+    Attributes:
+        args: Extra command line arguments for the build tool
+        offline: Whether the build runs without contacting remote repositories
+        skip_compile: Whether compilation of unchanged sources is skipped
+        fingerprints: Content hashes of the build files and sources
+    """
+    args: list[str] = field(default_factory=list)
+    offline: bool = False
+    skip_compile: bool = False
+    fingerprints: dict[str, str] = field(default_factory=dict)
+
+
+def _env_flag(name: str, default: str) -> str:
+    return os.getenv(name, default).strip().lower()
+
+
+def cache_dir() -> Path:
+    return Path(os.getenv("GATLING_BUILD_CACHE_DIR", Path(tempfile.gettempdir()) / "featherwand-gatling-build"))
+
+
+def _stamp_path(project_dir: Path, runner: str) -> Path:
+    key = hashlib.sha256(f"{runner}:{project_dir.resolve()}".encode()).hexdigest()[:16]
+    return cache_dir() / f"{project_dir.name}-{key}.json"
+
+
+def _project_files(project_dir: Path, top_files: tuple, dirs: tuple) -> list[Path]:
+    files = [project_dir / name for name in top_files if (project_dir / name).is_file()]
+    for name in dirs:
+        folder = project_dir / name
+        if folder.is_dir():
+            files.extend(path for path in folder.rglob("*") if path.is_file())
+    return sorted(files, key=lambda path: path.relative_to(project_dir).as_posix())
+
+
+def _hash_files(project_dir: Path, files: list[Path], seed: str = "") -> str:
+    digest = hashlib.sha256(seed.encode())
+    for path in files:
+        digest.update(path.relative_to(project_dir).as_posix().encode() + b"\0")
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def project_fingerprints(project_dir: Path) -> dict[str, str]:
+    """Hash the build files and the simulation sources of a project.
+
+    Args:
+        project_dir: Gatling project folder
+
+    Returns:
+        dict: ``build`` (build files and wrapper settings) and ``sources``
+        (simulation sources and resources, including the build files) hashes
+    """
+    project_dir = Path(project_dir)
+    build = _hash_files(project_dir, _project_files(project_dir, BUILD_FILES, BUILD_DIRS))
+    sources = _hash_files(project_dir, _project_files(project_dir, (), SOURCE_DIRS), seed=build)
+    return {"build": build, "sources": sources}
+
+
+def load_stamp(project_dir: Path, runner: str) -> Optional[dict]:
+    path = _stamp_path(Path(project_dir), runner)
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def save_stamp(project_dir: Path, runner: str, fingerprints: dict[str, str]) -> None:
+    """Record the fingerprints of a project that just built and ran successfully."""
+    path = _stamp_path(Path(project_dir), runner)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"runner": runner, "project": str(project_dir), "time": time.time(),
+                                    **fingerprints}), encoding="utf-8")
+    except OSError as e:
+        logger.warning(f"Could not save the Gatling build stamp: {e}")
+
+
+def plan_build(project_dir: Path, runner: str) -> BuildPlan:
+    """Decide how much of the build a run can skip.
+
+    ``GATLING_OFFLINE`` controls offline builds: ``auto`` (default) once the
+    build files have built successfully before, ``true`` always (for a local
+    repository seeded ahead of time) and ``false`` never.
+    ``GATLING_BUILD_CACHE=false`` disables skipping compilation, and
+    ``GATLING_MAVEN_REPO`` points Maven at a pre-seeded local repository.
+
+    Args:
+        project_dir: Gatling project folder
+        runner: Build tool, mvn or gradle
+
+    Returns:
+        BuildPlan: Extra build arguments and what they skip
+    """
+    project_dir = Path(project_dir)
+    fingerprints = project_fingerprints(project_dir)
+    stamp = load_stamp(project_dir, runner) or {}
+    warm = stamp.get("build") == fingerprints["build"]
+
+    offline_mode = _env_flag("GATLING_OFFLINE", "auto")
+    offline = offline_mode == "true" or (offline_mode == "auto" and warm)
+    compiled_dir = COMPILED_DIRS.get(runner)
+    skip_compile = (_env_flag("GATLING_BUILD_CACHE", "true") != "false"
+                    and stamp.get("sources") == fingerprints["sources"]
+                    and compiled_dir is not None and (project_dir / compiled_dir).is_dir())
+
+    plan = BuildPlan(offline=offline, fingerprints=fingerprints)
+    if runner == "mvn":
+        repo = os.getenv("GATLING_MAVEN_REPO")
+        if repo:
+            plan.args.append(f"-Dmaven.repo.local={repo}")
+        if offline:
+            plan.args.append("-o")
+        if skip_compile:
+            plan.skip_compile = True
+            plan.args.extend(["-Dmaven.main.skip=true", "-Dmaven.test.skip=true"])
+    else:
+        plan.args.append("--build-cache")
+        if offline:
+            plan.args.append("--offline")
+    return plan
+
+
+def without_offline(args: list[str]) -> list[str]:
+    """Return the build arguments with offline mode turned off."""
+    return [arg for arg in args if arg not in ("-o", "--offline")]
@@ -0,0 +1,257 @@
+"""Locate and parse Gatling simulation results.
+
+Gatling writes each run to ``<results>/<simulation>-<timestamp>/``, under
+``target/gatling`` for Maven and ``build/reports/gatling`` for Gradle. The
+raw records are in ``simulation.log``:
+
+- Gatling up to 3.10 writes it as tab-separated text, parsed here
+  incrementally.
+- Later versions write a binary log. For those, the per-request aggregates
+  are read from the HTML report's ``js/stats.json`` instead.
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+from .parse_utils import gather_bytes, line_bounds, parse_digits, read_blocks, starts_with
+from .stats_utils import EndpointAggregator, ThroughputTimeline, round_stat
+
+logger = logging.getLogger(__name__)
+
+# Part of the keys of cached reports: bump when the reports this module makes change
+PARSER_VERSION = 1
+
+RESULTS_DIRS = (Path("target") / "gatling", Path("build") / "reports" / "gatling")
+CHUNK_BYTES = 8 * 1024 * 1024
+
+# File timestamps come from a coarser clock than time.time() and can trail it slightly
+_MTIME_SLACK_SECONDS = 1.0
+
+
+def find_results_dir(directory: Union[str, Path], since: Optional[float] = None,
+                     class_name: Optional[str] = None) -> Optional[Path]:
+    """Find the newest Gatling results folder of a project.
+
+    Args:
+        directory: Gatling project directory
+        since: Only consider folders modified at or after this epoch time (e.g. the run start)
+        class_name: Prefer folders of this simulation class, when given
+
+    Returns:
+        Path: The newest matching results folder, or None
+    """
+    candidates = []
+    for results_root in RESULTS_DIRS:
+        root = Path(directory) / results_root
+        if root.is_dir():
+            candidates.extend(path for path in root.iterdir()
+                              if path.is_dir() and (path / "simulation.log").exists())
+    if since is not None:
+        candidates = [path for path in candidates if path.stat().st_mtime >= since - _MTIME_SLACK_SECONDS]
+    if class_name:
+        prefix = class_name.rsplit(".", 1)[-1].lower() + "-"
+        matching = [path for path in candidates if path.name.lower().startswith(prefix)]
+        candidates = matching or candidates
+    return max(candidates, key=lambda path: path.stat().st_mtime, default=None)
+
+
+def is_text_log(simulation_log: Union[str, Path]) -> bool:
+    with open(simulation_log, "rb") as f:
+        head = f.read(4096)
+    return head.startswith((b"RUN\t", b"ASSERTION\t", b"USER\t", b"REQUEST\t")) and b"\x00" not in head
+
+
+class SimulationLogAggregator:
+    """Fold text ``simulation.log`` records into per-request statistics.
+
+    Only ``REQUEST`` records carry response times. Their columns are
+    located relative to the OK/KO status field, which covers both the 3.0
+    layout (scenario and user id before the request) and the shorter 3.4+
+    layout.
+    """
+
+    def __init__(self):
+        self.aggregator = EndpointAggregator()
+        self.timeline = ThroughputTimeline()
+        self.users_started = 0
+        self.malformed_lines = 0
+        self.simulation = None
+
+    def feed_block(self, block: bytes) -> None:
+        """Aggregate a block of complete log lines.
+
+        REQUEST records are located and decoded column-wise with NumPy when
+        they all share one column layout; the few other record types, and
+        any irregular block, go through ``feed_lines``.
+        """
+        if b"\r" in block:
+            block = block.replace(b"\r", b"")
+        buf = np.frombuffer(block, dtype=np.uint8)
+        line_starts, line_ends = line_bounds(buf)
+        requests = starts_with(buf, line_starts, line_ends, b"REQUEST\t")
+        parsed = self._parse_requests(buf, line_starts, line_ends, requests) if requests.any() else None
+        if parsed is None and requests.any():
+            self.feed_lines(block.decode("utf-8", errors="replace").splitlines())
+            return
+        if parsed is not None:
+            names, elapsed, success, start = parsed
+            self.aggregator.add_batch(names, elapsed, success, start)
+            self.timeline.add(start, ~success)
+        others = np.flatnonzero(~requests)
+        if others.size:
+            self.feed_lines([block[line_starts[i]:line_ends[i]].decode("utf-8", errors="replace") for i in others])
+
+    def _parse_requests(self, buf: np.ndarray, line_starts: np.ndarray, line_ends: np.ndarray,
+                        requests: np.ndarray) -> Optional[tuple]:
+        tabs = np.flatnonzero(buf == ord("\t"))
+        tab_lines = np.searchsorted(line_starts, tabs, side="right") - 1
+        in_request = requests[tab_lines]
+        tabs = tabs[in_request]
+        tab_counts = np.bincount(tab_lines[in_request], minlength=line_starts.size)
+        request_tab_counts = tab_counts[requests]
+        n_tabs = int(request_tab_counts[0])
+        # 3.4+ layout has 6 tabs (message included), the 3.0 layout has 8
+        if n_tabs not in (6, 8) or (request_tab_counts != n_tabs).any():
+            return None
+        tabs = tabs.reshape(-1, n_tabs)
+        starts = np.column_stack((line_starts[requests], tabs + 1))
+        ends = np.column_stack((tabs, line_ends[requests]))
+        status = n_tabs - 1
+        start = parse_digits(buf, starts[:, status - 2], ends[:, status - 2])
+        end = parse_digits(buf, starts[:, status - 1], ends[:, status - 1])
+        groups = gather_bytes(buf, starts[:, status - 4], ends[:, status - 4])
+        names = gather_bytes(buf, starts[:, status - 3], ends[:, status - 3])
+        status_bytes = buf[starts[:, status]]
+        if start is None or end is None or groups is None or names is None or \
+                not np.isin(status_bytes, (ord("O"), ord("K"))).all():
+            return None
+        grouped = np.char.str_len(groups) > 0
+        if grouped.any():
+            names = np.where(grouped, np.char.add(np.char.add(groups, b" / "), names), names)
+        return names, end - start, status_bytes == ord("O"), start
+
+    def feed_lines(self, lines: list[str]) -> None:
+        names, starts, ends, ok = [], [], [], []
+        for line in lines:
+            if not line.startswith("REQUEST\t"):
+                if line.startswith("USER\t") and "\tSTART\t" in line:
+                    self.users_started += 1
+                elif line.startswith("RUN\t"):
+                    self.simulation = line.split("\t")[1]
+                continue
+            fields = line.rstrip("\r\n").split("\t")
+            status = next((i for i in (5, len(fields) - 2, len(fields) - 1)
+                           if 4 <= i < len(fields) and fields[i] in ("OK", "KO")), None)
+            if status is None:
+                self.malformed_lines += 1
+                continue
+            group = fields[status - 4]
+            name = fields[status - 3]
+            names.append(f"{group} / {name}" if group else name)
+            starts.append(fields[status - 2])
+            ends.append(fields[status - 1])
+            ok.append(fields[status] == "OK")
+        if not names:
+            return
+        try:
+            start = np.array(starts, dtype=np.float64)
+            end = np.array(ends, dtype=np.float64)
+        except ValueError:
+            self.malformed_lines += len(names)
+            return
+        success = np.array(ok)
+        self.aggregator.add_batch(np.array(names), end - start, success, start)
+        self.timeline.add(start, ~success)
+
+    def summary(self) -> dict:
+        report = self.aggregator.summary()
+        report["simulation"] = self.simulation
+        report["users"] = self.users_started
+        report["timeline"] = self.timeline.summary()
+        return report
+
+
+def parse_simulation_log(simulation_log: Union[str, Path], chunk_bytes: int = CHUNK_BYTES) -> dict:
+    """Parse a text ``simulation.log`` into per-request statistics and a throughput timeline.
+
+    The log is read in blocks of about ``chunk_bytes`` and the REQUEST
+    records of each block are decoded and aggregated with NumPy, so memory
+    stays bounded however many request records the log holds.
+
+    Args:
+        simulation_log: Path to a text-format simulation.log
+        chunk_bytes: Approximate size of the text aggregated per block
+
+    Returns:
+        dict: Report with ``total``, per-request ``labels`` and a per-second ``timeline``
+    """
+    aggregator = SimulationLogAggregator()
+    with open(simulation_log, "rb") as f:
+        for block in read_blocks(f, chunk_bytes):
+            aggregator.feed_block(block)
+    if aggregator.malformed_lines:
+        logger.warning(f"Skipped {aggregator.malformed_lines} malformed records in {simulation_log}")
+    return aggregator.summary()
+
+
+def _stats_row(stats: dict) -> dict:
+    requests = stats["numberOfRequests"]
+    samples = requests.get("total", 0)
+    errors = requests.get("ko", 0)
+
+    def value(key: str) -> Optional[float]:
+        entry = stats.get(key) or {}
+        return round_stat(entry.get("total")) if entry.get("total") is not None else None
+
+    # Gatling's default percentiles1..4 are the 50th, 75th, 95th and 99th
+    return {
+        "samples": samples,
+        "errors": errors,
+        "error_rate": round_stat(100.0 * errors / samples) if samples else 0.0,
+        "throughput": value("meanNumberOfRequestsPerSecond"),
+        "min": value("minResponseTime"),
+        "mean": value("meanResponseTime"),
+        "max": value("maxResponseTime"),
+        "p50": value("percentiles1"),
+        "p75": value("percentiles2"),
+        "p90": None,
+        "p95": value("percentiles3"),
+        "p99": value("percentiles4"),
+    }
+
+
+def parse_stats_json(stats_json: Union[str, Path]) -> dict:
+    """Read per-request aggregates from a Gatling HTML report's ``js/stats.json``."""
+    with open(stats_json, encoding="utf-8") as f:
+        data = json.load(f)
+    labels = {}
+    pending = list((data.get("contents") or {}).values())
+    while pending:
+        node = pending.pop()
+        if node.get("type") == "REQUEST":
+            labels[node["stats"]["name"]] = _stats_row(node["stats"])
+        pending.extend((node.get("contents") or {}).values())
+    return {
+        "total": _stats_row(data["stats"]),
+        "labels": {name: labels[name] for name in sorted(labels)},
+    }
+
+
+def results_files(results_dir: Union[str, Path]) -> list[Path]:
+    """The files of a Gatling results folder ``parse_results_dir`` may read."""
+    return [Path(results_dir) / "simulation.log", Path(results_dir) / "js" / "stats.json"]
+
+
+def parse_results_dir(results_dir: Union[str, Path]) -> dict:
+    """Parse a Gatling results folder, picking the best source for its log format."""
+    results_dir = Path(results_dir)
+    simulation_log = results_dir / "simulation.log"
+    if simulation_log.exists() and is_text_log(simulation_log):
+        return parse_simulation_log(simulation_log)
+    stats_json = results_dir / "js" / "stats.json"
+    if stats_json.exists():
+        return parse_stats_json(stats_json)
+    raise ValueError(f"No parseable Gatling results in {results_dir}")
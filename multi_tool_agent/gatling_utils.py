@@ -1,48 +1,83 @@
+import asyncio
 import logging
-from dotenv import load_dotenv
 from pathlib import Path
-import subprocess
 import platform
-from typing import Optional
+import time
+from typing import Optional, Sequence
 import os
 
-load_dotenv()
+from .cache_utils import parse_fresh
+from .gatling_build import OFFLINE_FAILURE_MARKER, plan_build, save_stamp, without_offline
+from .gatling_results import find_results_dir, parse_results_dir, results_files
+from .health_utils import GeneratorMonitor
+from .process_utils import LineConsumer, announce_artifacts, run_deadline, run_process
+from .run_utils import RunResult
+from .stats_utils import format_summary
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 
-async def run_gatling_simulation(directory_name: str, class_name: Optional[str] = None, runner: str = os.getenv("GATLING_RUNNER", "mvn")) -> str:
+async def run_gatling_simulation(directory_name: str, class_name: Optional[str] = None, runner: Optional[str] = None) -> str:
     """Run a Gatling simulation.
 
     Args:
         directory_name: Name of the Gatling simulation directory
         class_name: Optional name of the Gatling simulation class (default: None)
-        runner: Optional runner to use (default: mvn) other option: gradle
+        runner: Optional runner to use (default: GATLING_RUNNER, else mvn) other option: gradle
 
     Returns:
         str: Gatling simulation output
     """
+    result = await run_gatling_result(directory_name, class_name, runner)
+    if result.status != "success":
+        return result.error
+    if result.report is None:
+        return result.output
+    output = f"{result.output}\nResults folder: {result.artifacts['results_dir']}\n\n{format_summary(result.report)}\n"
+    timeline = result.report.get("timeline")
+    if timeline and timeline["peak_rps"] is not None:
+        output += f"\nThroughput: mean {timeline['mean_rps']} req/s, peak {timeline['peak_rps']} req/s\n"
+    build = result.report.get("build")
+    if build:
+        output += (f"\nBuild: compile {'skipped' if build['compile_skipped'] else 'ran'}, "
+                   f"{'offline' if build['offline'] else 'online'}")
+        if build["time_to_first_request_s"] is not None:
+            output += f", simulation started after {build['time_to_first_request_s']}s"
+        output += "\n"
+    return output
+
+
+async def run_gatling_result(directory_name: str, class_name: Optional[str] = None,
+                             runner: Optional[str] = None,
+                             consumers: Optional[Sequence[LineConsumer]] = None) -> RunResult:
+    """Run a Gatling simulation and return its output, parsed results and results folder.
+
+    Args:
+        directory_name: Name of the Gatling simulation directory
+        class_name: Optional name of the Gatling simulation class (default: None)
+        runner: Optional runner to use (default: GATLING_RUNNER, else mvn) other option: gradle
+        consumers: Callables invoked with (stream_name, line) for every output line
+
+    Returns:
+        RunResult: The structured outcome of the run
+    """
+    runner = runner or os.getenv("GATLING_RUNNER", "mvn")
     try:
         # Convert to absolute path
         directory_path = Path(directory_name).resolve()
         
         # Validate directory exists
         if not directory_path.exists():
-            return f"Error: Directory not found: {directory_name}"
+            return RunResult("gatling", "error", error=f"Error: Directory not found: {directory_name}")
         if not directory_path.is_dir():
-            return f"Error: Invalid directory: {directory_name}"
+            return RunResult("gatling", "error", error=f"Error: Invalid directory: {directory_name}")
 
         # Build command
         if runner == 'mvn':
             mvnw_path = directory_path / ('mvnw.cmd' if platform.system() == 'Windows' else 'mvnw')
             if not mvnw_path.exists():
-                return f"Error: mvnw not found in {directory_path}"
+                return RunResult("gatling", "error", error=f"Error: mvnw not found in {directory_path}")
                 
             cmd = [str(mvnw_path)]
             cmd.append('io.gatling:gatling-maven-plugin:test')
@@ -59,7 +94,7 @@ async def run_gatling_simulation(directory_name: str, class_name: Optional[str]
         if runner == 'gradle':
             gradlew_path = directory_path / ('gradlew.cmd' if platform.system() == 'Windows' else 'gradlew')
             if not gradlew_path.exists():
-                return f"Error: gradlew not found in {directory_path}"
+                return RunResult("gatling", "error", error=f"Error: gradlew not found in {directory_path}")
                 
             cmd = [str(gradlew_path)]
             cmd.append('gatlingRun')
@@ -70,19 +105,73 @@ async def run_gatling_simulation(directory_name: str, class_name: Optional[str]
             # Print the full command for debugging
             logger.debug(f"Executing command: {' '.join(cmd)}")
         
+        # Skip dependency resolution and compilation the previous runs already did
+        plan = await asyncio.to_thread(plan_build, directory_path, runner)
+        logger.debug(f"Build plan: offline={plan.offline}, skip_compile={plan.skip_compile}")
+
+        # Note when the simulation itself starts, to measure the build overhead
+        first_request = []
+        monitor = GeneratorMonitor("gatling")
+
+        def on_line(stream: str, line: str) -> None:
+            if not first_request and line.startswith("Simulation ") and "started" in line:
+                first_request.append(time.monotonic())
+                # Compiling is no part of generating the load
+                monitor.reset()
+
         # Run the command and capture output
-        result = subprocess.run(cmd, capture_output=True, text=True, cwd=str(directory_path))
+        started = time.time()
+        launched = time.monotonic()
+        # The results folder is only created once the simulation starts
+        announce_artifacts(consumers, {"project_dir": directory_path})
+        consumers = [*(consumers or ()), on_line]
+        # The simulation defines its own duration, and the build comes first
+        deadline = run_deadline()
+        result = await run_process(cmd + plan.args, cwd=str(directory_path), consumers=consumers, monitor=monitor,
+                                   deadline=deadline)
+        if (result.returncode != 0 and plan.offline
+                and OFFLINE_FAILURE_MARKER in result.stdout + result.stderr and not first_request):
+            # A dependency is missing from the local repository; resolve it online once
+            logger.info("Offline Gatling build is missing dependencies, retrying online")
+            plan.offline = False
+            plan.args = without_offline(plan.args)
+            launched = time.monotonic()
+            result = await run_process(cmd + plan.args, cwd=str(directory_path), consumers=consumers,
+                                       monitor=monitor, deadline=deadline)
         
         # Print output for debugging
         logger.debug(f"\nCommand output:")
-        logger.debug(f"Return code: {result.returncode}")
         logger.debug(f"Stdout: {result.stdout}")
         logger.debug(f"Stderr: {result.stderr}")
 
-        if result.returncode != 0:
-            return f"Error executing Gatling simulation:\n{result.stderr}"
-        
-        return result.stdout
+        # A run stopped early still has the results written so far
+        if result.returncode != 0 and not result.stopped:
+            return RunResult("gatling", "error", output=result.stdout,
+                             error=f"Error executing Gatling simulation:\n{result.stderr}", health=monitor.summary())
+        if result.returncode == 0:
+            await asyncio.to_thread(save_stamp, directory_path, runner, plan.fingerprints)
+
+        # The results of this run are in the newest results folder created since it started
+        results_dir = find_results_dir(directory_path, since=started, class_name=class_name)
+        if results_dir is None:
+            return RunResult("gatling", "success", output=result.stdout, error=result.stderr,
+                             health=monitor.summary())
+
+        # Parsing a large simulation.log is CPU bound; keep it off the event loop
+        report = await asyncio.to_thread(parse_fresh, parse_results_dir, results_dir,
+                                         results_files(results_dir))
+        report["build"] = {
+            "offline": plan.offline,
+            "compile_skipped": plan.skip_compile,
+            "time_to_first_request_s": round(first_request[0] - launched, 1) if first_request else None,
+        }
+        artifacts = {"results_dir": str(results_dir)}
+        for name, path in (("simulation_log", results_dir / "simulation.log"),
+                           ("stats_json", results_dir / "js" / "stats.json")):
+            if path.exists():
+                artifacts[name] = str(path)
+        return RunResult("gatling", "success", output=result.stdout, error=result.stderr,
+                         report=report, artifacts=artifacts, health=monitor.summary())
 
     except Exception as e:
-        return f"Unexpected error: {str(e)}"
\ No newline at end of file
+        return RunResult("gatling", "error", error=f"Unexpected error: {str(e)}")
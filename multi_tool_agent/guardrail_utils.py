@@ -0,0 +1,184 @@
+"""Live SLO guardrails that stop a run early when it goes bad.
+
+While a job runs, its guardrails are checked against every per-second
+snapshot of its live metrics (see ``live_utils``), over a sliding window of
+the last ``window_s`` seconds of the job's 1 s rollup:
+
+* ``error_rate``: failed requests in the window, in percent;
+* ``p95`` and ``p99``: latency percentiles merged from the window's
+  histograms, or Locust's own recent percentiles, in milliseconds;
+* ``min_rps``: a floor under the mean throughput of the window.
+
+Checks start ``warmup_s`` seconds after the first requests, so ramp-up and
+JVM warm-up do not count, and the latency and error limits need
+``min_requests`` requests in the window. A limit must stay breached for
+``sustain_s`` seconds in a row before the run is stopped: its load
+generators get SIGTERM, so they can still write the results so far, and the
+job ends as ``aborted`` with the reason.
+
+Limits are off unless set, through ``GUARDRAIL_*`` environment defaults or
+per run with a spec such as ``"error_rate=5,p95=800,min_rps=50,window=30s"``.
+"""
+import logging
+import os
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Optional
+
+from .run_utils import duration_seconds
+
+if TYPE_CHECKING:
+    from .rollup_utils import TimeSeriesRollup
+
+logger = logging.getLogger(__name__)
+
+# Spec keys, their Guardrails field and environment default
+_SPEC = {
+    "error_rate": ("max_error_rate", "GUARDRAIL_MAX_ERROR_RATE"),
+    "p95": ("max_p95_ms", "GUARDRAIL_MAX_P95_MS"),
+    "p99": ("max_p99_ms", "GUARDRAIL_MAX_P99_MS"),
+    "min_rps": ("min_rps", "GUARDRAIL_MIN_RPS"),
+    "window": ("window_s", "GUARDRAIL_WINDOW_S"),
+    "sustain": ("sustain_s", "GUARDRAIL_SUSTAIN_S"),
+    "warmup": ("warmup_s", "GUARDRAIL_WARMUP_S"),
+    "min_requests": ("min_requests", "GUARDRAIL_MIN_REQUESTS"),
+}
+_LIMITS = ("max_error_rate", "max_p95_ms", "max_p99_ms", "min_rps")
+_DURATIONS = ("window_s", "sustain_s", "warmup_s")
+_OFF = ("", "off", "none")
+
+
+@dataclass
+class Guardrails:
+    """Limits a run must stay within while it runs.
+
+    Attributes:
+        max_error_rate: Highest error rate, in percent
+        max_p95_ms: Highest p95 latency, in milliseconds
+        max_p99_ms: Highest p99 latency, in milliseconds
+        min_rps: Lowest mean throughput, in requests per second
+        window_s: Length of the sliding window the limits are checked over
+        sustain_s: Seconds a limit must stay breached before the run is stopped
+        warmup_s: Seconds after the first requests before checks start
+        min_requests: Requests the window needs before latency and errors are checked
+    """
+
+    max_error_rate: Optional[float] = None
+    max_p95_ms: Optional[float] = None
+    max_p99_ms: Optional[float] = None
+    min_rps: Optional[float] = None
+    window_s: float = 30.0
+    sustain_s: float = 10.0
+    warmup_s: float = 15.0
+    min_requests: int = 20
+
+    @property
+    def enabled(self) -> bool:
+        return any(getattr(self, name) is not None for name in _LIMITS)
+
+    def to_dict(self) -> dict:
+        return {key: value for key, value in asdict(self).items() if value is not None}
+
+
+def _value(name: str, key: str, text: str) -> Optional[float]:
+    text = text.strip()
+    if text.lower() in _OFF:
+        return None
+    value = duration_seconds(text) if name in _DURATIONS else float(text)
+    if value is None or value < 0:
+        raise ValueError(f"Invalid guardrail {key}={text}")
+    return int(value) if name == "min_requests" else value
+
+
+def parse_guardrails(spec: str = "") -> Guardrails:
+    """Guardrails from the ``GUARDRAIL_*`` environment defaults, overridden by a spec.
+
+    Args:
+        spec: Comma-separated ``key=value`` pairs; keys are error_rate, p95, p99,
+            min_rps, window, sustain, warmup and min_requests, and "off" unsets a limit
+
+    Returns:
+        Guardrails: The limits of the run
+
+    Raises:
+        ValueError: If the spec has an unknown key or an invalid value
+    """
+    guardrails = Guardrails()
+    for key, (name, variable) in _SPEC.items():
+        if os.getenv(variable):
+            setattr(guardrails, name, _value(name, key, os.environ[variable]))
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        key, sep, text = part.partition("=")
+        key = key.strip().lower()
+        if not sep or key not in _SPEC:
+            raise ValueError(f"Invalid guardrail {part!r}. Expected key=value with keys {', '.join(_SPEC)}")
+        name = _SPEC[key][0]
+        value = _value(name, key, text)
+        if value is None and name not in _LIMITS:
+            raise ValueError(f"Guardrail {key} cannot be turned off")
+        setattr(guardrails, name, value)
+    return guardrails
+
+
+class GuardrailMonitor:
+    """Checks a job's live snapshots against its guardrails and tells when to stop it."""
+
+    def __init__(self, guardrails: Guardrails):
+        self.guardrails = guardrails
+        self.traffic_since: Optional[float] = None
+        self.breached_since: Optional[float] = None
+        self.breach: Optional[str] = None
+
+    def window(self, snapshot: dict, rollup: Optional["TimeSeriesRollup"]) -> dict:
+        """Requests, errors, error rate, mean throughput and percentiles of the sliding window."""
+        if rollup is None or rollup.first is None:
+            return {}
+        start = snapshot["time"] - rollup.first - self.guardrails.window_s
+        summary = rollup.query(resolution=1, start=start, max_points=3, metrics=["rps"])["summary"]
+        # Without histograms (Locust), the tool's own recent percentiles stand in
+        for p in ("p95", "p99"):
+            if summary.get(p) is None and snapshot.get(p) is not None:
+                summary[p] = snapshot[p]
+        return summary
+
+    def breaches(self, window: dict) -> list[str]:
+        """The limits the window is over."""
+        guardrails = self.guardrails
+        found = []
+        if window.get("requests", 0) >= guardrails.min_requests:
+            error_rate = window.get("error_rate")
+            if guardrails.max_error_rate is not None and error_rate is not None \
+                    and error_rate > guardrails.max_error_rate:
+                found.append(f"error rate {error_rate:g}% over {guardrails.max_error_rate:g}%")
+            for p, limit in (("p95", guardrails.max_p95_ms), ("p99", guardrails.max_p99_ms)):
+                if limit is not None and window.get(p) is not None and window[p] > limit:
+                    found.append(f"{p} {window[p]:g} ms over {limit:g} ms")
+        mean_rps = window.get("mean_rps") or 0.0
+        if guardrails.min_rps is not None and mean_rps < guardrails.min_rps:
+            found.append(f"throughput {mean_rps:g} req/s under {guardrails.min_rps:g} req/s")
+        return found
+
+    def check(self, snapshot: dict, rollup: Optional["TimeSeriesRollup"]) -> Optional[str]:
+        """Check one snapshot.
+
+        Returns:
+            Optional[str]: Why the run must stop once a breach lasted ``sustain_s`` seconds, else None
+        """
+        now = snapshot["time"]
+        if self.traffic_since is None:
+            if not snapshot.get("rps"):
+                return None
+            self.traffic_since = now
+        if now - self.traffic_since < self.guardrails.warmup_s:
+            return None
+        found = self.breaches(self.window(snapshot, rollup))
+        if not found:
+            self.breached_since = self.breach = None
+            return None
+        if self.breached_since is None:
+            self.breached_since = now
+            logger.info(f"Guardrail breached by job {snapshot.get('job_id')}: {'; '.join(found)}")
+        self.breach = "; ".join(found)
+        if now - self.breached_since < self.guardrails.sustain_s:
+            return None
+        return (f"{self.breach} over the last {self.guardrails.window_s:g}s, "
+                f"sustained for {now - self.breached_since:.0f}s")
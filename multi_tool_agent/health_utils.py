@@ -0,0 +1,391 @@
+"""Health of the load generator processes while they run.
+
+A load generator that saturates its own CPU, or a JVM busy collecting
+garbage, measures its own queueing as response time: latency rises and
+throughput flattens while the system under test is fine. While a run is
+going, ``GeneratorMonitor`` samples the process tree of every tool process
+from ``/proc`` every ``HEALTH_SAMPLE_INTERVAL`` seconds (default 1; 0 turns
+sampling off):
+
+- CPU of the tree, in percent of one core, and busy CPU of the whole host,
+- resident memory, threads and processes of the tree,
+- for JVM tools (JMeter, Gatling), CPU of the garbage collector threads.
+
+The statistics are kept as the samples arrive, over the whole run, but
+only the last ``HEALTH_MAX_SAMPLES`` samples (default 3600) are kept, so
+that a soak test's result stays small. They are attached to the run
+result and saved as its ``health`` artifact. A run is flagged when the
+generator was the bottleneck in at least ``HEALTH_SATURATED_SHARE`` percent of the samples (default 20): its
+CPU at ``HEALTH_CPU_SATURATION`` percent (default 90) of the cores it may
+use, or of one core for a Locust process, or garbage collection taking
+``HEALTH_GC_SHARE`` percent (default 20) of the JVM's CPU time.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+PROC = Path("/proc")
+
+DEFAULT_INTERVAL = 1.0
+DEFAULT_CPU_SATURATION = 90.0
+DEFAULT_GC_SHARE = 20.0
+DEFAULT_SATURATED_SHARE = 20.0
+DEFAULT_MAX_SAMPLES = 3600
+MIN_SAMPLES = 3
+
+# Tools whose processes each run on one core, whatever their thread count
+SINGLE_CORE_TOOLS = {"locust"}
+JVM_TOOLS = {"jmeter", "gatling"}
+# Native names of HotSpot's garbage collector threads (G1, Parallel, ZGC, Shenandoah)
+GC_THREAD_PREFIXES = ("GC Thread", "G1 ", "ZWorker", "ZDriver", "ZDirector", "Shenandoah", "ParGC")
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# Kernels without CONFIG_PROC_CHILDREN have no children files; the parent pids are scanned instead
+_CHILDREN_FILES = (PROC / "self" / "task" / str(os.getpid()) / "children").exists()
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        value = Path(path).read_text().split()[0]
+    except (OSError, IndexError):
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def usable_cpus() -> int:
+    """CPUs this process may use: its affinity mask, capped by a cgroup v2 CPU quota."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def memory_mb() -> tuple[Optional[int], Optional[int]]:
+    """Total and currently available memory in MiB, capped by a cgroup v2 memory limit.
+
+    Returns (None, None) where neither /proc/meminfo nor cgroup limits exist.
+    """
+    total = available = None
+    try:
+        with open("/proc/meminfo") as f:
+            meminfo = {line.split(":")[0]: int(line.split()[1]) // 1024 for line in f if line.strip()}
+        total, available = meminfo.get("MemTotal"), meminfo.get("MemAvailable")
+    except (OSError, ValueError, IndexError):
+        pass
+    limit = _read_int("/sys/fs/cgroup/memory.max")
+    if limit is not None:
+        used = _read_int("/sys/fs/cgroup/memory.current") or 0
+        total = min(total, limit // 2**20) if total else limit // 2**20
+        available = min(available, (limit - used) // 2**20) if available is not None else (limit - used) // 2**20
+    return total, available
+
+
+def read_stat(path: Path) -> Optional[tuple[str, list[str]]]:
+    """The command name and the fields after it of a ``/proc/<pid>/stat`` file, or None if it is gone."""
+    try:
+        data = path.read_text()
+    except OSError:
+        return None
+    # The command name is in parentheses and may itself contain spaces or parentheses
+    end = data.rindex(")")
+    return data[data.index("(") + 1:end], data[end + 2:].split()
+
+
+def _children(pid: int) -> list[int]:
+    children = []
+    try:
+        for task in (PROC / str(pid) / "task").iterdir():
+            children.extend(int(child) for child in (task / "children").read_text().split())
+    except OSError:
+        pass
+    return children
+
+
+def _children_by_parent() -> dict[int, list[int]]:
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir(PROC):
+        if entry.isdigit():
+            stat = read_stat(PROC / entry / "stat")
+            if stat is not None:
+                children.setdefault(int(stat[1][1]), []).append(int(entry))
+    return children
+
+
+def process_trees(roots: Iterable[int]) -> set[int]:
+    """The given processes and all their descendants."""
+    if _CHILDREN_FILES:
+        children = _children
+    else:
+        by_parent = _children_by_parent()
+        children = lambda pid: by_parent.get(pid, [])  # noqa: E731
+    tree, pending = set(), list(roots)
+    while pending:
+        current = pending.pop()
+        if current not in tree:
+            tree.add(current)
+            pending.extend(children(current))
+    return tree
+
+
+def _host_busy_ticks() -> Optional[tuple[int, int]]:
+    try:
+        with open(PROC / "stat") as f:
+            values = [int(value) for value in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+    return sum(values) - idle, sum(values)
+
+
+class _Stats:
+    """Mean and maximum of a metric, kept as its values arrive."""
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count, self.total, self.max = 0, 0.0, 0.0
+
+    def add(self, value: float) -> None:
+        self.max = max(self.max, value) if self.count else value
+        self.count += 1
+        self.total += value
+
+    def to_dict(self) -> dict:
+        return {"mean": round(self.total / self.count, 1), "max": round(self.max, 1)} if self.count else {}
+
+
+class GeneratorMonitor:
+    """Sample the process trees of a run's load generator processes at a fixed interval.
+
+    Runners pass the monitor to ``run_process``, which watches every process
+    it starts; sampling starts with the first process and stops with the
+    last.
+
+    Args:
+        tool: Load testing tool, deciding how saturation and GC are judged
+        interval: Seconds between samples (default: ``HEALTH_SAMPLE_INTERVAL`` or 1)
+        max_samples: Latest samples kept (default: ``HEALTH_MAX_SAMPLES`` or 3600)
+    """
+
+    def __init__(self, tool: str, interval: Optional[float] = None, max_samples: Optional[int] = None):
+        self.tool = tool
+        self.interval = _env_float("HEALTH_SAMPLE_INTERVAL", DEFAULT_INTERVAL) if interval is None else interval
+        self.enabled = self.interval > 0 and PROC.is_dir()
+        self.cpus = usable_cpus()
+        self.max_samples = max_samples or int(_env_float("HEALTH_MAX_SAMPLES", DEFAULT_MAX_SAMPLES))
+        # Samples are taken in a worker thread and read by the run in the event loop
+        self._lock = threading.Lock()
+        self._clear()
+        self._roots: set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._sampling: Optional[asyncio.Future] = None
+        self._started: Optional[float] = None
+        self._last: Optional[tuple[float, dict[int, int], int, int, Optional[tuple[int, int]]]] = None
+        # GC threads by JVM pid, remembered so that only new threads' names are read
+        self._gc_threads: dict[int, dict[int, bool]] = {}
+
+    def watch(self, pid: int) -> None:
+        """Include a started process (and its descendants) in the samples."""
+        if not self.enabled:
+            return
+        self._roots.add(pid)
+        if self._task is None or self._task.done():
+            self._started = self._started or time.monotonic()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def unwatch(self, pid: int) -> None:
+        """Stop sampling a process that has exited; the last one stops the sampling.
+
+        A sample still being taken is waited for, so that it is in the summary read next.
+        """
+        self._roots.discard(pid)
+        if not self._roots and self._task is not None:
+            self._task.cancel()
+            self._task = None
+            if self._sampling is not None:
+                await asyncio.shield(asyncio.wait([self._sampling]))
+
+    def _clear(self) -> None:
+        self.samples: deque[dict] = deque(maxlen=self.max_samples)
+        self.sampled = self.measured = 0
+        self._saturated_counts: dict[str, int] = {}
+        self._stats = {name: _Stats() for name in ("cpu_percent", "host_cpu_percent", "gc_cpu_percent",
+                                                   "rss_mb", "threads")}
+        # Samples taken before a reset are dropped, even when they were being taken while it happened
+        self._generation = getattr(self, "_generation", 0) + 1
+
+    def reset(self) -> None:
+        """Forget the samples so far, e.g. those of a build before the test itself started."""
+        with self._lock:
+            self._clear()
+            self._started = time.monotonic()
+
+    async def _run(self) -> None:
+        try:
+            while self._roots:
+                # Reading the stat files of every thread of a large JVM must not stall other jobs
+                self._sampling = asyncio.ensure_future(asyncio.to_thread(self.sample))
+                await asyncio.shield(self._sampling)
+                await asyncio.sleep(self.interval)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # Losing the health samples must not fail the run
+            logger.exception(f"Sampling the {self.tool} processes failed")
+
+    def _gc_ticks(self, pid: int) -> int:
+        known = self._gc_threads.setdefault(pid, {})
+        ticks = 0
+        try:
+            tids = [int(tid) for tid in os.listdir(PROC / str(pid) / "task")]
+        except OSError:
+            return 0
+        for tid in tids:
+            if tid not in known:
+                try:
+                    name = (PROC / str(pid) / "task" / str(tid) / "comm").read_text().strip()
+                except OSError:
+                    continue
+                known[tid] = name.startswith(GC_THREAD_PREFIXES)
+            if known[tid]:
+                stat = read_stat(PROC / str(pid) / "task" / str(tid) / "stat")
+                if stat is not None:
+                    ticks += int(stat[1][11]) + int(stat[1][12])
+        return ticks
+
+    def sample(self) -> Optional[dict]:
+        """Take one sample of the watched process trees.
+
+        CPU is measured between two samples, so the first sample only
+        records memory and threads.
+
+        Returns:
+            dict: The sample, also recorded, or None if no process is left
+        """
+        generation = self._generation
+        now = time.monotonic()
+        total_ticks, gc_ticks, rss_pages, threads = 0, 0, 0, 0
+        own_ticks: dict[int, int] = {}
+        for pid in process_trees(list(self._roots)):
+            stat = read_stat(PROC / str(pid) / "stat")
+            if stat is None:
+                continue
+            name, fields = stat
+            utime, stime, cutime, cstime = (int(value) for value in fields[11:15])
+            own_ticks[pid] = utime + stime
+            # Children that exited and were reaped inside the tree move their CPU time into cutime/cstime
+            total_ticks += utime + stime + cutime + cstime
+            threads += int(fields[17])
+            rss_pages += int(fields[21])
+            if name == "java" and self.tool in JVM_TOOLS:
+                gc_ticks += self._gc_ticks(pid)
+        if not own_ticks:
+            return None
+        host = _host_busy_ticks()
+        sample = {"t": round(now - self._started, 1), "processes": len(own_ticks), "threads": threads,
+                  "rss_mb": round(rss_pages * _PAGE_SIZE / 2**20, 1)}
+        if self._last is not None:
+            last_time, last_own, last_total, last_gc, last_host = self._last
+            elapsed = now - last_time
+            ticks_per_s = _CLOCK_TICKS * elapsed
+            if elapsed > 0:
+                sample["cpu_percent"] = round(max(0, total_ticks - last_total) / ticks_per_s * 100, 1)
+                sample["max_process_cpu_percent"] = round(max(
+                    (max(0, ticks - last_own.get(pid, ticks)) for pid, ticks in own_ticks.items()),
+                    default=0) / ticks_per_s * 100, 1)
+                if self.tool in JVM_TOOLS:
+                    sample["gc_cpu_percent"] = round(max(0, gc_ticks - last_gc) / ticks_per_s * 100, 1)
+            if host is not None and last_host is not None and host[1] > last_host[1]:
+                sample["host_cpu_percent"] = round((host[0] - last_host[0]) / (host[1] - last_host[1]) * 100, 1)
+        self._last = (now, own_ticks, total_ticks, gc_ticks, host)
+        self.record(sample, generation)
+        return sample
+
+    def record(self, sample: dict, generation: Optional[int] = None) -> None:
+        """Keep a sample and fold it into the run's statistics."""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self.samples.append(sample)
+            self.sampled += 1
+            stats = self._stats
+            stats["rss_mb"].add(sample["rss_mb"])
+            stats["threads"].add(sample["threads"])
+            if "cpu_percent" not in sample:
+                return
+            self.measured += 1
+            stats["cpu_percent"].add(sample["cpu_percent"])
+            if "host_cpu_percent" in sample:
+                stats["host_cpu_percent"].add(sample["host_cpu_percent"])
+            if self.tool in JVM_TOOLS:
+                stats["gc_cpu_percent"].add(sample.get("gc_cpu_percent", 0))
+            for reason in self._saturated(sample):
+                self._saturated_counts[reason] = self._saturated_counts.get(reason, 0) + 1
+
+    def _saturated(self, sample: dict) -> list[str]:
+        """The resources the generator ran out of in one sample."""
+        limit = _env_float("HEALTH_CPU_SATURATION", DEFAULT_CPU_SATURATION)
+        reasons = []
+        if sample["cpu_percent"] >= limit * self.cpus:
+            reasons.append("cpu")
+        elif self.tool in SINGLE_CORE_TOOLS and sample["max_process_cpu_percent"] >= limit:
+            reasons.append("core")
+        if sample.get("gc_cpu_percent") and sample["cpu_percent"] and (
+                sample["gc_cpu_percent"] / sample["cpu_percent"] * 100
+                >= _env_float("HEALTH_GC_SHARE", DEFAULT_GC_SHARE)):
+            reasons.append("gc")
+        return reasons
+
+    def summary(self) -> Optional[dict]:
+        """The samples with their statistics, and whether the generator was the bottleneck.
+
+        Returns:
+            dict: ``samples`` (the latest ``max_samples``), ``sample_count``, ``cpu_percent``,
+            ``rss_mb``, ``threads``, ``bottleneck`` and ``findings``; None if nothing was sampled
+        """
+        with self._lock:
+            if not self.sampled:
+                return None
+            measured, saturated = self.measured, dict(self._saturated_counts)
+            stats = {name: value.to_dict() for name, value in self._stats.items()}
+            samples, sampled = list(self.samples), self.sampled
+        share = _env_float("HEALTH_SATURATED_SHARE", DEFAULT_SATURATED_SHARE)
+        findings = []
+        if measured >= MIN_SAMPLES:
+            for reason, count in saturated.items():
+                percent = count / measured * 100
+                if percent < share:
+                    continue
+                if reason == "cpu":
+                    findings.append(f"load generator CPU saturated (usable CPUs: {self.cpus}) in {percent:.0f}% "
+                                    f"of the run")
+                elif reason == "core":
+                    findings.append(f"a {self.tool} process used a full CPU core in {percent:.0f}% of the run; "
+                                    f"add workers")
+                else:
+                    findings.append(f"JVM garbage collection took over "
+                                    f"{_env_float('HEALTH_GC_SHARE', DEFAULT_GC_SHARE):.0f}% of the generator's CPU "
+                                    f"in {percent:.0f}% of the run; raise the heap")
+        summary = {"interval_s": self.interval, "usable_cpus": self.cpus, "sample_count": sampled}
+        summary.update((name, stats[name]) for name in ("cpu_percent", "host_cpu_percent", "rss_mb", "threads")
+                       if stats[name])
+        if self.tool in JVM_TOOLS and stats["gc_cpu_percent"]:
+            summary["gc_cpu_percent"] = stats["gc_cpu_percent"]
+        summary.update(bottleneck=bool(findings), findings=findings, samples=samples)
+        return summary
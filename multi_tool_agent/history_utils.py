@@ -0,0 +1,335 @@
+"""Persistent, indexed history of load test runs.
+
+Every finished run is recorded in a SQLite database (``FEATHERWAND_HISTORY_DB``,
+default ``run_history.db`` in the working directory) in WAL mode, so runs
+can be recorded while the history is being queried. The store keeps:
+
+* ``runs``: one row per run with its tool, script, script content hash,
+  users/VUs, duration and overall key statistics;
+* ``endpoint_stats``: one row per endpoint of a run with its key statistics
+  and, where the parser produced one, its sparse latency histogram;
+* ``timeseries``: the run timeline downsampled to at most
+  ``MAX_SERIES_POINTS`` points per metric, stored as one array per metric;
+* ``baselines``: the run each script's later runs are compared against.
+
+Trend queries ("p95 of /checkout over the last 50 runs of this script") are
+answered from the indexes without touching the raw run artifacts.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from .run_utils import RunResult, duration_seconds
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_DB = "run_history.db"
+MAX_SERIES_POINTS = 200
+DEFAULT_QUERY_RUNS = 50
+MAX_QUERY_RUNS = 1000
+
+STAT_COLUMNS = ("samples", "errors", "error_rate", "throughput", "mean", "p50", "p90", "p95", "p99", "max")
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    tool TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    script TEXT,
+    script_hash TEXT,
+    users INTEGER,
+    duration_s REAL,
+    params TEXT,
+    {", ".join(f"{column} REAL" for column in STAT_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS runs_by_script ON runs (script, created);
+CREATE INDEX IF NOT EXISTS runs_by_hash ON runs (script_hash, created);
+CREATE INDEX IF NOT EXISTS runs_by_tool ON runs (tool, created);
+CREATE TABLE IF NOT EXISTS endpoint_stats (
+    endpoint TEXT NOT NULL,
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    {", ".join(f"{column} REAL" for column in STAT_COLUMNS)},
+    histogram TEXT,
+    PRIMARY KEY (endpoint, run_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS endpoint_stats_by_run ON endpoint_stats (run_id);
+CREATE TABLE IF NOT EXISTS timeseries (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    metric TEXT NOT NULL,
+    seconds TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (run_id, metric)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS baselines (
+    script TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE
+);
+"""
+
+_initialised: set[str] = set()
+_init_lock = threading.Lock()
+
+
+def history_db() -> str:
+    return os.getenv("FEATHERWAND_HISTORY_DB", DEFAULT_HISTORY_DB)
+
+
+def connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """Open the history database, creating its schema on first use."""
+    db_path = db_path or history_db()
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    with _init_lock:
+        if db_path not in _initialised:
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.executescript(_SCHEMA)
+            _initialised.add(db_path)
+    return connection
+
+
+def script_hash(script: Optional[str]) -> Optional[str]:
+    """Content hash of a test script, or of a Gatling project's sources."""
+    if not script:
+        return None
+    path = Path(script)
+    if path.is_dir():
+        from .gatling_build import project_fingerprints
+        return project_fingerprints(path)["sources"][:16]
+    if not path.is_file():
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def downsample(values: np.ndarray, max_points: int = MAX_SERIES_POINTS) -> np.ndarray:
+    """Average consecutive values so that at most ``max_points`` remain, ignoring gaps (NaN)."""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size <= max_points:
+        return values
+    edges = np.linspace(0, values.size, max_points + 1).astype(np.int64)
+    present = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(present, values, 0.0), edges[:-1])
+    counts = np.add.reduceat(present.astype(np.int64), edges[:-1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+
+def timeline_series(timeline: Optional[dict]) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Seconds since the run started and the metric series of a report timeline.
+
+    Gatling timelines count requests and errors per second; Locust timelines
+    sample throughput, failures, p95 and users at their own timestamps.
+    """
+    if not timeline:
+        return np.zeros(0), {}
+    if "rps" in timeline:
+        timestamps = np.asarray(timeline.get("timestamps", []), dtype=np.float64)
+        series = {"rps": timeline["rps"], "errors_per_s": timeline.get("failures_per_s", []),
+                  "p95": timeline.get("p95", []), "users": timeline.get("users", [])}
+        seconds = timestamps - timestamps[0] if timestamps.size else timestamps
+    else:
+        series = {"rps": timeline.get("requests", []), "errors_per_s": timeline.get("errors", [])}
+        seconds = np.arange(len(series["rps"]), dtype=np.float64)
+    columns = {name: np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+               for name, values in series.items() if len(values) == seconds.size and len(values)}
+    return seconds, columns
+
+
+def _stat_values(stats: Optional[dict]) -> list:
+    stats = stats or {}
+    return [stats.get(column) for column in STAT_COLUMNS]
+
+
+def _series_json(values: np.ndarray) -> str:
+    return json.dumps([None if np.isnan(value) else round(float(value), 3) for value in values])
+
+
+def record_run(run_id: str, result: RunResult, params: Optional[dict] = None,
+               db_path: Optional[str] = None) -> None:
+    """Record a finished run in the history.
+
+    Args:
+        run_id: Run id the run was saved under
+        result: The run outcome
+        params: Run settings: ``script`` (file or Gatling project folder),
+            ``users`` (VUs or users), ``duration`` and any tool specific options
+        db_path: History database (default: ``FEATHERWAND_HISTORY_DB``)
+    """
+    params = dict(params or {})
+    script = params.get("script")
+    script = str(Path(script).resolve()) if script else None
+    report = result.report or {}
+    duration = duration_seconds(params.get("duration"))
+    if duration is None and report.get("start_time") is not None and report.get("end_time") is not None:
+        duration = (report["end_time"] - report["start_time"]) / 1000.0
+    users = params.get("users")
+    histograms = report.get("histograms") or {}
+
+    seconds, series = timeline_series(report.get("timeline"))
+    seconds = downsample(seconds)
+    with closing(connect(db_path)) as connection, connection:
+        connection.execute(
+            f"INSERT OR REPLACE INTO runs VALUES ({', '.join('?' * (9 + len(STAT_COLUMNS)))})",
+            [run_id, result.tool, result.status, time.time(), script, script_hash(script),
+             int(users) if users is not None else None, duration, json.dumps(params, default=str),
+             *_stat_values(report.get("total"))])
+        connection.executemany(
+            f"INSERT OR REPLACE INTO endpoint_stats VALUES ({', '.join('?' * (3 + len(STAT_COLUMNS)))})",
+            [(endpoint, run_id, *_stat_values(stats),
+              json.dumps(histograms[endpoint]) if endpoint in histograms else None)
+             for endpoint, stats in (report.get("labels") or {}).items()])
+        connection.executemany(
+            "INSERT OR REPLACE INTO timeseries VALUES (?, ?, ?, ?)",
+            [(run_id, metric, _series_json(seconds), _series_json(downsample(values)))
+             for metric, values in series.items()])
+
+
+def _resolve_endpoint(connection: sqlite3.Connection, endpoint: str, run_ids: list[str]) -> str:
+    """The stored endpoint name matching ``endpoint``, allowing the method prefix to be left out."""
+    placeholders = ", ".join("?" * len(run_ids))
+    row = connection.execute(
+        f"SELECT endpoint FROM endpoint_stats WHERE run_id IN ({placeholders}) "
+        f"AND (endpoint = ? OR endpoint LIKE ?) ORDER BY endpoint = ? DESC LIMIT 1",
+        [*run_ids, endpoint, f"% {endpoint}", endpoint]).fetchone()
+    return row["endpoint"] if row else endpoint
+
+
+def query_history(script: Optional[str] = None, tool: Optional[str] = None, endpoint: Optional[str] = None,
+                  metric: str = "p95", last: int = DEFAULT_QUERY_RUNS, same_version: bool = False,
+                  db_path: Optional[str] = None) -> dict:
+    """Trend of a statistic over the most recent runs.
+
+    Args:
+        script: Only runs of this script file or Gatling project folder
+        tool: Only runs of this tool
+        endpoint: Statistic of this endpoint instead of the run total; the
+            HTTP method prefix may be left out (``/checkout`` matches ``GET /checkout``)
+        metric: One of samples, errors, error_rate, throughput, mean, p50, p90, p95, p99 or max
+        last: Number of most recent runs to return (capped at 1000)
+        same_version: Only runs of the script's current content
+        db_path: History database (default: ``FEATHERWAND_HISTORY_DB``)
+
+    Returns:
+        dict: The runs, oldest first, with the metric ``value`` of each, and
+        its min, median, max and latest value
+    """
+    if metric not in STAT_COLUMNS:
+        raise ValueError(f"Unknown metric '{metric}'. Available: {', '.join(STAT_COLUMNS)}")
+    last = max(1, min(int(last), MAX_QUERY_RUNS))
+    conditions, args = [], []
+    if script:
+        conditions.append("script = ?")
+        args.append(str(Path(script).resolve()))
+        if same_version:
+            conditions.append("script_hash = ?")
+            args.append(script_hash(script))
+    if tool:
+        conditions.append("tool = ?")
+        args.append(tool)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with closing(connect(db_path)) as connection:
+        runs = connection.execute(
+            f"SELECT run_id, tool, status, created, script, script_hash, users, duration_s, {metric} AS value "
+            f"FROM runs {where} ORDER BY created DESC LIMIT ?", [*args, last]).fetchall()
+        rows = [dict(row) for row in reversed(runs)]
+        if endpoint and rows:
+            endpoint = _resolve_endpoint(connection, endpoint, [row["run_id"] for row in rows])
+            values = dict(connection.execute(
+                f"SELECT run_id, {metric} FROM endpoint_stats WHERE endpoint = ? "
+                f"AND run_id IN ({', '.join('?' * len(rows))})",
+                [endpoint, *(row["run_id"] for row in rows)]).fetchall())
+            for row in rows:
+                row["value"] = values.get(row["run_id"])
+
+    for row in rows:
+        row["created"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(row["created"]))
+    values = np.array([row["value"] for row in rows if row["value"] is not None], dtype=np.float64)
+    summary = {"runs": len(rows), "with_value": int(values.size)}
+    if values.size:
+        summary.update(min=round(float(values.min()), 2), median=round(float(np.median(values)), 2),
+                       max=round(float(values.max()), 2), latest=round(float(values[-1]), 2))
+    return {"metric": metric, "endpoint": endpoint, "summary": summary, "runs": rows}
+
+
+def run_timeseries(run_id: str, db_path: Optional[str] = None) -> dict:
+    """Downsampled timeline metrics of a recorded run, by metric name."""
+    with closing(connect(db_path)) as connection:
+        rows = connection.execute("SELECT metric, seconds, value FROM timeseries WHERE run_id = ?",
+                                  [run_id]).fetchall()
+    return {row["metric"]: {"seconds": json.loads(row["seconds"]), "value": json.loads(row["value"])}
+            for row in rows}
+
+
+def endpoint_histogram(run_id: str, endpoint: str, db_path: Optional[str] = None) -> Optional[dict]:
+    """Sparse latency histogram of one endpoint of a recorded run, if one was stored."""
+    with closing(connect(db_path)) as connection:
+        row = connection.execute("SELECT histogram FROM endpoint_stats WHERE endpoint = ? AND run_id = ?",
+                                 [endpoint, run_id]).fetchone()
+    return json.loads(row["histogram"]) if row and row["histogram"] else None
+
+
+def load_run(run_id: str, db_path: Optional[str] = None) -> dict:
+    """A recorded run with its per-endpoint statistics and histograms.
+
+    Raises:
+        ValueError: If the run is not in the history
+    """
+    with closing(connect(db_path)) as connection:
+        run = connection.execute("SELECT * FROM runs WHERE run_id = ?", [run_id]).fetchone()
+        if run is None:
+            raise ValueError(f"Run not found in the run history: {run_id}")
+        endpoints = connection.execute("SELECT * FROM endpoint_stats WHERE run_id = ? ORDER BY endpoint",
+                                       [run_id]).fetchall()
+    run = dict(run)
+    run["endpoints"] = {}
+    for row in endpoints:
+        row = dict(row)
+        histogram = row.pop("histogram")
+        row["histogram"] = json.loads(histogram) if histogram else None
+        run["endpoints"][row.pop("endpoint")] = row
+    return run
+
+
+def set_baseline(run_id: str, db_path: Optional[str] = None) -> dict:
+    """Make a recorded run the baseline later runs of its script are compared against."""
+    with closing(connect(db_path)) as connection, connection:
+        run = connection.execute("SELECT script FROM runs WHERE run_id = ?", [run_id]).fetchone()
+        if run is None:
+            raise ValueError(f"Run not found in the run history: {run_id}")
+        if not run["script"]:
+            raise ValueError(f"Run {run_id} has no script to set a baseline for")
+        connection.execute("INSERT OR REPLACE INTO baselines VALUES (?, ?)", [run["script"], run_id])
+    return {"script": run["script"], "baseline_run_id": run_id}
+
+
+def find_baseline(run_id: str, db_path: Optional[str] = None) -> Optional[str]:
+    """The baseline set for the script of a run or, failing that, the script's previous successful run."""
+    with closing(connect(db_path)) as connection:
+        run = connection.execute("SELECT script, created FROM runs WHERE run_id = ?", [run_id]).fetchone()
+        if run is None:
+            raise ValueError(f"Run not found in the run history: {run_id}")
+        if not run["script"]:
+            return None
+        baseline = connection.execute("SELECT run_id FROM baselines WHERE script = ? AND run_id != ?",
+                                      [run["script"], run_id]).fetchone()
+        if baseline is None:
+            baseline = connection.execute(
+                "SELECT run_id FROM runs WHERE script = ? AND created < ? AND status = 'success' "
+                "ORDER BY created DESC LIMIT 1", [run["script"], run["created"]]).fetchone()
+    return baseline["run_id"] if baseline else None
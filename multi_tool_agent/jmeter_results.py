@@ -0,0 +1,137 @@
+"""Streaming parser for JMeter CSV result (JTL) files."""
+import csv
+import io
+import logging
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from .parse_utils import gather_bytes, parse_digits, read_blocks, split_fields
+from .stats_utils import EndpointAggregator, ThroughputTimeline
+
+logger = logging.getLogger(__name__)
+
+# Part of the keys of cached reports: bump when the reports this module makes change
+PARSER_VERSION = 2
+
+# JMeter properties that make a non-GUI run write a CSV JTL with a header row
+JTL_PROPERTIES = [
+    "-Jjmeter.save.saveservice.output_format=csv",
+    "-Jjmeter.save.saveservice.print_field_names=true",
+    "-Jjmeter.save.saveservice.timestamp_format=ms",
+]
+
+CHUNK_BYTES = 16 * 1024 * 1024
+
+_REQUIRED_FIELDS = ("timeStamp", "elapsed", "label", "success")
+
+
+class JtlAggregator:
+    """Fold JTL rows into per-label statistics and a per-second timeline a block at a time."""
+
+    def __init__(self, header: Sequence[str]):
+        missing = [field for field in _REQUIRED_FIELDS if field not in header]
+        if missing:
+            raise ValueError(f"JTL header is missing fields: {', '.join(missing)}")
+        self.n_columns = len(header)
+        self.columns = {field: header.index(field) for field in _REQUIRED_FIELDS}
+        self.width = max(self.columns.values()) + 1
+        self.aggregator = EndpointAggregator()
+        self.timeline = ThroughputTimeline()
+        self.skipped_rows = 0
+
+    def add_block(self, block: bytes) -> None:
+        """Aggregate a block of complete JTL lines.
+
+        Blocks of plain unquoted rows are decoded column-wise with NumPy
+        without creating a Python object per row. Anything irregular (quoted
+        fields, odd column counts, non-numeric values) goes through the csv
+        module instead.
+        """
+        if b"\r" in block:
+            block = block.replace(b"\r", b"")
+        if b'"' not in block:
+            parsed = self._parse_plain_block(block)
+            if parsed is not None:
+                self._add(*parsed)
+                return
+        self.add_rows(list(csv.reader(io.StringIO(block.decode("utf-8", errors="replace"), newline=""))))
+
+    def _parse_plain_block(self, block: bytes) -> Optional[tuple]:
+        buf = np.frombuffer(block, dtype=np.uint8)
+        fields = split_fields(buf, self.n_columns)
+        if fields is None:
+            return None
+        starts, ends = fields
+        columns = self.columns
+        timestamps = parse_digits(buf, starts[:, columns["timeStamp"]], ends[:, columns["timeStamp"]])
+        elapsed = parse_digits(buf, starts[:, columns["elapsed"]], ends[:, columns["elapsed"]])
+        labels = gather_bytes(buf, starts[:, columns["label"]], ends[:, columns["label"]])
+        if timestamps is None or elapsed is None or labels is None:
+            return None
+        success = buf[np.minimum(starts[:, columns["success"]], buf.size - 1)] == ord("t")
+        return labels, elapsed, success, timestamps
+
+    def add_rows(self, rows: Sequence[Sequence[str]]) -> None:
+        columns = self.columns
+        complete = [row for row in rows if len(row) >= self.width]
+        try:
+            timestamps = np.array([row[columns["timeStamp"]] for row in complete], dtype=np.float64)
+            elapsed = np.array([row[columns["elapsed"]] for row in complete], dtype=np.float64)
+        except ValueError:
+            # A corrupt row (e.g. a run killed mid-write) should not lose the whole chunk
+            complete = [row for row in complete
+                        if _is_number(row[columns["timeStamp"]]) and _is_number(row[columns["elapsed"]])]
+            timestamps = np.array([row[columns["timeStamp"]] for row in complete], dtype=np.float64)
+            elapsed = np.array([row[columns["elapsed"]] for row in complete], dtype=np.float64)
+        self.skipped_rows += len([row for row in rows if row]) - len(complete)
+        if not complete:
+            return
+        rows = complete
+        labels = np.array([row[columns["label"]] for row in rows])
+        success = np.array([row[columns["success"]] for row in rows]) == "true"
+        self._add(labels, elapsed, success, timestamps)
+
+    def _add(self, labels: np.ndarray, elapsed: np.ndarray, success: np.ndarray, timestamps: np.ndarray) -> None:
+        self.aggregator.add_batch(labels, elapsed, success, timestamps)
+        self.timeline.add(timestamps, ~success)
+
+    def summary(self) -> dict:
+        report = self.aggregator.summary()
+        report["timeline"] = self.timeline.summary()
+        return report
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+def parse_jtl(jtl_file: Union[str, Path], chunk_bytes: int = CHUNK_BYTES) -> dict:
+    """Parse a CSV JTL file into per-label counts, error rates, throughput and percentiles.
+
+    The file is read in blocks of about ``chunk_bytes`` bytes, each aggregated
+    with vectorised NumPy operations, so memory stays constant regardless of
+    file size.
+
+    Args:
+        jtl_file: Path to the CSV JTL file (must include a header row)
+        chunk_bytes: Approximate size of the raw data aggregated per block
+
+    Returns:
+        dict: Report with ``total`` and per-label ``labels`` statistics and a per-second ``timeline``
+    """
+    with open(jtl_file, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8", errors="replace")]), None)
+        if not header:
+            raise ValueError(f"JTL file is empty: {jtl_file}")
+        aggregator = JtlAggregator([field.strip() for field in header])
+        for block in read_blocks(f, chunk_bytes, balance_quotes=True):
+            aggregator.add_block(block)
+    if aggregator.skipped_rows:
+        logger.warning(f"Skipped {aggregator.skipped_rows} malformed rows in {jtl_file}")
+    return aggregator.summary()
@@ -1,41 +1,77 @@
 import os
+import asyncio
 import logging
-from dotenv import load_dotenv
+import tempfile
+import time
+import uuid
 from pathlib import Path
-import subprocess
+from typing import Optional, Sequence
 
-load_dotenv()
+from .cache_utils import parse_fresh
+from .health_utils import GeneratorMonitor
+from .jmeter_results import JTL_PROPERTIES, parse_jtl
+from .process_utils import LineConsumer, announce_artifacts, run_deadline, run_process, spawn_detached
+from .registry_utils import resolve_binary
+from .run_utils import RunResult
+from .stats_utils import format_summary
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
-async def run_jmeter(test_file: str, non_gui: bool = True) -> str:
+async def run_jmeter(test_file: str, non_gui: bool = True, remote_hosts: Optional[Sequence[str]] = None) -> str:
     """Run a JMeter test.
 
     Args:
         test_file: Path to the JMeter test file (.jmx)
         non_gui: Run in non-GUI mode (default: True)
+        remote_hosts: JMeter server engines (host or host:port) to generate the load from (default: local)
 
     Returns:
         str: JMeter execution output
     """
+    result = await run_jmeter_result(test_file, non_gui, remote_hosts=remote_hosts)
+    if result.status != "success":
+        return result.error
+    if result.report is None:
+        return result.output
+    return f"{result.output}\nResults file: {result.artifacts['jtl']}\n\n{format_summary(result.report)}\n"
+
+
+async def run_jmeter_result(test_file: str, non_gui: bool = True,
+                            consumers: Optional[Sequence[LineConsumer]] = None,
+                            remote_hosts: Optional[Sequence[str]] = None,
+                            heap_mb: Optional[int] = None,
+                            duration_s: Optional[float] = None) -> RunResult:
+    """Run a JMeter test and return its output, parsed JTL report and result files.
+
+    With ``remote_hosts``, this JMeter acts as the controller of remote
+    JMeter server engines (``jmeter-server``), each running the whole test
+    plan. Their samples are sent back and written to the controller's single
+    JTL, so the report covers all engines.
+
+    Args:
+        test_file: Path to the JMeter test file (.jmx)
+        non_gui: Run in non-GUI mode (default: True)
+        consumers: Callables invoked with (stream_name, line) for every output line
+        remote_hosts: JMeter server engines (host or host:port) to generate the load from (default: local)
+        heap_mb: JVM heap for this JMeter, e.g. as sized by the pre-flight check (default: JMeter's own, or ``HEAP``)
+        duration_s: Expected duration of the test plan, e.g. from the pre-flight check, to derive its deadline
+
+    Returns:
+        RunResult: The structured outcome of the run
+    """
     try:
         # Convert to absolute path
         test_file_path = Path(test_file).resolve()
         
         # Validate file exists and is a .jmx file
         if not test_file_path.exists():
-            return f"Error: Test file not found: {test_file}"
+            return RunResult("jmeter", "error", error=f"Error: Test file not found: {test_file}")
         if not test_file_path.suffix == '.jmx':
-            return f"Error: Invalid file type. Expected .jmx file: {test_file}"
+            return RunResult("jmeter", "error", error=f"Error: Invalid file type. Expected .jmx file: {test_file}")
 
         # Get JMeter binary path from environment
-        jmeter_bin = os.getenv('JMETER_BIN', 'jmeter')
+        jmeter_bin = resolve_binary("jmeter")
         java_opts = os.getenv('JMETER_JAVA_OPTS', '')
 
         # Log the JMeter binary path and Java options
@@ -48,11 +84,22 @@ async def run_jmeter(test_file: str, non_gui: bool = True) -> str:
             logger.debug(f"JMETER_JAVA_OPTS: {jmeter_java_opts}")
 
         # Build command
-        cmd = [str(Path(jmeter_bin).resolve())]
+        cmd = [jmeter_bin]
         
         if non_gui:
             cmd.extend(['-n'])
         cmd.extend(['-t', str(test_file_path)])
+        if non_gui and remote_hosts:
+            cmd.extend(['-R', ','.join(remote_hosts)])
+
+        jtl_file = None
+        if non_gui:
+            # Write a CSV JTL so results can be aggregated, not just the console summariser
+            results_dir = Path(os.getenv('JMETER_RESULTS_DIR', tempfile.gettempdir()))
+            results_dir.mkdir(parents=True, exist_ok=True)
+            jtl_file = results_dir / f"{test_file_path.stem}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.jtl"
+            cmd.extend(['-l', str(jtl_file)])
+            cmd.extend(JTL_PROPERTIES)
 
         # Log the full command for debugging
         logger.debug(f"Executing command: {' '.join(cmd)}")
@@ -62,22 +109,37 @@ async def run_jmeter(test_file: str, non_gui: bool = True) -> str:
             env = os.environ.copy()
             if jmeter_java_opts:
                 env['JAVA_OPTS'] = f"{java_opts} {jmeter_java_opts}".strip()
-            result = subprocess.run(cmd, capture_output=True, text=True, env=env)
+            # The jmeter script reads its heap from HEAP; one set explicitly wins
+            if heap_mb and 'HEAP' not in os.environ:
+                env['HEAP'] = f"-Xms{heap_mb}m -Xmx{heap_mb}m"
+                logger.info(f"JMeter heap: {heap_mb} MiB")
+            announce_artifacts(consumers, {"jtl": jtl_file})
+            monitor = GeneratorMonitor("jmeter")
+            result = await run_process(cmd, env=env, consumers=consumers, monitor=monitor,
+                                       deadline=run_deadline(duration_s))
             
             # Log output for debugging
             logger.debug("Command output:")
-            logger.debug(f"Return code: {result.returncode}")
             logger.debug(f"Stdout: {result.stdout}")
             logger.debug(f"Stderr: {result.stderr}")
 
-            if result.returncode != 0:
-                return f"Error executing JMeter test:\n{result.stderr}"
-            
-            return result.stdout
+            # A run stopped early still has the results written so far
+            if result.returncode != 0 and not result.stopped:
+                return RunResult("jmeter", "error", output=result.stdout,
+                                 error=f"Error executing JMeter test:\n{result.stderr}", health=monitor.summary())
+
+            if not jtl_file.exists():
+                return RunResult("jmeter", "success", output=result.stdout, error=result.stderr,
+                                 health=monitor.summary())
+
+            # Parsing a large JTL is CPU bound; keep it off the event loop
+            report = await asyncio.to_thread(parse_fresh, parse_jtl, jtl_file)
+            return RunResult("jmeter", "success", output=result.stdout, error=result.stderr,
+                             report=report, artifacts={"jtl": str(jtl_file)}, health=monitor.summary())
         else:
-            # For GUI mode, start process without capturing output
-            subprocess.Popen(cmd)
-            return "JMeter GUI launched successfully"
+            # For GUI mode, start process without capturing output; it runs until the user closes it
+            await spawn_detached(cmd)
+            return RunResult("jmeter", "success", output="JMeter GUI launched successfully")
 
     except Exception as e:
-        return f"Unexpected error: {str(e)}"
+        return RunResult("jmeter", "error", error=f"Unexpected error: {str(e)}")
@@ -0,0 +1,561 @@
+"""Background load test jobs with admission control.
+
+Submitting a run returns a job id at once; the run itself is an asyncio
+task that first waits for admission, then runs the tool and finally saves
+and digests its results, recording it in the run history. Admission keeps load generators from competing
+for the machine, which would distort their results:
+
+- at most ``JOB_MAX_CONCURRENT`` load generating processes at a time on the
+  host (default: one per ``JOB_CORES_PER_RUN`` usable CPU cores, which is 2
+  by default); a sharded run counts once per process,
+- at most ``JOB_MAX_<TOOL>`` runs of each tool at a time (default: 1),
+- a run is only started when its memory reservation (the pre-flight estimate
+  of its test plan, else ``JOB_MEMORY_MB_<TOOL>`` per process) fits next to the reservations of the running jobs and in the memory
+  currently available.
+
+CPU and memory limits take the container's cgroup limits into account.
+When the server runs several worker processes, the admission slots and
+every job's status, cancel requests and live snapshots are kept in a
+host-wide job table (``JOB_STATE_DB``, see ``jobstore_utils``), so the
+limits hold for the host and any worker can follow or cancel any job.
+While a job runs, its per-second metrics are published to live subscribers
+(see ``live_utils``) and checked against its guardrails, which stop a run
+early, as ``aborted``, once it goes bad (see ``guardrail_utils``).
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Optional, Sequence
+
+from .health_utils import memory_mb, usable_cpus
+from .jobstore_utils import JobStore, Usage, job_state_db
+from .live_utils import LiveMetrics
+from .process_utils import ARTIFACT_STREAM, LineConsumer, run_groups, stop_groups
+from .run_utils import RunResult, save_run
+
+if TYPE_CHECKING:
+    from .guardrail_utils import Guardrails
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCESS = "success"
+ERROR = "error"
+CANCELLED = "cancelled"
+ABORTED = "aborted"
+FINISHED_STATES = (SUCCESS, ERROR, CANCELLED, ABORTED)
+
+DEFAULT_CORES_PER_RUN = 2
+DEFAULT_MEMORY_MB = {"jmeter": 1024, "gatling": 1024, "k6": 512, "locust": 512}
+MAX_FINISHED_JOBS = 100
+PROGRESS_TAIL_LINES = 20
+# How often jobs of other workers are polled in the shared job table
+SHARED_POLL_S = 0.5
+
+# Output lines that summarise progress so far, per tool
+PROGRESS_PATTERNS = {
+    "jmeter": re.compile(r"^summary [+=]"),
+    "k6": re.compile(r"running \(|http_reqs|http_req_duration"),
+    "locust": re.compile(r"\bAggregated\b"),
+    "gatling": re.compile(r"Global|request count|mean requests/sec"),
+}
+
+# A run receives the line consumers to pass on to run_process
+RunFactory = Callable[[Sequence[LineConsumer]], Awaitable[RunResult]]
+
+
+def _env_int(name: str, default: Optional[int]) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+class AdmissionController:
+    """Decide when a queued run may start, based on run counts and memory.
+
+    Args:
+        host_slots: Maximum concurrent load generating processes on the host
+            (default: from ``JOB_MAX_CONCURRENT`` or CPU cores)
+        tool_slots: Maximum concurrent runs of one tool (default: from ``JOB_MAX_<TOOL>`` or 1)
+        memory_budget_mb: Memory the runs may reserve in total (default: from
+            ``JOB_MEMORY_BUDGET_MB`` or 80% of total memory)
+        store: Host-wide job table the slots are taken in, shared with the other workers
+            (default: the slots are counted in this process)
+    """
+
+    def __init__(self, host_slots: Optional[int] = None, tool_slots: Optional[dict[str, int]] = None,
+                 memory_budget_mb: Optional[int] = None, store: Optional[JobStore] = None):
+        cores_per_run = _env_int("JOB_CORES_PER_RUN", DEFAULT_CORES_PER_RUN)
+        self.host_slots = host_slots or _env_int("JOB_MAX_CONCURRENT", max(1, usable_cpus() // cores_per_run))
+        self.tool_slots = dict(tool_slots or {})
+        total, _ = memory_mb()
+        self.memory_budget_mb = memory_budget_mb or _env_int(
+            "JOB_MEMORY_BUDGET_MB", int(total * 0.8) if total else None)
+        self.running: dict[str, int] = {}
+        self.host_used = 0
+        self.reserved_mb = 0
+        self.store = store
+        self._condition = asyncio.Condition()
+
+    def slots_for(self, tool: str) -> int:
+        if tool not in self.tool_slots:
+            self.tool_slots[tool] = _env_int(f"JOB_MAX_{tool.upper()}", 1)
+        return self.tool_slots[tool]
+
+    @staticmethod
+    def memory_for(tool: str) -> int:
+        return _env_int(f"JOB_MEMORY_MB_{tool.upper()}", DEFAULT_MEMORY_MB.get(tool, 512))
+
+    def memory_needed(self, tool: str, processes: int = 1, estimate_mb: Optional[int] = None) -> int:
+        # The run's own estimate, else the tool's reservation per process
+        return estimate_mb or self.memory_for(tool) * max(1, processes)
+
+    def host_slots_for(self, processes: int) -> int:
+        # A sharded run takes a host slot per load generating process, up to the whole host
+        return min(max(1, processes), self.host_slots)
+
+    def usage(self) -> Usage:
+        """Running jobs per tool, host slots in use and memory reserved, by every worker sharing the store."""
+        if self.store is not None:
+            return self.store.usage()
+        return self.running, self.host_used, self.reserved_mb
+
+    def blocked_by(self, tool: str, processes: int = 1, estimate_mb: Optional[int] = None) -> Optional[str]:
+        """Why a run of ``tool`` with ``processes`` load generating processes cannot start now, or None if it can."""
+        return self._blocked(self.usage(), tool, processes, estimate_mb)
+
+    def _blocked(self, usage: Usage, tool: str, processes: int, estimate_mb: Optional[int]) -> Optional[str]:
+        running, host_used, reserved_mb = usage
+        if host_used + self.host_slots_for(processes) > self.host_slots:
+            return f"host is running its maximum of {self.host_slots} load generators"
+        if running.get(tool, 0) >= self.slots_for(tool):
+            return f"{tool} is running its maximum of {self.slots_for(tool)} load tests"
+        needed = self.memory_needed(tool, processes, estimate_mb)
+        # With nothing running, a run is always admitted, or it would never start
+        if reserved_mb and self.memory_budget_mb and reserved_mb + needed > self.memory_budget_mb:
+            return f"memory budget exhausted ({reserved_mb} of {self.memory_budget_mb} MiB reserved)"
+        _, available = memory_mb()
+        if reserved_mb and available is not None and available < needed:
+            return f"only {available} MiB memory available, {needed} MiB needed"
+        return None
+
+    @asynccontextmanager
+    async def admit(self, tool: str, processes: int = 1, estimate_mb: Optional[int] = None,
+                    job_id: Optional[str] = None) -> AsyncIterator[None]:
+        """Wait until a run of ``tool`` may start, and hold its slots and memory for the duration."""
+        needed = self.memory_needed(tool, processes, estimate_mb)
+        host_slots = self.host_slots_for(processes)
+        if self.store is not None:
+            async with self._admit_shared(job_id or uuid.uuid4().hex, tool, processes, estimate_mb,
+                                          host_slots, needed):
+                yield
+            return
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.blocked_by(tool, processes, estimate_mb) is None)
+            self.running[tool] = self.running.get(tool, 0) + 1
+            self.host_used += host_slots
+            self.reserved_mb += needed
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.running[tool] -= 1
+                self.host_used -= host_slots
+                self.reserved_mb -= needed
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def _admit_shared(self, job_id: str, tool: str, processes: int, estimate_mb: Optional[int],
+                            host_slots: int, needed: int) -> AsyncIterator[None]:
+        def blocked(usage: Usage) -> Optional[str]:
+            return self._blocked(usage, tool, processes, estimate_mb)
+
+        while True:
+            try:
+                reason = await asyncio.to_thread(self.store.claim, job_id, tool, host_slots, needed, blocked)
+            except asyncio.CancelledError:
+                # The claim may have gone through in its thread
+                self.store.release(job_id)
+                raise
+            if reason is None:
+                break
+            # Woken at once by this worker's runs ending, else polling for other workers' runs
+            async with self._condition:
+                try:
+                    await asyncio.wait_for(self._condition.wait(), SHARED_POLL_S)
+                except asyncio.TimeoutError:
+                    pass
+        try:
+            yield
+        finally:
+            self.store.release(job_id)
+            async with self._condition:
+                self._condition.notify_all()
+
+
+class Job:
+    """One submitted load test run and its progress."""
+
+    def __init__(self, tool: str, description: str, processes: int = 1, params: Optional[dict] = None,
+                 memory_mb: Optional[int] = None, guardrails: Optional["Guardrails"] = None):
+        self.job_id = f"{tool}-{uuid.uuid4().hex[:12]}"
+        self.tool = tool
+        self.processes = processes
+        self.memory_mb = memory_mb
+        self.description = description
+        self.params = params or {}
+        self.status = QUEUED
+        self.waiting_for: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.output_lines = 0
+        self.last_progress: Optional[str] = None
+        self.output_tail: deque[str] = deque(maxlen=PROGRESS_TAIL_LINES)
+        self.run_id: Optional[str] = None
+        self.digest: Optional[dict] = None
+        self.task: Optional[asyncio.Task] = None
+        self.live = LiveMetrics(self.job_id, tool)
+        self.guardrails = guardrails if guardrails is not None and guardrails.enabled else None
+        self.abort_reason: Optional[str] = None
+        # Process groups of the run's load generators, see process_utils.run_groups
+        self.process_groups: set[int] = set()
+        self._progress = PROGRESS_PATTERNS.get(tool)
+
+    def on_line(self, stream_name: str, line: str) -> None:
+        if stream_name == ARTIFACT_STREAM:
+            return
+        self.output_lines += 1
+        self.output_tail.append(line[:300])
+        if self._progress is not None and self._progress.search(line):
+            self.last_progress = line.strip()[:300]
+
+    def to_dict(self, tail_lines: int = 5) -> dict:
+        now = self.finished_at or time.time()
+        status = {
+            "job_id": self.job_id,
+            "tool": self.tool,
+            "description": self.description,
+            "status": self.status,
+            "queued_seconds": round((self.started_at or now) - self.submitted_at, 1),
+        }
+        if self.status == QUEUED and self.waiting_for:
+            status["waiting_for"] = self.waiting_for
+        if self.guardrails is not None:
+            status["guardrails"] = self.guardrails.to_dict()
+        if self.abort_reason:
+            status["aborted_by"] = self.abort_reason
+        if self.started_at is not None:
+            status["running_seconds"] = round(now - self.started_at, 1)
+        if self.status == RUNNING:
+            status["output_lines"] = self.output_lines
+            if self.last_progress:
+                status["last_progress"] = self.last_progress
+            if tail_lines:
+                status["output_tail"] = list(self.output_tail)[-tail_lines:]
+        if self.digest is not None:
+            status["result"] = self.digest
+        return status
+
+
+class JobManager:
+    """Run load tests in the background, admitting them one by one."""
+
+    def __init__(self, admission: Optional[AdmissionController] = None, max_finished: int = MAX_FINISHED_JOBS,
+                 store: Optional[JobStore] = None):
+        self._admission = admission
+        self._store = store
+        self._store_resolved = store is not None
+        self.max_finished = max_finished
+        self.jobs: dict[str, Job] = {}
+        # Live metrics of other workers' jobs followed by subscribers of this one
+        self.mirrors: dict[str, LiveMetrics] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def store(self) -> Optional[JobStore]:
+        # Resolved on first use, as main.py sets JOB_STATE_DB after the agent is imported
+        if not self._store_resolved:
+            self._store = JobStore() if job_state_db() else None
+            self._store_resolved = True
+        return self._store
+
+    @property
+    def admission(self) -> AdmissionController:
+        # Created lazily so that its asyncio primitives bind to the running loop
+        if self._admission is None:
+            self._admission = AdmissionController(store=self.store)
+        return self._admission
+
+    def submit(self, tool: str, description: str, run: RunFactory, processes: int = 1,
+               params: Optional[dict] = None, memory_mb: Optional[int] = None,
+               guardrails: Optional["Guardrails"] = None) -> Job:
+        """Queue a run and return its job at once.
+
+        Args:
+            tool: Load testing tool, used for admission limits
+            description: Short description of the run shown in status reports
+            run: Starts the run, given the line consumers to pass on to run_process
+            processes: Number of load generating processes the run starts, e.g. its shards
+            params: Run settings recorded in the run history (script, users, duration, ...)
+            memory_mb: Memory to reserve for the run (default: ``JOB_MEMORY_MB_<TOOL>`` per process)
+            guardrails: Limits that stop the run early when breached while it runs (default: none)
+
+        Returns:
+            Job: The queued job
+        """
+        job = Job(tool, description, processes, params, memory_mb, guardrails)
+        job.waiting_for = self.admission.blocked_by(tool, processes, memory_mb)
+        if self.store is not None:
+            self.store.put(self._shared_state(job))
+        job.task = asyncio.create_task(self._run(job, run))
+        self.jobs[job.job_id] = job
+        self._forget_finished()
+        return job
+
+    async def _run(self, job: Job, run: RunFactory) -> None:
+        ticker = None
+        share = asyncio.create_task(self._share(job)) if self.store is not None else None
+        try:
+            async with self.admission.admit(job.tool, job.processes, job.memory_mb, job.job_id):
+                job.status, job.waiting_for, job.started_at = RUNNING, None, time.time()
+                ticker = asyncio.create_task(job.live.run())
+                guard = asyncio.create_task(self._guard(job)) if job.guardrails is not None else None
+                # The processes the run starts register their groups with the job
+                run_groups.set(job.process_groups)
+                try:
+                    result = await run([job.on_line, job.live.on_line])
+                finally:
+                    ticker.cancel()
+                    if guard is not None:
+                        guard.cancel()
+            if job.abort_reason:
+                result.status = ABORTED
+                # Last, where the digest's error tail shows it
+                result.error = f"{result.error}\nAborted by guardrail: {job.abort_reason}".lstrip()
+            # Digesting and recording need numpy, imported by the first finished run rather than at start-up
+            from .digest_utils import digest_run
+            from .history_utils import record_run
+            job.run_id = await asyncio.to_thread(save_run, result)
+            job.digest = digest_run(result, job.run_id)
+            job.status = {"success": SUCCESS, ABORTED: ABORTED}.get(result.status, ERROR)
+            try:
+                await asyncio.to_thread(record_run, job.run_id, result, job.params)
+            except Exception as e:
+                # The run itself succeeded; a history that cannot be written must not fail it
+                logger.warning(f"Could not record run {job.run_id} in the history: {e}")
+        except asyncio.CancelledError:
+            job.status = ABORTED if job.abort_reason else CANCELLED
+        except Exception as e:
+            logger.exception(f"Job {job.job_id} failed")
+            job.status = ERROR
+            job.digest = {"status": "error", "error": f"Unexpected error: {str(e)}"}
+        finally:
+            job.finished_at = time.time()
+            job.live.close(job.status)
+            if share is not None:
+                share.cancel()
+                await asyncio.gather(share, return_exceptions=True)
+                try:
+                    await asyncio.to_thread(self.store.put, self._shared_state(job))
+                except Exception as e:
+                    logger.warning(f"Could not share the final status of job {job.job_id}: {e}")
+
+    @staticmethod
+    def _shared_state(job: Job) -> dict:
+        return {**job.to_dict(PROGRESS_TAIL_LINES), "submitted_at": job.submitted_at}
+
+    async def _share(self, job: Job) -> None:
+        """Keep the job's status and live snapshots in the shared job table, and take cancel requests from it."""
+        shared_until = 0.0
+        while True:
+            await asyncio.sleep(SHARED_POLL_S)
+            if job.status == QUEUED:
+                job.waiting_for = await asyncio.to_thread(self.admission.blocked_by, job.tool, job.processes,
+                                                          job.memory_mb)
+            snapshots = [snapshot for snapshot in job.live.recent if snapshot["time"] > shared_until]
+            try:
+                cancel = await asyncio.to_thread(self.store.put, self._shared_state(job), snapshots)
+            except Exception as e:
+                logger.warning(f"Could not share the status of job {job.job_id}: {e}")
+                continue
+            if snapshots:
+                shared_until = snapshots[-1]["time"]
+            if cancel and not job.task.done():
+                logger.info(f"Cancelling job {job.job_id} as requested by another worker")
+                job.task.cancel()
+
+    async def _guard(self, job: Job) -> None:
+        """Check the job's live snapshots against its guardrails and stop the run on a sustained breach."""
+        from .guardrail_utils import GuardrailMonitor
+        monitor = GuardrailMonitor(job.guardrails)
+        subscription = job.live.subscribe()
+        try:
+            while True:
+                snapshot = await subscription.get()
+                if snapshot is None:
+                    return
+                reason = monitor.check(snapshot, job.live.rollup)
+                if reason:
+                    break
+        finally:
+            subscription.close()
+        logger.warning(f"Stopping job {job.job_id}: {reason}")
+        job.abort_reason = reason
+        stop_groups(job.process_groups)
+
+        async def still_running(seconds: float) -> bool:
+            deadline = time.monotonic() + seconds
+            while job.process_groups and time.monotonic() < deadline:
+                await asyncio.sleep(0.2)
+            return bool(job.process_groups)
+
+        # Once the generators exited the run is parsing the results so far, which must not be cut short;
+        # only generators that ignore SIGTERM are killed, and the job cancelled if even that fails
+        if await still_running(float(os.getenv("RUNNER_STOP_GRACE_S", "10"))):
+            logger.warning(f"Killing the load generators of job {job.job_id}, still running after SIGTERM")
+            stop_groups(job.process_groups, kill=True)
+            if await still_running(5) and not job.task.done():
+                job.task.cancel()
+
+    def get(self, job_id: str) -> Job:
+        if job_id not in self.jobs:
+            raise KeyError(job_id)
+        return self.jobs[job_id]
+
+    def shared(self, job_id: str) -> Optional[dict]:
+        """The latest status another worker shared of one of its jobs, or None."""
+        if self.store is None or job_id in self.jobs:
+            return None
+        return self.store.get(job_id)
+
+    def status(self, job_id: str, tail_lines: int = 5) -> dict:
+        """Status report of a job: queue position, progress so far, or its result digest."""
+        if job_id not in self.jobs:
+            state = self.shared(job_id)
+            if state is None:
+                raise KeyError(job_id)
+            return self._shared_status(state, tail_lines)
+        job = self.jobs[job_id]
+        if job.status == QUEUED:
+            job.waiting_for = self.admission.blocked_by(job.tool, job.processes, job.memory_mb)
+        status = job.to_dict(tail_lines)
+        if job.status == QUEUED:
+            status["queue_position"] = 1 + self._queued_before(job.submitted_at)
+        return status
+
+    def _queued_before(self, submitted_at: float) -> int:
+        if self.store is not None:
+            return self.store.queued_before(submitted_at)
+        return sum(1 for other in self.jobs.values() if other.status == QUEUED and other.submitted_at < submitted_at)
+
+    def _shared_status(self, state: dict, tail_lines: int) -> dict:
+        submitted_at = state.pop("submitted_at")
+        state.pop("worker_pid", None)
+        if "output_tail" in state:
+            if tail_lines:
+                state["output_tail"] = state["output_tail"][-tail_lines:]
+            else:
+                del state["output_tail"]
+        if state["status"] == QUEUED:
+            state["queue_position"] = 1 + self._queued_before(submitted_at)
+        return state
+
+    def statuses(self, tail_lines: int = 0) -> list[dict]:
+        """Status reports of every known job, of this worker and the others, most recent first."""
+        found = [(job.submitted_at, self.status(job.job_id, tail_lines)) for job in list(self.jobs.values())]
+        if self.store is not None:
+            found += [(state["submitted_at"], self._shared_status(state, tail_lines))
+                      for state in self.store.all() if state["job_id"] not in self.jobs]
+        return [status for _, status in sorted(found, key=lambda item: item[0], reverse=True)]
+
+    async def _wait_shared(self, job_id: str, timeout: Optional[float]) -> None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            state = await asyncio.to_thread(self.store.get, job_id)
+            if state is None or state["status"] in FINISHED_STATES:
+                return
+            await asyncio.sleep(SHARED_POLL_S)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """Wait up to ``timeout`` seconds for a job to finish, and return it (None when another worker runs it)."""
+        if job_id not in self.jobs:
+            state = self.shared(job_id)
+            if state is None:
+                raise KeyError(job_id)
+            if state["status"] not in FINISHED_STATES and timeout > 0:
+                await self._wait_shared(job_id, timeout)
+            return None
+        job = self.jobs[job_id]
+        if job.status not in FINISHED_STATES and timeout > 0:
+            await asyncio.wait([job.task], timeout=timeout)
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job; its load generator processes are stopped.
+
+        A job of another worker is cancelled by that worker, which is asked to through the shared job table.
+        """
+        if job_id not in self.jobs:
+            state = self.shared(job_id)
+            if state is None:
+                raise KeyError(job_id)
+            if state["status"] not in FINISHED_STATES:
+                await asyncio.to_thread(self.store.request_cancel, job_id)
+                await self._wait_shared(job_id, None)
+            return None
+        job = self.jobs[job_id]
+        if job.status not in FINISHED_STATES:
+            job.task.cancel()
+            await asyncio.wait([job.task])
+        return job
+
+    def live(self, job_id: str) -> LiveMetrics:
+        """The live metrics of a job; those of another worker's job are replayed from the shared job table."""
+        if job_id in self.jobs:
+            return self.jobs[job_id].live
+        if job_id in self.mirrors:
+            return self.mirrors[job_id]
+        state = self.shared(job_id)
+        if state is None:
+            raise KeyError(job_id)
+        mirror = LiveMetrics(job_id, state["tool"])
+        seq = 0
+        for seq, snapshot in self.store.snapshots(job_id):
+            mirror.replay(snapshot)
+        if state["status"] in FINISHED_STATES:
+            mirror.close(state["status"])
+        else:
+            self.mirrors[job_id] = mirror
+            task = asyncio.create_task(self._mirror(mirror, seq))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return mirror
+
+    async def _mirror(self, mirror: LiveMetrics, seq: int) -> None:
+        """Replay the new snapshots of another worker's job until it finishes."""
+        try:
+            while True:
+                await asyncio.sleep(SHARED_POLL_S)
+                state = await asyncio.to_thread(self.store.get, mirror.job_id)
+                for seq, snapshot in await asyncio.to_thread(self.store.snapshots, mirror.job_id, seq):
+                    mirror.replay(snapshot)
+                if state is None or state["status"] in FINISHED_STATES:
+                    mirror.close(state["status"] if state is not None else CANCELLED)
+                    return
+        finally:
+            del self.mirrors[mirror.job_id]
+
+    def _forget_finished(self) -> None:
+        # A job reports its final status while its run is still being recorded; keep it until that is done
+        finished = [job for job in self.jobs.values()
+                    if job.status in FINISHED_STATES and job.finished_at is not None]
+        for job in sorted(finished, key=lambda job: job.finished_at)[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job.job_id]
+        if self.store is not None:
+            self.store.forget_finished(self.max_finished)
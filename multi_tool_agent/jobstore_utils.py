@@ -0,0 +1,241 @@
+"""Host-wide table of test jobs, shared by the server's worker processes.
+
+With several uvicorn workers (``WEB_CONCURRENCY``), every worker runs the
+jobs its chat turns submit, but a turn asking for a job's status, a cancel
+or a live stream may be served by any of them, and all of them share the
+host's CPU and memory. ``JobStore`` keeps that state in one SQLite database
+in WAL mode (``JOB_STATE_DB``, set by ``main.py`` when it starts several
+workers):
+
+* ``slots``: the admission slots and memory reservations held by running
+  jobs, claimed in a single write transaction so that two workers cannot
+  both take the last slot;
+* ``jobs``: the status report of every job, kept up to date every second by
+  the worker running it, and a flag other workers set to cancel it;
+* ``snapshots``: the latest per-second live snapshots of every job, which
+  other workers replay to their own subscribers.
+
+Rows of a worker that exited are released or marked as failed as soon as
+another worker reads them, so a crashed worker never holds slots.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Callable, Optional, Sequence
+
+from .run_utils import runs_dir
+
+logger = logging.getLogger(__name__)
+
+MAX_SNAPSHOTS = 1440
+FINISHED_STATUSES = ("success", "error", "cancelled", "aborted")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    job_id TEXT PRIMARY KEY,
+    tool TEXT NOT NULL,
+    host_slots INTEGER NOT NULL,
+    memory_mb INTEGER NOT NULL,
+    pid INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    tool TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    submitted_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    state TEXT NOT NULL,
+    cancel INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, submitted_at);
+CREATE TABLE IF NOT EXISTS snapshots (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    event TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_job ON snapshots (job_id, seq);
+"""
+
+_initialised: set[str] = set()
+_init_lock = threading.Lock()
+
+# Running jobs per tool, host slots in use and memory reserved, see job_utils.AdmissionController
+Usage = tuple[dict[str, int], int, int]
+
+
+def job_state_db() -> Optional[str]:
+    """The shared job database, or None when jobs are kept in the process running them."""
+    return os.getenv("JOB_STATE_DB") or None
+
+
+def default_job_state_db() -> str:
+    """``jobs.db`` in the runs folder, shared by every server on the host saving runs there."""
+    runs_dir().mkdir(parents=True, exist_ok=True)
+    return str(runs_dir() / "jobs.db")
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobStore:
+    """Admission slots, status reports and live snapshots of the jobs of every worker on the host.
+
+    Args:
+        db_path: The SQLite database (default: ``JOB_STATE_DB`` or ``jobs.db`` in the runs folder)
+        max_snapshots: Live snapshots kept per job (default: ``JOB_STATE_MAX_SNAPSHOTS`` or 1440)
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_snapshots: Optional[int] = None):
+        self.db_path = db_path or job_state_db() or default_job_state_db()
+        self.max_snapshots = max_snapshots or int(os.getenv("JOB_STATE_MAX_SNAPSHOTS", MAX_SNAPSHOTS))
+        self.pid = os.getpid()
+
+    def connect(self) -> sqlite3.Connection:
+        # Autocommit, with explicit transactions where reads and writes must not interleave
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA synchronous = NORMAL")
+        with _init_lock:
+            if self.db_path not in _initialised:
+                connection.execute("PRAGMA journal_mode = WAL")
+                connection.executescript(_SCHEMA)
+                _initialised.add(self.db_path)
+        return connection
+
+    @staticmethod
+    def _release_dead(connection: sqlite3.Connection) -> None:
+        for row in connection.execute("SELECT DISTINCT pid FROM slots").fetchall():
+            if not _alive(row["pid"]):
+                logger.warning(f"Releasing the admission slots of exited worker {row['pid']}")
+                connection.execute("DELETE FROM slots WHERE pid = ?", (row["pid"],))
+
+    @staticmethod
+    def _usage(connection: sqlite3.Connection) -> Usage:
+        running: dict[str, int] = {}
+        host_used = reserved_mb = 0
+        for row in connection.execute("SELECT tool, host_slots, memory_mb FROM slots"):
+            running[row["tool"]] = running.get(row["tool"], 0) + 1
+            host_used += row["host_slots"]
+            reserved_mb += row["memory_mb"]
+        return running, host_used, reserved_mb
+
+    def usage(self) -> Usage:
+        """Running jobs per tool, host slots in use and memory reserved, over all workers."""
+        with closing(self.connect()) as connection:
+            return self._usage(connection)
+
+    def claim(self, job_id: str, tool: str, host_slots: int, memory_mb: int,
+              blocked_by: Callable[[Usage], Optional[str]]) -> Optional[str]:
+        """Take a job's slots and memory unless ``blocked_by`` the current usage gives a reason not to.
+
+        Returns:
+            Optional[str]: Why the job cannot start now, or None once its slots are taken
+        """
+        with closing(self.connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._release_dead(connection)
+                reason = blocked_by(self._usage(connection))
+                if reason is None:
+                    connection.execute("INSERT OR REPLACE INTO slots VALUES (?, ?, ?, ?, ?)",
+                                       (job_id, tool, host_slots, memory_mb, self.pid))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return reason
+
+    def release(self, job_id: str) -> None:
+        with closing(self.connect()) as connection:
+            connection.execute("DELETE FROM slots WHERE job_id = ?", (job_id,))
+
+    def put(self, state: dict, snapshots: Sequence[dict] = ()) -> bool:
+        """Save the status report of one of this worker's jobs, and its new live snapshots.
+
+        Returns:
+            bool: Whether another worker asked to cancel the job
+        """
+        job_id = state["job_id"]
+        finished = time.time() if state["status"] in FINISHED_STATUSES else None
+        with closing(self.connect()) as connection:
+            connection.execute(
+                "INSERT INTO jobs (job_id, tool, pid, submitted_at, finished_at, status, state) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (job_id) DO UPDATE SET "
+                "finished_at = excluded.finished_at, status = excluded.status, state = excluded.state",
+                (job_id, state["tool"], self.pid, state["submitted_at"], finished, state["status"],
+                 json.dumps(state)))
+            if snapshots:
+                connection.executemany("INSERT INTO snapshots (job_id, event) VALUES (?, ?)",
+                                       [(job_id, json.dumps(snapshot)) for snapshot in snapshots])
+                connection.execute(
+                    "DELETE FROM snapshots WHERE job_id = ? AND seq <= (SELECT seq FROM snapshots "
+                    "WHERE job_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)",
+                    (job_id, job_id, self.max_snapshots))
+            row = connection.execute("SELECT cancel FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return bool(row["cancel"])
+
+    def _state(self, connection: sqlite3.Connection, row: sqlite3.Row) -> dict:
+        state = json.loads(row["state"])
+        if row["finished_at"] is None and not _alive(row["pid"]):
+            # The worker running the job exited without finishing it
+            state.update(status="error", result={"status": "error",
+                                                 "error": f"The worker running the job (pid {row['pid']}) exited"})
+            for key in ("waiting_for", "output_lines", "last_progress", "output_tail"):
+                state.pop(key, None)
+            connection.execute("UPDATE jobs SET status = ?, finished_at = ?, state = ? WHERE job_id = ?",
+                               ("error", time.time(), json.dumps(state), row["job_id"]))
+        state["worker_pid"] = row["pid"]
+        return state
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """The latest status report of a job, or None if no worker knows it."""
+        with closing(self.connect()) as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            return self._state(connection, row) if row is not None else None
+
+    def all(self) -> list[dict]:
+        """The status reports of the jobs of every worker, most recent first."""
+        with closing(self.connect()) as connection:
+            rows = connection.execute("SELECT * FROM jobs ORDER BY submitted_at DESC").fetchall()
+            return [self._state(connection, row) for row in rows]
+
+    def queued_before(self, submitted_at: float) -> int:
+        """Jobs of any worker queued before a job submitted at ``submitted_at``."""
+        with closing(self.connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND submitted_at < ?",
+                                      (submitted_at,)).fetchone()[0]
+
+    def request_cancel(self, job_id: str) -> None:
+        """Ask the worker running a job to cancel it, with its next status update."""
+        with closing(self.connect()) as connection:
+            connection.execute("UPDATE jobs SET cancel = 1 WHERE job_id = ?", (job_id,))
+
+    def snapshots(self, job_id: str, after: int = 0) -> list[tuple[int, dict]]:
+        """The live snapshots of a job kept after sequence number ``after``, oldest first."""
+        with closing(self.connect()) as connection:
+            rows = connection.execute("SELECT seq, event FROM snapshots WHERE job_id = ? AND seq > ? ORDER BY seq",
+                                      (job_id, after)).fetchall()
+        return [(row["seq"], json.loads(row["event"])) for row in rows]
+
+    def forget_finished(self, keep: int) -> None:
+        """Drop all but the ``keep`` most recently finished jobs and their snapshots."""
+        with closing(self.connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute("SELECT job_id FROM jobs WHERE finished_at IS NOT NULL "
+                                      "ORDER BY finished_at DESC LIMIT -1 OFFSET ?", (keep,)).fetchall()
+            for row in rows:
+                connection.execute("DELETE FROM snapshots WHERE job_id = ?", (row["job_id"],))
+                connection.execute("DELETE FROM jobs WHERE job_id = ?", (row["job_id"],))
+            connection.execute("COMMIT")
@@ -0,0 +1,374 @@
+"""Incremental parsers for k6 machine-readable results.
+
+k6 can write two kinds of result files:
+
+- ``--summary-export``: one JSON document with the end-of-test aggregates.
+- ``--out json``: newline-delimited JSON (NDJSON), one metric point per line.
+  On high-VU runs this grows to millions of lines, so it is folded into
+  aggregates line by line and never loaded whole.
+"""
+import json
+import logging
+import math
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from .stats_utils import EndpointAggregator, LatencyHistogram, ThroughputTimeline, round_stat
+
+logger = logging.getLogger(__name__)
+
+# Part of the keys of cached reports: bump when the reports this module makes change
+PARSER_VERSION = 3
+
+BATCH_SIZE = 50_000
+CHUNK_BYTES = 4 * 1024 * 1024
+MAX_TAG_KEYS = 1000
+OTHER_KEY = "(other)"
+
+
+class _TimeParser:
+    """Convert k6 RFC 3339 timestamps (up to nanosecond precision) to epoch ms.
+
+    Points arrive in time order, so the expensive whole-second part is
+    parsed once per distinct second and cached.
+    """
+
+    def __init__(self):
+        self._second_prefix = None
+        self._second_epoch_ms = 0.0
+
+    def __call__(self, value: str) -> float:
+        head, dot, rest = value.partition(".")
+        fraction_digits = len(rest) - len(rest.lstrip("0123456789")) if dot else 0
+        zone = rest[fraction_digits:] if dot else ""
+        prefix = head + zone
+        if prefix != self._second_prefix:
+            if not dot:
+                head, zone = value[:19], value[19:]
+            self._second_epoch_ms = datetime.fromisoformat(head + zone.replace("Z", "+00:00")).timestamp() * 1000.0
+            self._second_prefix = prefix
+        if not fraction_digits:
+            return self._second_epoch_ms
+        return self._second_epoch_ms + float("0." + rest[:fraction_digits]) * 1000.0
+
+
+class _MetricStats:
+    """Aggregate of one metric for one tag combination.
+
+    Values are appended to a plain list and folded in with NumPy when the
+    owning aggregator flushes, keeping the per-point cost to one append.
+    """
+
+    def __init__(self, metric_type: str):
+        self.type = metric_type
+        self.count = 0
+        self.sum = 0.0
+        self.nonzero = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.last = None
+        self.pending: list[float] = []
+        self.histogram = LatencyHistogram() if metric_type == "trend" else None
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        values = np.asarray(self.pending, dtype=np.float64)
+        self.pending = []
+        self.count += int(values.size)
+        self.sum += float(values.sum())
+        self.nonzero += int(np.count_nonzero(values))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.last = float(values[-1])
+        if self.histogram is not None:
+            self.histogram.add(values)
+
+    def merge(self, other: "_MetricStats") -> "_MetricStats":
+        """Fold in the aggregate of the same metric from another k6 process.
+
+        Gauges of concurrent processes (such as ``vus``) add up, so their last
+        values are summed.
+        """
+        self.flush()
+        other.flush()
+        self.count += other.count
+        self.sum += other.sum
+        self.nonzero += other.nonzero
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if other.last is not None:
+            self.last = other.last if self.last is None else self.last + other.last
+        if self.histogram is not None and other.histogram is not None:
+            self.histogram.merge(other.histogram)
+        return self
+
+    def summary(self) -> dict:
+        self.flush()
+        if self.type == "counter":
+            return {"count": self.count, "sum": round_stat(self.sum)}
+        if self.type == "rate":
+            return {"count": self.count, "passes": self.nonzero,
+                    "rate": round_stat(self.nonzero / self.count, 4) if self.count else None}
+        if self.type == "gauge":
+            return {"value": self.last, "min": round_stat(self.min), "max": round_stat(self.max)}
+        summary = {"count": self.count, "min": round_stat(self.min), "mean": round_stat(self.sum / self.count),
+                   "max": round_stat(self.max)}
+        for p, value in self.histogram.percentiles().items():
+            summary[f"p{p}"] = round_stat(value)
+        return summary
+
+
+class K6MetricsAggregator:
+    """Fold k6 NDJSON metric points into per-metric, per-tag aggregates as they arrive.
+
+    Each metric is aggregated overall and per combination of the ``group_by``
+    tags. HTTP request durations are additionally folded into a per-request
+    endpoint report (grouped by the ``name`` tag) and a per-second timeline
+    compatible with the other tools' reports. The number of distinct tag combinations kept per metric
+    is capped; the rest are pooled under ``(other)``. Buffered values are
+    flushed into the aggregates every ``batch_size`` points.
+    """
+
+    def __init__(self, group_by: Sequence[str] = ("name",), batch_size: int = BATCH_SIZE,
+                 max_tag_keys: int = MAX_TAG_KEYS):
+        self.group_by = tuple(group_by)
+        self.batch_size = batch_size
+        self.max_tag_keys = max_tag_keys
+        self.metric_types: dict[str, str] = {}
+        self.metrics: dict[str, dict[str, _MetricStats]] = {}
+        self.endpoints = EndpointAggregator()
+        self.timeline = ThroughputTimeline()
+        self.malformed_lines = 0
+        # HTTP durations left out of the endpoint report for want of a time
+        self.untimed_points = 0
+        self._pending = 0
+        self._parse_time = _TimeParser()
+        self._last_time: Optional[float] = None
+        self._http: tuple[list, list, list, list] = ([], [], [], [])
+
+    def feed_line(self, line: str) -> None:
+        """Consume one NDJSON line from a k6 ``--out json`` stream."""
+        if not line or line.isspace():
+            return
+        try:
+            record = json.loads(line)
+        except ValueError:
+            self.malformed_lines += 1
+            return
+        self.feed_record(record)
+
+    def feed_lines(self, lines: Sequence[str]) -> None:
+        """Consume a block of NDJSON lines, decoding them with a single JSON call."""
+        lines = [line for line in lines if line and not line.isspace()]
+        if not lines:
+            return
+        try:
+            records = json.loads("[" + ",".join(lines) + "]")
+        except ValueError:
+            # Locate the bad lines the slow way rather than dropping the block
+            for line in lines:
+                self.feed_line(line)
+            return
+        for record in records:
+            self.feed_record(record)
+
+    def feed_record(self, record: dict) -> None:
+        kind = record.get("type")
+        if kind == "Metric":
+            data = record.get("data", {})
+            self.metric_types[record.get("metric") or data.get("name")] = data.get("type", "trend")
+            return
+        if kind != "Point":
+            return
+        metric = record.get("metric")
+        data = record.get("data", {})
+        value = data.get("value")
+        if metric is None or value is None:
+            self.malformed_lines += 1
+            return
+        tags = data.get("tags") or {}
+        by_key = self.metrics.get(metric)
+        if by_key is None:
+            by_key = self.metrics[metric] = {}
+        self._stats(by_key, metric, "").pending.append(value)
+        key = ",".join([f"{tag}={tags[tag]}" for tag in self.group_by if tag in tags])
+        if key:
+            self._stats(by_key, metric, key).pending.append(value)
+
+        if metric == "http_req_duration":
+            # A point without a time takes the last one seen rather than 1970, which would
+            # stretch the run's time span; before any, it is left out of the endpoint report
+            if "time" in data:
+                self._last_time = self._parse_time(data["time"])
+            if self._last_time is None:
+                self.untimed_points += 1
+            else:
+                labels, elapsed, success, timestamps = self._http
+                labels.append(tags.get("name") or tags.get("url") or "http")
+                elapsed.append(value)
+                success.append(tags.get("expected_response", "true") != "false")
+                timestamps.append(self._last_time - value)
+
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def _stats(self, by_key: dict, metric: str, key: str) -> _MetricStats:
+        stats = by_key.get(key)
+        if stats is None:
+            if key and len(by_key) > self.max_tag_keys:
+                key = OTHER_KEY
+                stats = by_key.get(key)
+            if stats is None:
+                stats = by_key[key] = _MetricStats(self.metric_types.get(metric, "trend"))
+        return stats
+
+    def flush(self) -> None:
+        """Fold all buffered values into the aggregates."""
+        for by_key in self.metrics.values():
+            for stats in by_key.values():
+                stats.flush()
+        labels, elapsed, success, timestamps = self._http
+        if labels:
+            success, timestamps = np.array(success), np.array(timestamps)
+            self.endpoints.add_batch(np.array(labels), np.array(elapsed), success, timestamps)
+            self.timeline.add(timestamps, ~success)
+            self._http = ([], [], [], [])
+        self._pending = 0
+
+    def merge(self, other: "K6MetricsAggregator") -> "K6MetricsAggregator":
+        """Fold in the aggregates of another process, e.g. another execution segment of the same test."""
+        self.flush()
+        other.flush()
+        self.metric_types.update(other.metric_types)
+        for metric, other_by_key in other.metrics.items():
+            by_key = self.metrics.setdefault(metric, {})
+            for key, stats in other_by_key.items():
+                if key in by_key:
+                    by_key[key].merge(stats)
+                else:
+                    by_key[key] = stats
+        self.endpoints.merge(other.endpoints)
+        self.timeline.merge(other.timeline)
+        self.malformed_lines += other.malformed_lines
+        self.untimed_points += other.untimed_points
+        return self
+
+    def summary(self) -> dict:
+        """Report with per-metric aggregates and an HTTP endpoint report."""
+        self.flush()
+        metrics = {}
+        for metric in sorted(self.metrics):
+            by_key = self.metrics[metric]
+            metrics[metric] = {
+                "type": self.metric_types.get(metric, "trend"),
+                "total": by_key[""].summary(),
+                "by_tag": {key: stats.summary() for key, stats in sorted(by_key.items()) if key},
+            }
+        report = {"metrics": metrics}
+        if self.endpoints.endpoints:
+            report.update(self.endpoints.summary())
+            report["timeline"] = self.timeline.summary()
+        return report
+
+
+def _aggregate_k6_json(json_file: Union[str, Path], group_by: Sequence[str]) -> K6MetricsAggregator:
+    aggregator = K6MetricsAggregator(group_by)
+    with open(json_file, encoding="utf-8", errors="replace") as f:
+        while True:
+            lines = f.readlines(CHUNK_BYTES)
+            if not lines:
+                break
+            aggregator.feed_lines(lines)
+    if aggregator.malformed_lines:
+        logger.warning(f"Skipped {aggregator.malformed_lines} malformed lines in {json_file}")
+    if aggregator.untimed_points:
+        logger.warning(f"Left {aggregator.untimed_points} HTTP durations without a time out of the endpoint report "
+                       f"of {json_file}")
+    return aggregator
+
+
+def parse_k6_json(json_file: Union[str, Path], group_by: Sequence[str] = ("name",)) -> dict:
+    """Parse a k6 ``--out json`` NDJSON file line by line.
+
+    Args:
+        json_file: Path to the NDJSON output file
+        group_by: Tags to aggregate each metric by, in addition to the overall aggregate
+
+    Returns:
+        dict: Per-metric aggregates and, for HTTP requests, a per-name endpoint report and a per-second timeline
+    """
+    return _aggregate_k6_json(json_file, group_by).summary()
+
+
+def merge_k6_json(json_files: Sequence[Union[str, Path]], group_by: Sequence[str] = ("name",)) -> dict:
+    """Parse the NDJSON files of several k6 processes into one report.
+
+    Each file is aggregated on its own and the aggregates are merged, so
+    percentiles come from the combined histograms rather than from averaging
+    per-process percentiles.
+
+    Args:
+        json_files: NDJSON output files, e.g. one per execution segment
+        group_by: Tags to aggregate each metric by, in addition to the overall aggregate
+
+    Returns:
+        dict: Per-metric aggregates and, for HTTP requests, a per-name endpoint report and a per-second timeline
+    """
+    merged = K6MetricsAggregator(group_by)
+    for json_file in json_files:
+        merged.merge(_aggregate_k6_json(json_file, group_by))
+    return merged.summary()
+
+
+def parse_summary_export(summary_file: Union[str, Path]) -> dict:
+    """Read the end-of-test aggregates written by ``k6 run --summary-export``."""
+    with open(summary_file, encoding="utf-8") as f:
+        export = json.load(f)
+    return export.get("metrics", {})
+
+
+def summary_export_report(metrics: dict) -> dict:
+    """Build a report ``total`` row from summary-export metrics.
+
+    k6's default trend statistics stop at p(95), so ``p99`` is only set when
+    the script asks for it in ``summaryTrendStats``.
+    """
+    requests = metrics.get("http_reqs") or {}
+    failed = metrics.get("http_req_failed") or {}
+    duration = metrics.get("http_req_duration") or {}
+    samples = int(requests.get("count", 0))
+    # http_req_failed is a rate of failures, so its "passes" are the failed requests
+    errors = int(failed.get("passes", 0))
+    total = {
+        "samples": samples,
+        "errors": errors,
+        "error_rate": round_stat(100.0 * errors / samples) if samples else 0.0,
+        "throughput": round_stat(requests.get("rate")),
+        "min": round_stat(duration.get("min")),
+        "mean": round_stat(duration.get("avg")),
+        "max": round_stat(duration.get("max")),
+        "p50": round_stat(duration.get("med")),
+        "p90": round_stat(duration.get("p(90)")),
+        "p95": round_stat(duration.get("p(95)")),
+        "p99": round_stat(duration.get("p(99)")),
+    }
+    return {"total": total, "labels": {}}
+
+
+def format_k6_summary(metrics: dict, names: Optional[Sequence[str]] = None) -> str:
+    """Render the key summary-export metrics, one per line."""
+    names = names or ["http_reqs", "http_req_failed", "http_req_duration", "iterations", "checks",
+                      "vus_max", "data_received", "data_sent"]
+    lines = []
+    for name in names:
+        values = metrics.get(name)
+        if values:
+            rendered = ", ".join(f"{key}={round_stat(value) if isinstance(value, float) else value}"
+                                 for key, value in values.items() if not isinstance(value, (dict, list)))
+            lines.append(f"{name}: {rendered}")
+    return "\n".join(lines)
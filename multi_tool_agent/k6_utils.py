@@ -1,69 +1,233 @@
 import os
+import asyncio
 import logging
-from dotenv import load_dotenv
+import tempfile
+import time
+import uuid
 from pathlib import Path
-import subprocess
+from typing import Optional, Sequence
 
-load_dotenv()
+from .cache_utils import parse_fresh
+from .health_utils import GeneratorMonitor
+from .k6_results import format_k6_summary, merge_k6_json, parse_k6_json, parse_summary_export, summary_export_report
+from .process_utils import LineConsumer, ProcessResult, announce_artifacts, run_deadline, run_process, run_processes
+from .registry_utils import resolve_binary
+from .run_utils import RunResult
+from .stats_utils import format_summary
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# k6 exits with this code when the script's thresholds were crossed
+THRESHOLDS_EXIT_CODE = 99
 
-async def run_k6_script(script_file: str, duration: str = "30s", vus: int = 10) -> str:
+
+async def run_k6_script(script_file: str, duration: str = "30s", vus: int = 10, json_output: bool = False,
+                        shards: int = 1) -> str:
     """Run a k6 load test script.
 
     Args:
         script_file: Path to the k6 test script (.js)
         duration: Duration of the test (e.g., "30s", "1m", "5m")
         vus: Number of virtual users to simulate
+        json_output: Also stream every metric point to an NDJSON file and aggregate it per request name
+        shards: Split the test into this many local k6 processes, one execution segment each (default: 1)
 
     Returns:
         str: k6 execution output
     """
+    result = await run_k6_result(script_file, duration, vus, json_output, shards=shards)
+    if result.status != "success":
+        return result.error
+    output = result.output
+    if "summary_export" in result.artifacts:
+        output += (f"\nSummary export: {result.artifacts['summary_export']}\n"
+                   f"{format_k6_summary(result.report['summary_metrics'])}\n")
+    if "json" in result.artifacts and result.report and result.report.get("labels"):
+        output += f"\nJSON output: {result.artifacts['json']}\n\n{format_summary(result.report)}\n"
+    if result.report and result.report.get("shards") and result.report.get("labels"):
+        output += f"\nMerged results of {result.report['shards']} shards:\n\n{format_summary(result.report)}\n"
+    return output
+
+
+async def run_k6_result(script_file: str, duration: str = "30s", vus: int = 10, json_output: bool = False,
+                        consumers: Optional[Sequence[LineConsumer]] = None, shards: int = 1,
+                        summary_trend_stats: Optional[Sequence[str]] = None,
+                        fail_on_thresholds: bool = True) -> RunResult:
+    """Run a k6 load test script and return its output, parsed results and result files.
+
+    Args:
+        script_file: Path to the k6 test script (.js)
+        duration: Duration of the test (e.g., "30s", "1m", "5m")
+        vus: Number of virtual users to simulate
+        json_output: Also stream every metric point to an NDJSON file and aggregate it per request name
+        consumers: Callables invoked with (stream_name, line) for every output line
+        shards: Split the test into this many local k6 processes, one execution segment each (default: 1)
+        summary_trend_stats: Trend statistics of the summary, e.g. ``["avg", "p(95)", "p(99)"]``
+            (default: the script's ``summaryTrendStats`` or k6's, which stop at p(95))
+        fail_on_thresholds: Whether a run that crossed the script's thresholds (exit code 99) is an
+            error; if not, its report is kept and names them under ``thresholds_crossed``
+
+    Returns:
+        RunResult: The structured outcome of the run. The report carries the
+        summary-export metrics under ``summary_metrics``
+    """
     try:
         # Convert to absolute path
         script_file_path = Path(script_file).resolve()
         
         # Validate file exists and is a .js file
         if not script_file_path.exists():
-            return f"Error: Script file not found: {script_file}"
+            return RunResult("k6", "error", error=f"Error: Script file not found: {script_file}")
         if not script_file_path.suffix == '.js':
-            return f"Error: Invalid file type. Expected .js file: {script_file}"
+            return RunResult("k6", "error", error=f"Error: Invalid file type. Expected .js file: {script_file}")
 
         # Get k6 binary path from environment
-        k6_bin = os.getenv('K6_BIN', 'k6')
+        k6_bin = resolve_binary("k6")
         
         # Print the k6 binary path for debugging
         logger.debug(f"k6 binary path: {k6_bin}")
 
         # Build command
-        cmd = [str(Path(k6_bin).resolve())]
+        cmd = [k6_bin]
         cmd.extend(['run'])
         cmd.extend(['-d', duration])
         cmd.extend(['-u', str(vus)])
+        if summary_trend_stats:
+            cmd.extend(['--summary-trend-stats', ','.join(summary_trend_stats)])
+
+        # Ask k6 for machine-readable results next to the human-readable summary
+        results_dir = Path(os.getenv('K6_RESULTS_DIR', tempfile.gettempdir()))
+        results_dir.mkdir(parents=True, exist_ok=True)
+        results_stem = f"{script_file_path.stem}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        monitor = GeneratorMonitor("k6")
+        if shards > 1:
+            return await _run_k6_segments(cmd, script_file_path, results_dir / results_stem, shards, consumers,
+                                          monitor, deadline=run_deadline(duration),
+                                          fail_on_thresholds=fail_on_thresholds)
+        summary_file = results_dir / f"{results_stem}.summary.json"
+        cmd.extend(['--summary-export', str(summary_file)])
+        json_file = None
+        if json_output:
+            json_file = results_dir / f"{results_stem}.ndjson"
+            cmd.extend(['--out', f'json={json_file}'])
         cmd.extend([str(script_file_path)])
 
         # Print the full command for debugging
         logger.debug(f"Executing command: {' '.join(cmd)}")
         
         # Run the command and capture output
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        if json_file is not None:
+            announce_artifacts(consumers, {"json": json_file})
+        result = await run_process(cmd, consumers=consumers, monitor=monitor, deadline=run_deadline(duration))
         
         # Print output for debugging
         logger.debug(f"\nCommand output:")
-        logger.debug(f"Return code: {result.returncode}")
         logger.debug(f"Stdout: {result.stdout}")
         logger.debug(f"Stderr: {result.stderr}")
 
-        if result.returncode != 0:
-            return f"Error executing k6 test:\n{result.stderr}"
-        
-        return result.stdout
+        # A run stopped early still has the results written so far
+        if result.returncode != 0 and not result.stopped and not _thresholds_only(result, fail_on_thresholds):
+            return RunResult("k6", "error", output=result.stdout, error=f"Error executing k6 test:\n{result.stderr}",
+                             health=monitor.summary())
+
+        report = None
+        artifacts = {}
+        if summary_file.exists():
+            metrics = parse_summary_export(summary_file)
+            report = summary_export_report(metrics)
+            report["summary_metrics"] = metrics
+            artifacts["summary_export"] = str(summary_file)
+            if result.returncode == THRESHOLDS_EXIT_CODE:
+                report["thresholds_crossed"] = thresholds_crossed(metrics)
+        if json_file is not None and json_file.exists():
+            # Folding a large NDJSON stream is CPU bound; keep it off the event loop
+            json_report = await asyncio.to_thread(parse_fresh, parse_k6_json, json_file)
+            if json_report.get("labels"):
+                report = {**(report or {}), **json_report}
+            artifacts["json"] = str(json_file)
+        return RunResult("k6", "success", output=result.stdout, error=result.stderr,
+                         report=report, artifacts=artifacts, health=monitor.summary())
 
     except Exception as e:
-        return f"Unexpected error: {str(e)}"
\ No newline at end of file
+        return RunResult("k6", "error", error=f"Unexpected error: {str(e)}")
+
+
+def _thresholds_only(result: ProcessResult, fail_on_thresholds: bool) -> bool:
+    """Whether k6 only failed because the script's thresholds were crossed, and that is not an error."""
+    return not fail_on_thresholds and result.returncode == THRESHOLDS_EXIT_CODE
+
+
+def thresholds_crossed(metrics: dict) -> list[str]:
+    """The crossed thresholds of summary-export metrics, as ``metric: threshold``."""
+    return [f"{metric}: {threshold}" for metric, values in metrics.items()
+            for threshold, crossed in (values.get("thresholds") or {}).items() if crossed]
+
+
+def execution_segments(shards: int) -> tuple[list[str], str]:
+    """Split a test into ``shards`` equal k6 execution segments.
+
+    Returns:
+        tuple: The segment of each shard and the segment sequence shared by all of them
+    """
+    bounds = ["0"] + [f"{i}/{shards}" for i in range(1, shards)] + ["1"]
+    return [f"{bounds[i]}:{bounds[i + 1]}" for i in range(shards)], ",".join(bounds)
+
+
+async def _run_k6_segments(cmd: list[str], script_file_path: Path, results_prefix: Path, shards: int,
+                           consumers: Optional[Sequence[LineConsumer]],
+                           monitor: Optional[GeneratorMonitor] = None,
+                           deadline: Optional[float] = None, fail_on_thresholds: bool = True) -> RunResult:
+    """Run one k6 process per execution segment and merge their NDJSON results.
+
+    k6 divides the VUs and iterations of the whole test between the
+    segments, so every process gets the same options. Summary exports only
+    hold per-process percentiles, so the report is built from the merged
+    NDJSON histograms instead.
+    """
+    segments, sequence = execution_segments(shards)
+    json_files = [Path(f"{results_prefix}.shard{i}.ndjson") for i in range(shards)]
+    summary_files = [Path(f"{results_prefix}.shard{i}.summary.json") for i in range(shards)]
+    cmds = [[*cmd, '--execution-segment', segment, '--execution-segment-sequence', sequence,
+             # Only one process can serve the REST API on its default port
+             '--address', '',
+             '--summary-export', str(summary_file), '--out', f'json={json_file}', str(script_file_path)]
+            for segment, json_file, summary_file in zip(segments, json_files, summary_files)]
+    logger.debug(f"Executing {shards} k6 segments: {' '.join(cmds[0])}")
+
+    announce_artifacts(consumers, {f"json_shard{i}": json_file for i, json_file in enumerate(json_files)})
+    results = await run_processes(cmds, consumers=consumers, monitor=monitor, deadline=deadline)
+    output = "".join(f"--- shard {i + 1}/{shards} ({segment}) ---\n{result.stdout}"
+                     for i, (segment, result) in enumerate(zip(segments, results)))
+    failed = [(i, result) for i, result in enumerate(results)
+              if result.returncode != 0 and not result.stopped and not _thresholds_only(result, fail_on_thresholds)]
+    # The generator samples explain a failed run as much as a finished one
+    health = monitor.summary() if monitor is not None else None
+    if failed:
+        errors = "".join(f"shard {i + 1}/{shards}:\n{result.stderr}" for i, result in failed)
+        return RunResult("k6", "error", output=output, error=f"Error executing k6 test:\n{errors}", health=health)
+
+    artifacts = {}
+    for i, (json_file, summary_file) in enumerate(zip(json_files, summary_files)):
+        if json_file.exists():
+            artifacts[f"json_shard{i}"] = str(json_file)
+        if summary_file.exists():
+            artifacts[f"summary_export_shard{i}"] = str(summary_file)
+    present = [json_file for json_file in json_files if json_file.exists()]
+    if not present:
+        return RunResult("k6", "success", output=output, artifacts=artifacts, health=health)
+
+    # Folding large NDJSON streams is CPU bound; keep it off the event loop
+    report = await asyncio.to_thread(parse_fresh, merge_k6_json, present)
+    report["shards"] = shards
+    # A threshold is breached when it is breached in any shard
+    thresholds = {}
+    for summary_file in summary_files:
+        if summary_file.exists():
+            for metric, values in parse_summary_export(summary_file).items():
+                for threshold, breached in (values.get("thresholds") or {}).items():
+                    merged = thresholds.setdefault(metric, {"thresholds": {}})["thresholds"]
+                    merged[threshold] = merged.get(threshold, False) or breached
+    report["summary_metrics"] = thresholds
+    if any(result.returncode == THRESHOLDS_EXIT_CODE for result in results):
+        report["thresholds_crossed"] = thresholds_crossed(thresholds)
+    return RunResult("k6", "success", output=output, report=report, artifacts=artifacts, health=health)
@@ -0,0 +1,447 @@
+"""Live per-second metrics of in-flight runs, streamed over Server-Sent Events.
+
+While a job runs, its ``LiveMetrics`` follows the result files the runner
+announced (see ``process_utils.announce_artifacts``) and the tool's console
+output, and publishes one snapshot per second: throughput, error count
+and rate, latency percentiles and active users. The snapshots are also
+folded into the job's 1 s, 10 s and 1 min rollups (see ``rollup_utils``),
+which ``GET /live/runs/{job_id}/series`` queries at any resolution.
+
+* JMeter: new rows of the CSV JTL.
+* k6: new points of the NDJSON output (``json_output`` or shards),
+  otherwise the VU count from the progress line.
+* Locust: the latest aggregated row of the ``_stats_history.csv`` file,
+  which Locust flushes every few seconds.
+* Gatling: new records of a text ``simulation.log`` (Gatling < 3.10).
+
+Every subscriber gets its own bounded queue (``LIVE_QUEUE_SIZE``). When a
+dashboard falls behind, its oldest snapshots are dropped; publishing never
+waits, so slow clients cannot hold up the job or its load generator.
+"""
+import asyncio
+import csv
+import json
+import logging
+import os
+import re
+import time
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from .process_utils import ARTIFACT_STREAM
+
+# The result parsers (and numpy with them) are imported by the sources below
+# once a run has result files to follow, not when the server starts
+if TYPE_CHECKING:
+    from .rollup_utils import TimeSeriesRollup
+    from .stats_utils import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+LIVE_INTERVAL_S = 1.0
+DEFAULT_QUEUE_SIZE = 120
+REPLAY_SNAPSHOTS = 60
+KEEPALIVE_S = 15.0
+MAX_READ_BYTES = 64 * 1024 * 1024
+
+_K6_METRICS = ("http_req_duration", "http_req_failed", "http_reqs", "vus")
+_K6_PROGRESS = re.compile(r"running \([^)]*\), (\d+)/\d+ VUs")
+_JMETER_ACTIVE = re.compile(r"^summary \+.*Active:\s+(\d+)")
+
+
+class FileTail:
+    """Incremental reader of a file that is still being written.
+
+    ``read`` returns the complete lines appended since the last call; a
+    partly written last line is kept back until its newline arrives.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.offset = 0
+        self.pending = b""
+
+    def read(self) -> bytes:
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read(MAX_READ_BYTES)
+        except FileNotFoundError:
+            return b""
+        self.offset += len(data)
+        data = self.pending + data
+        cut = data.rfind(b"\n") + 1
+        self.pending = data[cut:]
+        return data[:cut]
+
+
+def _latency_stats(histogram: "LatencyHistogram") -> dict:
+    from .stats_utils import round_stat
+    stats = {"mean": round_stat(histogram.mean)}
+    stats.update({f"p{p}": round_stat(value) for p, value in histogram.percentiles((50, 95, 99)).items()})
+    return stats
+
+
+class JtlSource:
+    """Requests, errors, percentiles and active threads from new JTL rows."""
+
+    def __init__(self, path: Path):
+        self.tail = FileTail(path)
+        self.header: Optional[list[str]] = None
+
+    def sample(self) -> dict:
+        block = self.tail.read()
+        if self.header is None:
+            if not block:
+                return {}
+            first, _, block = block.partition(b"\n")
+            self.header = [field.strip() for field in next(csv.reader([first.decode("utf-8", "replace")]))]
+        if not block:
+            return {"requests": 0, "errors": 0}
+        from .jmeter_results import JtlAggregator
+        aggregator = JtlAggregator(self.header)
+        aggregator.add_block(block)
+        total = aggregator.aggregator.total()
+        sample = {"requests": total.histogram.count, "errors": total.errors, "histogram": total.histogram,
+                  **_latency_stats(total.histogram)}
+        if "allThreads" in self.header:
+            last = next(csv.reader([block.rstrip(b"\n").rsplit(b"\n", 1)[-1].decode("utf-8", "replace")]))
+            column = self.header.index("allThreads")
+            if len(last) > column and last[column].isdigit():
+                sample["active_users"] = int(last[column])
+        return sample
+
+
+class K6JsonSource:
+    """Requests, errors, percentiles and VUs from new NDJSON points of one or more k6 processes."""
+
+    def __init__(self):
+        self.tails: list[FileTail] = []
+        self.vus: dict[int, float] = {}
+
+    def add(self, path: Path) -> None:
+        self.tails.append(FileTail(path))
+
+    @staticmethod
+    def points(block: bytes) -> list[tuple[str, float]]:
+        """The ``(metric, value)`` points of the live metrics in a block of NDJSON lines.
+
+        Lines are decoded with ``json.loads`` like ``k6_results`` does, since
+        k6 does not write the keys in a fixed order; the byte checks only skip
+        the lines that cannot hold a wanted point without decoding them.
+        """
+        points = []
+        for line in block.splitlines():
+            if b'"Point"' not in line or not any(metric.encode() in line for metric in _K6_METRICS):
+                continue
+            try:
+                record = json.loads(line)
+                metric, value = record.get("metric"), record["data"]["value"]
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+            if record.get("type") == "Point" and metric in _K6_METRICS and isinstance(value, (int, float)):
+                points.append((metric, float(value)))
+        return points
+
+    def sample(self) -> dict:
+        from .stats_utils import LatencyHistogram
+        durations, requests, errors = [], 0, 0
+        for i, tail in enumerate(self.tails):
+            for metric, value in self.points(tail.read()):
+                if metric == "http_req_duration":
+                    durations.append(value)
+                elif metric == "http_reqs":
+                    requests += 1
+                elif metric == "http_req_failed":
+                    errors += value > 0
+                else:
+                    self.vus[i] = value
+        histogram = LatencyHistogram()
+        histogram.add(durations)
+        sample = {"requests": requests or histogram.count, "errors": int(errors), "histogram": histogram,
+                  **_latency_stats(histogram)}
+        if self.vus:
+            sample["active_users"] = int(sum(self.vus.values()))
+        return sample
+
+
+class LocustHistorySource:
+    """The latest aggregated row of a Locust ``_stats_history.csv`` file."""
+
+    def __init__(self, path: Path):
+        self.tail = FileTail(path)
+        self.header: Optional[list[str]] = None
+
+    def sample(self) -> dict:
+        block = self.tail.read()
+        if not block:
+            return {}
+        rows = list(csv.reader(block.decode("utf-8", "replace").splitlines()))
+        if self.header is None:
+            self.header, rows = rows[0], rows[1:]
+        aggregated = [row for row in rows if len(row) == len(self.header) and "Aggregated" in row]
+        if not aggregated:
+            return {}
+        row = dict(zip(self.header, aggregated[-1]))
+
+        def number(name: str) -> Optional[float]:
+            try:
+                return float(row[name])
+            except (KeyError, ValueError):
+                return None
+
+        sample = {"rps": number("Requests/s"), "errors_per_s": number("Failures/s"),
+                  "p50": number("50%"), "p95": number("95%"), "p99": number("99%")}
+        if number("User Count") is not None:
+            sample["active_users"] = int(number("User Count"))
+        return sample
+
+
+class GatlingLogSource:
+    """Requests, errors, percentiles and active users from a text ``simulation.log`` as it grows."""
+
+    def __init__(self, project_dir: Path, started: float):
+        self.project_dir = Path(project_dir)
+        self.started = started
+        self.tail: Optional[FileTail] = None
+        self.active_users = 0
+
+    def sample(self) -> dict:
+        from .gatling_results import SimulationLogAggregator, find_results_dir, is_text_log
+        if self.tail is None:
+            results_dir = find_results_dir(self.project_dir, since=self.started)
+            log = results_dir / "simulation.log" if results_dir else None
+            if log is None or not log.exists() or not is_text_log(log):
+                return {}
+            self.tail = FileTail(log)
+        block = self.tail.read()
+        if not block:
+            return {"requests": 0, "errors": 0, "active_users": self.active_users}
+        self.active_users += block.count(b"\tSTART\t") - block.count(b"\tEND\t")
+        aggregator = SimulationLogAggregator()
+        aggregator.feed_block(block)
+        total = aggregator.aggregator.total()
+        return {"requests": total.histogram.count, "errors": total.errors, "histogram": total.histogram,
+                "active_users": max(0, self.active_users), **_latency_stats(total.histogram)}
+
+
+class Subscription:
+    """One subscriber's bounded queue of snapshots; ``None`` marks the end of the run."""
+
+    def __init__(self, live: "LiveMetrics", maxsize: int):
+        self.live = live
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, event: Optional[dict]) -> None:
+        # Never wait for a slow subscriber: drop its oldest snapshot instead
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self) -> None:
+        self.live.unsubscribe(self)
+
+
+class LiveMetrics:
+    """Per-second metrics of one job, fanned out to its subscribers."""
+
+    def __init__(self, job_id: str, tool: str):
+        self.job_id = job_id
+        self.tool = tool
+        self.started: Optional[float] = None
+        self.last_sample: Optional[float] = None
+        self.sources: list = []
+        self.k6_json: Optional[K6JsonSource] = None
+        self.console: dict = {}
+        self.recent: deque[dict] = deque(maxlen=REPLAY_SNAPSHOTS)
+        self.subscribers: list[Subscription] = []
+        self.end_event: Optional[dict] = None
+        # Created with the first metrics, so that jobs without result files never import numpy
+        self.rollup: Optional["TimeSeriesRollup"] = None
+
+    def on_line(self, stream_name: str, line: str) -> None:
+        """Line consumer: starts following announced result files and reads console progress."""
+        if stream_name == ARTIFACT_STREAM:
+            name, _, path = line.partition("=")
+            self._follow(name, Path(path))
+            return
+        match = (_K6_PROGRESS.search(line) if self.tool == "k6"
+                 else _JMETER_ACTIVE.search(line) if self.tool == "jmeter" else None)
+        if match:
+            self.console["active_users"] = int(match.group(1))
+
+    def _follow(self, name: str, path: Path) -> None:
+        if name == "jtl":
+            self.sources.append(JtlSource(path))
+        elif name == "json" or name.startswith("json_shard"):
+            if self.k6_json is None:
+                self.k6_json = K6JsonSource()
+                self.sources.append(self.k6_json)
+            self.k6_json.add(path)
+        elif name == "stats_history_csv":
+            self.sources.append(LocustHistorySource(path))
+        elif name == "project_dir":
+            self.sources.append(GatlingLogSource(path, self.started or time.time()))
+
+    def start(self) -> None:
+        self.started = self.last_sample = time.time()
+
+    def sample(self, now: Optional[float] = None) -> dict:
+        """Metrics since the previous sample, merged from all sources."""
+        now = time.time() if now is None else now
+        interval = max(now - (self.last_sample or now), 1e-3)
+        self.last_sample = now
+        snapshot = {"job_id": self.job_id, "tool": self.tool, "time": round(now, 3),
+                    "elapsed_s": round(now - (self.started or now), 1)}
+        merged = dict(self.console)
+        histogram = None
+        for source in self.sources:
+            try:
+                values = source.sample()
+                histogram = values.pop("histogram", None) or histogram
+                merged.update({key: value for key, value in values.items() if value is not None})
+            except Exception:
+                logger.exception(f"Live metrics source {type(source).__name__} of job {self.job_id} failed")
+        if "requests" in merged:
+            from .stats_utils import round_stat
+            requests = merged.pop("requests")
+            errors = merged.pop("errors", 0)
+            merged["rps"] = round_stat(requests / interval)
+            merged["errors_per_s"] = round_stat(errors / interval)
+            merged["error_rate"] = round_stat(100.0 * errors / requests) if requests else 0.0
+        if merged.get("rps") is not None:
+            self._roll_up(now - interval, interval, merged, histogram)
+        snapshot.update(merged)
+        return snapshot
+
+    def _roll_up(self, start: float, interval: float, metrics: dict, histogram: Optional["LatencyHistogram"]) -> None:
+        if self.rollup is None:
+            from .rollup_utils import TimeSeriesRollup
+            self.rollup = TimeSeriesRollup()
+        self.rollup.add(start, interval, metrics["rps"] * interval, (metrics.get("errors_per_s") or 0) * interval,
+                        histogram=histogram, users=metrics.get("active_users"),
+                        percentiles={p: metrics.get(f"p{p}") for p in (50, 95, 99)})
+
+    def replay(self, snapshot: dict) -> None:
+        """Publish a snapshot sampled by the worker running the job (see ``jobstore_utils``), rolling it up here too."""
+        now = snapshot["time"]
+        interval = max(now - self.last_sample, 1e-3) if self.last_sample is not None else LIVE_INTERVAL_S
+        if self.started is None:
+            self.started = now - snapshot.get("elapsed_s", 0)
+        self.last_sample = now
+        if snapshot.get("rps") is not None:
+            self._roll_up(now - interval, interval, snapshot, None)
+        self.publish(snapshot)
+
+    def publish(self, event: dict) -> None:
+        self.recent.append(event)
+        for subscription in list(self.subscribers):
+            subscription.offer(event)
+
+    def close(self, status: str) -> None:
+        """Publish the end of the run and release all subscribers."""
+        self.end_event = {"job_id": self.job_id, "tool": self.tool, "status": status, "time": round(time.time(), 3)}
+        for subscription in list(self.subscribers):
+            subscription.offer(None)
+
+    def subscribe(self, maxsize: Optional[int] = None) -> Subscription:
+        """Subscribe to the snapshots, starting with the most recent ones."""
+        maxsize = maxsize or int(os.getenv("LIVE_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+        subscription = Subscription(self, maxsize)
+        for event in self.recent:
+            subscription.offer(event)
+        if self.end_event is not None:
+            subscription.offer(None)
+        else:
+            self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+
+    async def run(self, interval: Optional[float] = None) -> None:
+        """Sample and publish every ``interval`` (default ``LIVE_INTERVAL_S``) seconds until cancelled."""
+        interval = interval or LIVE_INTERVAL_S
+        self.start()
+        while True:
+            await asyncio.sleep(interval)
+            # Reading and parsing new result rows is file IO and NumPy work; keep it off the event loop
+            self.publish(await asyncio.to_thread(self.sample))
+
+
+async def sse_events(live: LiveMetrics, keepalive: float = KEEPALIVE_S) -> AsyncIterator[str]:
+    """Server-Sent Events of a job's snapshots, ending with an ``end`` event."""
+    subscription = live.subscribe()
+    try:
+        while True:
+            try:
+                event = await subscription.get(timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                end = {**(live.end_event or {}), "dropped": subscription.dropped}
+                yield f"event: end\ndata: {json.dumps(end)}\n\n"
+                return
+            yield f"event: metrics\ndata: {json.dumps(event)}\n\n"
+    finally:
+        subscription.close()
+
+
+def live_router(jobs) -> APIRouter:
+    """FastAPI routes streaming the live metrics of the jobs of a ``JobManager``.
+
+    ``GET /live/runs`` lists queued and running jobs; ``GET /live/runs/{job_id}``
+    streams the job's snapshots as Server-Sent Events; ``GET /live/runs/{job_id}/series``
+    returns its rollups, e.g. ``?resolution=60&points=300&metrics=rps,p95`` (see
+    ``TimeSeriesRollup.query``), also once the job has finished. With several
+    workers, the jobs of the other workers are listed and streamed too.
+    """
+    router = APIRouter(prefix="/live", tags=["live"])
+
+    def live_of(job_id: str) -> LiveMetrics:
+        # Jobs of other workers are replayed from the shared job table, see JobManager.live
+        try:
+            return jobs.live(job_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+
+    @router.get("/runs")
+    async def list_live_runs() -> list:
+        runs = []
+        for status in jobs.statuses():
+            if status["status"] in ("queued", "running"):
+                live = jobs.jobs[status["job_id"]].live if status["job_id"] in jobs.jobs \
+                    else jobs.mirrors.get(status["job_id"])
+                runs.append({key: status[key] for key in ("job_id", "tool", "description", "status")}
+                            | {"subscribers": len(live.subscribers) if live is not None else 0})
+        return runs
+
+    @router.get("/runs/{job_id}")
+    async def stream_live_run(job_id: str) -> StreamingResponse:
+        return StreamingResponse(sse_events(live_of(job_id)), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @router.get("/runs/{job_id}/series")
+    async def live_run_series(job_id: str, resolution: Optional[int] = None, start: Optional[float] = None,
+                              end: Optional[float] = None, points: int = 500, metrics: Optional[str] = None) -> dict:
+        rollup = live_of(job_id).rollup
+        if rollup is None:
+            return {"job_id": job_id, "series": {}}
+        try:
+            return {"job_id": job_id, **rollup.query(resolution, start, end, points,
+                                                     metrics.split(",") if metrics else None)}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return router
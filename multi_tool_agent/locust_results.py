@@ -0,0 +1,304 @@
+"""Parsers for the CSV files Locust writes with ``--csv <prefix>``.
+
+- ``<prefix>_stats.csv``: final per-endpoint totals and percentiles.
+- ``<prefix>_failures.csv``: failure occurrences by endpoint and error.
+- ``<prefix>_stats_history.csv``: a row per reporting interval. With
+  ``--csv-full-history`` there is also a row per endpoint.
+"""
+import csv
+import io
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+from .parse_utils import gather_bytes, parse_floats, read_blocks, split_fields
+from .stats_utils import PERCENTILES, round_stat
+
+logger = logging.getLogger(__name__)
+
+# Part of the keys of cached reports: bump when the reports this module makes change
+PARSER_VERSION = 2
+
+AGGREGATED = "Aggregated"
+DEFAULT_HISTORY_POINTS = 1440
+
+
+def _number(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _read_csv(path: Union[str, Path]) -> tuple[list[str], list[list[str]]]:
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        return header, [row for row in reader if row]
+
+
+def _label(request_type: str, name: str) -> str:
+    return f"{request_type} {name}" if request_type else name
+
+
+def parse_stats_csv(stats_file: Union[str, Path]) -> dict:
+    """Per-endpoint totals from ``_stats.csv``, in the common report shape."""
+    header, rows = _read_csv(stats_file)
+    column = {name: i for i, name in enumerate(header)}
+
+    def row_stats(row: list[str]) -> dict:
+        def value(name: str) -> Optional[float]:
+            return _number(row[column[name]]) if name in column and column[name] < len(row) else None
+
+        samples = int(value("Request Count") or 0)
+        errors = int(value("Failure Count") or 0)
+        stats = {
+            "samples": samples,
+            "errors": errors,
+            "error_rate": round_stat(100.0 * errors / samples) if samples else 0.0,
+            "throughput": round_stat(value("Requests/s")),
+            "min": round_stat(value("Min Response Time")),
+            "mean": round_stat(value("Average Response Time")),
+            "max": round_stat(value("Max Response Time")),
+        }
+        for p in PERCENTILES:
+            stats[f"p{p}"] = round_stat(value(f"{p}%"))
+        return stats
+
+    report = {"total": None, "labels": {}}
+    for row in rows:
+        request_type = row[column["Type"]] if "Type" in column else ""
+        name = row[column["Name"]]
+        if name == AGGREGATED:
+            report["total"] = row_stats(row)
+        else:
+            report["labels"][_label(request_type, name)] = row_stats(row)
+    report["labels"] = dict(sorted(report["labels"].items()))
+    return report
+
+
+def parse_failures_csv(failures_file: Union[str, Path]) -> list[dict]:
+    """Failures from ``_failures.csv``, most frequent first."""
+    header, rows = _read_csv(failures_file)
+    column = {name: i for i, name in enumerate(header)}
+    failures = [{
+        "endpoint": _label(row[column["Method"]], row[column["Name"]]),
+        "error": row[column["Error"]],
+        "occurrences": int(_number(row[column["Occurrences"]]) or 0),
+    } for row in rows if len(row) == len(header)]
+    return sorted(failures, key=lambda failure: failure["occurrences"], reverse=True)
+
+
+_HISTORY_COLUMNS = ("Timestamp", "User Count", "Type", "Name", "Requests/s", "Failures/s", "95%")
+_NUMERIC_HISTORY_COLUMNS = ("Timestamp", "User Count", "Requests/s", "Failures/s", "95%")
+CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def _history_block_columns(block: bytes, header: list[str]) -> dict:
+    """The history columns of one block; Type and Name stay undecoded bytes."""
+    index = {name: header.index(name) for name in _HISTORY_COLUMNS if name in header}
+    buf = np.frombuffer(block.replace(b"\r", b""), dtype=np.uint8)
+    fields = split_fields(buf, len(header)) if b'"' not in block else None
+    if fields is not None:
+        starts, ends = fields
+        columns = {name: parse_floats(buf, starts[:, i], ends[:, i])
+                   for name, i in index.items() if name in _NUMERIC_HISTORY_COLUMNS}
+        texts = {name: gather_bytes(buf, starts[:, index[name]], ends[:, index[name]])
+                 for name in ("Type", "Name") if name in index}
+        if all(column is not None for column in (*columns.values(), *texts.values())):
+            columns.update(texts)
+            return columns
+
+    # Quoted endpoint names or ragged rows: decode this block with the csv module
+    rows = [row for row in csv.reader(io.StringIO(block.decode("utf-8", errors="replace"), newline=""))
+            if len(row) == len(header)]
+    columns = {}
+    for name, i in index.items():
+        values = np.array([row[i] for row in rows], dtype=object)
+        if name in _NUMERIC_HISTORY_COLUMNS:
+            values[(values == "N/A") | (values == "")] = "nan"
+            values = values.astype(np.float64)
+        else:
+            values = np.array([value.encode("utf-8") for value in values], dtype=bytes)
+        columns[name] = values
+    return columns
+
+
+class _BoundedTimeline:
+    """A history timeline folded in block by block, at most ``max_points`` long.
+
+    Consecutive rows are averaged into points of ``span`` rows each (users
+    keep their peak); once there are more than ``max_points`` points,
+    neighbouring points are merged and the span doubles. The peak and mean
+    throughput are kept from the rows themselves.
+    """
+
+    def __init__(self, max_points: int):
+        self.max_points = max(2, max_points)
+        self.span = 1
+        self.timestamps = np.zeros(0)
+        self.rows = np.zeros(0, dtype=np.int64)
+        # Sums and counts of the values present (not N/A) of every point
+        self.sums = {name: np.zeros(0) for name in ("rps", "failures", "p95")}
+        self.counts = {name: np.zeros(0, dtype=np.int64) for name in self.sums}
+        self.users: Optional[np.ndarray] = None
+        self.peak_rps = -np.inf
+        self.rps_total = 0.0
+        self.rps_rows = 0
+
+    def add(self, timestamps: np.ndarray, rps: np.ndarray, failures: np.ndarray, p95: np.ndarray,
+            users: Optional[np.ndarray] = None) -> None:
+        if not timestamps.size:
+            return
+        present = rps[~np.isnan(rps)]
+        if present.size:
+            self.peak_rps = max(self.peak_rps, float(present.max()))
+            self.rps_total += float(present.sum())
+            self.rps_rows += int(present.size)
+        values = {"rps": rps, "failures": failures, "p95": p95}
+        # Top up the last point, then start new points of ``span`` rows
+        fill = min(timestamps.size, self.span - int(self.rows[-1])) if self.rows.size else 0
+        if fill:
+            self.rows[-1] += fill
+            for name, column in values.items():
+                part = column[:fill]
+                self.sums[name][-1] += float(np.nansum(part))
+                self.counts[name][-1] += int(np.count_nonzero(~np.isnan(part)))
+            if users is not None and self.users is not None:
+                self.users[-1] = max(self.users[-1], float(users[:fill].max()))
+        if fill < timestamps.size:
+            edges = np.arange(fill, timestamps.size, self.span)
+            self._append(timestamps[edges], np.diff(np.append(edges, timestamps.size)),
+                         {name: np.add.reduceat(np.nan_to_num(column), edges) for name, column in values.items()},
+                         {name: np.add.reduceat((~np.isnan(column)).astype(np.int64), edges)
+                          for name, column in values.items()},
+                         np.maximum.reduceat(users, edges) if users is not None else None)
+        while self.timestamps.size > self.max_points:
+            self._halve()
+
+    def _append(self, timestamps: np.ndarray, rows: np.ndarray, sums: dict, counts: dict,
+                users: Optional[np.ndarray]) -> None:
+        self.timestamps = np.concatenate((self.timestamps, timestamps))
+        self.rows = np.concatenate((self.rows, rows))
+        for name in self.sums:
+            self.sums[name] = np.concatenate((self.sums[name], sums[name]))
+            self.counts[name] = np.concatenate((self.counts[name], counts[name]))
+        if users is not None:
+            self.users = users.astype(np.float64) if self.users is None else np.concatenate((self.users, users))
+
+    def _halve(self) -> None:
+        pairs = np.arange(0, self.timestamps.size, 2)
+        self.timestamps = self.timestamps[pairs]
+        self.rows = np.add.reduceat(self.rows, pairs)
+        for name in self.sums:
+            self.sums[name] = np.add.reduceat(self.sums[name], pairs)
+            self.counts[name] = np.add.reduceat(self.counts[name], pairs)
+        if self.users is not None:
+            self.users = np.maximum.reduceat(self.users, pairs)
+        self.span *= 2
+
+    def summary(self) -> dict:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = {name: np.where(self.counts[name] > 0, self.sums[name] / np.maximum(self.counts[name], 1), np.nan)
+                    for name in self.sums}
+        timeline = {
+            "timestamps": self.timestamps.astype(np.int64).tolist(),
+            "rps": np.round(mean["rps"], 2).tolist(),
+            "failures_per_s": np.round(mean["failures"], 2).tolist(),
+            "p95": [None if value != value else value for value in np.round(mean["p95"], 2).tolist()],
+            "peak_rps": round_stat(self.peak_rps) if self.rps_rows else None,
+            "mean_rps": round_stat(self.rps_total / self.rps_rows) if self.rps_rows else None,
+        }
+        if self.span > 1:
+            timeline["rows_per_point"] = self.span
+        if self.users is not None:
+            users = np.nan_to_num(self.users)
+            timeline["users"] = users.astype(np.int64).tolist()
+            timeline["peak_users"] = int(users.max()) if users.size else None
+        return timeline
+
+
+def parse_stats_history_csv(history_file: Union[str, Path], chunk_bytes: int = CHUNK_BYTES,
+                            max_points: Optional[int] = None) -> dict:
+    """Throughput time series from ``_stats_history.csv``.
+
+    The aggregated rows become the run timeline. Per-endpoint rows, written
+    with ``--csv-full-history``, become one timeline per endpoint.
+    Columns are located and converted in bulk with NumPy, and only the
+    distinct endpoint names are ever decoded. Each block is folded into the
+    timelines as it is read, and every timeline is kept to ``max_points``
+    points (default: ``LOCUST_HISTORY_MAX_POINTS`` or 1440) by averaging
+    neighbouring rows, so a soak test's history takes bounded memory.
+    """
+    max_points = max_points or int(os.getenv("LOCUST_HISTORY_MAX_POINTS", DEFAULT_HISTORY_POINTS))
+    timeline = _BoundedTimeline(max_points)
+    # Timelines by the undecoded (type, name) of their endpoint
+    endpoints: dict[tuple[bytes, bytes], _BoundedTimeline] = {}
+    with open(history_file, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8", errors="replace")]), [])
+        for block in read_blocks(f, chunk_bytes, balance_quotes=True):
+            columns = _history_block_columns(block, header)
+            names = columns.get("Name")
+            if names is None or not names.size:
+                continue
+            types = columns.get("Type", np.zeros(names.size, dtype="S1"))
+            timestamps, rps, failures, p95 = (columns[name]
+                                              for name in ("Timestamp", "Requests/s", "Failures/s", "95%"))
+            users = columns.get("User Count")
+
+            aggregated = names == AGGREGATED.encode()
+            timeline.add(timestamps[aggregated], rps[aggregated], failures[aggregated], p95[aggregated],
+                         np.nan_to_num(users[aggregated]) if users is not None else None)
+
+            endpoint_rows = np.flatnonzero(~aggregated)
+            if not endpoint_rows.size:
+                continue
+            # Group on (type, name) codes so only the distinct pairs are looked up
+            unique_types, type_codes = np.unique(types[endpoint_rows], return_inverse=True)
+            unique_names, name_codes = np.unique(names[endpoint_rows], return_inverse=True)
+            pairs, groups = np.unique(type_codes * unique_names.size + name_codes, return_inverse=True)
+            order = np.argsort(groups, kind="stable")
+            bounds = np.searchsorted(groups[order], np.arange(pairs.size + 1))
+            for i, pair in enumerate(pairs.tolist()):
+                key = (bytes(unique_types[pair // unique_names.size]), bytes(unique_names[pair % unique_names.size]))
+                rows_of_label = endpoint_rows[order[bounds[i]:bounds[i + 1]]]
+                endpoint = endpoints.get(key)
+                if endpoint is None:
+                    endpoint = endpoints[key] = _BoundedTimeline(max_points)
+                endpoint.add(timestamps[rows_of_label], rps[rows_of_label], failures[rows_of_label],
+                             p95[rows_of_label])
+
+    history = {"timeline": timeline.summary(), "endpoints": {}}
+    for (request_type, name), endpoint in endpoints.items():
+        label = _label(request_type.decode("utf-8", errors="replace"), name.decode("utf-8", errors="replace"))
+        history["endpoints"][label] = endpoint.summary()
+    history["endpoints"] = dict(sorted(history["endpoints"].items()))
+    return history
+
+
+def locust_csv_files(csv_prefix: Union[str, Path]) -> list[Path]:
+    """The CSV files ``parse_locust_csv`` reads for a prefix, whether or not they exist."""
+    return [Path(f"{csv_prefix}_{name}.csv") for name in ("stats", "failures", "stats_history")]
+
+
+def parse_locust_csv(csv_prefix: Union[str, Path]) -> dict:
+    """Parse every CSV file Locust wrote for ``--csv <csv_prefix>``.
+
+    Returns:
+        dict: Report with ``total``, per-endpoint ``labels``, ``failures``,
+        a run ``timeline`` and, with full history, per-endpoint ``endpoint_timelines``
+    """
+    prefix = str(csv_prefix)
+    report = parse_stats_csv(f"{prefix}_stats.csv")
+    failures_file = Path(f"{prefix}_failures.csv")
+    report["failures"] = parse_failures_csv(failures_file) if failures_file.exists() else []
+    history_file = Path(f"{prefix}_stats_history.csv")
+    if history_file.exists():
+        history = parse_stats_history_csv(history_file)
+        report["timeline"] = history["timeline"]
+        if history["endpoints"]:
+            report["endpoint_timelines"] = history["endpoints"]
+    return report
@@ -1,38 +1,105 @@
 import os
+import asyncio
 import logging
-from dotenv import load_dotenv
-import subprocess
-from typing import Any
+import socket
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Optional, Sequence
 
-load_dotenv()
+from .cache_utils import parse_fresh
+from .health_utils import GeneratorMonitor
+from .locust_results import locust_csv_files, parse_locust_csv
+from .process_utils import LineConsumer, ProcessResult, announce_artifacts, run_deadline, run_process
+from .registry_utils import resolve_binary
+from .run_utils import RunResult
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-async def run_locust_test(test_file: str, host: str = os.getenv("LOCUST_HOST", "http://localhost:8089"), 
-                    users: int = int(os.getenv("LOCUST_USERS", "100")), 
-                    spawn_rate: int = int(os.getenv("LOCUST_SPAWN_RATE", "10")), 
-                    runtime: str = os.getenv("LOCUST_RUNTIME", "30s"), 
-                    headless: bool = os.getenv("LOCUST_HEADLESS", "true").lower() == "true") -> dict:
+# How long workers get to exit on their own once the master has finished
+WORKER_EXIT_TIMEOUT = 10.0
+
+
+def locust_options(host: Optional[str] = None, users: Optional[int] = None, spawn_rate: Optional[int] = None,
+                   runtime: Optional[str] = None, headless: Optional[bool] = None) -> tuple[str, int, int, str, bool]:
+    """Fill in the options left out with their ``LOCUST_*`` environment defaults, read at call time.
+
+    Returns:
+        tuple: host, users, spawn_rate, runtime and headless
+    """
+    return (host or os.getenv("LOCUST_HOST", "http://localhost:8089"),
+            int(os.getenv("LOCUST_USERS", "100")) if users is None else users,
+            int(os.getenv("LOCUST_SPAWN_RATE", "10")) if spawn_rate is None else spawn_rate,
+            runtime or os.getenv("LOCUST_RUNTIME", "30s"),
+            os.getenv("LOCUST_HEADLESS", "true").lower() == "true" if headless is None else headless)
+
+
+async def run_locust_test(test_file: str, host: Optional[str] = None, users: Optional[int] = None,
+                          spawn_rate: Optional[int] = None, runtime: Optional[str] = None,
+                          headless: Optional[bool] = None, csv_full_history: bool = False,
+                          workers: int = 0) -> dict:
     """
     Run Locust with the given configuration.
     
     Args:
         test_file: Path to the Locust test file
-        host: Target host URL to load test
-        users: Number of concurrent users to simulate
-        spawn_rate: Rate at which users are spawned per second
-        runtime: Duration of the test (e.g., "30s", "1m", "5m")
-        headless: Whether to run in headless mode (no web UI)
+        host: Target host URL to load test (default: LOCUST_HOST)
+        users: Number of concurrent users to simulate (default: LOCUST_USERS)
+        spawn_rate: Rate at which users are spawned per second (default: LOCUST_SPAWN_RATE)
+        runtime: Duration of the test (e.g., "30s", "1m", "5m") (default: LOCUST_RUNTIME)
+        headless: Whether to run in headless mode (no web UI) (default: LOCUST_HEADLESS)
+        csv_full_history: Also record a per-endpoint stats history, not just the aggregate
+        workers: Generate load from this many worker processes under a master (default: 0, a single process)
         
     Returns:
-        dict: A dictionary containing status, output, and error information
+        dict: A dictionary containing status, output, and error information,
+        plus parsed CSV statistics under "stats" when Locust wrote them
+    """
+    result = await run_locust_result(test_file, host, users, spawn_rate, runtime, headless, csv_full_history,
+                                     workers=workers)
+    response = {
+        "status": result.status,
+        "output": result.output,
+        "error": result.error
+    }
+    if result.report is not None:
+        response["stats"] = result.report
+        response["csv_prefix"] = result.artifacts["stats_csv"][:-len("_stats.csv")]
+    return response
+
+
+async def run_locust_result(test_file: str, host: Optional[str] = None, users: Optional[int] = None,
+                            spawn_rate: Optional[int] = None, runtime: Optional[str] = None,
+                            headless: Optional[bool] = None, csv_full_history: bool = False,
+                            consumers: Optional[Sequence[LineConsumer]] = None,
+                            workers: int = 0, reset_stats: bool = False) -> RunResult:
+    """Run Locust and return its output, parsed CSV statistics and CSV files.
+
+    A single Locust process is bound to one CPU core by the GIL. With
+    ``workers``, a master coordinates that many worker processes and merges
+    their statistics. By default the workers are started as separate
+    ``--worker`` processes, like workers on other nodes would be. With
+    LOCUST_WORKER_MODE=processes, Locust forks them itself (``--processes``,
+    Locust 2.19+ on POSIX).
+
+    Args:
+        test_file: Path to the Locust test file
+        host: Target host URL to load test (default: LOCUST_HOST)
+        users: Number of concurrent users to simulate (default: LOCUST_USERS)
+        spawn_rate: Rate at which users are spawned per second (default: LOCUST_SPAWN_RATE)
+        runtime: Duration of the test (e.g., "30s", "1m", "5m") (default: LOCUST_RUNTIME)
+        headless: Whether to run in headless mode (no web UI) (default: LOCUST_HEADLESS)
+        csv_full_history: Also record a per-endpoint stats history, not just the aggregate
+        consumers: Callables invoked with (stream_name, line) for every output line
+        workers: Generate load from this many worker processes under a master (default: 0, a single process)
+        reset_stats: Reset the statistics once every user is spawned, leaving the ramp-up out of them
+
+    Returns:
+        RunResult: The structured outcome of the run
     """
-    locust_bin = os.getenv("LOCUST_BIN", "locust")
+    host, users, spawn_rate, runtime, headless = locust_options(host, users, spawn_rate, runtime, headless)
+    locust_bin = resolve_binary("locust")
     cmd = [locust_bin, "-f", test_file, "--host", host]
     
     if headless:
@@ -41,18 +108,89 @@ async def run_locust_test(test_file: str, host: str = os.getenv("LOCUST_HOST", "
         cmd.extend(["-r", str(spawn_rate)])
         cmd.extend(["-t", runtime])
 
+        # Have Locust write its statistics as CSV for structured results
+        results_dir = Path(os.getenv("LOCUST_RESULTS_DIR", tempfile.gettempdir()))
+        results_dir.mkdir(parents=True, exist_ok=True)
+        csv_prefix = results_dir / f"{Path(test_file).stem}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        cmd.extend(["--csv", str(csv_prefix)])
+        if csv_full_history:
+            cmd.extend(["--csv-full-history"])
+        if reset_stats:
+            cmd.extend(["--reset-stats"])
+    else:
+        csv_prefix = None
+
+    worker_cmds = []
+    if workers > 0:
+        if os.getenv("LOCUST_WORKER_MODE", "workers") == "processes":
+            cmd.extend(["--processes", str(workers)])
+        else:
+            port = _free_port()
+            cmd.extend(["--master", "--master-bind-port", str(port)])
+            if headless:
+                cmd.extend(["--expect-workers", str(workers)])
+            worker_cmds = [[locust_bin, "-f", test_file, "--worker", "--master-host", "127.0.0.1",
+                            "--master-port", str(port)] for _ in range(workers)]
+            if reset_stats:
+                # Locust needs the flag on the workers too to reset their share of the statistics
+                for worker_cmd in worker_cmds:
+                    worker_cmd.append("--reset-stats")
+
     logging.debug(f"Executing command: {' '.join(cmd)}")
+    if csv_prefix is not None:
+        announce_artifacts(consumers, {"stats_history_csv": f"{csv_prefix}_stats_history.csv"})
     
+    monitor = GeneratorMonitor("locust")
+    # With the web UI the run lasts until it is stopped there
+    deadline = run_deadline(runtime if headless else None)
+    if worker_cmds:
+        result = await _run_with_workers(cmd, worker_cmds, consumers, monitor, deadline)
+    else:
+        result = await run_process(cmd, consumers=consumers, monitor=monitor, deadline=deadline)
+    report = None
+    artifacts = {}
+    if csv_prefix is not None and Path(f"{csv_prefix}_stats.csv").exists():
+        report = await asyncio.to_thread(parse_fresh, parse_locust_csv, csv_prefix,
+                                         locust_csv_files(csv_prefix))
+        for name in ("stats", "failures", "stats_history"):
+            csv_file = Path(f"{csv_prefix}_{name}.csv")
+            if csv_file.exists():
+                artifacts[f"{name}_csv"] = str(csv_file)
+    # A run stopped early still has the results written so far
+    return RunResult("locust", "error" if result.returncode != 0 and not result.stopped else "success",
+                     output=result.stdout, error=result.stderr, report=report, artifacts=artifacts,
+                     health=monitor.summary())
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _run_with_workers(master_cmd: list[str], worker_cmds: list[list[str]],
+                            consumers: Optional[Sequence[LineConsumer]],
+                            monitor: Optional[GeneratorMonitor] = None,
+                            deadline: Optional[float] = None) -> ProcessResult:
+    """Run a Locust master and its local workers; the master's result is the run's result.
+
+    Workers quit when the master tells them to at the end of the test; any
+    still running shortly after the master has exited are killed.
+    """
+    worker_tasks = [asyncio.create_task(run_process(worker_cmd, monitor=monitor, deadline=deadline))
+                    for worker_cmd in worker_cmds]
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return {
-            "status": "success",
-            "output": result.stdout,
-            "error": result.stderr
-        }
-    except subprocess.CalledProcessError as e:
-        return {
-            "status": "error",
-            "output": e.stdout,
-            "error": e.stderr
-        }
\ No newline at end of file
+        result = await run_process(master_cmd, consumers=consumers, monitor=monitor, deadline=deadline)
+        done, pending = await asyncio.wait(worker_tasks, timeout=WORKER_EXIT_TIMEOUT)
+    except BaseException:
+        pending = worker_tasks
+        raise
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*worker_tasks, return_exceptions=True)
+    failed = [task.result() for task in done if not task.cancelled() and task.exception() is None
+              and task.result().returncode != 0]
+    if failed:
+        logger.warning(f"{len(failed)} Locust workers exited with an error:\n{failed[0].stderr}")
+    return result
@@ -0,0 +1,115 @@
+"""Vectorised decoding of delimited text result files.
+
+Result files from load generators are large, line-oriented and mostly
+regular. These helpers locate fields in a raw byte block with NumPy and
+decode whole columns at once, so the parsers do not create Python objects
+per row on the common path.
+"""
+from typing import BinaryIO, Iterator, Optional
+
+import numpy as np
+
+MAX_LABEL_BYTES = 512
+
+
+def read_blocks(f: BinaryIO, chunk_bytes: int, balance_quotes: bool = False) -> Iterator[bytes]:
+    """Yield blocks of about ``chunk_bytes`` that end on a line boundary.
+
+    With ``balance_quotes`` a block is only cut where its double quotes
+    balance, so a quoted multi-line CSV field never straddles two blocks.
+    """
+    pending = b""
+    while True:
+        data = f.read(chunk_bytes)
+        if not data:
+            if pending:
+                yield pending if pending.endswith(b"\n") else pending + b"\n"
+            return
+        pending += data
+        cut = pending.rfind(b"\n") + 1
+        if cut == 0 or (balance_quotes and pending.count(b'"', 0, cut) % 2):
+            continue
+        block, pending = pending[:cut], pending[cut:]
+        yield block
+
+
+def line_bounds(buf: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Start offsets and end offsets (of the newline) of every line in a block ending in a newline."""
+    line_ends = np.flatnonzero(buf == ord("\n"))
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    return line_starts, line_ends
+
+
+def split_fields(buf: np.ndarray, n_fields: int, delimiter: bytes = b",") -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """Start and end offsets, shaped (rows, fields), of every field in a block.
+
+    Returns None unless every line holds exactly ``n_fields`` fields, which
+    callers treat as "use the slow path" (quoted delimiters, ragged rows).
+    """
+    if buf.size == 0 or buf[-1] != ord("\n"):
+        return None
+    line_starts, line_ends = line_bounds(buf)
+    delimiters = np.flatnonzero(buf == ord(delimiter))
+    n_rows = line_ends.size
+    if delimiters.size != n_rows * (n_fields - 1):
+        return None
+    if n_fields == 1:
+        return line_starts[:, None], line_ends[:, None]
+    delimiters = delimiters.reshape(n_rows, n_fields - 1)
+    # Every row must own exactly its share of the delimiters
+    if (delimiters[:, 0] < line_starts).any() or (delimiters[:, -1] > line_ends).any():
+        return None
+    return np.column_stack((line_starts, delimiters + 1)), np.column_stack((delimiters, line_ends))
+
+
+def parse_digits(buf: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> Optional[np.ndarray]:
+    """Parse unsigned decimal integer fields; None if any field is not one."""
+    lengths = ends - starts
+    if lengths.size == 0 or lengths.min() < 1 or lengths.max() > 18:
+        return None
+    values = np.zeros(lengths.size, dtype=np.int64)
+    # Horner's scheme, one digit column at a time across all fields
+    for position in range(int(lengths.max())):
+        present = position < lengths
+        digits = buf[np.minimum(starts + position, buf.size - 1)].astype(np.int64) - ord("0")
+        if ((digits < 0) | (digits > 9))[present].any():
+            return None
+        values = np.where(present, values * 10 + digits, values)
+    return values.astype(np.float64)
+
+
+def gather_bytes(buf: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                 max_bytes: int = MAX_LABEL_BYTES) -> Optional[np.ndarray]:
+    """Copy variable-length fields into a fixed-width bytes array; None if any is longer than ``max_bytes``."""
+    lengths = ends - starts
+    width = int(lengths.max()) if lengths.size else 0
+    if width > max_bytes:
+        return None
+    if width == 0:
+        return np.zeros(lengths.size, dtype="S1")
+    positions = np.arange(width)
+    gathered = np.where(positions < lengths[:, None],
+                        buf[np.minimum(starts[:, None] + positions, buf.size - 1)], 0).astype(np.uint8)
+    return np.ascontiguousarray(gathered).view(f"S{width}").ravel()
+
+
+def parse_floats(buf: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                 missing: tuple[bytes, ...] = (b"", b"N/A")) -> Optional[np.ndarray]:
+    """Parse decimal fields as floats, with ``missing`` markers as NaN; None if any field is not a number."""
+    text = gather_bytes(buf, starts, ends, max_bytes=64)
+    if text is None:
+        return None
+    text = text.copy()
+    text[np.isin(text, missing)] = b"nan"
+    try:
+        return text.astype(np.float64)
+    except ValueError:
+        return None
+
+
+def starts_with(buf: np.ndarray, starts: np.ndarray, ends: np.ndarray, prefix: bytes) -> np.ndarray:
+    """Boolean mask of the lines that begin with ``prefix``."""
+    pattern = np.frombuffer(prefix, dtype=np.uint8)
+    long_enough = ends - starts >= pattern.size
+    window = buf[np.minimum(starts[:, None] + np.arange(pattern.size), buf.size - 1)]
+    return long_enough & (window == pattern).all(axis=1)
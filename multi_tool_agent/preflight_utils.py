@@ -0,0 +1,608 @@
+"""Pre-flight analysis of test plans, sizing load generators before launch.
+
+A test plan is read statically, before it runs, to estimate:
+
+* peak concurrency: the threads of the JMeter thread groups (with
+  ``${__P(name,default)}`` and user defined variables resolved), the k6
+  VUs or the Locust users;
+* request rate: concurrent users times requests per iteration over the
+  iteration time. An iteration takes an assumed response time per request
+  (``PREFLIGHT_RESPONSE_MS``, default 100) plus the think time of timers,
+  ``sleep()`` calls or ``wait_time``; throughput timers and
+  ``constant_throughput`` cap the rate;
+* memory of the load generator processes.
+
+From these the JMeter heap, the number of k6 shards or the number of Locust
+workers are picked, and a run is refused when it would saturate the host:
+more load generating processes than usable CPUs, or more memory than the
+runs may reserve (``JOB_MEMORY_BUDGET_MB``, default 80% of memory). With
+``PREFLIGHT_ENFORCE=false`` such runs only get a warning.
+
+The estimates are rough by design. What one process can generate depends on
+the script and the machine; the ``PREFLIGHT_*`` capacities below are
+conservative defaults to tune per installation.
+"""
+import ast
+import logging
+import math
+import os
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from .health_utils import memory_mb, usable_cpus
+from .run_utils import duration_seconds
+
+logger = logging.getLogger(__name__)
+
+OK = "ok"
+REFUSED = "refused"
+
+DEFAULT_RESPONSE_MS = 100.0
+MEMORY_BUDGET_SHARE = 0.8
+
+# JMeter: heap per thread on top of a base heap, and what one engine handles
+JMETER_BASE_HEAP_MB = 256
+JMETER_MIN_HEAP_MB = 512
+JMETER_NON_HEAP_MB = 256
+DEFAULT_JMETER_MB_PER_THREAD = 1.0
+DEFAULT_JMETER_MAX_THREADS = 2000
+DEFAULT_JMETER_MAX_RPS = 5000
+
+# k6: memory per VU and what one process handles
+K6_BASE_MB = 50
+DEFAULT_K6_MB_PER_VU = 2.0
+DEFAULT_K6_MAX_VUS = 5000
+DEFAULT_K6_MAX_RPS = 20000
+
+# Locust: one process is bound to one core; FastHttpUser is several times cheaper than HttpUser
+LOCUST_BASE_MB = 70
+DEFAULT_LOCUST_MB_PER_USER = 0.1
+DEFAULT_LOCUST_MAX_USERS = 1000
+DEFAULT_LOCUST_MAX_RPS = 800
+DEFAULT_LOCUST_FAST_MAX_RPS = 4000
+
+_SAMPLER_SUFFIXES = ("Sampler", "SamplerProxy")
+_TIMERS = ("ConstantTimer", "UniformRandomTimer", "GaussianRandomTimer", "PoissonRandomTimer")
+_LISTENERS_TO_AVOID = ("ViewResultsFullVisualizer", "TableVisualizer", "GraphVisualizer")
+_JMETER_PROPERTY = re.compile(r"\$\{__(P|property)\(([^()]*(?:\$\{[^{}]*\}[^()]*)*)\)\}")
+_JMETER_VARIABLE = re.compile(r"\$\{(\w+)\}")
+
+_K6_REQUEST = re.compile(r"\bhttp\.(?:get|post|put|patch|del|head|options|request|asyncRequest)\s*\(")
+_K6_BATCH = re.compile(r"\bhttp\.batch\s*\(")
+_K6_SLEEP = re.compile(r"\bsleep\s*\(\s*([^)]*)\)")
+_K6_OPTION = {name: re.compile(rf"\b{name}\s*:\s*(\d+)") for name in ("vus", "target", "maxVUs", "preAllocatedVUs")}
+
+_LOCUST_METHODS = {"get", "post", "put", "patch", "delete", "head", "options", "request", "rest"}
+
+
+@dataclass
+class Preflight:
+    """Estimated load of a test plan and the load generator settings picked for it.
+
+    Attributes:
+        tool: Load testing tool
+        script: Test plan, script or locustfile
+        peak_users: Peak concurrent threads, VUs or users
+        requests_per_s: Estimated peak request rate
+        duration_s: Run duration, when it is known
+        processes: Load generating processes on this host
+        memory_mb: Estimated memory of those processes
+        heap_mb: JMeter heap picked
+        shards: k6 processes picked
+        workers: Locust worker processes picked (0: a single process)
+        verdict: "ok" or "refused"
+        reasons: Why the run was refused
+        adjustments: Settings picked automatically
+        warnings: Things the estimate could not account for, or plan issues
+        details: Per thread group, scenario or user class figures
+    """
+    tool: str
+    script: str
+    peak_users: Optional[int] = None
+    requests_per_s: Optional[float] = None
+    duration_s: Optional[float] = None
+    processes: int = 1
+    memory_mb: Optional[int] = None
+    heap_mb: Optional[int] = None
+    shards: Optional[int] = None
+    workers: Optional[int] = None
+    verdict: str = OK
+    reasons: list[str] = field(default_factory=list)
+    adjustments: list[str] = field(default_factory=list)
+    warnings: list[str] = field(default_factory=list)
+    details: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def refused(self) -> bool:
+        return self.verdict == REFUSED
+
+    def to_dict(self) -> dict:
+        return {key: value for key, value in asdict(self).items() if value not in (None, [], {})}
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _round_rate(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 1)
+
+
+# JMeter ----------------------------------------------------------------------------------------
+
+def _children(tree: ET.Element) -> Iterator[tuple[ET.Element, ET.Element]]:
+    """The enabled (element, hashTree) pairs of a JMeter hashTree."""
+    items = list(tree)
+    for element, subtree in zip(items[0::2], items[1::2]):
+        if element.get("enabled", "true") != "false":
+            yield element, subtree
+
+
+def _prop(element: ET.Element, name: str) -> Optional[str]:
+    """Value of a property of an element or of its nested elementProps."""
+    for prop in element.iter():
+        if prop.get("name") == name:
+            return (prop.text or "").strip()
+        # doubleProp and objProp keep their name and value in child elements
+        if prop.findtext("name") == name and prop.find("value") is not None:
+            return (prop.findtext("value") or "").strip()
+    return None
+
+
+def _resolve(value: Optional[str], variables: dict[str, str], properties: dict[str, str]) -> Optional[str]:
+    """Resolve ``${__P(...)}``, ``${__property(...)}`` and ``${var}`` references, as far as they are known."""
+    if value is None:
+        return None
+
+    def prop(match: re.Match) -> str:
+        args = [arg.strip() for arg in match.group(2).split(",")]
+        default = args[1] if match.group(1) == "P" and len(args) > 1 else args[2] if len(args) > 2 else ""
+        return properties.get(args[0], default)
+
+    for _ in range(5):
+        resolved = _JMETER_VARIABLE.sub(lambda m: variables.get(m.group(1), m.group(0)),
+                                        _JMETER_PROPERTY.sub(prop, value))
+        if resolved == value:
+            break
+        value = resolved
+    return value
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def _user_variables(test_plan: ET.Element, tree: ET.Element) -> dict[str, str]:
+    variables = {}
+    arguments = [test_plan] + [element for element, _ in _children(tree) if element.tag == "Arguments"]
+    for element in arguments:
+        for argument in element.iter("elementProp"):
+            if argument.get("elementType") == "Argument":
+                name, value = _prop(argument, "Argument.name"), _prop(argument, "Argument.value")
+                if name:
+                    variables[name] = value or ""
+    return variables
+
+
+def _timer_ms(element: ET.Element, resolve) -> float:
+    delay = _number(resolve(_prop(element, "ConstantTimer.delay"))) or 0.0
+    if element.tag in ("UniformRandomTimer", "PoissonRandomTimer"):
+        delay += (_number(resolve(_prop(element, "RandomTimer.range"))) or 0.0) / (
+            2 if element.tag == "UniformRandomTimer" else 1)
+    return delay
+
+
+def _iteration(tree: ET.Element, resolve) -> dict:
+    """Requests, think time and throughput limits of one pass through a hashTree."""
+    requests, think_ms, timers_ms = 0.0, 0.0, 0.0
+    per_thread_limit, group_limit = None, None
+    for element, subtree in _children(tree):
+        tag = element.tag
+        if tag.endswith(_SAMPLER_SUFFIXES):
+            requests += 1
+            own = _iteration(subtree, resolve)
+            think_ms += own["timers_ms"]
+        elif tag in _TIMERS:
+            timers_ms += _timer_ms(element, resolve)
+        elif tag == "ConstantThroughputTimer":
+            per_minute = _number(resolve(_prop(element, "throughput")))
+            if per_minute:
+                # calcMode 0 paces each thread; the other modes share the rate between threads
+                if (_number(_prop(element, "calcMode")) or 0) == 0:
+                    per_thread_limit = per_minute / 60
+                else:
+                    group_limit = per_minute / 60
+        elif not tag.endswith(("Visualizer", "ResultCollector", "ConfigTestElement")):
+            inner = _iteration(subtree, resolve)
+            loops = _number(resolve(_prop(element, "LoopController.loops"))) if tag == "LoopController" else None
+            repeat = loops if loops and loops > 0 else 1
+            requests += inner["requests"] * repeat
+            think_ms += inner["think_ms"] * repeat
+            per_thread_limit = per_thread_limit or inner["per_thread_limit"]
+            group_limit = group_limit or inner["group_limit"]
+    # A timer delays every sampler in its scope
+    think_ms += timers_ms * requests
+    return {"requests": requests, "think_ms": think_ms, "timers_ms": timers_ms,
+            "per_thread_limit": per_thread_limit, "group_limit": group_limit}
+
+
+def _thread_group(element: ET.Element, subtree: ET.Element, resolve, response_ms: float) -> dict:
+    tag = element.tag
+    group = {"name": element.get("testname", tag), "type": tag.rsplit(".", 1)[-1]}
+    if tag.endswith("ConcurrencyThreadGroup"):
+        # Concurrency Thread Group plugin: TargetLevel threads, held for Hold seconds (or minutes)
+        threads = _number(resolve(_prop(element, "TargetLevel")))
+        unit = 60 if (_prop(element, "Unit") or "S").upper() == "M" else 1
+        ramp, hold = (_number(resolve(_prop(element, name))) for name in ("RampUp", "Hold"))
+        duration = (ramp or 0) * unit + hold * unit if hold is not None else None
+    elif tag in ("ThreadGroup", "SetupThreadGroup", "PostThreadGroup"):
+        threads = _number(resolve(_prop(element, "ThreadGroup.num_threads")))
+        ramp = _number(resolve(_prop(element, "ThreadGroup.ramp_time")))
+        duration = None
+        if (_prop(element, "ThreadGroup.scheduler") or "").lower() == "true":
+            duration = _number(resolve(_prop(element, "ThreadGroup.duration")))
+        loops = _number(resolve(_prop(element, "LoopController.loops")))
+        group["loops"] = None if loops is None or loops < 0 else int(loops)
+    else:
+        group["unsupported"] = True
+        return group
+    group.update(threads=None if threads is None else int(threads), ramp_up_s=ramp, duration_s=duration)
+    iteration = _iteration(subtree, resolve)
+    group["requests_per_iteration"] = iteration["requests"]
+    if threads is None or not iteration["requests"]:
+        return group
+    iteration_ms = iteration["requests"] * response_ms + iteration["think_ms"]
+    per_thread = iteration["requests"] * 1000 / iteration_ms
+    if iteration["per_thread_limit"]:
+        per_thread = min(per_thread, iteration["per_thread_limit"])
+    rate = per_thread * threads
+    if iteration["group_limit"]:
+        rate = min(rate, iteration["group_limit"])
+    group["requests_per_s"] = rate
+    if duration is None and group.get("loops"):
+        group["duration_s"] = (ramp or 0) + group["loops"] * iteration_ms / 1000
+    return group
+
+
+def analyze_jmx(path: Path, properties: Optional[dict[str, str]] = None,
+                response_ms: float = DEFAULT_RESPONSE_MS) -> dict:
+    """Thread groups, peak threads and request rate of a JMeter test plan.
+
+    Args:
+        path: The .jmx file
+        properties: JMeter properties (``-J``) the plan is run with
+        response_ms: Assumed response time per request
+
+    Returns:
+        dict: peak_users, requests_per_s, duration_s, thread_groups and warnings
+    """
+    root = ET.parse(path).getroot()
+    plan_tree = root.find("hashTree")
+    pairs = list(_children(plan_tree)) if plan_tree is not None else []
+    if not pairs or pairs[0][0].tag != "TestPlan":
+        raise ValueError(f"Not a JMeter test plan: {path}")
+    test_plan, tree = pairs[0]
+    variables = _user_variables(test_plan, tree)
+    resolve = lambda value: _resolve(value, variables, properties or {})  # noqa: E731
+    serialized = (_prop(test_plan, "TestPlan.serialize_threadgroups") or "").lower() == "true"
+
+    groups, warnings = [], []
+    for element, subtree in _children(tree):
+        if element.tag.endswith("ThreadGroup"):
+            group = _thread_group(element, subtree, resolve, response_ms)
+            if group.pop("unsupported", False):
+                warnings.append(f"Thread group '{group['name']}' ({group['type']}) is not analysed")
+            elif group.get("threads") is None:
+                warnings.append(f"Thread count of '{group['name']}' is not known before the run")
+            groups.append(group)
+    for listener in root.iter("ResultCollector"):
+        if listener.get("enabled", "true") != "false" and listener.get("guiclass") in _LISTENERS_TO_AVOID:
+            warnings.append(f"Listener '{listener.get('testname')}' is enabled: it costs memory and CPU "
+                            f"during a load test; results are written to the JTL anyway")
+
+    # Setup and tear-down groups run before and after the others
+    main = [group for group in groups if group["type"] not in ("SetupThreadGroup", "PostThreadGroup")
+            and group.get("threads") is not None]
+    others = [group for group in groups if group not in main and group.get("threads") is not None]
+    combine = max if serialized else sum
+    peaks = [group["threads"] for group in others]
+    if main:
+        peaks.append(combine(group["threads"] for group in main))
+    peak = max(peaks, default=0)
+    rates = [group["requests_per_s"] for group in main if "requests_per_s" in group]
+    durations = [group["duration_s"] for group in main if group.get("duration_s") is not None]
+    return {"peak_users": peak or None, "requests_per_s": combine(rates) if rates else None,
+            "duration_s": (sum(durations) if serialized else max(durations)) if durations else None,
+            "thread_groups": groups, "warnings": warnings}
+
+
+# k6 ----------------------------------------------------------------------------------------
+
+def analyze_k6_script(path: Path, vus: Optional[int] = None, response_ms: float = DEFAULT_RESPONSE_MS) -> dict:
+    """Requests per iteration, think time and request rate of a k6 script.
+
+    The runner passes ``-u`` and ``-d`` to k6, which take the place of the
+    script's own ``vus``, ``stages`` and ``scenarios``; those are reported
+    in the details only.
+
+    Args:
+        path: The .js script
+        vus: Virtual users the script is run with
+        response_ms: Assumed response time per request
+
+    Returns:
+        dict: peak_users, requests_per_s, requests_per_iteration, sleep_s, script_vus and warnings
+    """
+    source = path.read_text(encoding="utf-8", errors="replace")
+    # Comments do not make requests
+    source = re.sub(r"/\*.*?\*/|//[^\n]*", "", source, flags=re.DOTALL)
+    warnings = []
+    requests = len(_K6_REQUEST.findall(source)) + len(_K6_BATCH.findall(source))
+    if _K6_BATCH.search(source):
+        warnings.append("http.batch() calls are counted as one request each")
+    sleep_s = 0.0
+    for argument in _K6_SLEEP.findall(source):
+        value = _number(argument.strip())
+        if value is None:
+            warnings.append(f"sleep({argument.strip()}) is not a constant and is not counted")
+        else:
+            sleep_s += value
+    script_vus = max((int(value) for pattern in _K6_OPTION.values() for value in pattern.findall(source)),
+                     default=None)
+    result = {"peak_users": vus or script_vus, "requests_per_iteration": requests, "sleep_s": sleep_s,
+              "script_vus": script_vus, "warnings": warnings}
+    if not requests:
+        warnings.append("No http requests found in the script; imported modules are not analysed")
+        return {**result, "requests_per_s": None}
+    iteration_s = requests * response_ms / 1000 + sleep_s
+    result["requests_per_s"] = (vus or script_vus or 1) * requests / iteration_s
+    return result
+
+
+# Locust ------------------------------------------------------------------------------------
+
+def _call_name(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Call):
+        func = node.func
+        return func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else None
+    return None
+
+
+def _constant_args(call: ast.Call) -> list[Optional[float]]:
+    return [arg.value if isinstance(arg, ast.Constant) and isinstance(arg.value, (int, float)) else None
+            for arg in call.args]
+
+
+def _client_requests(function: ast.AST) -> int:
+    """Calls of ``self.client.<method>(...)`` in a task."""
+    count = 0
+    for node in ast.walk(function):
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in _LOCUST_METHODS
+                and isinstance(node.func.value, ast.Attribute) and node.func.value.attr == "client"):
+            count += 1
+    return count
+
+
+def _user_class(node: ast.ClassDef, response_ms: float) -> dict:
+    user = {"name": node.name, "fast_http": any(getattr(base, "id", getattr(base, "attr", "")) == "FastHttpUser"
+                                                for base in node.bases),
+            "weight": 1}
+    tasks = []
+    wait = None
+    for item in node.body:
+        if isinstance(item, ast.Assign) and any(getattr(target, "id", None) == "wait_time" for target in item.targets):
+            wait = item.value
+        elif isinstance(item, ast.Assign) and any(getattr(target, "id", None) in ("weight", "fixed_count")
+                                                  for target in item.targets):
+            if isinstance(item.value, ast.Constant) and getattr(item.targets[0], "id", None) == "weight":
+                user["weight"] = item.value.value
+        elif isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for decorator in item.decorator_list:
+                name = getattr(decorator, "id", None) or _call_name(decorator)
+                if name == "task":
+                    weight = _constant_args(decorator)[0] if isinstance(decorator, ast.Call) and decorator.args else 1
+                    tasks.append((weight or 1, _client_requests(item)))
+    if tasks:
+        total_weight = sum(weight for weight, _ in tasks)
+        user["requests_per_task"] = sum(weight * requests for weight, requests in tasks) / total_weight
+    else:
+        user["requests_per_task"] = None
+    task_s = (user["requests_per_task"] or 0) * response_ms / 1000
+    kind, args = _call_name(wait), _constant_args(wait) if isinstance(wait, ast.Call) else []
+    if kind == "between" and len(args) == 2 and None not in args:
+        interval = task_s + (args[0] + args[1]) / 2
+    elif kind == "constant" and args and args[0] is not None:
+        interval = task_s + args[0]
+    elif kind == "constant_pacing" and args and args[0] is not None:
+        interval = max(args[0], task_s)
+    elif kind == "constant_throughput" and args and args[0]:
+        interval = max(1 / args[0], task_s)
+    elif wait is None:
+        interval = task_s
+    else:
+        interval = None
+    user["wait_time"] = kind
+    if user["requests_per_task"] and interval:
+        user["requests_per_s_per_user"] = user["requests_per_task"] / interval
+    return user
+
+
+def analyze_locustfile(path: Path, users: Optional[int] = None, response_ms: float = DEFAULT_RESPONSE_MS) -> dict:
+    """User classes, their wait times and the request rate of a locustfile.
+
+    Args:
+        path: The locustfile
+        users: Users the test is run with
+        response_ms: Assumed response time per request
+
+    Returns:
+        dict: peak_users, requests_per_s, fast_http, user_classes and warnings
+    """
+    module = ast.parse(path.read_text(encoding="utf-8", errors="replace"), filename=str(path))
+    classes = [node for node in module.body if isinstance(node, ast.ClassDef)]
+    warnings = []
+    if any(getattr(base, "id", getattr(base, "attr", "")) == "LoadTestShape" for node in classes for base in node.bases):
+        warnings.append("A LoadTestShape controls the user count; its peak is not analysed")
+    user_classes = [_user_class(node, response_ms) for node in classes
+                    if any(getattr(base, "id", getattr(base, "attr", "")).endswith("User") for base in node.bases)]
+    result = {"peak_users": users, "user_classes": user_classes, "warnings": warnings,
+              "fast_http": bool(user_classes) and all(user["fast_http"] for user in user_classes)}
+    rated = [user for user in user_classes if "requests_per_s_per_user" in user]
+    if not rated:
+        warnings.append("No tasks making requests through self.client were found")
+        return {**result, "requests_per_s": None}
+    if len(rated) < len(user_classes):
+        warnings.append("Some user classes have a wait time or tasks that are not analysed")
+    total_weight = sum(user["weight"] for user in rated)
+    per_user = sum(user["weight"] * user["requests_per_s_per_user"] for user in rated) / total_weight
+    result["requests_per_s"] = per_user * (users or 1)
+    return result
+
+
+# Sizing ------------------------------------------------------------------------------------
+
+def _memory_budget_mb() -> Optional[int]:
+    value = os.getenv("JOB_MEMORY_BUDGET_MB")
+    if value:
+        return int(value)
+    total, _ = memory_mb()
+    return int(total * MEMORY_BUDGET_SHARE) if total else None
+
+
+def _check_host(plan: Preflight, split_advice: str) -> None:
+    """Refuse a plan that needs more processes or memory than the host has."""
+    cpus = usable_cpus()
+    if plan.processes > cpus:
+        plan.reasons.append(f"needs {plan.processes} load generator processes but the host has {cpus} usable "
+                            f"CPUs; {split_advice}")
+    budget = _memory_budget_mb()
+    if plan.memory_mb and budget and plan.memory_mb > budget:
+        plan.reasons.append(f"needs about {plan.memory_mb} MiB memory but at most {budget} MiB may be reserved "
+                            f"for load tests; {split_advice}")
+    if plan.reasons:
+        if os.getenv("PREFLIGHT_ENFORCE", "true").lower() == "true":
+            plan.verdict = REFUSED
+        else:
+            plan.warnings.extend(plan.reasons)
+            plan.reasons = []
+
+
+def _size_jmeter(plan: Preflight, remote_hosts: int) -> None:
+    threads = plan.peak_users or 0
+    max_threads = _env_float("PREFLIGHT_JMETER_MAX_THREADS", DEFAULT_JMETER_MAX_THREADS)
+    max_rps = _env_float("PREFLIGHT_JMETER_MAX_RPS", DEFAULT_JMETER_MAX_RPS)
+    if remote_hosts:
+        # Every engine runs the whole plan; this JMeter only collects their results
+        plan.requests_per_s = _round_rate(plan.requests_per_s * remote_hosts) if plan.requests_per_s else None
+        if threads > max_threads:
+            plan.warnings.append(f"{threads} threads per engine is more than the {int(max_threads)} "
+                                 f"an engine usually sustains")
+        return
+    heap = JMETER_BASE_HEAP_MB + threads * _env_float("PREFLIGHT_JMETER_MB_PER_THREAD", DEFAULT_JMETER_MB_PER_THREAD)
+    plan.heap_mb = max(JMETER_MIN_HEAP_MB, int(math.ceil(heap / 256) * 256))
+    plan.memory_mb = plan.heap_mb + JMETER_NON_HEAP_MB
+    plan.adjustments.append(f"JMeter heap set to {plan.heap_mb} MiB for {threads} threads")
+    engines = max(math.ceil(threads / max_threads),
+                  math.ceil((plan.requests_per_s or 0) / max_rps), 1)
+    if engines > 1:
+        plan.reasons.append(f"{threads} threads at about {plan.requests_per_s:.0f} requests/s need about "
+                            f"{engines} JMeter engines; run it on remote engines (remote_hosts)")
+    _check_host(plan, "run it on remote JMeter engines (remote_hosts) or lower the load")
+
+
+def _size_k6(plan: Preflight, shards: Optional[int]) -> None:
+    vus = plan.peak_users or 0
+    needed = max(math.ceil(vus / _env_float("PREFLIGHT_K6_MAX_VUS", DEFAULT_K6_MAX_VUS)),
+                 math.ceil((plan.requests_per_s or 0) / _env_float("PREFLIGHT_K6_MAX_RPS", DEFAULT_K6_MAX_RPS)), 1)
+    if shards is None:
+        shards = needed
+        if shards > 1:
+            plan.adjustments.append(f"Split into {shards} k6 shards for {vus} VUs at about "
+                                    f"{plan.requests_per_s:.0f} requests/s")
+    elif shards < needed:
+        plan.warnings.append(f"{shards} k6 processes may not generate the load; about {needed} are needed")
+    plan.shards = plan.processes = shards
+    per_vu = _env_float("PREFLIGHT_K6_MB_PER_VU", DEFAULT_K6_MB_PER_VU)
+    plan.memory_mb = int(shards * K6_BASE_MB + vus * per_vu)
+    _check_host(plan, "run it from several machines or lower the load")
+
+
+def _size_locust(plan: Preflight, workers: Optional[int], fast_http: bool) -> None:
+    users = plan.peak_users or 0
+    max_rps = (_env_float("PREFLIGHT_LOCUST_FAST_MAX_RPS", DEFAULT_LOCUST_FAST_MAX_RPS) if fast_http
+               else _env_float("PREFLIGHT_LOCUST_MAX_RPS", DEFAULT_LOCUST_MAX_RPS))
+    needed = max(math.ceil(users / _env_float("PREFLIGHT_LOCUST_MAX_USERS", DEFAULT_LOCUST_MAX_USERS)),
+                 math.ceil((plan.requests_per_s or 0) / max_rps), 1)
+    if workers is None:
+        workers = needed if needed > 1 else 0
+        if workers:
+            plan.adjustments.append(f"Split over {workers} Locust workers for {users} users at about "
+                                    f"{plan.requests_per_s:.0f} requests/s")
+    elif max(workers, 1) < needed:
+        plan.warnings.append(f"{max(workers, 1)} Locust processes may not generate the load; about {needed} "
+                             f"are needed (one process uses one CPU core)")
+    plan.workers = workers
+    plan.processes = max(workers, 1)
+    per_user = _env_float("PREFLIGHT_LOCUST_MB_PER_USER", DEFAULT_LOCUST_MB_PER_USER)
+    # The master of a distributed run is a process of its own
+    plan.memory_mb = int((plan.processes + (1 if workers else 0)) * LOCUST_BASE_MB + users * per_user)
+    _check_host(plan, "run workers on other machines or lower the load")
+
+
+def preflight(tool: str, script: str, users: Optional[int] = None, duration: Optional[str] = None,
+              shards: Optional[int] = None, workers: Optional[int] = None,
+              remote_hosts: int = 0, properties: Optional[dict[str, str]] = None) -> Preflight:
+    """Analyse a test plan and size its load generators before it runs.
+
+    Args:
+        tool: jmeter, k6 or locust
+        script: Path to the .jmx plan, k6 script or locustfile
+        users: VUs or users the test is run with (k6 and Locust)
+        duration: Duration the test is run with, e.g. "5m"
+        shards: k6 processes asked for; picked from the estimate when None
+        workers: Locust workers asked for; picked from the estimate when None
+        remote_hosts: Number of remote JMeter engines running the plan
+        properties: JMeter properties (``-J``) the plan is run with
+
+    Returns:
+        Preflight: The estimate, the settings picked and the verdict
+
+    Raises:
+        ValueError: If the tool is not supported or the plan cannot be read
+    """
+    path = Path(script)
+    if not path.is_file():
+        raise ValueError(f"Test file not found: {script}")
+    response_ms = _env_float("PREFLIGHT_RESPONSE_MS", DEFAULT_RESPONSE_MS)
+    try:
+        if tool == "jmeter":
+            analysis = analyze_jmx(path, properties, response_ms)
+        elif tool == "k6":
+            analysis = analyze_k6_script(path, users, response_ms)
+        elif tool == "locust":
+            analysis = analyze_locustfile(path, users, response_ms)
+        else:
+            raise ValueError(f"No pre-flight analysis for {tool}")
+    except (ET.ParseError, SyntaxError) as e:
+        raise ValueError(f"Cannot read {script}: {e}") from e
+
+    plan = Preflight(tool, str(path), peak_users=analysis.pop("peak_users"),
+                     requests_per_s=_round_rate(analysis.pop("requests_per_s")),
+                     duration_s=analysis.pop("duration_s", None) or duration_seconds(duration),
+                     warnings=analysis.pop("warnings"), details=analysis)
+    if tool == "jmeter":
+        _size_jmeter(plan, remote_hosts)
+    elif tool == "k6":
+        _size_k6(plan, shards)
+    else:
+        _size_locust(plan, workers, analysis["fast_http"])
+    logger.info(f"Pre-flight of {script}: {plan.peak_users} users, {plan.requests_per_s} requests/s, "
+                f"{plan.processes} processes, {plan.memory_mb} MiB: {plan.verdict}")
+    return plan
@@ -0,0 +1,439 @@
+import asyncio
+import atexit
+import logging
+import os
+import signal
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Mapping, Optional, Sequence
+
+from .run_utils import duration_seconds
+
+if TYPE_CHECKING:
+    from .health_utils import GeneratorMonitor
+
+logger = logging.getLogger(__name__)
+
+# A consumer receives every output line as it is read: consumer(stream_name, line)
+LineConsumer = Callable[[str, str], None]
+
+# Pseudo stream on which runners announce the result files of a run before it starts,
+# one "name=path" line per file, so consumers can follow them while they are written
+ARTIFACT_STREAM = "artifact"
+
+_READ_CHUNK_SIZE = 64 * 1024
+# Seconds the output pumps get to drain once the process group is gone
+_DRAIN_TIMEOUT_S = 5.0
+
+# Every runner process leads its own process group, so the JVMs and workers a wrapper
+# script starts can be signalled together; a group exits with its last member
+_POSIX = os.name == "posix"
+_PROC = Path("/proc")
+
+# Process groups of the runners still running, killed when the agent exits
+_live_groups: set[int] = set()
+# Process groups asked to stop early by ``stop_groups``
+_stopping: set[int] = set()
+# Process groups started by the current job, so it can stop them (see ``job_utils``)
+run_groups: ContextVar[Optional[set[int]]] = ContextVar("run_groups", default=None)
+# Detached processes, such as the JMeter GUI, kept until they are reaped
+_detached: set[asyncio.Task] = set()
+
+
+class OutputBuffer:
+    """Bounded capture of a process stream: the first and last lines only.
+
+    Lines between the head and the tail are counted but not kept, so memory
+    stays flat however long the process runs.
+    """
+
+    def __init__(self, head_lines: int = 200, tail_lines: int = 1000, max_line_length: int = 4096):
+        self.head_lines = head_lines
+        self.max_line_length = max_line_length
+        self.head: list[str] = []
+        self.tail: deque[str] = deque(maxlen=tail_lines)
+        self.total_lines = 0
+
+    def append(self, line: str) -> None:
+        if len(line) > self.max_line_length:
+            line = line[:self.max_line_length] + " ...[truncated]"
+        self.total_lines += 1
+        if len(self.head) < self.head_lines:
+            self.head.append(line)
+        else:
+            self.tail.append(line)
+
+    @property
+    def omitted_lines(self) -> int:
+        return self.total_lines - len(self.head) - len(self.tail)
+
+    def text(self) -> str:
+        lines = list(self.head)
+        if self.omitted_lines:
+            lines.append(f"... [{self.omitted_lines} lines omitted] ...")
+        lines.extend(self.tail)
+        return "".join(f"{line}\n" for line in lines)
+
+
+@dataclass
+class ProcessResult:
+    """Outcome of a finished runner process."""
+
+    returncode: int
+    stdout: str
+    stderr: str
+    timed_out: bool = False
+    stopped: bool = False
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def run_deadline(duration: Any = None) -> Optional[float]:
+    """The hard deadline of a runner process, in seconds from its start.
+
+    A run of known duration gets RUNNER_DEADLINE_SLACK_S seconds (default 300)
+    on top of it for JVM start-up, ramp-down and writing results. One of
+    unknown duration, such as a Gatling build and simulation, gets
+    RUNNER_MAX_RUNTIME_S (default 21600, 0 for none).
+
+    Args:
+        duration: Requested duration of the run, e.g. ``"5m"`` or seconds
+
+    Returns:
+        Optional[float]: Seconds the process may run before it is stopped, or None for no deadline
+    """
+    seconds = duration_seconds(duration)
+    if seconds is not None:
+        return seconds + _env_float("RUNNER_DEADLINE_SLACK_S", 300)
+    max_runtime = _env_float("RUNNER_MAX_RUNTIME_S", 21600)
+    return max_runtime if max_runtime > 0 else None
+
+
+def _dispatch(consumers: Iterable[LineConsumer], stream_name: str, line: str) -> None:
+    for consumer in consumers:
+        try:
+            consumer(stream_name, line)
+        except Exception:
+            # A broken parser must never take the test run down with it
+            logger.exception(f"Output consumer {consumer!r} failed on {stream_name} line")
+
+
+def announce_artifacts(consumers: Optional[Iterable[LineConsumer]], artifacts: Mapping[str, object]) -> None:
+    """Tell the consumers where the run is about to write its result files."""
+    for name, path in artifacts.items():
+        _dispatch(consumers or (), ARTIFACT_STREAM, f"{name}={path}")
+
+
+async def _pump(stream: asyncio.StreamReader, stream_name: str, buffer: OutputBuffer,
+                consumers: Sequence[LineConsumer]) -> None:
+    """Read a stream in chunks and hand it on line by line."""
+    pending = b""
+    while True:
+        chunk = await stream.read(_READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        # Guard against a producer that never emits a newline
+        if len(pending) > buffer.max_line_length * 4:
+            lines.append(pending)
+            pending = b""
+        for raw in lines:
+            line = raw.decode(errors="replace").rstrip("\r")
+            buffer.append(line)
+            _dispatch(consumers, stream_name, line)
+    if pending:
+        line = pending.decode(errors="replace").rstrip("\r")
+        buffer.append(line)
+        _dispatch(consumers, stream_name, line)
+
+
+def _group_members(pgid: int) -> set[int]:
+    """Live processes of a process group, zombies left out."""
+    from .health_utils import read_stat
+
+    members = set()
+    try:
+        entries = os.listdir(_PROC)
+    except OSError:
+        return members
+    for entry in entries:
+        if entry.isdigit():
+            stat = read_stat(_PROC / entry / "stat")
+            if stat is not None and stat[1][0] != "Z" and int(stat[1][2]) == pgid:
+                members.add(int(entry))
+    return members
+
+
+def _signal(pgid: int, pids: Iterable[int], sig: int) -> None:
+    try:
+        os.killpg(pgid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+    for pid in pids:
+        try:
+            os.kill(pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def _alive(pgid: int, pids: Iterable[int]) -> set[int]:
+    from .health_utils import read_stat
+
+    alive = _group_members(pgid)
+    for pid in pids:
+        stat = read_stat(_PROC / str(pid) / "stat")
+        if stat is not None and stat[1][0] != "Z":
+            alive.add(pid)
+    return alive
+
+
+async def _exited(process: asyncio.subprocess.Process) -> int:
+    """Wait for the process itself to exit.
+
+    Unlike ``Process.wait``, this does not wait for its pipes to close, which
+    a descendant that inherited them can keep open long after.
+    """
+    while process.returncode is None:
+        await asyncio.sleep(0.1)
+    return process.returncode
+
+
+async def stop_process_tree(process: asyncio.subprocess.Process, grace: Optional[float] = None) -> int:
+    """Stop a runner process, its process group and any descendants that left the group.
+
+    The processes get SIGTERM first, so load generators can stop their
+    virtual users and write their results, and SIGKILL once they are still
+    running after the grace period (default: RUNNER_STOP_GRACE_S, 10 seconds).
+    Also reaps the members a group leader that already exited left behind.
+
+    Args:
+        process: A process started by ``run_process``
+        grace: Seconds between SIGTERM and SIGKILL
+
+    Returns:
+        int: Number of processes that were still running
+    """
+    grace = _env_float("RUNNER_STOP_GRACE_S", 10) if grace is None else grace
+    if not _POSIX:
+        if process.returncode is None:
+            process.terminate()
+            try:
+                await asyncio.wait_for(_exited(process), grace)
+            except asyncio.TimeoutError:
+                process.kill()
+                await _exited(process)
+            return 1
+        return 0
+    from .health_utils import process_trees
+
+    # Descendants that started a session of their own are no longer in the group;
+    # the scans of /proc run off the event loop
+    escaped = set()
+    if process.returncode is None:
+        escaped = await asyncio.to_thread(process_trees, [process.pid]) - {process.pid}
+    stopping = await asyncio.to_thread(_alive, process.pid, escaped)
+    if process.returncode is None:
+        stopping.add(process.pid)
+    if not stopping:
+        return 0
+    _signal(process.pid, escaped, signal.SIGTERM)
+    deadline = time.monotonic() + grace
+    while time.monotonic() < deadline:
+        if process.returncode is not None and not await asyncio.to_thread(_alive, process.pid, escaped):
+            break
+        await asyncio.sleep(0.1)
+    else:
+        logger.warning(f"Killing process group {process.pid}, still running {grace:.0f}s after SIGTERM")
+        _signal(process.pid, escaped, signal.SIGKILL)
+    await _exited(process)
+    return len(stopping)
+
+
+async def run_process(cmd: Sequence[str], env: Optional[Mapping[str, str]] = None,
+                      cwd: Optional[str] = None,
+                      consumers: Optional[Sequence[LineConsumer]] = None,
+                      monitor: Optional["GeneratorMonitor"] = None,
+                      deadline: Optional[float] = None) -> ProcessResult:
+    """Run a command as an asyncio subprocess without blocking the event loop.
+
+    Output is streamed line by line to the consumers. Only a bounded head and
+    tail of each stream is retained for the result, sized by the
+    RUNNER_OUTPUT_HEAD_LINES and RUNNER_OUTPUT_TAIL_LINES environment variables.
+
+    The command leads a process group of its own. When it outlives its
+    deadline, or the caller is cancelled, the whole group is stopped with
+    ``stop_process_tree``; processes it leaves behind when it exits are
+    stopped too. The run ends when the command exits, not when its output
+    pipes close, so a leftover child holding them cannot keep it going.
+
+    Args:
+        cmd: Command and arguments to execute
+        env: Environment for the child process (default: inherit)
+        cwd: Working directory for the child process (default: current)
+        consumers: Callables invoked with (stream_name, line) for every output line
+        monitor: Samples the health of the process tree while it runs
+        deadline: Seconds the process may run before it is stopped (default: no deadline), see ``run_deadline``
+
+    Returns:
+        ProcessResult: Return code and the retained stdout/stderr of the process
+    """
+    logger.debug(f"Executing command: {' '.join(cmd)}")
+    consumers = list(consumers or [])
+    head_lines = _env_int("RUNNER_OUTPUT_HEAD_LINES", 200)
+    tail_lines = _env_int("RUNNER_OUTPUT_TAIL_LINES", 1000)
+    stdout_buffer = OutputBuffer(head_lines, tail_lines)
+    stderr_buffer = OutputBuffer(head_lines, tail_lines)
+
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=dict(env) if env is not None else None,
+        cwd=cwd,
+        start_new_session=_POSIX,
+    )
+    _live_groups.add(process.pid)
+    groups = run_groups.get()
+    if groups is not None:
+        groups.add(process.pid)
+    if monitor is not None:
+        monitor.watch(process.pid)
+    pumps = [
+        asyncio.create_task(_pump(process.stdout, "stdout", stdout_buffer, consumers)),
+        asyncio.create_task(_pump(process.stderr, "stderr", stderr_buffer, consumers)),
+    ]
+    timed_out = False
+    try:
+        try:
+            await asyncio.wait_for(_exited(process), deadline)
+        except asyncio.TimeoutError:
+            timed_out = True
+            logger.warning(f"Stopping {cmd[0]} (pid {process.pid}), still running after its deadline of {deadline:g}s")
+            await stop_process_tree(process)
+            stderr_buffer.append(f"Stopped after exceeding the deadline of {deadline:g}s")
+        # A wrapper script may exit before the JVM or workers it started
+        orphans = await stop_process_tree(process)
+        if orphans and not timed_out:
+            logger.warning(f"Stopped {orphans} processes {cmd[0]} left running after it exited")
+        # Read what is left in the pipes; a descendant that escaped the group may still hold them
+        _, pending = await asyncio.wait(pumps, timeout=_DRAIN_TIMEOUT_S)
+        if pending:
+            logger.warning(f"Output of {cmd[0]} (pid {process.pid}) still open {_DRAIN_TIMEOUT_S:g}s after it exited")
+    except asyncio.CancelledError:
+        # The caller gave up on the run; do not leave the load generator behind
+        await stop_process_tree(process)
+        raise
+    finally:
+        for pump in pumps:
+            pump.cancel()
+        await asyncio.gather(*pumps, return_exceptions=True)
+        _live_groups.discard(process.pid)
+        stopped = process.pid in _stopping
+        _stopping.discard(process.pid)
+        if groups is not None:
+            groups.discard(process.pid)
+        if monitor is not None:
+            await monitor.unwatch(process.pid)
+
+    logger.debug(f"Return code: {process.returncode}, "
+                 f"stdout lines: {stdout_buffer.total_lines}, stderr lines: {stderr_buffer.total_lines}")
+    return ProcessResult(
+        returncode=process.returncode,
+        stdout=stdout_buffer.text(),
+        stderr=stderr_buffer.text(),
+        timed_out=timed_out,
+        stopped=stopped,
+    )
+
+
+async def run_processes(cmds: Sequence[Sequence[str]], env: Optional[Mapping[str, str]] = None,
+                        cwd: Optional[str] = None,
+                        consumers: Optional[Sequence[LineConsumer]] = None,
+                        monitor: Optional["GeneratorMonitor"] = None,
+                        deadline: Optional[float] = None) -> list[ProcessResult]:
+    """Run several commands concurrently, e.g. the shards of one load test.
+
+    If any command cannot be started, or the caller is cancelled, the other
+    processes are killed too rather than left running.
+
+    Args:
+        cmds: Commands to execute
+        env: Environment for the child processes (default: inherit)
+        cwd: Working directory for the child processes (default: current)
+        consumers: Callables invoked with (stream_name, line) for every output line of every process
+        monitor: Samples the health of the process trees while they run
+        deadline: Seconds each process may run before it is stopped (default: no deadline)
+
+    Returns:
+        list[ProcessResult]: The result of each command, in order
+    """
+    tasks = [asyncio.create_task(run_process(cmd, env=env, cwd=cwd, consumers=consumers, monitor=monitor,
+                                              deadline=deadline))
+             for cmd in cmds]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def stop_groups(pgids: Iterable[int], kill: bool = False) -> None:
+    """Ask the processes of running runners to stop, e.g. when a guardrail is breached.
+
+    They get SIGTERM, so load generators can write the results so far; the
+    ``ProcessResult`` of each is marked ``stopped``.
+
+    Args:
+        pgids: Process groups to stop
+        kill: Send SIGKILL instead, to processes that ignored SIGTERM
+    """
+    for pgid in list(pgids):
+        _stopping.add(pgid)
+        if _POSIX:
+            _signal(pgid, (), signal.SIGKILL if kill else signal.SIGTERM)
+
+
+async def spawn_detached(cmd: Sequence[str], env: Optional[Mapping[str, str]] = None) -> int:
+    """Start an interactive program, such as the JMeter GUI, that outlives the call.
+
+    It runs in a session of its own without a deadline, so it is not stopped
+    with the runs or the agent, and is reaped once it exits.
+
+    Returns:
+        int: The process id
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+        env=dict(env) if env is not None else None,
+        start_new_session=_POSIX,
+    )
+    task = asyncio.create_task(process.wait())
+    _detached.add(task)
+    task.add_done_callback(_detached.discard)
+    return process.pid
+
+
+@atexit.register
+def _kill_live_groups() -> None:
+    """Kill the load generators of runs still going when the agent exits."""
+    if _POSIX:
+        for pgid in list(_live_groups):
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
@@ -28,7 +28,21 @@ ROOT_PROMPT = """
         - If the user provided both the directory and class name, proceed with the execution.
     4. If your user has provided a Locust test file (file type .py), call `execute_locust_test` to run a Locust test.
         - If the user does not provide any additional parameters, use the default values.
-    5. Once the test is done, analyze the results and provide a report, recommendations, and bottlenecks.
+    5. Tests run in the background: each test tool returns a job_id at once.
+        - Call `get_test_status` with the job_id and wait_seconds=60 until its status is success, error or cancelled. While it runs, share the progress it reports with the user.
+        - If the user gives limits a test must stay within, such as a maximum error rate or p95, pass them as `guardrails` (e.g. "error_rate=5,p95=800"). A test breaching them for a sustained period is stopped early with the status "aborted"; report the reason in "aborted_by" and analyse the results collected until then.
+        - If the user asks to stop a test, call `cancel_test`. Call `list_tests` to see all submitted tests; tests may wait in the queue until the machine has capacity.
+        - If the user needs more load than one load generator process can produce, shard the test: `workers` for Locust, `shards` for k6 (`execute_k6_test_with_options`), or `remote_hosts` for JMeter servers (`execute_jmeter_test_non_gui`). The results of all shards are merged into one report.
+        - Before a JMeter, k6 or Locust test starts, its test plan is analysed: the JMeter heap, k6 shards and Locust workers are picked from its estimated concurrency and request rate unless the user gave them, and a test that would saturate the machine is refused. Report the "preflight" estimate and any warnings; if a test is refused, explain the reasons and suggest the alternative they name. To only estimate a test plan without running it, call `analyze_test_plan`.
+        - If the user wants to know how much load a service can take (its capacity, knee or max throughput), call `find_max_capacity` with the k6 script or locustfile and the latency and error SLOs the user gave, rather than running full tests at guessed users. Its digest's "capacity" entry holds the max sustainable users and throughput, what limited them, and a row per probe: users, req/s, latency, error rate and whether it passed.
+    6. Once the test is done, analyze the results and provide a report, recommendations, and bottlenecks.
+        - The "result" of a finished test is a digest of the run: key percentiles, errors, slowest endpoints and anomalies.
+        - The digest's "generator" entry is the health of the load generator itself (its CPU, memory and JVM garbage collection). If it reports a bottleneck, the latencies and throughput measure the load generator's limits, not the system under test: say so first, do not blame the system under test for them, and suggest more workers, shards, remote engines or a larger heap.
+        - For long tests, call `get_test_timeline` to see how throughput, errors and latency evolved, while the test runs or after it; pick a coarser resolution or a start and end to zoom in on a period such as a latency spike.
+        - Base the analysis on the digest. Only if it is not enough, call `fetch_run_artifact` with the run_id and one of the listed artifacts, reading small parts at a time.
+        - To analyse a run again, or result files the user already has (a JTL, k6 NDJSON output, Locust CSV files or a Gatling results folder), call `analyze_test_results` with the run_id or the path; it does not run a test.
+        - Every run is recorded in a run history. To compare with earlier runs or show a trend (e.g. p95 of an endpoint over the last runs of the script), call `query_run_history`.
+        - To check a run for performance regressions, call `compare_test_runs` with its run_id; it compares with the script's baseline (or previous run) and reports significant changes per endpoint. If the user approves a run as the new reference, call `set_baseline_run`.
     </Steps>
 
     <Key Constraints>
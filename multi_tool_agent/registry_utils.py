@@ -0,0 +1,146 @@
+"""Registry of the tools the agent runs load tests with.
+
+A runner is the ``run_<tool>_result`` coroutine of a tool, returning a
+``RunResult``. Runners are registered by name as ``module:function`` and
+imported on first use, so starting the agent does not import every tool
+module, and their binaries are looked up on ``PATH`` when a run first needs
+them.
+
+Besides the built-in JMeter, k6, Locust and Gatling runners, installed
+packages can add tools through the ``featherwand.runners`` entry point
+group, e.g. in ``pyproject.toml``::
+
+    [project.entry-points."featherwand.runners"]
+    artillery = "featherwand_artillery:run_artillery_result"
+
+Entry points are only scanned when a tool is not a built-in one or when all
+tools are listed.
+"""
+import importlib
+import logging
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from importlib.metadata import entry_points
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from .run_utils import RunResult
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "featherwand.runners"
+
+Runner = Callable[..., Awaitable[RunResult]]
+
+
+@dataclass(frozen=True)
+class RunnerSpec:
+    """Where a tool's runner lives and how its binary is configured."""
+    tool: str
+    target: str  # "module:function"
+    bin_env: Optional[str] = None  # environment variable holding the binary
+    default_bin: Optional[str] = None
+
+
+BUILTIN_RUNNERS = {spec.tool: spec for spec in (
+    RunnerSpec("jmeter", "multi_tool_agent.jmeter_utils:run_jmeter_result", "JMETER_BIN", "jmeter"),
+    RunnerSpec("k6", "multi_tool_agent.k6_utils:run_k6_result", "K6_BIN", "k6"),
+    RunnerSpec("locust", "multi_tool_agent.locust_utils:run_locust_result", "LOCUST_BIN", "locust"),
+    # Gatling runs through the project's own Maven or Gradle wrapper
+    RunnerSpec("gatling", "multi_tool_agent.gatling_utils:run_gatling_result"),
+)}
+
+_lock = threading.Lock()
+_plugins: Optional[dict[str, RunnerSpec]] = None
+_runners: dict[str, Runner] = {}
+_binaries: dict[str, str] = {}
+
+
+def _plugin_specs() -> dict[str, RunnerSpec]:
+    global _plugins
+    with _lock:
+        if _plugins is None:
+            _plugins = {}
+            for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+                if entry_point.name in BUILTIN_RUNNERS:
+                    logger.warning(f"Ignoring runner entry point {entry_point.value}: "
+                                   f"{entry_point.name} is a built-in tool")
+                    continue
+                _plugins[entry_point.name] = RunnerSpec(entry_point.name, entry_point.value,
+                                                        f"{entry_point.name.upper()}_BIN", entry_point.name)
+        return _plugins
+
+
+def runner_specs() -> dict[str, RunnerSpec]:
+    """All registered tools, built-in ones first.
+
+    Returns:
+        dict: RunnerSpec by tool name
+    """
+    return {**BUILTIN_RUNNERS, **_plugin_specs()}
+
+
+def get_spec(tool: str) -> RunnerSpec:
+    """The registration of a tool.
+
+    Raises:
+        ValueError: If no runner is registered for the tool
+    """
+    spec = BUILTIN_RUNNERS.get(tool) or _plugin_specs().get(tool)
+    if spec is None:
+        raise ValueError(f"Unknown tool: {tool}. Available tools: {', '.join(runner_specs())}")
+    return spec
+
+
+def get_runner(tool: str) -> Runner:
+    """The runner of a tool, importing its module on first use.
+
+    Args:
+        tool: Tool name, e.g. "jmeter"
+
+    Returns:
+        Runner: The coroutine function running the tool
+
+    Raises:
+        ValueError: If no runner is registered for the tool
+    """
+    runner = _runners.get(tool)
+    if runner is None:
+        module_name, _, function = get_spec(tool).target.partition(":")
+        runner = getattr(importlib.import_module(module_name), function)
+        _runners[tool] = runner
+    return runner
+
+
+def _which(command: str) -> Optional[str]:
+    # Only found binaries are remembered: a tool installed later is still picked up
+    path = _binaries.get(command)
+    if path is None:
+        path = shutil.which(command)
+        if path is not None:
+            _binaries[command] = path
+    return path
+
+
+def resolve_binary(tool: str) -> str:
+    """The binary to start a tool with, from its ``<TOOL>_BIN`` variable or its default name.
+
+    A bare command name is looked up on ``PATH`` until found, then remembered; a path
+    is made absolute. An unknown command is returned unchanged so starting it
+    reports it as not found.
+
+    Args:
+        tool: Tool name, e.g. "jmeter"
+
+    Returns:
+        str: Path or command of the tool's binary
+    """
+    spec = get_spec(tool)
+    command = os.getenv(spec.bin_env, spec.default_bin) if spec.bin_env else spec.default_bin
+    if not command:
+        raise ValueError(f"{tool} has no binary of its own")
+    if os.sep in command or (os.altsep and os.altsep in command):
+        return str(Path(command).resolve())
+    return _which(command) or command
@@ -0,0 +1,321 @@
+"""Multi-resolution time series of a run, bounded in memory for soak tests.
+
+A per-second series of a multi-hour run is too long to keep for every run,
+to hand to the model or to draw. ``TimeSeriesRollup`` folds the metrics of a
+run, as they arrive, into windows of 1 s, 10 s and 1 min. Each window keeps
+its requests, errors, active users and a sparse latency sketch (the
+buckets of ``stats_utils.LatencyHistogram``), so the percentiles of a
+window, or of any range of windows, are computed from merged counts rather
+than by averaging percentiles. Every resolution keeps its most recent
+``ROLLUP_MAX_WINDOWS`` windows (default 1440: 24 minutes of seconds, 4
+hours of 10 s windows and 24 hours of minutes), whatever the run's length.
+
+Queries pick a resolution, or the finest one that still covers the range
+asked for, and reduce the result to a number of points with
+Largest-Triangle-Three-Buckets (``lttb``), which keeps the peaks and dips a
+chart must show where averaging would flatten them.
+
+A rollup may be fed in one thread (live metrics are sampled in a worker
+thread) while it is queried in others; a lock keeps every query to a
+consistent set of windows.
+"""
+import json
+import math
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from .history_utils import timeline_series
+from .run_utils import load_manifest
+from .stats_utils import NUM_BUCKETS, PERCENTILES, LatencyHistogram, round_stat
+
+RESOLUTIONS = (1, 10, 60)
+DEFAULT_MAX_WINDOWS = 1440
+DEFAULT_MAX_POINTS = 500
+METRICS = ("rps", "errors_per_s", "error_rate", "mean", "p50", "p90", "p95", "p99", "max", "users")
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """Indexes of the points Largest-Triangle-Three-Buckets keeps of a series.
+
+    The first and last points are always kept; in between, every bucket
+    keeps the point forming the largest triangle with the point kept before
+    it and the average of the next bucket.
+
+    Args:
+        x: Increasing x values
+        y: The values, without gaps (NaN)
+        max_points: Number of points to keep, at least 3
+
+    Returns:
+        np.ndarray: Sorted indexes of the kept points
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    size = x.size
+    if size <= max_points or max_points < 3:
+        return np.arange(size)
+    every = (size - 2) / (max_points - 2)
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, size - 1
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        if i == max_points - 3:
+            next_x, next_y = x[-1], y[-1]
+        else:
+            next_end = min(int((i + 2) * every) + 1, size)
+            next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        kept[i + 1] = previous
+    return kept
+
+
+class Window:
+    """The metrics of one closed time window and its sparse latency sketch."""
+    __slots__ = ("start", "seconds", "requests", "errors", "users", "buckets", "counts", "total", "min", "max",
+                 "stats")
+
+    def to_histogram(self) -> LatencyHistogram:
+        histogram = LatencyHistogram()
+        if self.buckets is not None:
+            counts = np.zeros(NUM_BUCKETS, dtype=np.int64)
+            counts[self.buckets] = self.counts
+            histogram.add_counts(counts, self.total, self.min, self.max)
+        return histogram
+
+
+class _OpenWindow:
+    """A window still receiving metrics."""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.seconds = self.requests = self.errors = 0.0
+        self.users: Optional[int] = None
+        self.histogram: Optional[LatencyHistogram] = None
+        # Percentiles reported without a histogram (Locust), weighted by requests
+        self.reported: dict[int, float] = {}
+        self.reported_weight = 0.0
+
+    def add(self, seconds: float, requests: float, errors: float, histogram: Optional[LatencyHistogram],
+            users: Optional[int], percentiles: Optional[dict]) -> None:
+        self.seconds += seconds
+        self.requests += requests
+        self.errors += errors
+        if users is not None:
+            self.users = max(self.users or 0, int(users))
+        if histogram is not None and histogram.count:
+            self.histogram = (self.histogram or LatencyHistogram()).merge(histogram)
+        elif percentiles and requests:
+            for p, value in percentiles.items():
+                if value is not None:
+                    self.reported[p] = self.reported.get(p, 0.0) + value * requests
+            self.reported_weight += requests
+
+    def close(self) -> Window:
+        window = Window()
+        window.start, window.seconds, window.users = self.start, self.seconds, self.users
+        window.requests, window.errors = self.requests, self.errors
+        window.buckets = window.counts = None
+        window.total = window.min = window.max = None
+        histogram = self.histogram
+        if histogram is not None:
+            nonzero = np.flatnonzero(histogram.counts)
+            window.buckets = nonzero.astype(np.uint16)
+            window.counts = histogram.counts[nonzero].astype(np.int32)
+            window.total, window.min, window.max = histogram.total, histogram.min, histogram.max
+        window.stats = _latency_stats(histogram) if histogram is not None else {
+            f"p{p}": value / self.reported_weight for p, value in self.reported.items()}
+        return window
+
+
+def _latency_stats(histogram: LatencyHistogram) -> dict:
+    stats = {f"p{p}": value for p, value in histogram.percentiles(PERCENTILES).items()}
+    stats.update(mean=histogram.mean, max=histogram.max if histogram.count else None)
+    return stats
+
+
+class _Level:
+    def __init__(self, resolution: int, max_windows: int):
+        self.resolution = resolution
+        self.windows: deque[Window] = deque(maxlen=max_windows)
+        self.open: Optional[_OpenWindow] = None
+
+    def add(self, t: float, *values) -> None:
+        start = math.floor(t / self.resolution) * self.resolution
+        # Metrics arrive in time order; a late interval is folded into the open window
+        if self.open is not None and start > self.open.start:
+            self.windows.append(self.open.close())
+            self.open = None
+        if self.open is None:
+            self.open = _OpenWindow(start)
+        self.open.add(*values)
+
+    def all_windows(self) -> list[Window]:
+        """The closed windows and, last, a snapshot of the open one."""
+        windows = list(self.windows)
+        if self.open is not None:
+            windows.append(self.open.close())
+        return windows
+
+
+class TimeSeriesRollup:
+    """Streaming 1 s, 10 s and 1 min rollups of a run's throughput, errors, latency and users.
+
+    Args:
+        resolutions: Window lengths in seconds (default: 1, 10 and 60)
+        max_windows: Windows kept per resolution (default: ``ROLLUP_MAX_WINDOWS`` or 1440)
+    """
+
+    def __init__(self, resolutions: Iterable[int] = RESOLUTIONS, max_windows: Optional[int] = None):
+        max_windows = max_windows or int(os.getenv("ROLLUP_MAX_WINDOWS", DEFAULT_MAX_WINDOWS))
+        self.levels = [_Level(resolution, max_windows) for resolution in sorted(resolutions)]
+        self.first: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add(self, t: float, seconds: float, requests: float, errors: float = 0.0,
+            histogram: Optional[LatencyHistogram] = None, users: Optional[int] = None,
+            percentiles: Optional[dict] = None) -> None:
+        """Fold in the metrics of an interval.
+
+        Args:
+            t: Start of the interval, in epoch seconds
+            seconds: Length of the interval
+            requests: Requests completed in the interval
+            errors: Failed requests in the interval
+            histogram: Latencies of the interval's requests, when known
+            users: Active users or VUs at the end of the interval
+            percentiles: Percentiles by rank (e.g. ``{95: 180.0}``) when no histogram is known
+        """
+        with self._lock:
+            if self.first is None:
+                self.first = t
+            for level in self.levels:
+                level.add(t, seconds, requests, errors, histogram, users, percentiles)
+
+    @classmethod
+    def from_timeline(cls, timeline: Optional[dict], **options) -> "TimeSeriesRollup":
+        """Rollups of a parsed report's timeline: counts per second, or Locust's sampled rates."""
+        rollup = cls(**options)
+        seconds, series = timeline_series(timeline)
+        if not seconds.size:
+            return rollup
+        start = (timeline.get("start_second") if "requests" in timeline
+                 else timeline["timestamps"][0]) or 0
+        steps = np.diff(seconds, append=seconds[-1] + (seconds[-1] - seconds[-2] if seconds.size > 1 else 1))
+        rps, errors = series.get("rps", np.zeros(seconds.size)), series.get("errors_per_s", np.zeros(seconds.size))
+        p95, users = series.get("p95"), series.get("users")
+        for i in range(seconds.size):
+            step = float(steps[i]) or 1.0
+            rollup.add(start + float(seconds[i]), step, float(np.nan_to_num(rps[i])) * step,
+                       float(np.nan_to_num(errors[i])) * step,
+                       users=int(users[i]) if users is not None and not np.isnan(users[i]) else None,
+                       percentiles={95: float(p95[i])} if p95 is not None and not np.isnan(p95[i]) else None)
+        return rollup
+
+    def _pick(self, resolution: Optional[int], start: Optional[float], end: Optional[float],
+              max_points: int) -> _Level:
+        if resolution:
+            for level in self.levels:
+                if level.resolution == resolution:
+                    return level
+            raise ValueError(f"Unknown resolution {resolution}s. Available: "
+                             f"{', '.join(str(level.resolution) for level in self.levels)}")
+        # The finest resolution that still holds the start of the range and fits the points asked for
+        low = self.first + (start or 0)
+        high = self.first + end if end is not None else self.levels[0].open.start
+        covering = []
+        for level in self.levels:
+            oldest = level.windows[0].start if level.windows else level.open.start
+            if oldest <= low:
+                covering.append(level)
+                if (high - low) / level.resolution < max_points:
+                    return level
+        # Else the finest that covers the range, reduced with LTTB, or the one reaching back furthest
+        return covering[0] if covering else self.levels[-1]
+
+    def query(self, resolution: Optional[int] = None, start: Optional[float] = None, end: Optional[float] = None,
+              max_points: int = DEFAULT_MAX_POINTS, metrics: Optional[Iterable[str]] = None) -> dict:
+        """The run's metrics over a range, at one resolution, reduced to at most ``max_points`` per metric.
+
+        Args:
+            resolution: Window length in seconds (default: the finest covering the range within ``max_points``)
+            start: Start of the range, in seconds since the run started (default: the oldest window kept)
+            end: End of the range, in seconds since the run started (default: now)
+            max_points: Points per metric; longer series are reduced with LTTB
+            metrics: Metrics to return (default: all of ``METRICS`` that have values)
+
+        Returns:
+            dict: ``resolution_s``, the range's overall ``summary`` (requests, errors and
+            merged percentiles) and ``series``: per metric, the ``seconds`` since the run
+            started and the ``value`` of each kept point
+        """
+        metrics = list(metrics or METRICS)
+        unknown = [metric for metric in metrics if metric not in METRICS]
+        if unknown:
+            raise ValueError(f"Unknown metrics {', '.join(unknown)}. Available: {', '.join(METRICS)}")
+        max_points = max(3, int(max_points))
+        # Closed windows never change, so only picking them needs the lock
+        with self._lock:
+            if self.first is None:
+                return {"resolution_s": resolution, "summary": {}, "series": {}}
+            first = self.first
+            level = self._pick(resolution, start, end, max_points)
+            windows = [window for window in level.all_windows()
+                       if (start is None or window.start + level.resolution > first + start)
+                       and (end is None or window.start <= first + end)]
+
+        columns: dict[str, list] = {metric: [] for metric in metrics}
+        for window in windows:
+            values = {"rps": window.requests / window.seconds if window.seconds else None,
+                      "errors_per_s": window.errors / window.seconds if window.seconds else None,
+                      "error_rate": 100.0 * window.errors / window.requests if window.requests else None,
+                      "users": window.users, **window.stats}
+            for metric in metrics:
+                columns[metric].append(values.get(metric))
+        offsets = np.array([window.start - first for window in windows], dtype=np.float64)
+        series = {}
+        for metric, values in columns.items():
+            values = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+            present = ~np.isnan(values)
+            if not present.any():
+                continue
+            x, y = offsets[present], values[present]
+            kept = lttb(x, y, max_points)
+            series[metric] = {"seconds": [round(float(value), 1) for value in x[kept]],
+                              "value": [round_stat(float(value)) for value in y[kept]]}
+        return {"resolution_s": level.resolution, "start_time": first, "windows": len(windows),
+                "summary": self._summary(windows), "series": series}
+
+    @staticmethod
+    def _summary(windows: list[Window]) -> dict:
+        histogram = LatencyHistogram()
+        for window in windows:
+            histogram.merge(window.to_histogram())
+        requests = sum(window.requests for window in windows)
+        errors = sum(window.errors for window in windows)
+        seconds = sum(window.seconds for window in windows)
+        summary = {"requests": int(round(requests)), "errors": int(round(errors)),
+                   "mean_rps": round_stat(requests / seconds) if seconds else None,
+                   "error_rate": round_stat(100.0 * errors / requests) if requests else None}
+        if histogram.count:
+            summary.update({key: round_stat(value) for key, value in _latency_stats(histogram).items()})
+        return summary
+
+
+def run_rollup(run_id: str) -> TimeSeriesRollup:
+    """Rollups of a saved run, from the timeline of its parsed report.
+
+    Raises:
+        ValueError: If the run has no report
+        FileNotFoundError: If the run is not saved anymore
+    """
+    report = load_manifest(run_id)["artifacts"].get("report")
+    if report is None or not Path(report).is_file():
+        raise ValueError(f"Run {run_id} has no parsed report")
+    return TimeSeriesRollup.from_timeline(json.loads(Path(report).read_text(encoding="utf-8")).get("timeline"))
@@ -0,0 +1,184 @@
+"""Structured run results and the on-disk store of raw run artifacts.
+
+Every run is saved under ``FEATHERWAND_RUNS_DIR`` (default: a
+``featherwand-runs`` folder in the temp directory) as
+``<run_id>/manifest.json``. The manifest lists the captured output, the
+parsed report, the load generator's health samples and the result files
+the tool itself wrote (JTL, CSV, NDJSON, simulation.log). The agent only
+sees a digest of the run and reads any of these artifacts on demand, a
+window at a time.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEP_RUNS = 100
+DEFAULT_FETCH_BYTES = 16 * 1024
+MAX_FETCH_BYTES = 256 * 1024
+
+_RUN_ID = re.compile(r"^[a-z0-9]+-\d{8}-\d{6}-[0-9a-f]{8}$")
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)\s*(ms|s|m|h)?", re.IGNORECASE)
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+@dataclass
+class RunResult:
+    """Outcome of one load test run.
+
+    Attributes:
+        tool: Load testing tool (jmeter, k6, locust or gatling)
+        status: "success", "error" or, when a guardrail stopped it early, "aborted"
+        output: Captured standard output
+        error: Error message or captured standard error
+        report: Parsed results in the common report shape, when available
+        artifacts: Result files the tool wrote, by artifact name
+        health: Load generator health samples and findings, see ``health_utils``
+    """
+    tool: str
+    status: str
+    output: str = ""
+    error: str = ""
+    report: Optional[dict] = None
+    artifacts: dict[str, str] = field(default_factory=dict)
+    health: Optional[dict] = None
+
+
+def duration_seconds(duration: Any) -> Optional[float]:
+    """Convert a duration such as ``30``, ``"45s"``, ``"1m30s"`` or ``"2h"`` to seconds."""
+    if duration is None or duration == "":
+        return None
+    if isinstance(duration, (int, float)):
+        return float(duration)
+    parts = _DURATION.findall(str(duration))
+    if not parts:
+        return None
+    return sum(float(value) * _DURATION_UNITS[(unit or "s").lower()] for value, unit in parts)
+
+
+def runs_dir() -> Path:
+    return Path(os.getenv("FEATHERWAND_RUNS_DIR", Path(tempfile.gettempdir()) / "featherwand-runs"))
+
+
+def _run_dir(run_id: str) -> Path:
+    if not _RUN_ID.match(run_id):
+        raise ValueError(f"Invalid run id: {run_id}")
+    return runs_dir() / run_id
+
+
+def save_run(result: RunResult) -> str:
+    """Save the output, report and artifact index of a run.
+
+    Args:
+        result: The run to save
+
+    Returns:
+        str: The run id to fetch artifacts with
+    """
+    run_id = f"{result.tool}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    run_dir = _run_dir(run_id)
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    artifacts = {}
+    for name, content in (("output", result.output), ("error", result.error)):
+        if content:
+            path = run_dir / f"{name}.log"
+            path.write_text(content, encoding="utf-8", errors="replace")
+            artifacts[name] = str(path)
+    if result.report is not None:
+        path = run_dir / "report.json"
+        path.write_text(json.dumps(result.report, indent=1), encoding="utf-8")
+        artifacts["report"] = str(path)
+    if result.health is not None:
+        path = run_dir / "health.json"
+        path.write_text(json.dumps(result.health, indent=1), encoding="utf-8")
+        artifacts["health"] = str(path)
+    artifacts.update(result.artifacts)
+
+    manifest = {
+        "run_id": run_id,
+        "tool": result.tool,
+        "status": result.status,
+        "created": time.time(),
+        "artifacts": artifacts,
+    }
+    (run_dir / "manifest.json").write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+    prune_runs()
+    return run_id
+
+
+def load_manifest(run_id: str) -> dict:
+    manifest_file = _run_dir(run_id) / "manifest.json"
+    if not manifest_file.exists():
+        raise FileNotFoundError(f"Run not found: {run_id}")
+    return json.loads(manifest_file.read_text(encoding="utf-8"))
+
+
+def read_artifact(run_id: str, artifact: str = "output", offset: int = 0,
+                  max_bytes: int = DEFAULT_FETCH_BYTES) -> dict:
+    """Read a window of a saved run artifact.
+
+    Args:
+        run_id: Run id returned by ``save_run``
+        artifact: Artifact name from the run manifest
+        offset: Byte offset to start reading at; negative values count from the end
+        max_bytes: Maximum number of bytes to return (capped at 256 KiB)
+
+    Returns:
+        dict: The artifact window with its total ``size`` and the ``next_offset``
+        to continue from (None at the end of the file). For a folder
+        artifact, the files it contains instead
+    """
+    manifest = load_manifest(run_id)
+    path = manifest["artifacts"].get(artifact)
+    if path is None:
+        raise ValueError(f"Unknown artifact '{artifact}' for run {run_id}. "
+                       f"Available: {', '.join(sorted(manifest['artifacts']))}")
+    path = Path(path)
+    if path.is_dir():
+        listing = sorted(str(entry.relative_to(path)) for entry in path.rglob("*") if entry.is_file())
+        return {"run_id": run_id, "artifact": artifact, "path": str(path), "files": listing[:1000]}
+    if not path.is_file():
+        raise FileNotFoundError(f"Artifact '{artifact}' of run {run_id} no longer exists: {path}")
+
+    size = path.stat().st_size
+    max_bytes = max(1, min(int(max_bytes), MAX_FETCH_BYTES))
+    start = max(0, size + offset if offset < 0 else min(offset, size))
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(max_bytes)
+    end = start + len(data)
+    return {
+        "run_id": run_id,
+        "artifact": artifact,
+        "path": str(path),
+        "size": size,
+        "offset": start,
+        "content": data.decode("utf-8", errors="replace"),
+        "next_offset": end if end < size else None,
+    }
+
+
+def prune_runs(keep: Optional[int] = None) -> None:
+    """Remove the oldest saved runs beyond ``keep`` (``FEATHERWAND_KEEP_RUNS``).
+
+    Only the run folders are removed; result files the tools wrote elsewhere
+    are left alone.
+    """
+    keep = int(os.getenv("FEATHERWAND_KEEP_RUNS", DEFAULT_KEEP_RUNS)) if keep is None else keep
+    root = runs_dir()
+    if not root.is_dir():
+        return
+    saved = sorted((path for path in root.iterdir() if path.is_dir() and _RUN_ID.match(path.name)),
+                   key=lambda path: path.stat().st_mtime)
+    for path in saved[:max(0, len(saved) - keep)]:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,571 @@
+"""Chat session storage for serving the agent from several workers.
+
+ADK's SQLite session service opens a connection per call, parses every
+event of a session on every turn and commits each event in its own
+transaction. Under many concurrent sessions the turns then queue on the
+database write lock. ``CachedSqliteSessionService`` stores the same tables,
+so either service can open the other's database, but:
+
+* the database runs in WAL mode with a busy timeout, so readers never wait
+  for the writer and a worker waits for the write lock instead of failing;
+* connections are pooled and reused;
+* recently used sessions are kept in a per-worker LRU cache. A cached
+  session is only served while its ``update_time`` in the database still
+  matches, so a turn handled by another worker is never missed, and
+  unchanged conversations are not parsed again;
+* events are committed in batches: every event appended while a batch is
+  being written goes into the next transaction (group commit). With
+  ``SESSION_WRITE_BEHIND=true`` appends do not wait for the commit at all
+  and are written within ``SESSION_FLUSH_INTERVAL_MS``.
+
+The service is registered with ADK for ``sqlite+wal:///<path>`` URIs by
+``register_session_service``. It applies state deltas with private helpers
+of ``BaseSessionService`` (``ADK_HELPERS``) and mirrors the tables of ADK's
+``SqliteSessionService``, so ``requirements.txt`` pins the ADK minor
+releases it was checked against, and the unit tests fail when a release
+drops a helper or changes the tables.
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+from urllib.parse import urlparse
+
+from google.adk.errors import StaleSessionError
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.errors.session_not_found_error import SessionNotFoundError
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.state import State
+
+logger = logging.getLogger(__name__)
+
+SESSION_SCHEME = "sqlite+wal"
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_POOL_SIZE = 4
+DEFAULT_FLUSH_INTERVAL_MS = 50
+MAX_BATCH_EVENTS = 500
+BUSY_TIMEOUT_S = 30
+
+# Same tables as ADK's SqliteSessionService, plus an index to read a session's events in order
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS app_states (
+    app_name TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    update_time REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_states (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    create_time REAL NOT NULL,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+CREATE TABLE IF NOT EXISTS events (
+    id TEXT NOT NULL,
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    invocation_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    event_data TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, id),
+    FOREIGN KEY (app_name, user_id, session_id) REFERENCES sessions(app_name, user_id, id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS events_by_session_time ON events (app_name, user_id, session_id, timestamp);
+"""
+
+_SESSION_PREFIXES = (State.APP_PREFIX, State.USER_PREFIX)
+
+# Private BaseSessionService methods append_event relies on, as ADK's own services do
+ADK_HELPERS = ("_apply_temp_state", "_trim_temp_delta_state", "_update_session_state", "_commit_event_to_session")
+
+SessionKey = tuple[str, str, str]
+
+# Services created in this process, flushed together at shutdown
+_services: "weakref.WeakSet[CachedSqliteSessionService]" = weakref.WeakSet()
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _split_state(state: Optional[dict]) -> tuple[dict, dict, dict]:
+    """Split a state (delta) into its app, user and session scoped parts; temp keys are dropped."""
+    app, user, session = {}, {}, {}
+    for key, value in (state or {}).items():
+        if key.startswith(State.APP_PREFIX):
+            app[key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            user[key[len(State.USER_PREFIX):]] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            session[key] = value
+    return app, user, session
+
+
+def _merge_state(app_state: dict, user_state: dict, session_state: dict) -> dict:
+    merged = {key: value for key, value in session_state.items() if not key.startswith(_SESSION_PREFIXES)}
+    merged.update({State.APP_PREFIX + key: value for key, value in app_state.items()})
+    merged.update({State.USER_PREFIX + key: value for key, value in user_state.items()})
+    return merged
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=str)
+
+
+class _ConnectionPool:
+    """A bounded pool of SQLite connections shared by the worker threads."""
+
+    def __init__(self, db_path: str, size: int):
+        self.db_path = db_path
+        self.size = size
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: write transactions are opened explicitly with BEGIN IMMEDIATE
+        connection = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_S, isolation_level=None,
+                                     check_same_thread=False)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("PRAGMA foreign_keys = ON")
+        with self._lock:
+            if not self._schema_ready:
+                connection.executescript(_SCHEMA)
+                self._schema_ready = True
+        return connection
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                self._created += create
+            connection = self._connect() if create else self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+@dataclass
+class _CachedSession:
+    session: Session
+    synced_time: float  # update_time of the session in the database when this copy matched it
+
+
+@dataclass
+class _PendingEvent:
+    key: SessionKey
+    event: Event
+    event_json: str
+    deltas: tuple[dict, dict, dict]
+    expected_time: Optional[float]
+    future: Optional[asyncio.Future] = None
+
+
+class CachedSqliteSessionService(BaseSessionService):
+    """SQLite session service with pooled WAL connections, an LRU cache and batched event writes.
+
+    Args:
+        db_path: Path of the SQLite database
+        cache_size: Sessions kept in memory (default: ``SESSION_CACHE_SIZE`` or 256; 0 disables the cache)
+        pool_size: Database connections (default: ``SESSION_POOL_SIZE`` or 4)
+        write_behind: Return from ``append_event`` before the event is committed
+            (default: ``SESSION_WRITE_BEHIND`` or false)
+        flush_interval_ms: With write-behind, how long events may wait before being written
+            (default: ``SESSION_FLUSH_INTERVAL_MS`` or 50)
+    """
+
+    def __init__(self, db_path: str, cache_size: Optional[int] = None, pool_size: Optional[int] = None,
+                 write_behind: Optional[bool] = None, flush_interval_ms: Optional[int] = None):
+        self.db_path = db_path
+        self.cache_size = _env_int("SESSION_CACHE_SIZE", DEFAULT_CACHE_SIZE) if cache_size is None else cache_size
+        self.write_behind = (os.getenv("SESSION_WRITE_BEHIND", "false").lower() == "true"
+                             if write_behind is None else write_behind)
+        interval_ms = (_env_int("SESSION_FLUSH_INTERVAL_MS", DEFAULT_FLUSH_INTERVAL_MS)
+                       if flush_interval_ms is None else flush_interval_ms)
+        self.flush_interval = interval_ms / 1000
+        self.pool = _ConnectionPool(db_path, _env_int("SESSION_POOL_SIZE", DEFAULT_POOL_SIZE)
+                                    if pool_size is None else pool_size)
+        self.batches_written = 0
+        self._cache: OrderedDict[SessionKey, _CachedSession] = OrderedDict()
+        self._pending: list[_PendingEvent] = []
+        self._pending_keys: Counter = Counter()
+        self._writer: Optional[asyncio.Task] = None
+        self._flush_now: Optional[asyncio.Event] = None
+        _services.add(self)
+
+    # Cache ----------------------------------------------------------------------------------------
+
+    def _cache_get(self, key: SessionKey) -> Optional[_CachedSession]:
+        entry = self._cache.get(key)
+        if entry is not None:
+            self._cache.move_to_end(key)
+        return entry
+
+    def _cache_put(self, key: SessionKey, session: Session, synced_time: float) -> None:
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = _CachedSession(session, synced_time)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            # Sessions with unwritten events must stay readable until they are flushed
+            evicted = next((cached for cached in self._cache if not self._pending_keys[cached]), None)
+            if evicted is None:
+                break
+            del self._cache[evicted]
+
+    @staticmethod
+    def _view(session: Session, app_state: dict, user_state: dict,
+              config: Optional[GetSessionConfig]) -> Session:
+        """A copy of a session with fresh shared state and the events ``config`` asks for.
+
+        Events are shared with the cache; ADK never modifies an event once it is appended.
+        """
+        events = list(session.events)
+        if config and config.after_timestamp:
+            events = [event for event in events if event.timestamp >= config.after_timestamp]
+        if config and config.num_recent_events is not None:
+            events = events[-config.num_recent_events:] if config.num_recent_events else []
+        return Session(app_name=session.app_name, user_id=session.user_id, id=session.id,
+                       state=_merge_state(app_state, user_state, session.state), events=events,
+                       last_update_time=session.last_update_time)
+
+    # Reads (run in worker threads) ------------------------------------------------------------------
+
+    @staticmethod
+    def _shared_state(db: sqlite3.Connection, app_name: str, user_id: str) -> tuple[dict, dict]:
+        app_row = db.execute("SELECT state FROM app_states WHERE app_name=?", (app_name,)).fetchone()
+        user_row = db.execute("SELECT state FROM user_states WHERE app_name=? AND user_id=?",
+                              (app_name, user_id)).fetchone()
+        return (json.loads(app_row[0]) if app_row else {}), (json.loads(user_row[0]) if user_row else {})
+
+    def _read_session(self, key: SessionKey, cached_time: Optional[float]) -> Optional[tuple]:
+        """Load a session, or only its shared state when the cached copy is still current."""
+        app_name, user_id, session_id = key
+        with self.pool.connection() as db:
+            row = db.execute("SELECT state, update_time FROM sessions WHERE app_name=? AND user_id=? AND id=?",
+                             key).fetchone()
+            if row is None:
+                return None
+            app_state, user_state = self._shared_state(db, app_name, user_id)
+            if row[1] == cached_time:
+                return app_state, user_state, None
+            event_rows = db.execute(
+                "SELECT event_data FROM events WHERE app_name=? AND user_id=? AND session_id=?"
+                " ORDER BY timestamp, id", key).fetchall()
+        # Decoding the events is the expensive part of a read; it is done once per change
+        events = [Event.model_validate_json(event_row[0]) for event_row in event_rows]
+        session = Session(app_name=app_name, user_id=user_id, id=session_id, state=json.loads(row[0]),
+                          events=events, last_update_time=row[1])
+        return app_state, user_state, session
+
+    # Writes (run in worker threads) -----------------------------------------------------------------
+
+    @staticmethod
+    def _upsert_state(db: sqlite3.Connection, table: str, keys: dict, delta: dict, now: float) -> None:
+        where = " AND ".join(f"{column}=?" for column in keys)
+        row = db.execute(f"SELECT state FROM {table} WHERE {where}", tuple(keys.values())).fetchone()
+        state = {**(json.loads(row[0]) if row else {}), **delta}
+        columns = ", ".join([*keys, "state", "update_time"])
+        db.execute(f"INSERT OR REPLACE INTO {table} ({columns}) VALUES ({', '.join('?' * (len(keys) + 2))})",
+                   (*keys.values(), _dumps(state), now))
+
+    def _write_events(self, batch: list[_PendingEvent]) -> list[Optional[Exception]]:
+        """Commit a batch of events in one transaction; returns the error of each event, if any."""
+        results: list[Optional[Exception]] = []
+        with self.pool.connection() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for pending in batch:
+                    results.append(self._write_event(db, pending))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        self.batches_written += 1
+        return results
+
+    def _write_event(self, db: sqlite3.Connection, pending: _PendingEvent) -> Optional[Exception]:
+        app_name, user_id, session_id = pending.key
+        row = db.execute("SELECT state, update_time FROM sessions WHERE app_name=? AND user_id=? AND id=?",
+                         pending.key).fetchone()
+        if row is None:
+            return SessionNotFoundError(f"Session {session_id} not found.")
+        if pending.expected_time is not None and row[1] > pending.expected_time:
+            return StaleSessionError("The session was updated by another request since it was read;"
+                                     " reload it before appending events.")
+        event = pending.event
+        app_delta, user_delta, session_delta = pending.deltas
+        if app_delta:
+            self._upsert_state(db, "app_states", {"app_name": app_name}, app_delta, event.timestamp)
+        if user_delta:
+            self._upsert_state(db, "user_states", {"app_name": app_name, "user_id": user_id}, user_delta,
+                               event.timestamp)
+        try:
+            db.execute("INSERT INTO events (id, app_name, user_id, session_id, invocation_id, timestamp, event_data)"
+                       " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (event.id, app_name, user_id, session_id, event.invocation_id, event.timestamp,
+                        pending.event_json))
+        except sqlite3.IntegrityError as e:
+            return e
+        state = {**json.loads(row[0]), **session_delta} if session_delta else None
+        db.execute("UPDATE sessions SET state=COALESCE(?, state), update_time=?"
+                   " WHERE app_name=? AND user_id=? AND id=?",
+                   (_dumps(state) if state is not None else None, event.timestamp, *pending.key))
+        return None
+
+    # Write batching ---------------------------------------------------------------------------------
+
+    def _enqueue(self, pending: _PendingEvent) -> None:
+        self._pending.append(pending)
+        self._pending_keys[pending.key] += 1
+        if self._flush_now is None:
+            self._flush_now = asyncio.Event()
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def _write_loop(self) -> None:
+        while self._pending:
+            if self.write_behind and not self._flush_now.is_set():
+                try:
+                    await asyncio.wait_for(self._flush_now.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            batch, self._pending = self._pending[:MAX_BATCH_EVENTS], self._pending[MAX_BATCH_EVENTS:]
+            try:
+                results = await asyncio.to_thread(self._write_events, batch)
+            except Exception as e:
+                if self.write_behind:
+                    # Nobody is waiting on these events; keep them for the next attempt
+                    logger.error(f"Could not write {len(batch)} session events, retrying: {e}")
+                    self._pending[:0] = batch
+                    await asyncio.sleep(self.flush_interval)
+                    continue
+                results = [e] * len(batch)
+            for pending, error in zip(batch, results):
+                self._finish(pending, error)
+        self._flush_now.clear()
+
+    def _finish(self, pending: _PendingEvent, error: Optional[Exception]) -> None:
+        self._pending_keys[pending.key] -= 1
+        if not self._pending_keys[pending.key]:
+            del self._pending_keys[pending.key]
+        entry = self._cache.get(pending.key)
+        if error is not None:
+            self._cache.pop(pending.key, None)
+            if pending.future is None:
+                logger.error(f"Could not write event {pending.event.id} of session {pending.key[2]}: {error}")
+        elif entry is not None:
+            if self.write_behind:
+                entry.synced_time = pending.event.timestamp
+            elif entry.synced_time == pending.expected_time:
+                # The cached copy was current before this event; keep it current
+                self._update_session_state(entry.session, pending.event)
+                entry.session.events.append(pending.event)
+                entry.session.last_update_time = entry.synced_time = pending.event.timestamp
+            else:
+                self._cache.pop(pending.key, None)
+        if pending.future is not None and not pending.future.done():
+            if error is None:
+                pending.future.set_result(None)
+            else:
+                pending.future.set_exception(error)
+
+    async def flush(self) -> None:
+        """Write all buffered events now."""
+        if self._writer is not None and not self._writer.done():
+            self._flush_now.set()
+            await asyncio.shield(self._writer)
+
+    async def _flush_session(self, key: SessionKey) -> None:
+        if self._pending_keys[key]:
+            await self.flush()
+
+    def close(self) -> None:
+        self.pool.close()
+
+    # BaseSessionService -----------------------------------------------------------------------------
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        session_id = (session_id or "").strip() or str(uuid.uuid4())
+        app_delta, user_delta, session_state = _split_state(state)
+        now = time.time()
+
+        def create() -> tuple[dict, dict]:
+            with self.pool.connection() as db:
+                db.execute("BEGIN IMMEDIATE")
+                try:
+                    db.execute("INSERT INTO sessions (app_name, user_id, id, state, create_time, update_time)"
+                               " VALUES (?, ?, ?, ?, ?, ?)",
+                               (app_name, user_id, session_id, _dumps(session_state), now, now))
+                    if app_delta:
+                        self._upsert_state(db, "app_states", {"app_name": app_name}, app_delta, now)
+                    if user_delta:
+                        self._upsert_state(db, "user_states", {"app_name": app_name, "user_id": user_id},
+                                           user_delta, now)
+                    shared = self._shared_state(db, app_name, user_id)
+                    db.execute("COMMIT")
+                    return shared
+                except BaseException:
+                    db.execute("ROLLBACK")
+                    raise
+
+        try:
+            app_state, user_state = await asyncio.to_thread(create)
+        except sqlite3.IntegrityError:
+            raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+        session = Session(app_name=app_name, user_id=user_id, id=session_id, state=session_state, events=[],
+                          last_update_time=now)
+        self._cache_put((app_name, user_id, session_id), session, now)
+        return self._view(session, app_state, user_state, None)
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                          config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        entry = self._cache_get(key)
+        if self._pending_keys[key]:
+            if entry is not None:
+                # This worker holds newer events than the database; they are written shortly
+                app_state, user_state = await asyncio.to_thread(self._read_shared_state, app_name, user_id)
+                return self._view(entry.session, app_state, user_state, config)
+            await self._flush_session(key)
+        loaded = await asyncio.to_thread(self._read_session, key, entry.synced_time if entry else None)
+        if loaded is None:
+            self._cache.pop(key, None)
+            return None
+        app_state, user_state, session = loaded
+        if session is None:
+            session = entry.session
+        else:
+            self._cache_put(key, session, session.last_update_time)
+        return self._view(session, app_state, user_state, config)
+
+    def _read_shared_state(self, app_name: str, user_id: str) -> tuple[dict, dict]:
+        with self.pool.connection() as db:
+            return self._shared_state(db, app_name, user_id)
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        await self.flush()
+
+        def read() -> tuple[list, dict, dict]:
+            with self.pool.connection() as db:
+                query = "SELECT id, user_id, state, update_time FROM sessions WHERE app_name=?"
+                params: tuple = (app_name,)
+                if user_id:
+                    query += " AND user_id=?"
+                    params += (user_id,)
+                rows = db.execute(query + " ORDER BY update_time, user_id, id", params).fetchall()
+                app_row = db.execute("SELECT state FROM app_states WHERE app_name=?", (app_name,)).fetchone()
+                user_states = {row[0]: json.loads(row[1]) for row in db.execute(
+                    "SELECT user_id, state FROM user_states WHERE app_name=?", (app_name,))}
+            return rows, (json.loads(app_row[0]) if app_row else {}), user_states
+
+        rows, app_state, user_states = await asyncio.to_thread(read)
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=row[1], id=row[0], events=[], last_update_time=row[3],
+                    state=_merge_state(app_state, user_states.get(row[1], {}), json.loads(row[2])))
+            for row in rows
+        ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        await self._flush_session(key)
+
+        def delete() -> None:
+            with self.pool.connection() as db:
+                db.execute("DELETE FROM sessions WHERE app_name=? AND user_id=? AND id=?", key)
+
+        await asyncio.to_thread(delete)
+        self._cache.pop(key, None)
+
+    async def get_user_state(self, *, app_name: str, user_id: str) -> dict[str, Any]:
+        await self.flush()
+        _, user_state = await asyncio.to_thread(self._read_shared_state, app_name, user_id)
+        return user_state
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        self._apply_temp_state(session, event)
+        event = self._trim_temp_delta_state(event)
+        key = (session.app_name, session.user_id, session.id)
+        pending = _PendingEvent(key, event, event.model_dump_json(exclude_none=True),
+                                _split_state(event.actions.state_delta if event.actions else None),
+                                None if self.write_behind else session.last_update_time)
+
+        if self.write_behind:
+            entry = self._cache_get(key)
+            if entry is not None and entry.session is not session:
+                self._update_session_state(entry.session, event)
+                entry.session.events.append(event)
+                entry.session.last_update_time = event.timestamp
+            self._enqueue(pending)
+        else:
+            pending.future = asyncio.get_running_loop().create_future()
+            self._enqueue(pending)
+            await pending.future
+        session.last_update_time = event.timestamp
+        return self._commit_event_to_session(session, event)
+
+
+def session_service_factory(uri: str, **kwargs: Any) -> CachedSqliteSessionService:
+    """Create the session service for a ``sqlite+wal:///<path>`` URI.
+
+    ``sqlite+wal:///sessions.db`` is relative to the working directory and
+    ``sqlite+wal:////var/lib/agent/sessions.db`` is absolute, as for ADK's
+    ``sqlite://`` URIs. Other keyword arguments (e.g. ``cache_size``) are
+    passed to the service.
+    """
+    path = urlparse(uri).path
+    path = path[1:] if path.startswith("/") else path
+    if not path:
+        raise ValueError(f"Session service URI needs a database path: {uri}")
+    kwargs.pop("agents_dir", None)
+    return CachedSqliteSessionService(path, **kwargs)
+
+
+def register_session_service() -> None:
+    """Make ``sqlite+wal://`` session URIs available to ADK's app factory."""
+    from google.adk.cli.service_registry import get_service_registry
+    get_service_registry().register_session_service(SESSION_SCHEME, session_service_factory)
+
+
+async def flush_sessions() -> None:
+    """Write the buffered events of every session service in this process, e.g. at shutdown."""
+    for service in list(_services):
+        await service.flush()
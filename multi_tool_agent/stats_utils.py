@@ -0,0 +1,291 @@
+"""Mergeable latency statistics shared by the result parsers."""
+import math
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Log-spaced buckets with ~1% relative error, covering 0 ms up to several hours
+_GAMMA = 1.01
+_LOG_GAMMA = math.log(_GAMMA)
+NUM_BUCKETS = 2400
+
+_BUCKET_LOWER = np.expm1(np.arange(NUM_BUCKETS) * _LOG_GAMMA)
+_BUCKET_UPPER = np.expm1((np.arange(NUM_BUCKETS) + 1) * _LOG_GAMMA)
+_BUCKET_MID = (_BUCKET_LOWER + _BUCKET_UPPER) / 2
+
+
+def bucket_index(values: np.ndarray) -> np.ndarray:
+    """Map latencies in milliseconds to histogram bucket indexes."""
+    values = np.maximum(np.asarray(values, dtype=np.float64), 0.0)
+    return np.minimum((np.log1p(values) / _LOG_GAMMA).astype(np.int64), NUM_BUCKETS - 1)
+
+
+class LatencyHistogram:
+    """Fixed-size log-bucketed latency histogram.
+
+    Memory does not grow with the number of samples, and two histograms can be
+    merged exactly, so percentiles of combined runs, shards or windows are
+    computed from the merged counts rather than by averaging percentiles.
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(NUM_BUCKETS, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values: Iterable[float]) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        self.counts += np.bincount(bucket_index(values), minlength=NUM_BUCKETS)
+        self.count += int(values.size)
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def add_counts(self, counts: np.ndarray, total: float, minimum: float, maximum: float) -> None:
+        """Fold in pre-bucketed counts, as produced by a grouped aggregation."""
+        n = int(counts.sum())
+        if n == 0:
+            return
+        self.counts += counts
+        self.count += n
+        self.total += total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        self.add_counts(other.counts, other.total, other.min, other.max)
+        return self
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def percentiles(self, percentiles: Iterable[float] = PERCENTILES) -> dict:
+        """Approximate percentiles (within ~1%), clamped to the observed min/max."""
+        percentiles = list(percentiles)
+        if not self.count:
+            return {p: None for p in percentiles}
+        cumulative = np.cumsum(self.counts)
+        ranks = np.ceil(np.array(percentiles, dtype=np.float64) / 100.0 * self.count).clip(1, self.count)
+        indexes = np.searchsorted(cumulative, ranks)
+        values = np.clip(_BUCKET_MID[indexes], self.min, self.max)
+        return {p: float(v) for p, v in zip(percentiles, values)}
+
+    def to_dict(self) -> dict:
+        """Sparse, JSON-serialisable form of the histogram."""
+        nonzero = np.flatnonzero(self.counts)
+        return {
+            "buckets": nonzero.tolist(),
+            "counts": self.counts[nonzero].tolist(),
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LatencyHistogram":
+        histogram = cls()
+        counts = np.zeros(NUM_BUCKETS, dtype=np.int64)
+        counts[np.asarray(data["buckets"], dtype=np.int64)] = data["counts"]
+        if counts.any():
+            histogram.add_counts(counts, data["total"], data["min"], data["max"])
+        return histogram
+
+
+class EndpointStats:
+    """Running totals for one sampler, request name or endpoint."""
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.errors = 0
+        self.first_timestamp = math.inf
+        self.last_timestamp = -math.inf
+
+    def merge(self, other: "EndpointStats") -> "EndpointStats":
+        self.histogram.merge(other.histogram)
+        self.errors += other.errors
+        self.first_timestamp = min(self.first_timestamp, other.first_timestamp)
+        self.last_timestamp = max(self.last_timestamp, other.last_timestamp)
+        return self
+
+    def summary(self) -> dict:
+        histogram = self.histogram
+        span_seconds = (self.last_timestamp - self.first_timestamp) / 1000.0 if histogram.count else 0.0
+        summary = {
+            "samples": histogram.count,
+            "errors": self.errors,
+            "error_rate": round_stat(100.0 * self.errors / histogram.count) if histogram.count else 0.0,
+            "throughput": round_stat(histogram.count / span_seconds) if span_seconds > 0 else None,
+            "min": round_stat(histogram.min if histogram.count else None),
+            "mean": round_stat(histogram.mean),
+            "max": round_stat(histogram.max if histogram.count else None),
+        }
+        for p, value in histogram.percentiles().items():
+            summary[f"p{p}"] = round_stat(value)
+        return summary
+
+
+class EndpointAggregator:
+    """Vectorised per-endpoint aggregation of latency samples.
+
+    Samples are added in batches of NumPy arrays; each batch is grouped by
+    label with a single ``np.unique`` and folded into fixed-size histograms,
+    so the cost per sample is a handful of array operations and memory is
+    bounded by the number of distinct labels.
+    """
+
+    def __init__(self):
+        self.endpoints: dict[str, EndpointStats] = {}
+
+    def add_batch(self, labels: np.ndarray, elapsed: np.ndarray, success: np.ndarray,
+                  start_timestamps: np.ndarray) -> None:
+        """Add a batch of samples.
+
+        Args:
+            labels: Sample labels (array of str or bytes)
+            elapsed: Response times in milliseconds
+            success: Boolean success flags
+            start_timestamps: Sample start times in epoch milliseconds
+        """
+        if len(labels) == 0:
+            return
+        elapsed = np.asarray(elapsed, dtype=np.float64)
+        start_timestamps = np.asarray(start_timestamps, dtype=np.float64)
+        failures = ~np.asarray(success, dtype=bool)
+        names, groups = np.unique(np.asarray(labels), return_inverse=True)
+        n_groups = len(names)
+
+        bucket_counts = np.bincount(groups * NUM_BUCKETS + bucket_index(elapsed),
+                                    minlength=n_groups * NUM_BUCKETS).reshape(n_groups, NUM_BUCKETS)
+        totals = np.bincount(groups, weights=elapsed, minlength=n_groups)
+        errors = np.bincount(groups, weights=failures, minlength=n_groups)
+        minimums = np.full(n_groups, np.inf)
+        maximums = np.full(n_groups, -np.inf)
+        np.minimum.at(minimums, groups, elapsed)
+        np.maximum.at(maximums, groups, elapsed)
+        first = np.full(n_groups, np.inf)
+        last = np.full(n_groups, -np.inf)
+        np.minimum.at(first, groups, start_timestamps)
+        np.maximum.at(last, groups, start_timestamps + elapsed)
+
+        for i, name in enumerate(names.tolist()):
+            if isinstance(name, bytes):
+                name = name.decode("utf-8", errors="replace")
+            stats = self.endpoints.get(name)
+            if stats is None:
+                stats = self.endpoints[name] = EndpointStats()
+            stats.histogram.add_counts(bucket_counts[i], float(totals[i]), float(minimums[i]), float(maximums[i]))
+            stats.errors += int(errors[i])
+            stats.first_timestamp = min(stats.first_timestamp, float(first[i]))
+            stats.last_timestamp = max(stats.last_timestamp, float(last[i]))
+
+    def merge(self, other: "EndpointAggregator") -> "EndpointAggregator":
+        for name, stats in other.endpoints.items():
+            self.endpoints.setdefault(name, EndpointStats()).merge(stats)
+        return self
+
+    def total(self) -> EndpointStats:
+        total = EndpointStats()
+        for stats in self.endpoints.values():
+            total.merge(stats)
+        return total
+
+    def summary(self) -> dict:
+        """Report with a ``total`` row and one row per label, sorted by label.
+
+        The sparse latency histogram of each label is kept under ``histograms``,
+        so that runs can later be compared or merged exactly.
+        """
+        total = self.total()
+        names = sorted(self.endpoints)
+        return {
+            "start_time": total.first_timestamp if total.histogram.count else None,
+            "end_time": total.last_timestamp if total.histogram.count else None,
+            "total": total.summary(),
+            "labels": {name: self.endpoints[name].summary() for name in names},
+            "histograms": {name: self.endpoints[name].histogram.to_dict() for name in names},
+        }
+
+
+class ThroughputTimeline:
+    """Requests and errors per whole second of a run, built from sample timestamps."""
+
+    def __init__(self):
+        self.start_second: Optional[int] = None
+        self.requests = np.zeros(0, dtype=np.int64)
+        self.errors = np.zeros(0, dtype=np.int64)
+
+    def add(self, timestamps_ms: np.ndarray, failures: np.ndarray) -> None:
+        seconds = (np.asarray(timestamps_ms, dtype=np.float64) // 1000).astype(np.int64)
+        if seconds.size == 0:
+            return
+        first = int(seconds.min())
+        if self.start_second is None:
+            self.start_second = first
+        elif first < self.start_second:
+            shift = self.start_second - first
+            self.requests = np.concatenate((np.zeros(shift, dtype=np.int64), self.requests))
+            self.errors = np.concatenate((np.zeros(shift, dtype=np.int64), self.errors))
+            self.start_second = first
+        offsets = seconds - self.start_second
+        length = max(self.requests.size, int(offsets.max()) + 1)
+        self.requests = _grow(self.requests, length) + np.bincount(offsets, minlength=length)
+        self.errors = _grow(self.errors, length) + np.bincount(offsets, weights=np.asarray(failures, dtype=bool),
+                                                               minlength=length).astype(np.int64)
+
+    def merge(self, other: "ThroughputTimeline") -> "ThroughputTimeline":
+        """Fold in the timeline of another process of the same run, e.g. another k6 execution segment."""
+        if other.start_second is None:
+            return self
+        if self.start_second is None:
+            self.start_second, self.requests, self.errors = other.start_second, other.requests.copy(), other.errors.copy()
+            return self
+        start = min(self.start_second, other.start_second)
+        length = max(self.start_second + self.requests.size, other.start_second + other.requests.size) - start
+        requests, errors = np.zeros(length, dtype=np.int64), np.zeros(length, dtype=np.int64)
+        for timeline in (self, other):
+            offset = timeline.start_second - start
+            requests[offset:offset + timeline.requests.size] += timeline.requests
+            errors[offset:offset + timeline.errors.size] += timeline.errors
+        self.start_second, self.requests, self.errors = start, requests, errors
+        return self
+
+    def summary(self) -> dict:
+        if self.start_second is None:
+            return {"start_second": None, "requests": [], "errors": [], "peak_rps": None, "mean_rps": None}
+        return {
+            "start_second": self.start_second,
+            "requests": self.requests.tolist(),
+            "errors": self.errors.tolist(),
+            "peak_rps": int(self.requests.max()),
+            "mean_rps": round_stat(float(self.requests.mean())),
+        }
+
+
+def _grow(array: np.ndarray, length: int) -> np.ndarray:
+    if array.size >= length:
+        return array
+    return np.concatenate((array, np.zeros(length - array.size, dtype=array.dtype)))
+
+
+def round_stat(value: Optional[float], digits: int = 2) -> Optional[float]:
+    return None if value is None else round(value, digits)
+
+
+def format_summary(report: dict[str, Any]) -> str:
+    """Render a parsed report as a fixed-width table."""
+    columns = ["samples", "errors", "error_rate", "throughput", "mean"] + [f"p{p}" for p in PERCENTILES] + ["max"]
+    headers = ["label", "samples", "errors", "err%", "req/s", "mean", *[f"p{p}" for p in PERCENTILES], "max"]
+    rows = [("TOTAL", report["total"])] + list(report["labels"].items())
+    width = max(len(headers[0]), *(len(name) for name, _ in rows))
+    lines = ["  ".join([headers[0].ljust(width)] + [h.rjust(10) for h in headers[1:]])]
+    for name, stats in rows:
+        cells = ["-" if stats.get(column) is None else str(stats[column]) for column in columns]
+        lines.append("  ".join([name.ljust(width)] + [cell.rjust(10) for cell in cells]))
+    return "\n".join(lines)
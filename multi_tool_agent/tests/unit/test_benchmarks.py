@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from benchmarks.run_benchmarks import compare_results
+from benchmarks.standins import install_standins, make_gatling_project
+from multi_tool_agent.gatling_utils import run_gatling_result
+from multi_tool_agent.jmeter_utils import run_jmeter_result
+from multi_tool_agent.k6_utils import run_k6_result
+from multi_tool_agent.locust_utils import run_locust_result
+
+SAMPLE = Path(__file__).resolve().parents[2] / "sample"
+
+
+class TestStandIns(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        root = Path(self.workdir.name)
+        self.bins = install_standins(root / "bin")
+        self.env = patch.dict(os.environ, {
+            "BENCH_ROWS": "500", "BENCH_CONSOLE_LINES": "50",
+            "JMETER_BIN": str(self.bins["jmeter"]), "K6_BIN": str(self.bins["k6"]),
+            "LOCUST_BIN": str(self.bins["locust"]),
+            "JMETER_RESULTS_DIR": str(root / "results"), "K6_RESULTS_DIR": str(root / "results"),
+            "LOCUST_RESULTS_DIR": str(root / "results"), "GATLING_BUILD_CACHE_DIR": str(root / "build-cache"),
+        })
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.workdir.cleanup()
+
+    async def test_jmeter_stand_in_writes_a_parsable_jtl(self):
+        """Test the JMeter stand-in honours the runner's command line"""
+        result = await run_jmeter_result(str(SAMPLE / "hello.jmx"))
+        self.assertEqual(result.status, "success", result.error)
+        self.assertEqual(result.report["total"]["samples"], 500)
+        self.assertEqual(len(result.report["labels"]), 8)
+
+    async def test_k6_stand_in_writes_summary_and_points(self):
+        """Test the k6 stand-in writes both the summary export and the NDJSON stream"""
+        result = await run_k6_result(str(SAMPLE / "hello.js"), json_output=True)
+        self.assertEqual(result.status, "success", result.error)
+        self.assertEqual(result.report["total"]["samples"], 500)
+        self.assertIn("summary_export", result.artifacts)
+
+    async def test_locust_stand_in_writes_csv_history(self):
+        """Test the Locust stand-in writes the CSV files requested with --csv"""
+        result = await run_locust_result(str(SAMPLE / "hello.py"), csv_full_history=True)
+        self.assertEqual(result.status, "success", result.error)
+        self.assertTrue(result.report["timeline"]["rps"])
+
+    async def test_mvnw_stand_in_writes_a_simulation_log(self):
+        """Test the Maven wrapper stand-in leaves a Gatling results folder behind"""
+        project = make_gatling_project(Path(self.workdir.name) / "gatling", self.bins["mvnw"])
+        result = await run_gatling_result(str(project), runner="mvn")
+        self.assertEqual(result.status, "success", result.error)
+        self.assertEqual(result.report["total"]["samples"], 500)
+
+
+class TestCompareResults(unittest.TestCase):
+    def test_regressions_respect_direction_and_noise(self):
+        """Test slower, leaner and noise-level changes are told apart"""
+        baseline = {"scenarios": {"parse_jtl": {"seconds": 2.0, "rows_per_s": 500_000, "peak_rss_mb": 100.0},
+                                  "server": {"status_p95_ms": 0.5}}}
+        current = {"scenarios": {"parse_jtl": {"seconds": 3.0, "rows_per_s": 330_000, "peak_rss_mb": 60.0},
+                                 "server": {"status_p95_ms": 1.5}}}
+        regressions = compare_results(current, baseline, tolerance=0.25)
+        self.assertEqual({(entry["scenario"], entry["metric"]) for entry in regressions},
+                         {("parse_jtl", "seconds"), ("parse_jtl", "rows_per_s")})
+        self.assertEqual(regressions[0]["change_pct"], 50.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from multi_tool_agent import cache_utils
+from multi_tool_agent.cache_utils import ReportCache, analyze_results, cached_report, parse_fresh
+
+JTL_HEADER = ("timeStamp,elapsed,label,responseCode,responseMessage,threadName,dataType,success,failureMessage,"
+              "bytes,sentBytes,grpThreads,allThreads,URL,Latency,IdleTime,Connect\n")
+
+
+def write_jtl(path: str, rows: int = 2000, slow: int = 0) -> None:
+    with open(path, "w") as f:
+        f.write(JTL_HEADER)
+        for i in range(rows):
+            f.write(f"{1700000000000 + i * 5},{40 + i % 60 + slow},GET /api/{i % 5},200,OK,Users 1-1,text,"
+                    f"{'false' if i % 40 == 0 else 'true'},,512,128,1,1,http://localhost/api,10,0,2\n")
+
+
+class TestReportCache(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.cache = ReportCache(os.path.join(self.root.name, "cache"), max_disk_mb=1, max_memory_mb=1)
+        self.singleton = patch.object(cache_utils, "_cache", self.cache)
+        self.singleton.start()
+        self.env = patch.dict(os.environ, {"FEATHERWAND_RUNS_DIR": os.path.join(self.root.name, "runs"),
+                                           "FEATHERWAND_HISTORY_DB": os.path.join(self.root.name, "history.db")})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.singleton.stop()
+        self.root.cleanup()
+
+    def test_same_content_is_parsed_once(self):
+        """Test a report is parsed once per content, whatever the file name, and again once the file changes"""
+        calls = []
+
+        def parser(path):
+            calls.append(path)
+            with open(path) as f:
+                return {"lines": len(f.readlines())}
+
+        first, copy = (os.path.join(self.root.name, name) for name in ("first.jtl", "copy.jtl"))
+        write_jtl(first)
+        write_jtl(copy)
+        self.assertEqual(cached_report(parser, first), {"lines": 2001})
+        cached_report(parser, first)["lines"] = 0
+        self.assertEqual(cached_report(parser, copy), {"lines": 2001})
+        self.assertEqual(calls, [first])
+        write_jtl(first, rows=10)
+        self.assertEqual(cached_report(parser, first), {"lines": 11})
+        # A new process finds the reports on disk
+        fresh = ReportCache(self.cache.directory, max_disk_mb=1, max_memory_mb=1)
+        with patch.object(cache_utils, "_cache", fresh):
+            cached_report(parser, copy)
+        self.assertEqual(len(calls), 2)
+
+    def test_fresh_results_are_not_hashed(self):
+        """Test results a run just wrote are parsed without hashing them, and found again by their stamp"""
+        calls = []
+
+        def parser(path):
+            calls.append(path)
+            return {"path": str(path)}
+
+        jtl = os.path.join(self.root.name, "run.jtl")
+        write_jtl(jtl)
+        with patch.object(self.cache, "file_hash", side_effect=AssertionError("hashed")):
+            self.assertEqual(parse_fresh(parser, jtl), {"path": jtl})
+        self.assertEqual(cached_report(parser, jtl), {"path": jtl})
+        self.assertEqual(len(calls), 1)
+        # Filed under the content from then on, so a copy is a hit too
+        copy = os.path.join(self.root.name, "copy.jtl")
+        write_jtl(copy)
+        cached_report(parser, copy)
+        self.assertEqual(len(calls), 1)
+
+    def test_evicts_least_recently_used(self):
+        """Test the disk and memory bounds evict the least recently used entries first"""
+        cache = ReportCache(os.path.join(self.root.name, "small"), max_disk_mb=0.25, max_memory_mb=0.1)
+        value = "x" * 40_000
+        for i in range(5):
+            cache.put(f"{i:02d}key", value)
+            os.utime(cache._path(f"{i:02d}key"), (1e9 + i, 1e9 + i))
+        self.assertLessEqual(cache._memory_bytes, 0.1 * 2**20)
+        self.assertEqual(list(cache._memory), ["03key", "04key"])
+        cache.get("00key")
+        for i in range(5, 8):
+            cache.put(f"{i:02d}key", value)
+        on_disk = sorted(path.stem for _, _, path in cache._entries())
+        self.assertIn("00key", on_disk)
+        self.assertNotIn("01key", on_disk)
+        self.assertLessEqual(sum(size for _, size, _ in cache._entries()), 0.25 * 2**20)
+
+    def test_analyze_result_file(self):
+        """Test a result file is saved as a run once and its digest is served from the cache afterwards"""
+        jtl = os.path.join(self.root.name, "results.jtl")
+        write_jtl(jtl)
+        digest = analyze_results(jtl)
+        self.assertFalse(digest["cached"])
+        self.assertEqual(digest["total"]["samples"], 2000)
+        self.assertIn("jtl", digest["artifacts"])
+        again = analyze_results(jtl)
+        self.assertTrue(again["cached"])
+        self.assertEqual(again["run_id"], digest["run_id"])
+        self.assertFalse(analyze_results(digest["run_id"])["cached"])
+        self.assertTrue(analyze_results(digest["run_id"])["cached"])
+        write_jtl(jtl, slow=500)
+        changed = analyze_results(jtl)
+        self.assertNotEqual(changed["run_id"], digest["run_id"])
+        with self.assertRaises(ValueError):
+            analyze_results(os.path.join(self.root.name, "unknown.txt"))
+
+    def test_disabled_cache_always_parses(self):
+        """Test a cache of size 0 parses every time and writes nothing"""
+        cache = ReportCache(os.path.join(self.root.name, "off"), max_disk_mb=0)
+        jtl = os.path.join(self.root.name, "results.jtl")
+        write_jtl(jtl)
+        calls = []
+        with patch.object(cache_utils, "_cache", cache):
+            for _ in range(2):
+                cached_report(lambda path: calls.append(path) or {}, jtl)
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(os.path.exists(cache.directory))
+
+
+if __name__ == "__main__":
+    unittest.main()
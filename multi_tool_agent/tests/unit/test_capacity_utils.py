@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from multi_tool_agent.capacity_utils import SLO, CapacitySearch, ProbeError, k6_probe, locust_probe
+from multi_tool_agent.digest_utils import digest_run
+from multi_tool_agent.process_utils import ProcessResult
+from multi_tool_agent.run_utils import RunResult
+
+
+def service(capacity_rps: float = 500, base_ms: float = 50, error_users: int = 0):
+    """A fake probe runner: each user makes 20 req/s until the service saturates, then latency queues up."""
+    calls = []
+
+    async def probe(users: int, seconds: int) -> RunResult:
+        calls.append((users, seconds))
+        throughput = min(users * 20, capacity_rps)
+        p95 = base_ms * max(1.0, users * 20 / capacity_rps)
+        error_rate = 5.0 if error_users and users >= error_users else 0.0
+        samples = int(throughput * seconds)
+        total = {"samples": samples, "errors": int(samples * error_rate / 100), "error_rate": error_rate,
+                 "throughput": throughput, "p95": p95}
+        return RunResult("k6", "success", output=f"{users} users", report={"total": total, "labels": {}})
+
+    probe.calls = calls
+    return probe
+
+
+class TestCapacitySearch(IsolatedAsyncioTestCase):
+    async def test_binary_search_brackets_the_knee(self):
+        """Test doubling then bisecting stops at the saturation point with few probes"""
+        probe = service(capacity_rps=500)
+        search = CapacitySearch(probe, SLO(latency_ms=1000), start_users=2, max_users=1000)
+        result = await search.run()
+        # The service saturates at 25 users; beyond it throughput stops growing
+        self.assertGreaterEqual(result.max_users, 25)
+        self.assertLessEqual(result.max_users, 28)
+        self.assertEqual(result.max_throughput, 500)
+        self.assertIn("saturated", result.limited_by)
+        self.assertLessEqual(len(result.probes), 8)
+        self.assertEqual([users for users, _ in probe.calls[:5]], [2, 4, 8, 16, 32])
+
+    async def test_step_mode_stops_at_first_breach(self):
+        """Test the step mode adds start_users per probe and stops at the first SLO breach"""
+        probe = service(capacity_rps=2000, error_users=40)
+        result = await CapacitySearch(probe, SLO(latency_ms=1000), start_users=10, max_users=100,
+                                      mode="step").run()
+        self.assertEqual([p.users for p in result.probes], [10, 20, 30, 40])
+        self.assertEqual(result.max_users, 30)
+        self.assertTrue(result.limited_by.startswith("error rate 5% over 1%"))
+
+    async def test_probes_near_a_limit_are_extended(self):
+        """Test a probe close to the latency SLO is run again with longer windows"""
+        probe = service(capacity_rps=200, base_ms=50)
+        result = await CapacitySearch(probe, SLO(latency_ms=55), start_users=10, max_users=10).run()
+        self.assertEqual(probe.calls, [(10, 15), (10, 30), (10, 60)])
+        self.assertEqual(result.probes[0].duration_s, 60)
+        self.assertEqual(result.probe_seconds, 105)
+        self.assertEqual(result.limited_by, "max_users 10 reached")
+
+    async def test_probe_without_report_stops_the_search(self):
+        """Test a probe that produced no report raises instead of being judged"""
+        async def broken(users: int, seconds: int) -> RunResult:
+            return RunResult("k6", "error", error="k6: script error")
+
+        with self.assertRaises(ProbeError):
+            await CapacitySearch(broken, SLO()).run()
+        with self.assertRaises(ValueError):
+            CapacitySearch(broken, SLO(), mode="random")
+
+    async def test_k6_probes_check_p99_and_crossed_thresholds(self):
+        """Test k6 probes export p99 and a probe crossing the script's thresholds is judged failing"""
+        script = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                              "sample", "hello.js")
+        commands = []
+
+        async def k6(cmd, **kwargs):
+            commands.append(cmd)
+            vus = int(cmd[cmd.index("-u") + 1])
+            duration = {"count": vus * 100, "rate": vus * 10.0, "p(95)": 80.0, "p(99)": 120.0}
+            metrics = {"http_reqs": duration, "http_req_failed": {"passes": 0},
+                       "http_req_duration": {**duration, "thresholds": {"p(99)<100": True}}}
+            with open(cmd[cmd.index("--summary-export") + 1], "w") as f:
+                json.dump({"metrics": metrics}, f)
+            return ProcessResult(returncode=99 if vus > 10 else 0, stdout="", stderr="thresholds crossed")
+
+        with tempfile.TemporaryDirectory() as results, \
+                patch.dict(os.environ, {"K6_RESULTS_DIR": results, "HEALTH_SAMPLE_INTERVAL": "0"}), \
+                patch("multi_tool_agent.k6_utils.run_process", side_effect=k6):
+            result = await CapacitySearch(k6_probe(script), SLO(latency_ms=1000, percentile="p99"),
+                                          start_users=10, max_users=1000).run()
+        self.assertIn("p(99)", commands[0][commands[0].index("--summary-trend-stats") + 1])
+        self.assertEqual(result.probes[0].latency_ms, 120.0)
+        self.assertEqual(result.max_users, 10)
+        self.assertTrue(result.limited_by.startswith("k6 thresholds crossed: http_req_duration: p(99)<100"))
+        with self.assertRaises(ValueError):
+            CapacitySearch(k6_probe(script), SLO(percentile="p999"))
+
+    async def test_locust_probes_leave_the_ramp_out(self):
+        """Test a Locust probe runs its window on top of the spawn ramp and resets its statistics after it"""
+        test_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                 "sample", "hello.py")
+        commands = []
+
+        async def locust(cmd, **kwargs):
+            commands.append(cmd)
+            if "--master" in cmd:
+                with open(cmd[cmd.index("--csv") + 1] + "_stats.csv", "w") as f:
+                    f.write("Type,Name,Request Count,Failure Count,Average Response Time,Requests/s,95%\n"
+                            ",Aggregated,120,0,40.0,8.0,80\n")
+            return ProcessResult(returncode=0, stdout="", stderr="")
+
+        with tempfile.TemporaryDirectory() as results, \
+                patch.dict(os.environ, {"LOCUST_RESULTS_DIR": results, "HEALTH_SAMPLE_INTERVAL": "0",
+                                        "CAPACITY_RAMP_S": "5"}), \
+                patch("multi_tool_agent.locust_utils.run_process", side_effect=locust):
+            result = await locust_probe(test_file, "http://localhost", workers=2)(50, 15)
+        master = next(cmd for cmd in commands if "--master" in cmd)
+        self.assertEqual(master[master.index("-r") + 1], "10")
+        self.assertEqual(master[master.index("-t") + 1], "20s")
+        self.assertTrue(all("--reset-stats" in cmd for cmd in commands))
+        self.assertEqual(result.report["total"]["samples"], 120)
+
+    async def test_digest_carries_the_capacity(self):
+        """Test the run of a search reports the best probe and summarises every probe in its digest"""
+        search = CapacitySearch(service(), SLO(latency_ms=1000), start_users=5, max_users=1000)
+        await search.run()
+        result = search.run_result("k6")
+        self.assertEqual(result.report["total"]["throughput"], search.result.max_throughput)
+        self.assertIn("Max sustainable", result.output)
+        digest = digest_run(result, "k6-20260101-000000-00000000")
+        self.assertEqual(digest["capacity"]["max_users"], search.result.max_users)
+        self.assertEqual(len(digest["capacity"]["probes"]), len(search.result.probes))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from multi_tool_agent.compare_utils import IMPROVEMENT, NO_CHANGE, REGRESSION, compare_runs, ks_test, mann_whitney
+from multi_tool_agent.history_utils import record_run, set_baseline
+from multi_tool_agent.run_utils import RunResult
+from multi_tool_agent.stats_utils import NUM_BUCKETS, EndpointAggregator, bucket_index
+
+
+def make_report(rng, checkout_scale: float = 1.0, checkout_errors: float = 0.0, n: int = 20_000) -> dict:
+    aggregator = EndpointAggregator()
+    labels = rng.choice(np.array(["GET /checkout", "GET /home", "GET /search"]), size=n)
+    elapsed = rng.lognormal(4, 0.4, size=n)
+    elapsed[labels == "GET /checkout"] *= checkout_scale
+    success = ~((labels == "GET /checkout") & (rng.random(n) < checkout_errors))
+    aggregator.add_batch(labels, elapsed, success, np.arange(n) * 5.0)
+    return aggregator.summary()
+
+
+def bucketed(values: np.ndarray) -> np.ndarray:
+    return np.bincount(bucket_index(values), minlength=NUM_BUCKETS)[None, :]
+
+
+class TestSignificanceTests(unittest.TestCase):
+    def test_identical_and_shifted_distributions(self):
+        """Test the bucketed tests find no difference between equal runs and a clear one after a shift"""
+        rng = np.random.default_rng(3)
+        base = bucketed(rng.lognormal(4, 0.5, 50_000))
+        same = bucketed(rng.lognormal(4, 0.5, 50_000))
+        slower = bucketed(rng.lognormal(4.1, 0.5, 50_000))
+        effect, _, p = mann_whitney(np.vstack([base, base]), np.vstack([same, slower]))
+        d, ks_p = ks_test(np.vstack([base, base]), np.vstack([same, slower]))
+        self.assertGreater(p[0], 0.01)
+        self.assertGreater(ks_p[0], 0.01)
+        self.assertLess(p[1], 1e-10)
+        self.assertLess(ks_p[1], 1e-10)
+        # Cliff's delta of a 0.1 log-normal shift is about 2 * Phi(0.1 / (0.5 * sqrt 2)) - 1
+        self.assertAlmostEqual(effect[1], 0.11, delta=0.02)
+        self.assertGreater(d[1], d[0])
+
+
+class TestCompareRuns(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {"FEATHERWAND_HISTORY_DB": os.path.join(self.root.name, "history.db")})
+        self.env.start()
+        self.script = os.path.join(self.root.name, "test.jmx")
+        open(self.script, "w").close()
+        self.rng = np.random.default_rng(7)
+
+    def tearDown(self):
+        self.env.stop()
+        self.root.cleanup()
+
+    def record(self, run_id: str, **kwargs):
+        record_run(run_id, RunResult("jmeter", "success", report=make_report(self.rng, **kwargs)),
+                   {"script": self.script})
+
+    def test_slower_endpoint_is_a_regression(self):
+        """Test a slower endpoint is flagged against the previous run, unchanged ones are not"""
+        self.record("jmeter-base")
+        self.record("jmeter-new", checkout_scale=1.3)
+        comparison = compare_runs("jmeter-new")
+        self.assertEqual(comparison["baseline_run_id"], "jmeter-base")
+        self.assertEqual(comparison["verdict"], REGRESSION)
+        self.assertEqual(comparison["regressions"], 1)
+        checkout = comparison["changed_endpoints"][0]
+        self.assertEqual(checkout["endpoint"], "GET /checkout")
+        self.assertAlmostEqual(checkout["p95_change_pct"], 30, delta=5)
+        self.assertLess(checkout["mann_whitney_p"], 0.01)
+        self.assertEqual(comparison["endpoints_compared"], 3)
+
+    def test_error_rate_and_baseline(self):
+        """Test error rate increases are regressions and a pinned baseline is preferred"""
+        self.record("jmeter-errors", checkout_errors=0.2)
+        self.record("jmeter-fixed")
+        set_baseline("jmeter-errors")
+        self.record("jmeter-next")
+        comparison = compare_runs("jmeter-next")
+        self.assertEqual(comparison["baseline_run_id"], "jmeter-errors")
+        self.assertEqual(comparison["verdict"], IMPROVEMENT)
+        self.assertEqual(compare_runs("jmeter-errors", "jmeter-next")["verdict"], REGRESSION)
+        self.assertEqual(compare_runs("jmeter-next", "jmeter-fixed")["verdict"], NO_CHANGE)
+
+    def test_missing_baseline(self):
+        """Test a first run has nothing to be compared with"""
+        self.record("jmeter-first")
+        with self.assertRaises(ValueError):
+            compare_runs("jmeter-first")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from multi_tool_agent.digest_utils import detect_anomalies, digest_run, estimate_tokens
+from multi_tool_agent.run_utils import RunResult, prune_runs, read_artifact, save_run
+from multi_tool_agent.stats_utils import EndpointAggregator
+
+
+def make_report(n_labels: int = 50) -> dict:
+    rng = np.random.default_rng(11)
+    aggregator = EndpointAggregator()
+    labels = np.array([f"GET /api/resource/{i % n_labels}" for i in range(20_000)])
+    elapsed = rng.lognormal(4, 0.5, size=labels.size)
+    elapsed[labels == "GET /api/resource/7"] *= 20
+    success = labels != "GET /api/resource/3"
+    aggregator.add_batch(labels, elapsed, success, np.arange(labels.size) * 3.0)
+    return aggregator.summary()
+
+
+class TestDigest(unittest.TestCase):
+    def test_digest_fits_token_budget(self):
+        """Test a large report is trimmed to the token budget, slowest endpoints first"""
+        result = RunResult("jmeter", "success", output="summary line\n" * 5000, report=make_report())
+        digest = digest_run(result, token_budget=200)
+        self.assertLessEqual(estimate_tokens(digest), 200)
+        self.assertTrue(digest["truncated"])
+        self.assertEqual(digest["total"]["samples"], 20_000)
+        self.assertEqual(digest["endpoints"], 50)
+        self.assertEqual(digest["slowest"][0]["endpoint"], "GET /api/resource/7")
+
+    def test_digest_reports_errors_and_anomalies(self):
+        """Test failing endpoints and long latency tails are surfaced"""
+        digest = digest_run(RunResult("jmeter", "success", report=make_report()))
+        self.assertNotIn("truncated", digest)
+        self.assertEqual(digest["errors"][0]["endpoint"], "GET /api/resource/3")
+        self.assertIn("overall error rate is 2.0%", digest["anomalies"])
+        self.assertIn("GET /api/resource/3: 100.0% errors", digest["anomalies"])
+
+    def test_timeline_anomalies(self):
+        """Test throughput dips and late latency growth are detected from a timeline"""
+        report = {"total": {}, "labels": {}, "timeline": {
+            "rps": [5, 100, 100, 100, 20, 100, 100, 100, 3],
+            "failures_per_s": [0] * 9,
+            "p95": [50, 50, 55, 50, 60, 150, 150, 160, 170],
+        }}
+        anomalies = detect_anomalies(report)
+        self.assertTrue(any(anomaly.startswith("throughput fell below 50%") for anomaly in anomalies))
+        self.assertTrue(any(anomaly.startswith("p95 latency rose") for anomaly in anomalies))
+
+    def test_failed_run_keeps_error_tail(self):
+        """Test a failed run digest carries the end of the error output"""
+        error = "Error executing k6 test:\n" + "\n".join(f"line {i}" for i in range(100))
+        digest = digest_run(RunResult("k6", "error", error=error))
+        self.assertEqual(digest["status"], "error")
+        self.assertTrue(digest["error"].endswith("line 99"))
+
+    def test_generator_bottleneck_comes_first(self):
+        """Test a saturated load generator is the first anomaly and its health is summarised"""
+        health = {"usable_cpus": 2, "cpu_percent": {"mean": 195.0, "max": 200.0}, "rss_mb": {"mean": 300, "max": 310},
+                  "bottleneck": True, "findings": ["load generator CPU saturated (usable CPUs: 2) in 80% of the run"],
+                  "samples": [{"t": 0.0, "cpu_percent": 200.0}]}
+        digest = digest_run(RunResult("k6", "success", report=make_report(), health=health), "k6-run")
+        self.assertTrue(digest["anomalies"][0].startswith("load generator bottleneck: load generator CPU"))
+        self.assertEqual(digest["generator"]["bottleneck"], True)
+        self.assertNotIn("samples", digest["generator"])
+        self.assertIn("health", digest["artifacts"])
+
+
+class TestRunStore(unittest.TestCase):
+    def setUp(self):
+        self.runs_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {"FEATHERWAND_RUNS_DIR": self.runs_dir.name})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.runs_dir.cleanup()
+
+    def test_save_and_read_artifact_windows(self):
+        """Test saved output is read back a window at a time"""
+        output = "".join(f"line {i}\n" for i in range(1000))
+        run_id = save_run(RunResult("locust", "success", output=output, report={"total": {}}))
+        window = read_artifact(run_id, "output", max_bytes=100)
+        self.assertEqual(window["content"], output[:100])
+        self.assertEqual(window["next_offset"], 100)
+        tail = read_artifact(run_id, "output", offset=-9)
+        self.assertEqual(tail["content"], "line 999\n")
+        self.assertIsNone(tail["next_offset"])
+
+    def test_unknown_artifacts_and_runs_are_rejected(self):
+        """Test unknown artifact names and malformed run ids raise errors"""
+        run_id = save_run(RunResult("jmeter", "success", output="ok"))
+        with self.assertRaises(ValueError):
+            read_artifact(run_id, "jtl")
+        with self.assertRaises(ValueError):
+            read_artifact("../../etc", "output")
+
+    def test_prunes_oldest_runs(self):
+        """Test only the newest runs are kept"""
+        run_ids = [save_run(RunResult("k6", "success", output=str(i))) for i in range(4)]
+        for age, run_id in enumerate(reversed(run_ids)):
+            os.utime(os.path.join(self.runs_dir.name, run_id), (1e9 - age, 1e9 - age))
+        prune_runs(keep=2)
+        self.assertEqual(sorted(os.listdir(self.runs_dir.name)), sorted(run_ids[-2:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import unittest
+import tempfile
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from multi_tool_agent.gatling_results import (
+    SimulationLogAggregator, find_results_dir, parse_results_dir, parse_simulation_log,
+)
+from multi_tool_agent.gatling_utils import run_gatling_simulation
+from multi_tool_agent.process_utils import ProcessResult
+
+SIMULATION_LOG = "\n".join([
+    "RUN\texample.BasicSimulation\tbasicsimulation\t1700000000000\t \t3.9.5",
+    "USER\tScenario\tSTART\t1700000000000",
+    "REQUEST\t\tSession\t1700000000000\t1700000000120\tOK\t ",
+    "REQUEST\t\tSession\t1700000000500\t1700000000580\tOK\t ",
+    "REQUEST\tCheckout\tPay\t1700000001000\t1700000001900\tKO\tstatus.find.is(200), but actually found 500",
+    "REQUEST\tScenario\t1\t\tSession\t1700000002000\t1700000002060\tOK\t ",
+    "REQUEST\tgarbage",
+    "USER\tScenario\tEND\t1700000003000",
+]) + "\n"
+
+STATS_JSON = {
+    "type": "GROUP", "name": "All Requests",
+    "stats": {
+        "name": "All Requests",
+        "numberOfRequests": {"total": 10, "ok": 9, "ko": 1},
+        "minResponseTime": {"total": 50}, "maxResponseTime": {"total": 900}, "meanResponseTime": {"total": 150},
+        "percentiles1": {"total": 100}, "percentiles2": {"total": 120}, "percentiles3": {"total": 700},
+        "percentiles4": {"total": 880}, "meanNumberOfRequestsPerSecond": {"total": 5.0},
+    },
+    "contents": {
+        "req_session": {
+            "type": "REQUEST", "name": "Session",
+            "stats": {
+                "name": "Session",
+                "numberOfRequests": {"total": 10, "ok": 9, "ko": 1},
+                "minResponseTime": {"total": 50}, "maxResponseTime": {"total": 900}, "meanResponseTime": {"total": 150},
+                "percentiles1": {"total": 100}, "percentiles2": {"total": 120}, "percentiles3": {"total": 700},
+                "percentiles4": {"total": 880}, "meanNumberOfRequestsPerSecond": {"total": 5.0},
+            },
+        },
+    },
+}
+
+
+def make_results_dir(root, name, log=SIMULATION_LOG):
+    results_dir = Path(root) / "target" / "gatling" / name
+    results_dir.mkdir(parents=True)
+    (results_dir / "simulation.log").write_text(log)
+    return results_dir
+
+
+class TestGatlingResults(unittest.TestCase):
+    def setUp(self):
+        self.project = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.project.cleanup()
+
+    def test_parse_text_simulation_log(self):
+        """Test REQUEST records in both column layouts are aggregated per request"""
+        results_dir = make_results_dir(self.project.name, "basicsimulation-20240101000000000")
+        report = parse_simulation_log(results_dir / "simulation.log", chunk_bytes=64)
+        self.assertEqual(report["labels"]["Session"]["samples"], 3)
+        self.assertEqual(report["labels"]["Checkout / Pay"]["errors"], 1)
+        self.assertAlmostEqual(report["labels"]["Checkout / Pay"]["max"], 900)
+        self.assertEqual(report["total"]["samples"], 4)
+        self.assertEqual(report["users"], 1)
+        self.assertEqual(report["timeline"]["requests"], [2, 1, 1])
+        self.assertEqual(report["timeline"]["errors"], [0, 1, 0])
+
+    def test_vectorised_block_matches_line_parsing(self):
+        """Test the NumPy fast path agrees with line-by-line parsing"""
+        lines = [f"REQUEST\t{'Group' if i % 4 == 0 else ''}\treq{i % 3}\t{1700000000000 + i * 7}\t{1700000000000 + i * 7 + i % 500}\t{'KO' if i % 9 == 0 else 'OK'}\t "
+                 for i in range(300)]
+        fast, slow = SimulationLogAggregator(), SimulationLogAggregator()
+        fast.feed_block(("\n".join(lines) + "\n").encode())
+        slow.feed_lines(lines)
+        self.assertEqual(fast.summary(), slow.summary())
+
+    def test_binary_log_falls_back_to_stats_json(self):
+        """Test a binary simulation.log is summarised from the report's stats.json"""
+        results_dir = make_results_dir(self.project.name, "basicsimulation-20240101000000000", log="\x00\x01binary")
+        (results_dir / "js").mkdir()
+        (results_dir / "js" / "stats.json").write_text(json.dumps(STATS_JSON))
+        report = parse_results_dir(results_dir)
+        self.assertEqual(report["labels"]["Session"]["p95"], 700)
+        self.assertEqual(report["total"]["errors"], 1)
+
+    def test_find_results_dir_picks_newest_since_start(self):
+        """Test the locator ignores folders from earlier runs"""
+        old = make_results_dir(self.project.name, "basicsimulation-20240101000000000")
+        os.utime(old, (time.time() - 3600, time.time() - 3600))
+        started = time.time() - 10
+        new = make_results_dir(self.project.name, "basicsimulation-20240101010000000")
+        self.assertEqual(find_results_dir(self.project.name, since=started, class_name="example.BasicSimulation"), new)
+        os.utime(new, (time.time() - 60, time.time() - 60))
+        self.assertIsNone(find_results_dir(self.project.name, since=started))
+
+
+class TestRunGatlingResults(IsolatedAsyncioTestCase):
+    async def test_run_gatling_simulation_reports_results(self):
+        """Test the runner summarises the results folder of the run it started"""
+        with tempfile.TemporaryDirectory() as project:
+            Path(project, "mvnw").write_text("#!/bin/sh\n")
+
+            async def fake_run(cmd, **kwargs):
+                make_results_dir(project, "basicsimulation-20240101000000000")
+                return ProcessResult(returncode=0, stdout="[INFO] BUILD SUCCESS\n", stderr="")
+
+            with patch('multi_tool_agent.gatling_utils.run_process', side_effect=fake_run):
+                result = await run_gatling_simulation(project, "BasicSimulation", "mvn")
+        self.assertIn("Results folder", result)
+        self.assertIn("Checkout / Pay", result)
+        self.assertIn("peak 2 req/s", result)
+
+
+class TestGatlingBuildCache(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.project = tempfile.TemporaryDirectory()
+        self.cache = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {"GATLING_BUILD_CACHE_DIR": self.cache.name})
+        self.env.start()
+        Path(self.project.name, "mvnw").write_text("#!/bin/sh\n")
+        Path(self.project.name, "pom.xml").write_text("<project/>")
+        self.simulation = Path(self.project.name, "src", "test", "java", "BasicSimulation.java")
+        self.simulation.parent.mkdir(parents=True)
+        self.simulation.write_text("class BasicSimulation {}")
+
+    def tearDown(self):
+        self.env.stop()
+        self.cache.cleanup()
+        self.project.cleanup()
+
+    async def run_simulation(self, *results):
+        cmds = []
+
+        async def fake_run(cmd, **kwargs):
+            cmds.append(cmd)
+            Path(self.project.name, "target", "test-classes").mkdir(parents=True, exist_ok=True)
+            return results[len(cmds) - 1]
+
+        with patch('multi_tool_agent.gatling_utils.run_process', side_effect=fake_run):
+            await run_gatling_simulation(self.project.name, "BasicSimulation", "mvn")
+        return cmds
+
+    async def test_repeat_runs_skip_compilation_offline(self):
+        """Test unchanged projects build offline without recompiling, changed sources recompile"""
+        ok = ProcessResult(returncode=0, stdout="", stderr="")
+        first = (await self.run_simulation(ok))[0]
+        self.assertNotIn("-o", first)
+        self.assertNotIn("-Dmaven.test.skip=true", first)
+        second = (await self.run_simulation(ok))[0]
+        self.assertIn("-o", second)
+        self.assertIn("-Dmaven.test.skip=true", second)
+        self.simulation.write_text("class BasicSimulation { int users = 10; }")
+        third = (await self.run_simulation(ok))[0]
+        self.assertIn("-o", third)
+        self.assertNotIn("-Dmaven.test.skip=true", third)
+
+    async def test_missing_offline_dependency_retries_online(self):
+        """Test an offline build missing a dependency is retried once online"""
+        missing = ProcessResult(returncode=1, stdout="[ERROR] Cannot access central in offline mode", stderr="")
+        ok = ProcessResult(returncode=0, stdout="", stderr="")
+        with patch.dict(os.environ, {"GATLING_OFFLINE": "true", "GATLING_MAVEN_REPO": "/opt/m2"}):
+            cmds = await self.run_simulation(missing, ok)
+        self.assertEqual(len(cmds), 2)
+        self.assertIn("-o", cmds[0])
+        self.assertNotIn("-o", cmds[1])
+        self.assertIn("-Dmaven.repo.local=/opt/m2", cmds[1])
+
+if __name__ == '__main__':
+    unittest.main()
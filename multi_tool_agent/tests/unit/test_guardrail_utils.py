@@ -0,0 +1,176 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from multi_tool_agent.guardrail_utils import GuardrailMonitor, Guardrails, parse_guardrails
+from multi_tool_agent.job_utils import AdmissionController, JobManager
+from multi_tool_agent.process_utils import announce_artifacts, run_process
+from multi_tool_agent.rollup_utils import TimeSeriesRollup
+from multi_tool_agent.run_utils import RunResult
+from multi_tool_agent.stats_utils import LatencyHistogram
+
+# Writes a JTL of failing samples until it is stopped
+FAILING_JTL_WRITER = """
+import signal, sys, time
+if len(sys.argv) > 2:
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+with open(sys.argv[1], "w") as f:
+    f.write("timeStamp,elapsed,label,responseCode,success,allThreads\\n")
+    while True:
+        now = int(time.time() * 1000)
+        f.writelines(f"{now},50,GET /,500,false,10\\n" for _ in range(20))
+        f.flush()
+        time.sleep(0.2)
+"""
+
+# Writes k6 NDJSON points, in the key order k6 uses, of slow failing requests until it is stopped
+FAILING_K6_WRITER = """
+import json, sys, time
+with open(sys.argv[1], "w") as f:
+    f.write(json.dumps({"type": "Metric", "data": {"name": "http_reqs", "type": "counter"}, "metric": "http_reqs"}) + "\\n")
+    while True:
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%S.000000000Z", time.gmtime())
+        tags = {"method": "GET", "name": "http://test/", "status": "500", "expected_response": "false"}
+        for metric, value in [("http_reqs", 1), ("http_req_duration", 1200.0), ("http_req_failed", 1)] * 20:
+            f.write(json.dumps({"type": "Point", "data": {"time": stamp, "value": value, "tags": tags},
+                                "metric": metric}) + "\\n")
+        f.flush()
+        time.sleep(0.2)
+"""
+
+
+def feed(rollup: TimeSeriesRollup, t: float, requests: int, errors: int = 0, latency_ms: float = 50.0) -> dict:
+    """Fold one second of traffic into the rollup and return its live snapshot."""
+    histogram = LatencyHistogram()
+    histogram.add([latency_ms] * requests)
+    rollup.add(t, 1.0, requests, errors, histogram=histogram)
+    return {"job_id": "job", "time": t + 1, "rps": float(requests)}
+
+
+class TestGuardrails(unittest.TestCase):
+    def test_parse_spec_over_environment(self):
+        """Test a spec overrides the GUARDRAIL_* defaults and rejects unknown keys"""
+        with patch.dict(os.environ, {"GUARDRAIL_MAX_ERROR_RATE": "10", "GUARDRAIL_MIN_RPS": "5"}):
+            self.assertEqual(parse_guardrails().max_error_rate, 10)
+            guardrails = parse_guardrails("error_rate=2, p99=1500, min_rps=off, window=1m")
+        self.assertEqual((guardrails.max_error_rate, guardrails.max_p99_ms, guardrails.min_rps, guardrails.window_s),
+                         (2, 1500, None, 60))
+        self.assertFalse(parse_guardrails("").enabled)
+        for spec in ("latency=5", "p95", "window=off", "error_rate=-1"):
+            with self.assertRaises(ValueError):
+                parse_guardrails(spec)
+
+    def test_sustained_breach_stops_the_run(self):
+        """Test a breach stops the run only after the warm-up and once it lasted sustain_s"""
+        monitor = GuardrailMonitor(Guardrails(max_error_rate=5, warmup_s=3, sustain_s=4, window_s=5))
+        rollup, start, stopped_at = TimeSeriesRollup(), 1_700_000_000, None
+        for second in range(20):
+            snapshot = feed(rollup, start + second, 100, errors=50)
+            reason = monitor.check(snapshot, rollup)
+            if reason:
+                stopped_at = second
+                break
+        # Traffic from second 0, checks from second 3, breached for 4 s by second 7
+        self.assertEqual(stopped_at, 7)
+        self.assertTrue(reason.startswith("error rate 50% over 5% over the last 5s"))
+
+    def test_recovery_resets_the_breach(self):
+        """Test a breach that clears before sustain_s does not stop the run"""
+        monitor = GuardrailMonitor(Guardrails(max_p95_ms=200, min_rps=10, warmup_s=0, sustain_s=3, window_s=2))
+        rollup, start = TimeSeriesRollup(), 1_700_000_000
+        latencies = [50, 500, 500, 50, 50, 50, 500, 500, 50, 50]
+        reasons = [monitor.check(feed(rollup, start + i, 100, latency_ms=ms), rollup)
+                   for i, ms in enumerate(latencies)]
+        self.assertEqual(reasons, [None] * len(latencies))
+        # Throughput dropping under the floor is a breach too
+        for i in range(10, 16):
+            reason = monitor.check(feed(rollup, start + i, 2), rollup)
+        self.assertIn("under 10 req/s", reason)
+
+
+class TestGuardedJob(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {"FEATHERWAND_RUNS_DIR": self.root.name, "RUNNER_STOP_GRACE_S": "2",
+                                           "FEATHERWAND_HISTORY_DB": os.path.join(self.root.name, "history.db")})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.root.cleanup()
+
+    async def test_breach_aborts_the_job(self):
+        """Test a job breaching its guardrails has its generator stopped and ends aborted with the reason"""
+        jtl = os.path.join(self.root.name, "run.jtl")
+
+        async def run(consumers):
+            announce_artifacts(consumers, {"jtl": jtl})
+            result = await run_process([sys.executable, "-c", FAILING_JTL_WRITER, jtl], consumers=consumers)
+            return RunResult("jmeter", "success" if result.stopped else "error", error=result.stderr)
+
+        manager = JobManager(AdmissionController(host_slots=1, memory_budget_mb=10_000))
+        started = time.monotonic()
+        job = manager.submit("jmeter", "JMeter failing.jmx", run,
+                             guardrails=Guardrails(max_error_rate=5, warmup_s=0, sustain_s=1, window_s=5))
+        await manager.wait(job.job_id, timeout=20)
+        self.assertLess(time.monotonic() - started, 15)
+        status = manager.status(job.job_id)
+        self.assertEqual(status["status"], "aborted")
+        self.assertTrue(status["aborted_by"].startswith("error rate 100% over 5%"))
+        self.assertEqual(status["result"]["status"], "aborted")
+        self.assertIn("Aborted by guardrail: error rate", status["result"]["error"])
+
+    async def test_breach_aborts_a_k6_job(self):
+        """Test guardrails arm on k6 NDJSON points and stop the run"""
+        ndjson = os.path.join(self.root.name, "run.ndjson")
+
+        async def run(consumers):
+            announce_artifacts(consumers, {"json": ndjson})
+            result = await run_process([sys.executable, "-c", FAILING_K6_WRITER, ndjson], consumers=consumers)
+            return RunResult("k6", "success" if result.stopped else "error", error=result.stderr)
+
+        manager = JobManager(AdmissionController(host_slots=1, memory_budget_mb=10_000))
+        started = time.monotonic()
+        job = manager.submit("k6", "k6 failing.js", run,
+                             guardrails=Guardrails(max_error_rate=5, max_p95_ms=800, warmup_s=0, sustain_s=1,
+                                                   window_s=5))
+        await manager.wait(job.job_id, timeout=20)
+        self.assertLess(time.monotonic() - started, 15)
+        status = manager.status(job.job_id)
+        self.assertEqual(status["status"], "aborted")
+        self.assertIn("error rate 100% over 5%", status["aborted_by"])
+        self.assertIn("p95", status["aborted_by"])
+        self.assertEqual(status["result"]["status"], "aborted")
+
+    async def test_stopped_run_keeps_its_results(self):
+        """Test a generator ignoring SIGTERM is killed, and the results parsed after it exits are kept"""
+        jtl = os.path.join(self.root.name, "run.jtl")
+
+        async def run(consumers):
+            announce_artifacts(consumers, {"jtl": jtl})
+            result = await run_process([sys.executable, "-c", FAILING_JTL_WRITER, jtl, "ignore-sigterm"],
+                                       consumers=consumers)
+            # Parsing a large report outlasts the stop grace period
+            await asyncio.sleep(3)
+            return RunResult("jmeter", "success" if result.stopped else "error", output="parsed",
+                             report={"total": {"samples": 100, "errors": 100}, "labels": {}})
+
+        manager = JobManager(AdmissionController(host_slots=1, memory_budget_mb=10_000))
+        with patch.dict(os.environ, {"RUNNER_STOP_GRACE_S": "0.5"}):
+            job = manager.submit("jmeter", "JMeter failing.jmx", run,
+                                 guardrails=Guardrails(max_error_rate=5, warmup_s=0, sustain_s=1, window_s=5))
+            await manager.wait(job.job_id, timeout=30)
+        status = manager.status(job.job_id)
+        self.assertEqual(status["status"], "aborted")
+        self.assertIsNotNone(job.run_id)
+        self.assertEqual(status["result"]["status"], "aborted")
+        self.assertIn("Aborted by guardrail", status["result"]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import sys
+import unittest
+from unittest import IsolatedAsyncioTestCase
+
+from multi_tool_agent.health_utils import GeneratorMonitor, process_trees
+from multi_tool_agent.process_utils import run_process
+
+# A parent process whose child keeps one core busy for a while
+BUSY_TREE = ("import subprocess, sys\n"
+             "subprocess.run([sys.executable, '-c', 'import time\\nend = time.time() + 1.5\\n"
+             "while time.time() < end: pass'])")
+
+
+def samples(cpu: float, gc: float = 0.0, count: int = 10) -> list[dict]:
+    return [{"t": float(i), "processes": 1, "threads": 40, "rss_mb": 500.0, "cpu_percent": cpu,
+             "max_process_cpu_percent": cpu, "gc_cpu_percent": gc} for i in range(count)]
+
+
+def record(monitor: GeneratorMonitor, *runs: list[dict]) -> GeneratorMonitor:
+    monitor.reset()
+    for sample in (sample for run in runs for sample in run):
+        monitor.record(sample)
+    return monitor
+
+
+@unittest.skipUnless(os.path.isdir("/proc"), "needs /proc")
+class TestGeneratorMonitor(IsolatedAsyncioTestCase):
+    async def test_samples_the_process_tree(self):
+        """Test the CPU of a child process is sampled and a busy single-core generator is flagged"""
+        monitor = GeneratorMonitor("locust", interval=0.2)
+        await run_process([sys.executable, "-c", BUSY_TREE], monitor=monitor)
+        health = monitor.summary()
+        self.assertGreaterEqual(len(health["samples"]), 5)
+        self.assertEqual(max(sample["processes"] for sample in health["samples"]), 2)
+        self.assertGreater(health["cpu_percent"]["max"], 50)
+        self.assertTrue(health["bottleneck"])
+        self.assertIsNone(monitor._task)
+        # The last sample was in the summary, not taken after it
+        self.assertTrue(monitor._sampling.done())
+
+    def test_process_trees(self):
+        """Test the tree of a process holds itself and no unrelated process"""
+        self.assertEqual(process_trees([os.getpid()]) & {os.getpid(), 1}, {os.getpid()})
+
+    def test_findings(self):
+        """Test CPU saturation and garbage collection are flagged only when they last"""
+        monitor = GeneratorMonitor("jmeter", interval=1)
+        monitor.cpus = 2
+        self.assertIn("CPU saturated", record(monitor, samples(cpu=190)).summary()["findings"][0])
+        findings = record(monitor, samples(cpu=100, gc=40)).summary()["findings"]
+        self.assertEqual(len(findings), 1)
+        self.assertIn("garbage collection", findings[0])
+        self.assertFalse(record(monitor, samples(cpu=120, gc=5), samples(cpu=190, count=1)).summary()["bottleneck"])
+        self.assertFalse(record(monitor, samples(cpu=190, count=2)).summary()["bottleneck"])
+        # Locust processes are bound to one core however many the host has
+        locust = GeneratorMonitor("locust", interval=1)
+        locust.cpus = 8
+        self.assertIn("full CPU core", record(locust, samples(cpu=98)).summary()["findings"][0])
+        self.assertNotIn("gc_cpu_percent", locust.summary())
+
+    def test_long_runs_keep_the_latest_samples(self):
+        """Test only the latest samples are kept while the statistics cover the whole run"""
+        monitor = GeneratorMonitor("jmeter", interval=1, max_samples=5)
+        monitor.cpus = 2
+        health = record(monitor, samples(cpu=190, count=15), samples(cpu=10, count=5)).summary()
+        self.assertEqual(health["sample_count"], 20)
+        self.assertEqual([sample["cpu_percent"] for sample in health["samples"]], [10] * 5)
+        self.assertEqual(health["cpu_percent"], {"mean": 145.0, "max": 190.0})
+        self.assertTrue(health["bottleneck"])
+
+    def test_sample_taken_across_a_reset_is_dropped(self):
+        """Test a sample that was being taken when the samples were reset is not counted"""
+        monitor = GeneratorMonitor("gatling", interval=1)
+        generation = monitor._generation
+        monitor.reset()
+        monitor.record(samples(cpu=50, count=1)[0], generation)
+        self.assertIsNone(monitor.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
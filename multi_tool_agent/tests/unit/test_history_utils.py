@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from multi_tool_agent.history_utils import (
+    downsample, duration_seconds, endpoint_histogram, query_history, record_run, run_timeseries,
+)
+from multi_tool_agent.run_utils import RunResult
+from multi_tool_agent.stats_utils import EndpointAggregator, LatencyHistogram, ThroughputTimeline
+
+
+def make_report(checkout_ms: float, seconds: int = 600) -> dict:
+    aggregator = EndpointAggregator()
+    labels = np.array(["GET /checkout", "GET /home"] * 500)
+    elapsed = np.where(labels == "GET /checkout", checkout_ms, 20.0)
+    timestamps = 1_700_000_000_000 + np.arange(labels.size) * (seconds * 1000.0 / labels.size)
+    aggregator.add_batch(labels, elapsed, np.ones(labels.size, dtype=bool), timestamps)
+    timeline = ThroughputTimeline()
+    timeline.add(timestamps, np.zeros(labels.size, dtype=bool))
+    return {**aggregator.summary(), "timeline": timeline.summary()}
+
+
+class TestRunHistory(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.root.name, "history.db")
+        self.env = patch.dict(os.environ, {"FEATHERWAND_HISTORY_DB": self.db})
+        self.env.start()
+        self.script = os.path.join(self.root.name, "checkout.js")
+        with open(self.script, "w") as f:
+            f.write("export default function () {}")
+
+    def tearDown(self):
+        self.env.stop()
+        self.root.cleanup()
+
+    def record(self, run_id: str, checkout_ms: float, script=None):
+        record_run(run_id, RunResult("k6", "success", report=make_report(checkout_ms)),
+                   {"script": script or self.script, "users": 10, "duration": "1m30s"})
+
+    def test_endpoint_trend_across_runs(self):
+        """Test the p95 of an endpoint is returned per run, oldest first, without re-parsing"""
+        for i, latency in enumerate((100.0, 120.0, 300.0)):
+            with patch("multi_tool_agent.history_utils.time.time", return_value=1_700_000_000 + i):
+                self.record(f"k6-run{i}", latency)
+        history = query_history(script=self.script, endpoint="/checkout", metric="p95", last=2)
+        self.assertEqual(history["endpoint"], "GET /checkout")
+        self.assertEqual([run["run_id"] for run in history["runs"]], ["k6-run1", "k6-run2"])
+        self.assertAlmostEqual(history["runs"][-1]["value"], 300.0, delta=3)
+        self.assertEqual(history["runs"][0]["users"], 10)
+        self.assertEqual(history["runs"][0]["duration_s"], 90.0)
+        self.assertAlmostEqual(history["summary"]["latest"], 300.0, delta=3)
+
+    def test_histograms_and_timeseries_are_stored(self):
+        """Test endpoint histograms and the downsampled timeline can be read back"""
+        self.record("k6-run0", 100.0)
+        histogram = LatencyHistogram.from_dict(endpoint_histogram("k6-run0", "GET /checkout"))
+        self.assertEqual(histogram.count, 500)
+        series = run_timeseries("k6-run0")
+        self.assertEqual(len(series["rps"]["value"]), 200)
+        self.assertAlmostEqual(sum(series["rps"]["value"]) * 3, 1000, delta=1)
+
+    def test_same_version_filters_changed_scripts(self):
+        """Test runs of an earlier version of the script can be excluded"""
+        self.record("k6-run0", 100.0)
+        time.sleep(0.01)
+        with open(self.script, "a") as f:
+            f.write("\n// changed")
+        self.record("k6-run1", 200.0)
+        self.assertEqual(query_history(script=self.script)["summary"]["runs"], 2)
+        runs = query_history(script=self.script, same_version=True)["runs"]
+        self.assertEqual([run["run_id"] for run in runs], ["k6-run1"])
+        with self.assertRaises(ValueError):
+            query_history(metric="p95; DROP TABLE runs")
+
+    def test_helpers(self):
+        """Test duration parsing and gap-aware downsampling"""
+        self.assertEqual(duration_seconds("1m30s"), 90.0)
+        self.assertEqual(duration_seconds("2h"), 7200.0)
+        self.assertEqual(duration_seconds(45), 45.0)
+        self.assertIsNone(duration_seconds(""))
+        values = np.array([1.0, 3.0, np.nan, np.nan, 5.0, 7.0])
+        np.testing.assert_array_equal(downsample(values, 3), [2.0, np.nan, 6.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
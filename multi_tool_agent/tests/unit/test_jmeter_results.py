@@ -0,0 +1,106 @@
+import os
+import unittest
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from multi_tool_agent.jmeter_results import JtlAggregator, parse_jtl
+from multi_tool_agent.jmeter_utils import run_jmeter
+from multi_tool_agent.process_utils import ProcessResult
+
+JTL = """timeStamp,elapsed,label,responseCode,responseMessage,threadName,dataType,success,failureMessage,bytes
+1700000000000,120,Home Page,200,OK,Thread Group 1-1,text,true,,512
+1700000000500,80,Home Page,200,OK,Thread Group 1-2,text,true,,512
+1700000001000,950,"Login, step 1",500,"Internal
+Server Error",Thread Group 1-1,text,false,boom,128
+1700000001200,not-a-number,Home Page,200,OK,Thread Group 1-1,text,true,,512
+1700000002000,60,Home Page,200,OK,Thread Group 1-2,text,true,,512
+"""
+
+
+class TestParseJtl(unittest.TestCase):
+    def setUp(self):
+        handle, self.jtl_file = tempfile.mkstemp(suffix=".jtl")
+        with os.fdopen(handle, "w") as f:
+            f.write(JTL)
+
+    def tearDown(self):
+        os.remove(self.jtl_file)
+
+    def test_parse_jtl_per_label(self):
+        """Test per-label counts, errors and percentiles from a JTL"""
+        report = parse_jtl(self.jtl_file)
+        home = report["labels"]["Home Page"]
+        self.assertEqual(home["samples"], 3)
+        self.assertEqual(home["errors"], 0)
+        self.assertAlmostEqual(home["max"], 120)
+        login = report["labels"]["Login, step 1"]
+        self.assertEqual(login["errors"], 1)
+        self.assertEqual(login["error_rate"], 100.0)
+        self.assertEqual(report["total"]["samples"], 4)
+
+    def test_parse_jtl_timeline(self):
+        """Test the JTL report carries requests and errors per second of the run"""
+        timeline = parse_jtl(self.jtl_file)["timeline"]
+        self.assertEqual(timeline["start_second"], 1700000000)
+        self.assertEqual(timeline["requests"], [2, 1, 1])
+        self.assertEqual(timeline["errors"], [0, 1, 0])
+
+    def test_chunking_does_not_change_result(self):
+        """Test small chunks aggregate to the same report as one chunk"""
+        self.assertEqual(parse_jtl(self.jtl_file, chunk_bytes=1), parse_jtl(self.jtl_file))
+
+    def test_vectorised_block_matches_csv_rows(self):
+        """Test the NumPy fast path agrees with the csv fallback"""
+        header = JTL.splitlines()[0].split(",")
+        lines = [f"{1700000000000 + i * 10},{(i * 37) % 1000},label{i % 3},200,OK,TG 1-1,text,{'false' if i % 7 == 0 else 'true'},,512"
+                 for i in range(500)]
+        fast, slow = JtlAggregator(header), JtlAggregator(header)
+        fast.add_block(("\n".join(lines) + "\n").encode())
+        slow.add_rows([line.split(",") for line in lines])
+        self.assertEqual(fast.summary(), slow.summary())
+
+    def test_missing_columns(self):
+        """Test a JTL without the required columns is rejected"""
+        with open(self.jtl_file, "w") as f:
+            f.write("a,b,c\n1,2,3\n")
+        with self.assertRaises(ValueError):
+            parse_jtl(self.jtl_file)
+
+
+class TestRunJmeterResults(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.test_jmx = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "sample", "hello.jmx")
+
+    async def test_run_jmeter_appends_jtl_summary(self):
+        """Test the non-GUI run writes a JTL and reports its aggregate"""
+        async def fake_run(cmd, **kwargs):
+            with open(cmd[cmd.index('-l') + 1], "w") as f:
+                f.write(JTL)
+            return ProcessResult(returncode=0, stdout="end of run\n", stderr="")
+
+        with tempfile.TemporaryDirectory() as results_dir, \
+                patch.dict('os.environ', {"JMETER_RESULTS_DIR": results_dir}), \
+                patch('multi_tool_agent.jmeter_utils.run_process', side_effect=fake_run):
+            result = await run_jmeter(self.test_jmx)
+        self.assertIn("end of run", result)
+        self.assertIn("Home Page", result)
+        self.assertIn("p99", result)
+
+    async def test_run_jmeter_on_remote_engines(self):
+        """Test remote engines are passed to the controller with -R"""
+        async def fake_run(cmd, **kwargs):
+            self.assertEqual(cmd[cmd.index('-R') + 1], "10.0.0.1,10.0.0.2:1099")
+            with open(cmd[cmd.index('-l') + 1], "w") as f:
+                f.write(JTL)
+            return ProcessResult(returncode=0, stdout="end of run\n", stderr="")
+
+        with tempfile.TemporaryDirectory() as results_dir, \
+                patch.dict('os.environ', {"JMETER_RESULTS_DIR": results_dir}), \
+                patch('multi_tool_agent.jmeter_utils.run_process', side_effect=fake_run) as mock_run:
+            result = await run_jmeter(self.test_jmx, remote_hosts=["10.0.0.1", "10.0.0.2:1099"])
+        mock_run.assert_called_once()
+        self.assertIn("Home Page", result)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from multi_tool_agent.history_utils import query_history
+from multi_tool_agent.job_utils import AdmissionController, JobManager
+from multi_tool_agent.run_utils import RunResult
+
+
+def fake_run(tool: str, release: asyncio.Event, log: list):
+    async def run(consumers):
+        log.append(("start", tool))
+        for consumer in consumers:
+            consumer("stdout", "summary +    100 in 00:00:05 =   20.0/s")
+        await release.wait()
+        log.append(("end", tool))
+        return RunResult(tool, "success", output="done\n", report={"total": {"samples": 100}, "labels": {}})
+    return run
+
+
+class TestJobManager(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.runs_dir = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {"FEATHERWAND_RUNS_DIR": self.runs_dir.name,
+                                           "FEATHERWAND_HISTORY_DB": os.path.join(self.runs_dir.name, "history.db")})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.runs_dir.cleanup()
+
+    async def test_submit_returns_at_once_and_reports_progress(self):
+        """Test a job is queued at once, reports progress while running and a digest when done"""
+        manager = JobManager(AdmissionController(host_slots=2, memory_budget_mb=10_000))
+        release, log = asyncio.Event(), []
+        job = manager.submit("jmeter", "JMeter test.jmx", fake_run("jmeter", release, log))
+        self.assertEqual(manager.status(job.job_id)["status"], "queued")
+        await asyncio.sleep(0.01)
+        status = manager.status(job.job_id)
+        self.assertEqual(status["status"], "running")
+        self.assertTrue(status["last_progress"].startswith("summary +"))
+        release.set()
+        await manager.wait(job.job_id, timeout=5)
+        status = manager.status(job.job_id)
+        self.assertEqual(status["status"], "success")
+        self.assertEqual(status["result"]["total"]["samples"], 100)
+        self.assertIsNotNone(status["result"]["run_id"])
+
+    async def test_finished_runs_are_recorded_in_history(self):
+        """Test a finished job is recorded in the run history with its settings"""
+        manager = JobManager(AdmissionController(host_slots=1, memory_budget_mb=10_000))
+        release, log = asyncio.Event(), []
+        release.set()
+        job = manager.submit("k6", "k6", fake_run("k6", release, log), params={"users": 25, "duration": "2m"})
+        await manager.wait(job.job_id, timeout=5)
+        run = query_history(tool="k6", metric="samples")["runs"][-1]
+        self.assertEqual(run["run_id"], job.run_id)
+        self.assertEqual((run["users"], run["duration_s"], run["value"]), (25, 120.0, 100))
+
+    async def test_submit_while_a_run_is_being_recorded(self):
+        """Test a job that finished but is still being recorded does not break a new submission"""
+        manager = JobManager(AdmissionController(host_slots=2, memory_budget_mb=10_000), max_finished=0)
+        release, log = asyncio.Event(), []
+        release.set()
+        recording, resume = threading.Semaphore(0), threading.Event()
+
+        def slow_record(*args):
+            recording.release()
+            resume.wait(5)
+
+        with patch("multi_tool_agent.history_utils.record_run", side_effect=slow_record):
+            finished = [manager.submit("k6", "k6", fake_run("k6", release, log)) for _ in range(2)]
+            for _ in finished:
+                await asyncio.to_thread(recording.acquire, True, 5)
+            self.assertEqual([(job.status, job.finished_at) for job in finished], [("success", None)] * 2)
+            job = manager.submit("k6", "k6", fake_run("k6", release, log))
+            resume.set()
+            await manager.wait(job.job_id, timeout=5)
+        self.assertEqual(job.status, "success")
+
+    async def test_tool_limit_queues_second_run(self):
+        """Test a second run of the same tool waits until the first finishes"""
+        manager = JobManager(AdmissionController(host_slots=4, tool_slots={"locust": 1}, memory_budget_mb=10_000))
+        first_release, second_release, log = asyncio.Event(), asyncio.Event(), []
+        first = manager.submit("locust", "first", fake_run("locust", first_release, log))
+        second = manager.submit("locust", "second", fake_run("locust", second_release, log))
+        await asyncio.sleep(0.01)
+        status = manager.status(second.job_id)
+        self.assertEqual(status["status"], "queued")
+        self.assertEqual(status["queue_position"], 1)
+        self.assertIn("locust is running its maximum", status["waiting_for"])
+        first_release.set()
+        second_release.set()
+        await manager.wait(second.job_id, timeout=5)
+        self.assertEqual(log, [("start", "locust"), ("end", "locust"), ("start", "locust"), ("end", "locust")])
+        self.assertEqual(manager.status(first.job_id)["status"], "success")
+
+    async def test_memory_budget_limits_concurrency(self):
+        """Test runs whose memory reservations exceed the budget do not overlap"""
+        manager = JobManager(AdmissionController(host_slots=4, memory_budget_mb=1500))
+        release, log = asyncio.Event(), []
+        manager.submit("jmeter", "jmeter", fake_run("jmeter", release, log))
+        gatling = manager.submit("gatling", "gatling", fake_run("gatling", release, log))
+        await asyncio.sleep(0.01)
+        self.assertIn("memory budget", manager.status(gatling.job_id)["waiting_for"])
+        release.set()
+        await manager.wait(gatling.job_id, timeout=5)
+        self.assertEqual(log[:2], [("start", "jmeter"), ("end", "jmeter")])
+
+    async def test_estimated_memory_replaces_tool_reservation(self):
+        """Test a run's own memory estimate is reserved instead of the tool's default"""
+        manager = JobManager(AdmissionController(host_slots=4, tool_slots={"k6": 3}, memory_budget_mb=1500))
+        release, log = asyncio.Event(), []
+        manager.submit("k6", "small", fake_run("k6", release, log), memory_mb=200)
+        large = manager.submit("k6", "large", fake_run("k6", release, log), memory_mb=1400)
+        small = manager.submit("k6", "small", fake_run("k6", release, log), memory_mb=200)
+        await asyncio.sleep(0.01)
+        self.assertIn("memory budget", manager.status(large.job_id)["waiting_for"])
+        self.assertEqual(manager.status(small.job_id)["status"], "running")
+        release.set()
+        await manager.wait(large.job_id, timeout=5)
+
+    async def test_cancel_running_job(self):
+        """Test cancelling a running job stops it and frees its slot"""
+        manager = JobManager(AdmissionController(host_slots=1, memory_budget_mb=10_000))
+        job = manager.submit("k6", "k6", fake_run("k6", asyncio.Event(), []))
+        await asyncio.sleep(0.01)
+        await manager.cancel(job.job_id)
+        self.assertEqual(manager.status(job.job_id)["status"], "cancelled")
+        self.assertEqual(manager.admission.running["k6"], 0)
+        self.assertEqual(manager.admission.reserved_mb, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
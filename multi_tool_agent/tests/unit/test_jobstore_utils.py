@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from multi_tool_agent.job_utils import AdmissionController, JobManager
+from multi_tool_agent.jobstore_utils import JobStore
+from multi_tool_agent.run_utils import RunResult
+
+PACKAGE_ROOT = Path(__file__).resolve().parents[3]
+
+# A worker process running one JMeter-like job that writes JTL rows until it is stopped
+WORKER = """
+import asyncio, json, sys
+from multi_tool_agent.job_utils import AdmissionController, JobManager
+from multi_tool_agent.jobstore_utils import JobStore
+from multi_tool_agent.process_utils import announce_artifacts, run_process
+from multi_tool_agent.run_utils import RunResult
+
+WRITER = '''
+import sys, time
+with open(sys.argv[1], "w") as f:
+    f.write("timeStamp,elapsed,label,responseCode,success,allThreads\\\\n")
+    while True:
+        now = int(time.time() * 1000)
+        f.writelines(f"{now},50,GET /,200,true,10\\\\n" for _ in range(20))
+        f.flush()
+        time.sleep(0.2)
+'''
+
+async def main():
+    store = JobStore()
+    manager = JobManager(AdmissionController(host_slots=1, memory_budget_mb=10_000, store=store), store=store)
+
+    async def run(consumers):
+        announce_artifacts(consumers, {"jtl": sys.argv[1]})
+        await run_process([sys.executable, "-c", WRITER, sys.argv[1]], consumers=consumers)
+        return RunResult("jmeter", "success", report={"total": {}, "labels": {}})
+
+    job = manager.submit("jmeter", "JMeter endless.jmx", run)
+    print(job.job_id, flush=True)
+    await manager.wait(job.job_id, timeout=60)
+    print(json.dumps(manager.status(job.job_id)), flush=True)
+
+asyncio.run(main())
+"""
+
+
+def fake_run(tool: str, release: asyncio.Event):
+    async def run(consumers):
+        await release.wait()
+        return RunResult(tool, "success", report={"total": {"samples": 1}, "labels": {}})
+    return run
+
+
+class TestSharedJobs(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.env = patch.dict(os.environ, {
+            "FEATHERWAND_RUNS_DIR": self.root.name, "RUNNER_STOP_GRACE_S": "2",
+            "FEATHERWAND_HISTORY_DB": os.path.join(self.root.name, "history.db"),
+            "JOB_STATE_DB": os.path.join(self.root.name, "jobs.db")})
+        self.env.start()
+        self.store = JobStore()
+        self.manager = JobManager(AdmissionController(host_slots=1, memory_budget_mb=10_000, store=self.store),
+                                  store=self.store)
+
+    def tearDown(self):
+        self.env.stop()
+        self.root.cleanup()
+
+    async def wait_for(self, predicate, timeout: float = 10) -> None:
+        for _ in range(int(timeout / 0.1)):
+            if predicate():
+                return
+            await asyncio.sleep(0.1)
+        self.fail("condition not met in time")
+
+    async def test_two_workers_share_admission_status_and_cancel(self):
+        """Test a second worker sees the first one's job, waits for its slot, streams and cancels it"""
+        jtl = os.path.join(self.root.name, "run.jtl")
+        worker = await asyncio.create_subprocess_exec(sys.executable, "-c", WORKER, jtl, cwd=PACKAGE_ROOT,
+                                                      stdout=asyncio.subprocess.PIPE)
+        try:
+            job_id = (await asyncio.wait_for(worker.stdout.readline(), 20)).decode().strip()
+            await self.wait_for(lambda: self.manager.status(job_id)["status"] == "running")
+            status = self.manager.status(job_id)
+            self.assertEqual(status["description"], "JMeter endless.jmx")
+            self.assertIn("running_seconds", status)
+            self.assertEqual(job_id, self.manager.statuses()[0]["job_id"])
+
+            # The host's only slot is taken by the other worker
+            release = asyncio.Event()
+            release.set()
+            own = self.manager.submit("k6", "k6 test.js", fake_run("k6", release))
+            await asyncio.sleep(1)
+            status = self.manager.status(own.job_id)
+            self.assertEqual(status["status"], "queued")
+            self.assertIn("host is running its maximum of 1", status["waiting_for"])
+
+            # Its live metrics are replayed here
+            subscription = self.manager.live(job_id).subscribe()
+            snapshot = await subscription.get(timeout=10)
+            self.assertGreater(snapshot["rps"], 0)
+            subscription.close()
+
+            await asyncio.wait_for(self.manager.cancel(job_id), 20)
+            self.assertEqual(self.manager.status(job_id)["status"], "cancelled")
+            final = json.loads(await asyncio.wait_for(worker.stdout.readline(), 20))
+            self.assertEqual(final["status"], "cancelled")
+
+            await self.manager.wait(own.job_id, timeout=10)
+            self.assertEqual(self.manager.status(own.job_id)["status"], "success")
+            self.assertEqual(self.store.usage(), ({}, 0, 0))
+        finally:
+            if worker.returncode is None:
+                worker.kill()
+            await worker.wait()
+
+    async def test_exited_worker_releases_its_slots(self):
+        """Test the slots and jobs of a worker that died are released for the others"""
+        script = ("from multi_tool_agent.jobstore_utils import JobStore; store = JobStore(); "
+                  "store.put({'job_id': 'k6-dead', 'tool': 'k6', 'status': 'running', 'submitted_at': 0}); "
+                  "store.claim('k6-dead', 'k6', 1, 512, lambda usage: None)")
+        worker = await asyncio.create_subprocess_exec(sys.executable, "-c", script, cwd=PACKAGE_ROOT)
+        self.assertEqual(await worker.wait(), 0)
+        self.assertEqual(self.store.usage()[1], 1)
+        release = asyncio.Event()
+        release.set()
+        job = self.manager.submit("k6", "k6 test.js", fake_run("k6", release))
+        await self.manager.wait(job.job_id, timeout=5)
+        self.assertEqual(job.status, "success")
+        self.assertEqual(self.manager.status("k6-dead")["status"], "error")
+        self.assertIn("exited", self.manager.status("k6-dead")["result"]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
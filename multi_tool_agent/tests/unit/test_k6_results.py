@@ -0,0 +1,174 @@
+import os
+import json
+import unittest
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from multi_tool_agent.k6_results import K6MetricsAggregator, merge_k6_json, parse_k6_json, parse_summary_export
+from multi_tool_agent.k6_utils import execution_segments, run_k6_result, run_k6_script
+from multi_tool_agent.process_utils import ProcessResult
+
+
+def point(metric, value, time="2024-05-09T14:34:45.625742514+02:00", **tags):
+    return json.dumps({"type": "Point", "metric": metric, "data": {"time": time, "value": value, "tags": tags}})
+
+
+NDJSON = "\n".join([
+    json.dumps({"type": "Metric", "metric": "http_req_duration", "data": {"name": "http_req_duration", "type": "trend"}}),
+    json.dumps({"type": "Metric", "metric": "http_reqs", "data": {"name": "http_reqs", "type": "counter"}}),
+    json.dumps({"type": "Metric", "metric": "http_req_failed", "data": {"name": "http_req_failed", "type": "rate"}}),
+    point("http_req_duration", 120.5, name="home", status="200", expected_response="true"),
+    point("http_reqs", 1, name="home", status="200"),
+    point("http_req_failed", 0, name="home"),
+    point("http_req_duration", 80.0, time="2024-05-09T14:34:46.1Z", name="home", status="200", expected_response="true"),
+    point("http_reqs", 1, name="home", status="200"),
+    point("http_req_failed", 0, name="home"),
+    point("http_req_duration", 900.0, name="login", status="500", expected_response="false"),
+    point("http_reqs", 1, name="login", status="500"),
+    point("http_req_failed", 1, name="login"),
+    "{not json",
+]) + "\n"
+
+SUMMARY = {
+    "metrics": {
+        "http_reqs": {"count": 3, "rate": 1.5},
+        "http_req_duration": {"avg": 366.8, "min": 80, "med": 120.5, "max": 900, "p(90)": 744.1, "p(95)": 822.05},
+    },
+    "root_group": {"name": "", "checks": {}},
+}
+
+
+class TestK6Results(unittest.TestCase):
+    def setUp(self):
+        handle, self.json_file = tempfile.mkstemp(suffix=".ndjson")
+        with os.fdopen(handle, "w") as f:
+            f.write(NDJSON)
+
+    def tearDown(self):
+        os.remove(self.json_file)
+
+    def test_parse_k6_json_per_metric_and_tag(self):
+        """Test points are folded per metric overall and per name tag"""
+        report = parse_k6_json(self.json_file)
+        metrics = report["metrics"]
+        self.assertEqual(metrics["http_reqs"]["total"]["sum"], 3)
+        self.assertEqual(metrics["http_req_failed"]["total"]["rate"], 0.3333)
+        self.assertEqual(metrics["http_req_duration"]["by_tag"]["name=home"]["count"], 2)
+        self.assertEqual(metrics["http_req_duration"]["total"]["max"], 900.0)
+
+    def test_parse_k6_json_endpoint_report(self):
+        """Test HTTP durations produce a per-name endpoint report with errors"""
+        report = parse_k6_json(self.json_file)
+        self.assertEqual(report["labels"]["home"]["samples"], 2)
+        self.assertEqual(report["labels"]["login"]["errors"], 1)
+        self.assertEqual(report["total"]["samples"], 3)
+        self.assertEqual((sum(report["timeline"]["requests"]), sum(report["timeline"]["errors"])), (3, 1))
+
+    def test_points_without_time_keep_the_time_span(self):
+        """Test a duration without a time takes the last time seen instead of the epoch"""
+        untimed = json.dumps({"type": "Point", "metric": "http_req_duration",
+                              "data": {"value": 50.0, "tags": {"name": "home"}}})
+        aggregator = K6MetricsAggregator()
+        aggregator.feed_lines([untimed, point("http_req_duration", 100.0, time="2024-05-09T12:00:00Z", name="home"),
+                               untimed])
+        report = aggregator.summary()
+        self.assertEqual(aggregator.untimed_points, 1)
+        self.assertEqual(report["labels"]["home"]["samples"], 2)
+        self.assertGreater(report["start_time"], 1.7e12)
+        self.assertEqual(report["timeline"]["requests"], [2])
+
+    def test_incremental_feed_matches_file_parse(self):
+        """Test feeding lines one at a time with tiny batches gives the same result"""
+        aggregator = K6MetricsAggregator(batch_size=1)
+        for line in NDJSON.splitlines():
+            aggregator.feed_line(line)
+        self.assertEqual(aggregator.malformed_lines, 1)
+        self.assertEqual(aggregator.summary(), parse_k6_json(self.json_file))
+
+    def test_tag_cardinality_is_capped(self):
+        """Test high-cardinality tags are pooled instead of growing without bound"""
+        aggregator = K6MetricsAggregator(max_tag_keys=3)
+        for i in range(50):
+            aggregator.feed_line(point("http_reqs", 1, name=f"/item/{i}"))
+        self.assertLessEqual(len(aggregator.summary()["metrics"]["http_reqs"]["by_tag"]), 5)
+
+    def test_merge_matches_single_aggregation(self):
+        """Test merging per-process aggregates equals aggregating all points in one process"""
+        lines = NDJSON.splitlines()
+        whole, first, second = K6MetricsAggregator(), K6MetricsAggregator(), K6MetricsAggregator()
+        whole.feed_lines(lines)
+        first.feed_lines(lines[:6])
+        second.feed_lines(lines[:3] + lines[6:])
+        self.assertEqual(first.merge(second).summary(), whole.summary())
+
+    def test_merge_k6_json_files(self):
+        """Test the NDJSON files of several shards merge into one report"""
+        report = merge_k6_json([self.json_file, self.json_file])
+        self.assertEqual(report["total"]["samples"], 6)
+        self.assertEqual(report["labels"]["login"]["errors"], 2)
+        self.assertEqual(report["metrics"]["http_reqs"]["total"]["sum"], 6)
+        self.assertEqual(sum(report["timeline"]["requests"]), 6)
+
+
+class TestRunK6Results(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.test_js = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "sample", "hello.js")
+
+    async def test_run_k6_script_reports_machine_readable_results(self):
+        """Test the runner requests summary export and JSON output and reports both"""
+        async def fake_run(cmd, **kwargs):
+            with open(cmd[cmd.index('--summary-export') + 1], "w") as f:
+                json.dump(SUMMARY, f)
+            with open(cmd[cmd.index('--out') + 1].split("=", 1)[1], "w") as f:
+                f.write(NDJSON)
+            return ProcessResult(returncode=0, stdout="k6 output\n", stderr="")
+
+        with tempfile.TemporaryDirectory() as results_dir, \
+                patch.dict('os.environ', {"K6_RESULTS_DIR": results_dir}), \
+                patch('multi_tool_agent.k6_utils.run_process', side_effect=fake_run):
+            result = await run_k6_script(self.test_js, json_output=True)
+            self.assertEqual(parse_summary_export(next(
+                os.path.join(results_dir, name) for name in os.listdir(results_dir) if name.endswith(".summary.json")
+            ))["http_reqs"]["count"], 3)
+        self.assertIn("http_reqs: count=3", result)
+        self.assertIn("login", result)
+
+    async def test_run_k6_script_shards_by_execution_segment(self):
+        """Test a sharded run starts one process per segment and merges their results"""
+        async def fake_run_processes(cmds, **kwargs):
+            for cmd in cmds:
+                with open(cmd[cmd.index('--out') + 1].split("=", 1)[1], "w") as f:
+                    f.write(NDJSON)
+            return [ProcessResult(returncode=0, stdout="k6 output\n", stderr="") for _ in cmds]
+
+        with tempfile.TemporaryDirectory() as results_dir, \
+                patch.dict('os.environ', {"K6_RESULTS_DIR": results_dir}), \
+                patch('multi_tool_agent.k6_utils.run_processes', side_effect=fake_run_processes) as mock_run:
+            result = await run_k6_script(self.test_js, vus=30, shards=3)
+        cmds = mock_run.call_args.args[0]
+        self.assertEqual([cmd[cmd.index('--execution-segment') + 1] for cmd in cmds], ["0:1/3", "1/3:2/3", "2/3:1"])
+        self.assertIn("Merged results of 3 shards", result)
+        self.assertRegex(result, r"TOTAL\s+9\s+3")
+
+    async def test_failed_shard_keeps_generator_health(self):
+        """Test a sharded run that failed still carries the generator health samples"""
+        async def fake_run_processes(cmds, **kwargs):
+            return [ProcessResult(returncode=i, stdout="", stderr="shard failed") for i in range(len(cmds))]
+
+        health = {"samples": [{"cpu_percent": 100.0}], "findings": ["CPU saturated"]}
+        with tempfile.TemporaryDirectory() as results_dir, \
+                patch.dict('os.environ', {"K6_RESULTS_DIR": results_dir}), \
+                patch('multi_tool_agent.k6_utils.GeneratorMonitor.summary', return_value=health), \
+                patch('multi_tool_agent.k6_utils.run_processes', side_effect=fake_run_processes):
+            result = await run_k6_result(self.test_js, vus=20, shards=2)
+        self.assertEqual(result.status, "error")
+        self.assertIn("shard 2/2", result.error)
+        self.assertEqual(result.health, health)
+
+    def test_execution_segments(self):
+        """Test segments cover the whole test without gaps"""
+        self.assertEqual(execution_segments(2), (["0:1/2", "1/2:1"], "0,1/2,1"))
+
+if __name__ == '__main__':
+    unittest.main()
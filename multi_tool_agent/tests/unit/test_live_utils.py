@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import httpx
+from fastapi import FastAPI
+
+from multi_tool_agent.job_utils import AdmissionController, JobManager
+from multi_tool_agent.live_utils import LiveMetrics, live_router
+from multi_tool_agent.process_utils import ARTIFACT_STREAM
+from multi_tool_agent.run_utils import RunResult
+
+JTL_HEADER = "timeStamp,elapsed,label,responseCode,success,allThreads\n"
+
+
+def jtl_rows(start: int, count: int, elapsed: int, threads: int, failures: int = 0) -> str:
+    return "".join(f"{start + i},{elapsed},GET /,{500 if i < failures else 200},{'false' if i < failures else 'true'},{threads}\n"
+                   for i in range(count))
+
+
+def k6_line(kind: str, metric: str, data: dict) -> str:
+    """One line in the key order ``k6 --out json`` writes."""
+    return json.dumps({"type": kind, "data": data, "metric": metric}) + "\n"
+
+
+def k6_point(metric: str, value: float) -> str:
+    return k6_line("Point", metric, {"time": "2024-05-01T12:00:00.123456789Z", "value": value,
+                                     "tags": {"method": "GET", "name": "http://test/", "status": "200"}})
+
+
+class TestLiveMetrics(unittest.TestCase):
+    def setUp(self):
+        self.results_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.results_dir.cleanup()
+
+    def test_jtl_rows_become_per_second_snapshots(self):
+        """Test each sample covers only the JTL rows written since the previous one"""
+        jtl = os.path.join(self.results_dir.name, "run.jtl")
+        live = LiveMetrics("jmeter-1", "jmeter")
+        live.start()
+        live.on_line(ARTIFACT_STREAM, f"jtl={jtl}")
+        with open(jtl, "w") as f:
+            f.write(JTL_HEADER + jtl_rows(1700000000000, 100, 50, 10, failures=5) + "1700000000100,5")
+        first = live.sample(now=live.started + 1)
+        self.assertEqual(first["rps"], 100)
+        self.assertEqual(first["error_rate"], 5.0)
+        self.assertAlmostEqual(first["p95"], 50, delta=1)
+        self.assertEqual(first["active_users"], 10)
+        with open(jtl, "a") as f:
+            f.write("0,GET /,200,true,20\n" + jtl_rows(1700000001000, 39, 200, 20))
+        second = live.sample(now=live.started + 3)
+        self.assertEqual(second["rps"], 20)
+        self.assertEqual(second["errors_per_s"], 0)
+        self.assertAlmostEqual(second["p99"], 200, delta=2)
+        self.assertEqual(second["active_users"], 20)
+        # Both snapshots are rolled up with their latency sketches
+        summary = live.rollup.query(resolution=10)["summary"]
+        self.assertEqual(summary["requests"], 140)
+        self.assertAlmostEqual(summary["p99"], 200, delta=2)
+
+    def test_k6_points_and_progress(self):
+        """Test k6 NDJSON points are aggregated and VUs come from the progress line without them"""
+        ndjson = os.path.join(self.results_dir.name, "run.ndjson")
+        live = LiveMetrics("k6-1", "k6")
+        live.start()
+        live.on_line("stdout", "running (0m05.0s), 08/10 VUs, 120 complete and 0 interrupted iterations")
+        self.assertEqual(live.sample()["active_users"], 8)
+        live.on_line(ARTIFACT_STREAM, f"json={ndjson}")
+        with open(ndjson, "w") as f:
+            f.write(k6_line("Metric", "http_reqs", {"name": "http_reqs", "type": "counter"}))
+            for i in range(10):
+                f.write(k6_point("http_reqs", 1))
+                f.write(k6_point("http_req_duration", 10 + i))
+                f.write(k6_point("http_req_failed", int(i == 0)))
+            f.write(k6_point("vus", 9))
+        snapshot = live.sample(now=live.last_sample + 2)
+        self.assertEqual(snapshot["rps"], 5)
+        self.assertEqual(snapshot["error_rate"], 10.0)
+        self.assertEqual(snapshot["active_users"], 9)
+
+
+class TestLiveStreaming(IsolatedAsyncioTestCase):
+    async def test_slow_subscriber_drops_oldest(self):
+        """Test publishing never blocks on a full subscriber queue; the oldest snapshots are dropped"""
+        live = LiveMetrics("locust-1", "locust")
+        subscription = live.subscribe(maxsize=5)
+        for i in range(100):
+            live.publish({"seq": i})
+        live.close("success")
+        self.assertEqual(subscription.dropped, 96)
+        events = [await subscription.get(timeout=1) for _ in range(5)]
+        self.assertEqual([event["seq"] for event in events[:4]], [96, 97, 98, 99])
+        self.assertIsNone(events[-1])
+
+    async def test_sse_stream_of_a_job(self):
+        """Test the SSE route replays a finished job's snapshots and ends with its status"""
+        with tempfile.TemporaryDirectory() as runs_dir, patch.dict(os.environ, {
+                "FEATHERWAND_RUNS_DIR": runs_dir, "FEATHERWAND_HISTORY_DB": os.path.join(runs_dir, "history.db")}):
+            manager = JobManager(AdmissionController(host_slots=1, memory_budget_mb=10_000))
+
+            async def run(consumers):
+                await asyncio.sleep(0.05)
+                return RunResult("k6", "success", report={"total": {}, "labels": {}})
+
+            with patch("multi_tool_agent.live_utils.LIVE_INTERVAL_S", 0.01):
+                job = manager.submit("k6", "k6 test.js", run)
+                await manager.wait(job.job_id, timeout=5)
+
+            app = FastAPI()
+            app.include_router(live_router(manager))
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                self.assertEqual((await client.get("/live/runs")).json(), [])
+                response = await client.get(f"/live/runs/{job.job_id}")
+                self.assertEqual((await client.get("/live/runs/k6-unknown")).status_code, 404)
+        self.assertEqual(response.headers["content-type"].split(";")[0], "text/event-stream")
+        self.assertIn("event: metrics", response.text)
+        self.assertTrue(response.text.rstrip().endswith('"dropped": 0}'))
+        self.assertIn('"status": "success"', response.text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import os
+import unittest
+import tempfile
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from multi_tool_agent.locust_results import parse_locust_csv, parse_stats_history_csv
+from multi_tool_agent.locust_utils import run_locust_test
+from multi_tool_agent.process_utils import ProcessResult
+
+PERCENTILE_HEADER = "50%,66%,75%,80%,90%,95%,98%,99%,99.9%,99.99%,100%"
+
+STATS = f"""Type,Name,Request Count,Failure Count,Median Response Time,Average Response Time,Min Response Time,Max Response Time,Average Content Size,Requests/s,Failures/s,{PERCENTILE_HEADER}
+GET,/,100,2,40,45.5,10,300,512,10.0,0.2,40,45,50,55,80,120,200,250,300,300,300
+POST,/login,20,5,90,110.0,50,900,64,2.0,0.5,90,95,100,110,400,600,800,900,900,900,900
+,Aggregated,120,7,45,56.25,10,900,437,12.0,0.7,45,50,55,60,100,200,400,600,900,900,900
+"""
+
+FAILURES = """Method,Name,Error,Occurrences
+GET,/,ConnectionResetError(104),2
+POST,/login,HTTPError('500 Server Error'),5
+"""
+
+HISTORY = f"""Timestamp,User Count,Type,Name,Requests/s,Failures/s,{PERCENTILE_HEADER},Total Request Count,Total Failure Count,Total Median Response Time,Total Average Response Time,Total Min Response Time,Total Max Response Time,Total Average Content Size
+1700000000,5,,Aggregated,0.000000,0.000000,N/A,N/A,N/A,N/A,N/A,N/A,N/A,N/A,N/A,N/A,N/A,0,0,0,0,0,0,0
+1700000001,10,GET,/,8.0,0.0,40,45,50,55,80,100,200,250,300,300,300,8,0,40,45,10,300,512
+1700000001,10,,Aggregated,9.0,0.5,40,45,50,55,80,110,200,250,300,300,300,9,1,40,45,10,300,512
+1700000002,10,,Aggregated,15.0,1.0,45,50,55,60,100,200,400,600,900,900,900,24,2,45,56,10,900,437
+"""
+
+
+def write_csv_files(prefix):
+    for suffix, content in (("_stats.csv", STATS), ("_failures.csv", FAILURES), ("_stats_history.csv", HISTORY)):
+        with open(f"{prefix}{suffix}", "w") as f:
+            f.write(content)
+
+
+class TestLocustResults(unittest.TestCase):
+    def setUp(self):
+        self.results_dir = tempfile.TemporaryDirectory()
+        self.prefix = os.path.join(self.results_dir.name, "run")
+        write_csv_files(self.prefix)
+
+    def tearDown(self):
+        self.results_dir.cleanup()
+
+    def test_parse_stats_and_failures(self):
+        """Test per-endpoint percentiles and failures are parsed"""
+        report = parse_locust_csv(self.prefix)
+        self.assertEqual(report["total"]["samples"], 120)
+        self.assertEqual(report["labels"]["POST /login"]["p95"], 600)
+        self.assertEqual(report["labels"]["GET /"]["error_rate"], 2.0)
+        self.assertEqual(report["failures"][0]["endpoint"], "POST /login")
+        self.assertEqual(report["failures"][0]["occurrences"], 5)
+
+    def test_parse_history_timeline(self):
+        """Test the aggregated history becomes a throughput time series"""
+        timeline = parse_locust_csv(self.prefix)["timeline"]
+        self.assertEqual(timeline["rps"], [0.0, 9.0, 15.0])
+        self.assertEqual(timeline["p95"], [None, 110.0, 200.0])
+        self.assertEqual(timeline["peak_rps"], 15.0)
+        self.assertEqual(timeline["peak_users"], 10)
+
+    def test_long_history_is_bounded(self):
+        """Test a soak test's history is folded into a bounded timeline, whatever the block size"""
+        history_file = f"{self.prefix}_stats_history.csv"
+        rps = [10.0 + (i % 50) for i in range(10_000)]
+        with open(history_file, "w") as f:
+            f.write(HISTORY.splitlines()[0] + "\n")
+            for i, value in enumerate(rps):
+                f.write(f"{1700000000 + i},{i // 100},,Aggregated,{value},0.5,{','.join(['40'] * 11)},0,0,0,0,0,0,0\n"
+                        f"{1700000000 + i},{i // 100},GET,/,{value},0.5,{','.join(['40'] * 11)},0,0,0,0,0,0,0\n")
+        history = parse_stats_history_csv(history_file, max_points=100)
+        timeline = history["timeline"]
+        self.assertLessEqual(len(timeline["rps"]), 100)
+        self.assertEqual(len(timeline["timestamps"]), len(timeline["users"]))
+        self.assertEqual(timeline["peak_rps"], 59.0)
+        self.assertAlmostEqual(timeline["mean_rps"], sum(rps) / len(rps), places=2)
+        self.assertEqual(timeline["peak_users"], 99)
+        self.assertEqual(timeline["timestamps"][0], 1700000000)
+        self.assertLessEqual(len(history["endpoints"]["GET /"]["rps"]), 100)
+        self.assertEqual(parse_stats_history_csv(history_file, chunk_bytes=4096, max_points=100), history)
+
+    def test_parse_full_history_endpoints(self):
+        """Test per-endpoint history rows get their own timelines"""
+        history = parse_stats_history_csv(f"{self.prefix}_stats_history.csv")
+        self.assertEqual(list(history["endpoints"]), ["GET /"])
+        self.assertEqual(history["endpoints"]["GET /"]["rps"], [8.0])
+
+    def test_parse_history_quoted_names(self):
+        """Test endpoint names containing commas fall back to the csv module"""
+        history_file = f"{self.prefix}_stats_history.csv"
+        with open(history_file, "a") as f:
+            f.write('1700000002,10,GET,"/search?q=a,b",6.0,0.0,40,45,50,55,80,90,200,250,300,300,300,6,0,40,45,10,300,512\n')
+        history = parse_stats_history_csv(history_file, chunk_bytes=256)
+        self.assertEqual(list(history["endpoints"]), ["GET /", "GET /search?q=a,b"])
+        self.assertEqual(history["endpoints"]["GET /search?q=a,b"]["p95"], [90.0])
+        self.assertEqual(history["timeline"]["rps"], [0.0, 9.0, 15.0])
+
+
+class TestRunLocustResults(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.test_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "sample", "hello.py")
+
+    async def test_run_locust_test_includes_stats(self):
+        """Test the runner requests CSV output and returns the parsed statistics"""
+        async def fake_run(cmd, **kwargs):
+            self.assertIn("--csv-full-history", cmd)
+            write_csv_files(cmd[cmd.index("--csv") + 1])
+            return ProcessResult(returncode=1, stdout="", stderr="locust log")
+
+        with tempfile.TemporaryDirectory() as results_dir, \
+                patch.dict('os.environ', {"LOCUST_RESULTS_DIR": results_dir}), \
+                patch('multi_tool_agent.locust_utils.run_process', side_effect=fake_run):
+            result = await run_locust_test(self.test_file, csv_full_history=True)
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(result["error"], "locust log")
+        self.assertEqual(result["stats"]["total"]["errors"], 7)
+
+    async def test_run_locust_test_with_workers(self):
+        """Test a master is started with the expected number of local workers"""
+        cmds = []
+
+        async def fake_run(cmd, **kwargs):
+            cmds.append(cmd)
+            if "--master" in cmd:
+                write_csv_files(cmd[cmd.index("--csv") + 1])
+            return ProcessResult(returncode=0, stdout="", stderr="")
+
+        with tempfile.TemporaryDirectory() as results_dir, \
+                patch.dict('os.environ', {"LOCUST_RESULTS_DIR": results_dir}), \
+                patch('multi_tool_agent.locust_utils.run_process', side_effect=fake_run):
+            result = await run_locust_test(self.test_file, workers=3)
+        master = next(cmd for cmd in cmds if "--master" in cmd)
+        workers = [cmd for cmd in cmds if "--worker" in cmd]
+        self.assertEqual(master[master.index("--expect-workers") + 1], "3")
+        self.assertEqual(len(workers), 3)
+        self.assertEqual(workers[0][workers[0].index("--master-port") + 1],
+                         master[master.index("--master-bind-port") + 1])
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["stats"]["total"]["samples"], 120)
+
+    async def test_run_locust_test_with_processes(self):
+        """Test LOCUST_WORKER_MODE=processes lets Locust fork its own workers"""
+        mock_result = ProcessResult(returncode=0, stdout="", stderr="")
+        with tempfile.TemporaryDirectory() as results_dir, \
+                patch.dict('os.environ', {"LOCUST_RESULTS_DIR": results_dir, "LOCUST_WORKER_MODE": "processes"}), \
+                patch('multi_tool_agent.locust_utils.run_process', return_value=mock_result) as mock_run:
+            await run_locust_test(self.test_file, workers=4)
+        cmd = mock_run.call_args.args[0]
+        self.assertEqual(cmd[cmd.index("--processes") + 1], "4")
+        mock_run.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
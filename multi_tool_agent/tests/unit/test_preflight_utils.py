@@ -0,0 +1,173 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from multi_tool_agent import preflight_utils
+from multi_tool_agent.preflight_utils import analyze_jmx, preflight
+
+SAMPLE = Path(__file__).resolve().parents[2] / "sample"
+
+JMX = """<?xml version="1.0" encoding="UTF-8"?>
+<jmeterTestPlan version="1.2">
+  <hashTree>
+    <TestPlan guiclass="TestPlanGui" testclass="TestPlan" testname="Plan">
+      <boolProp name="TestPlan.serialize_threadgroups">{serialize}</boolProp>
+      <elementProp name="TestPlan.user_defined_variables" elementType="Arguments">
+        <collectionProp name="Arguments.arguments">
+          <elementProp name="users" elementType="Argument">
+            <stringProp name="Argument.name">users</stringProp>
+            <stringProp name="Argument.value">{users}</stringProp>
+          </elementProp>
+        </collectionProp>
+      </elementProp>
+    </TestPlan>
+    <hashTree>
+      <ThreadGroup guiclass="ThreadGroupGui" testclass="ThreadGroup" testname="Browse">
+        <elementProp name="ThreadGroup.main_controller" elementType="LoopController">
+          <stringProp name="LoopController.loops">-1</stringProp>
+        </elementProp>
+        <stringProp name="ThreadGroup.num_threads">${{__P(threads,${{users}})}}</stringProp>
+        <stringProp name="ThreadGroup.ramp_time">10</stringProp>
+        <boolProp name="ThreadGroup.scheduler">true</boolProp>
+        <stringProp name="ThreadGroup.duration">120</stringProp>
+      </ThreadGroup>
+      <hashTree>
+        <ConstantTimer guiclass="ConstantTimerGui" testclass="ConstantTimer" testname="Think">
+          <stringProp name="ConstantTimer.delay">400</stringProp>
+        </ConstantTimer>
+        <hashTree/>
+        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="home"/>
+        <hashTree/>
+        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="search"/>
+        <hashTree/>
+        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="off" enabled="false"/>
+        <hashTree/>
+      </hashTree>
+      <ThreadGroup guiclass="ThreadGroupGui" testclass="ThreadGroup" testname="Checkout">
+        <elementProp name="ThreadGroup.main_controller" elementType="LoopController">
+          <stringProp name="LoopController.loops">-1</stringProp>
+        </elementProp>
+        <stringProp name="ThreadGroup.num_threads">10</stringProp>
+        <stringProp name="ThreadGroup.ramp_time">0</stringProp>
+        <boolProp name="ThreadGroup.scheduler">true</boolProp>
+        <stringProp name="ThreadGroup.duration">60</stringProp>
+      </ThreadGroup>
+      <hashTree>
+        <ConstantThroughputTimer guiclass="TestBeanGUI" testclass="ConstantThroughputTimer" testname="Pace">
+          <intProp name="calcMode">2</intProp>
+          <doubleProp>
+            <name>throughput</name>
+            <value>600.0</value>
+            <savedValue>0.0</savedValue>
+          </doubleProp>
+        </ConstantThroughputTimer>
+        <hashTree/>
+        <HTTPSamplerProxy guiclass="HttpTestSampleGui" testclass="HTTPSamplerProxy" testname="pay"/>
+        <hashTree/>
+      </hashTree>
+    </hashTree>
+  </hashTree>
+</jmeterTestPlan>
+"""
+
+
+class TestPreflight(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+        self.host = patch.multiple(preflight_utils, usable_cpus=lambda: 4, memory_mb=lambda: (64_000, 48_000))
+        self.host.start()
+
+    def tearDown(self):
+        self.host.stop()
+        self.temp_dir.cleanup()
+
+    def write(self, name: str, content: str) -> str:
+        path = self.dir / name
+        path.write_text(content)
+        return str(path)
+
+    def test_jmx_thread_groups(self):
+        """Test threads resolve through properties and variables, and timers and throughput timers set the rate"""
+        plan = self.write("plan.jmx", JMX.format(serialize="false", users=40))
+        analysis = analyze_jmx(Path(plan), response_ms=100)
+        browse, checkout = analysis["thread_groups"]
+        self.assertEqual((browse["threads"], browse["requests_per_iteration"]), (40, 2))
+        # 2 requests of 100 ms, each after a 400 ms timer: 2 requests per second per thread
+        self.assertAlmostEqual(browse["requests_per_s"], 80)
+        self.assertAlmostEqual(checkout["requests_per_s"], 10)  # 600 per minute for the whole group
+        self.assertEqual((analysis["peak_users"], analysis["duration_s"]), (50, 120))
+        self.assertAlmostEqual(analysis["requests_per_s"], 90)
+        serialized = analyze_jmx(Path(self.write("serial.jmx", JMX.format(serialize="true", users=40))),
+                                 properties={"threads": "5"})
+        self.assertEqual((serialized["peak_users"], serialized["duration_s"]), (10, 180))
+
+    def test_jmeter_heap_and_refusal(self):
+        """Test the heap grows with the threads, and a plan too large for one engine is refused"""
+        sample = preflight("jmeter", str(SAMPLE / "hello.jmx"))
+        self.assertEqual((sample.peak_users, sample.heap_mb, sample.verdict), (2, 512, "ok"))
+        self.assertTrue(any("View Results Tree" in warning for warning in sample.warnings))
+        medium = preflight("jmeter", self.write("medium.jmx", JMX.format(serialize="false", users=1500)))
+        self.assertEqual(medium.heap_mb, 1792)
+        large = preflight("jmeter", self.write("large.jmx", JMX.format(serialize="false", users=3000)))
+        self.assertTrue(large.refused)
+        self.assertIn("remote_hosts", large.reasons[0])
+        remote = preflight("jmeter", self.write("remote.jmx", JMX.format(serialize="false", users=1500)),
+                           remote_hosts=2)
+        self.assertEqual((remote.verdict, remote.heap_mb, remote.requests_per_s), ("ok", None, 6020))
+
+    def test_k6_shards(self):
+        """Test k6 shards are picked from VUs and request rate, and capped by the CPUs"""
+        script = self.write("load.js", "import http from 'k6/http';\nimport { sleep } from 'k6';\n"
+                                       "export const options = { vus: 5 };\n"
+                                       "export default function () {\n  http.get('http://a/');\n"
+                                       "  // http.get('http://commented/');\n  http.post('http://a/b');\n"
+                                       "  sleep(0.8);\n}\n")
+        plan = preflight("k6", script, users=100, duration="1m")
+        self.assertEqual((plan.requests_per_s, plan.shards, plan.duration_s), (200, 1, 60))
+        self.assertEqual(plan.details["script_vus"], 5)
+        plan = preflight("k6", script, users=12000)
+        self.assertEqual((plan.shards, plan.verdict), (3, "ok"))
+        self.assertEqual(plan.memory_mb, 3 * 50 + 24000)
+        plan = preflight("k6", script, users=30000)
+        self.assertTrue(plan.refused)
+        self.assertIn("4 usable CPUs", plan.reasons[0])
+        with patch.dict(os.environ, {"PREFLIGHT_ENFORCE": "false"}):
+            plan = preflight("k6", script, users=30000)
+        self.assertEqual((plan.verdict, plan.shards), ("ok", 6))
+        self.assertIn("usable CPUs", plan.warnings[0])
+        self.assertEqual(preflight("k6", script, users=12000, shards=1).shards, 1)
+
+    def test_locust_workers(self):
+        """Test Locust workers follow the request rate of the user classes and their wait times"""
+        sample = preflight("locust", str(SAMPLE / "hello.py"), users=100)
+        # between(1, 5) waits 3 s on average after a 100 ms request
+        self.assertAlmostEqual(sample.requests_per_s, 32.3)
+        self.assertEqual((sample.workers, sample.processes), (0, 1))
+        locustfile = self.write("locustfile.py", (
+            "from locust import FastHttpUser, HttpUser, task, constant_throughput\n\n"
+            "class Shopper(HttpUser):\n    wait_time = constant_throughput(2)\n\n"
+            "    @task(3)\n    def browse(self):\n        self.client.get('/')\n\n"
+            "    @task\n    def buy(self):\n        self.client.get('/cart')\n        self.client.post('/buy')\n"))
+        plan = preflight("locust", locustfile, users=1000)
+        # Tasks run twice a second and make 1.25 requests on average
+        self.assertEqual((plan.requests_per_s, plan.workers, plan.processes), (2500, 4, 4))
+        self.assertEqual(plan.memory_mb, 5 * 70 + 100)
+        self.assertFalse(plan.details["fast_http"])
+        fast = self.write("fast.py", (Path(locustfile).read_text().replace("(HttpUser)", "(FastHttpUser)")))
+        self.assertEqual(preflight("locust", fast, users=1000).workers, 0)
+
+    def test_unreadable_plans(self):
+        """Test missing, broken and unsupported plans raise ValueError"""
+        with self.assertRaisesRegex(ValueError, "not found"):
+            preflight("jmeter", str(self.dir / "missing.jmx"))
+        with self.assertRaisesRegex(ValueError, "Cannot read"):
+            preflight("jmeter", self.write("broken.jmx", "<jmeterTestPlan><hashTree>"))
+        with self.assertRaisesRegex(ValueError, "No pre-flight analysis"):
+            preflight("gatling", self.write("Sim.scala", ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import unittest
+import unittest.mock
+import sys
+import time
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from multi_tool_agent.process_utils import OutputBuffer, run_deadline, run_process, run_processes
+
+# Starts a child that sleeps, prints its pid, then sleeps or exits
+SPAWN_CHILD = ("import subprocess, sys, time; "
+               "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'], "
+               "stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session={escape}); "
+               "print(child.pid, flush=True); time.sleep({sleep})")
+
+
+def gone(pid: int) -> bool:
+    """Whether a process has exited; an orphan may stay a zombie until its new parent reaps it."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] == "Z"
+    except FileNotFoundError:
+        return True
+
+
+class TestRunProcess(IsolatedAsyncioTestCase):
+    async def test_run_process_captures_output(self):
+        """Test stdout, stderr and return code are captured"""
+        cmd = [sys.executable, "-c", "import sys; print('out'); print('err', file=sys.stderr); sys.exit(3)"]
+        result = await run_process(cmd)
+        self.assertEqual(result.returncode, 3)
+        self.assertEqual(result.stdout.strip(), "out")
+        self.assertEqual(result.stderr.strip(), "err")
+
+    async def test_run_process_does_not_block_event_loop(self):
+        """Test concurrent runs overlap instead of running back to back"""
+        cmd = [sys.executable, "-c", "import time; time.sleep(0.5)"]
+        started = time.monotonic()
+        results = await asyncio.gather(*(run_process(cmd) for _ in range(4)))
+        elapsed = time.monotonic() - started
+        self.assertTrue(all(result.returncode == 0 for result in results))
+        self.assertLess(elapsed, 1.5)
+
+    async def test_run_process_kills_child_on_cancel(self):
+        """Test cancelling the awaiting task terminates the child"""
+        cmd = [sys.executable, "-c", "import time; time.sleep(30)"]
+        task = asyncio.create_task(run_process(cmd))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(task, timeout=5)
+
+    async def test_run_processes_runs_commands_concurrently(self):
+        """Test several commands run side by side and return results in order"""
+        cmds = [[sys.executable, "-c", f"import time; time.sleep(0.5); print({i})"] for i in range(3)]
+        started = time.monotonic()
+        results = await run_processes(cmds)
+        self.assertLess(time.monotonic() - started, 1.4)
+        self.assertEqual([result.stdout for result in results], ["0\n", "1\n", "2\n"])
+
+    async def test_run_processes_stops_others_on_failure(self):
+        """Test a command that cannot start takes the other processes down with it"""
+        cmds = [[sys.executable, "-c", "import time; time.sleep(30)"], ["/nonexistent/load-generator"]]
+        started = time.monotonic()
+        with self.assertRaises(FileNotFoundError):
+            await run_processes(cmds)
+        self.assertLess(time.monotonic() - started, 5)
+
+    async def test_run_process_streams_lines_to_consumers(self):
+        """Test every line reaches the consumers while only head and tail are kept"""
+        cmd = [sys.executable, "-c", "for i in range(5000): print(f'line {i}')"]
+        seen = []
+        with unittest.mock.patch.dict('os.environ', {"RUNNER_OUTPUT_HEAD_LINES": "2", "RUNNER_OUTPUT_TAIL_LINES": "3"}):
+            result = await run_process(cmd, consumers=[lambda stream, line: seen.append((stream, line))])
+        self.assertEqual(len(seen), 5000)
+        self.assertEqual(seen[-1], ("stdout", "line 4999"))
+        self.assertEqual(result.stdout.splitlines(), [
+            "line 0", "line 1", "... [4995 lines omitted] ...", "line 4997", "line 4998", "line 4999",
+        ])
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "process groups are read from /proc")
+class TestProcessDeadline(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.env = unittest.mock.patch.dict('os.environ', {"RUNNER_STOP_GRACE_S": "1"})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+
+    async def assert_gone(self, pid: int) -> None:
+        for _ in range(20):
+            if gone(pid):
+                return
+            await asyncio.sleep(0.05)
+        self.fail(f"process {pid} is still running")
+
+    async def test_deadline_stops_process_group(self):
+        """Test a process outliving its deadline is stopped with the children it started"""
+        cmd = [sys.executable, "-c", SPAWN_CHILD.format(escape=False, sleep=30)]
+        started = time.monotonic()
+        result = await run_process(cmd, deadline=0.5)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertTrue(result.timed_out)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("deadline of 0.5s", result.stderr)
+        await self.assert_gone(int(result.stdout))
+
+    async def test_deadline_stops_escaped_descendants(self):
+        """Test a descendant that started its own session is stopped with its parent"""
+        cmd = [sys.executable, "-c", SPAWN_CHILD.format(escape=True, sleep=30)]
+        result = await run_process(cmd, deadline=0.5)
+        self.assertTrue(result.timed_out)
+        await self.assert_gone(int(result.stdout))
+
+    async def test_orphans_are_reaped_after_exit(self):
+        """Test children a process leaves running when it exits are stopped"""
+        cmd = [sys.executable, "-c", SPAWN_CHILD.format(escape=False, sleep=0)]
+        result = await run_process(cmd, deadline=10)
+        self.assertEqual(result.returncode, 0)
+        self.assertFalse(result.timed_out)
+        await self.assert_gone(int(result.stdout))
+
+    async def test_orphan_holding_the_pipes_does_not_block(self):
+        """Test a run ends when its process exits although a leftover child keeps stdout open"""
+        cmd = ["sh", "-c", "sleep 30 & echo $!"]
+        started = time.monotonic()
+        result = await run_process(cmd)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(result.returncode, 0)
+        await self.assert_gone(int(result.stdout))
+
+    async def test_ignored_sigterm_is_followed_by_sigkill(self):
+        """Test a process ignoring SIGTERM is killed once the grace period is over"""
+        cmd = [sys.executable, "-c", "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); "
+                                     "print('ready', flush=True); time.sleep(30)"]
+        started = time.monotonic()
+        result = await run_process(cmd, deadline=0.5)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(result.returncode, -9)
+
+    def test_run_deadline(self):
+        """Test the deadline is the requested duration plus slack, or the maximum runtime when unknown"""
+        with unittest.mock.patch.dict('os.environ', {"RUNNER_DEADLINE_SLACK_S": "60", "RUNNER_MAX_RUNTIME_S": "3600"}):
+            self.assertEqual(run_deadline("2m"), 180)
+            self.assertEqual(run_deadline(None), 3600)
+        with unittest.mock.patch.dict('os.environ', {"RUNNER_MAX_RUNTIME_S": "0"}):
+            self.assertIsNone(run_deadline(""))
+
+
+class TestOutputBuffer(unittest.TestCase):
+    def test_short_output_is_kept_whole(self):
+        """Test output under the bound is returned unchanged"""
+        buffer = OutputBuffer(head_lines=5, tail_lines=5)
+        for line in ["a", "b", "c"]:
+            buffer.append(line)
+        self.assertEqual(buffer.text(), "a\nb\nc\n")
+        self.assertEqual(buffer.omitted_lines, 0)
+
+    def test_long_lines_are_truncated(self):
+        """Test a single huge line cannot blow the bound"""
+        buffer = OutputBuffer(max_line_length=10)
+        buffer.append("x" * 100)
+        self.assertTrue(buffer.text().startswith("x" * 10 + " ...[truncated]"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from importlib.metadata import EntryPoint
+from pathlib import Path
+from unittest.mock import patch
+
+from multi_tool_agent import registry_utils
+from multi_tool_agent.locust_utils import locust_options
+from multi_tool_agent.registry_utils import get_runner, resolve_binary, runner_specs
+
+ROOT = Path(__file__).resolve().parents[3]
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.plugins = patch.object(registry_utils, "_plugins", None)
+        self.plugins.start()
+
+    def tearDown(self):
+        self.plugins.stop()
+
+    def test_importing_the_package_imports_no_tool(self):
+        """Test importing the package or the agent leaves runner modules, numpy and the ADK unloaded until used"""
+        code = ("import sys\nimport multi_tool_agent.registry_utils\n"
+                "print(sorted(m for m in ('google.adk', 'numpy', 'multi_tool_agent.jmeter_utils') if m in sys.modules))\n"
+                "import multi_tool_agent.agent\n"
+                "print(sorted(m for m in ('numpy', 'multi_tool_agent.jmeter_utils') if m in sys.modules))\n"
+                "multi_tool_agent.registry_utils.get_runner('jmeter')\n"
+                "print(sorted(m for m in ('numpy', 'multi_tool_agent.jmeter_utils') if m in sys.modules))")
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.splitlines()
+        self.assertEqual(output, ["[]", "[]", "['multi_tool_agent.jmeter_utils', 'numpy']"])
+
+    def test_runner_is_imported_on_first_use(self):
+        """Test a built-in runner resolves to its module's function"""
+        from multi_tool_agent.k6_utils import run_k6_result
+        self.assertIs(get_runner("k6"), run_k6_result)
+        with self.assertRaisesRegex(ValueError, "Unknown tool: artillery"):
+            get_runner("artillery")
+
+    def test_entry_points_add_tools(self):
+        """Test runners registered as entry points are found, and cannot replace built-in tools"""
+        plugins = [EntryPoint("artillery", "os.path:join", registry_utils.ENTRY_POINT_GROUP),
+                   EntryPoint("k6", "os.path:split", registry_utils.ENTRY_POINT_GROUP)]
+        with patch.object(registry_utils, "entry_points", return_value=plugins):
+            self.assertEqual(list(runner_specs()), ["jmeter", "k6", "locust", "gatling", "artillery"])
+            self.assertIs(get_runner("artillery"), os.path.join)
+            self.assertEqual(runner_specs()["artillery"].bin_env, "ARTILLERY_BIN")
+        registry_utils._runners.pop("artillery")
+
+    def test_resolve_binary(self):
+        """Test binaries are found on PATH, paths made absolute and unknown commands kept"""
+        with tempfile.TemporaryDirectory() as bin_dir:
+            k6 = Path(bin_dir) / "k6"
+            k6.write_text("#!/bin/sh\n")
+            k6.chmod(0o755)
+            with patch.dict(os.environ, {"PATH": bin_dir, "K6_BIN": "k6", "JMETER_BIN": "./bin/jmeter",
+                                         "LOCUST_BIN": "no-such-locust"}):
+                self.assertEqual(resolve_binary("k6"), str(k6))
+                self.assertEqual(resolve_binary("jmeter"), str(Path("bin/jmeter").resolve()))
+                self.assertEqual(resolve_binary("locust"), "no-such-locust")
+        with self.assertRaises(ValueError):
+            resolve_binary("gatling")
+
+    def test_locust_defaults_are_read_at_call_time(self):
+        """Test options left out take the environment's current values"""
+        with patch.dict(os.environ, {"LOCUST_HOST": "http://shop", "LOCUST_USERS": "7", "LOCUST_HEADLESS": "false"}):
+            self.assertEqual(locust_options(), ("http://shop", 7, 10, "30s", False))
+            self.assertEqual(locust_options(users=3, headless=True), ("http://shop", 3, 10, "30s", True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from multi_tool_agent.rollup_utils import TimeSeriesRollup, lttb, run_rollup
+from multi_tool_agent.run_utils import RunResult, save_run
+from multi_tool_agent.stats_utils import LatencyHistogram, ThroughputTimeline
+
+START = 1_700_000_000
+
+
+def soak(rollup: TimeSeriesRollup, seconds: int, spike_at: int) -> None:
+    """Feed a run at 100 rps whose latency jumps tenfold for 20 seconds."""
+    for second in range(seconds):
+        histogram = LatencyHistogram()
+        latency = 500.0 if spike_at <= second < spike_at + 20 else 50.0
+        histogram.add(np.full(100, latency))
+        rollup.add(START + second, 1.0, 100, 1 if second % 10 == 0 else 0, histogram, users=50)
+
+
+class TestTimeSeriesRollup(unittest.TestCase):
+    def test_lttb_keeps_peaks(self):
+        """Test LTTB keeps the ends and a single spike that averaging would flatten"""
+        x = np.arange(10_000, dtype=np.float64)
+        y = np.sin(x / 500)
+        y[6543] = 40.0
+        kept = lttb(x, y, 100)
+        self.assertEqual(len(kept), 100)
+        self.assertEqual((kept[0], kept[-1]), (0, 9999))
+        self.assertIn(6543, kept)
+        self.assertTrue(np.all(np.diff(kept) > 0))
+        np.testing.assert_array_equal(lttb(x[:50], y[:50], 100), np.arange(50))
+
+    def test_resolutions_are_bounded_and_selectable(self):
+        """Test each resolution keeps a bounded number of windows and queries pick one covering the range"""
+        rollup = TimeSeriesRollup(max_windows=200)
+        soak(rollup, 3 * 3600, spike_at=9000)
+        self.assertEqual([len(level.windows) for level in rollup.levels], [200, 200, 180])
+        # Only the minute windows still reach back to the start of the run
+        whole = rollup.query(max_points=50, metrics=["rps", "p95"])
+        self.assertEqual(whole["resolution_s"], 60)
+        self.assertEqual(len(whole["series"]["p95"]["value"]), 50)
+        self.assertAlmostEqual(max(whole["series"]["p95"]["value"]), 500, delta=10)
+        # Zooming in on the spike picks the finest resolution still holding it
+        spike = rollup.query(start=9000 - 30, end=9000 + 60, metrics=["p95"])
+        self.assertEqual(spike["resolution_s"], 10)
+        self.assertAlmostEqual(spike["summary"]["p99"], 500, delta=10)
+        latest = rollup.query(resolution=1, metrics=["rps", "users", "error_rate"])
+        self.assertEqual(latest["windows"], 201)
+        self.assertEqual(latest["series"]["users"]["value"][-1], 50)
+        self.assertAlmostEqual(latest["summary"]["mean_rps"], 100)
+        with self.assertRaises(ValueError):
+            rollup.query(resolution=5)
+        with self.assertRaises(ValueError):
+            rollup.query(metrics=["p999"])
+
+    def test_queries_while_fed_from_another_thread(self):
+        """Test queries in one thread see consistent windows while another thread feeds the rollup"""
+        rollup = TimeSeriesRollup(max_windows=100)
+        feeder = threading.Thread(target=soak, args=(rollup, 3000, 1000))
+        feeder.start()
+        queries = 0
+        while feeder.is_alive() or not queries:
+            summary = rollup.query(resolution=1, max_points=10, metrics=["rps"])["summary"]
+            if summary:
+                self.assertEqual(summary["requests"], 100 * round(summary["requests"] / 100))
+            queries += 1
+        feeder.join()
+        self.assertEqual(rollup.query(resolution=60)["summary"]["requests"], 300_000)
+
+    def test_saved_run_timeline(self):
+        """Test the rollups of a saved run are built from its report timeline"""
+        timeline = ThroughputTimeline()
+        timestamps = START * 1000.0 + np.arange(36_000) * 100
+        timeline.add(timestamps, np.arange(36_000) % 100 == 0)
+        with tempfile.TemporaryDirectory() as runs_dir, patch.dict(os.environ, {"FEATHERWAND_RUNS_DIR": runs_dir}):
+            run_id = save_run(RunResult("gatling", "success", report={"timeline": timeline.summary()}))
+            series = run_rollup(run_id).query(max_points=30, metrics=["rps", "errors_per_s"])
+            self.assertEqual(series["resolution_s"], 10)
+            self.assertEqual(series["summary"]["requests"], 36_000)
+            self.assertEqual(series["series"]["rps"]["value"], [10.0] * 30)
+            self.assertNotIn("p95", series["series"])
+            json.dumps(series)
+
+
+if __name__ == "__main__":
+    unittest.main()
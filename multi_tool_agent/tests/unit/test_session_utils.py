@@ -0,0 +1,150 @@
+import asyncio
+import inspect
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import IsolatedAsyncioTestCase
+
+from google.adk.errors import StaleSessionError
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events import Event, EventActions
+from google.adk.sessions import BaseSessionService
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.adk.sessions.sqlite_session_service import CREATE_SCHEMA_SQL, SqliteSessionService
+from google.genai import types
+
+from multi_tool_agent.session_utils import ADK_HELPERS, CachedSqliteSessionService, session_service_factory
+
+APP = "multi_tool_agent"
+
+
+def message(text: str, state_delta: dict = None) -> Event:
+    return Event(invocation_id="invocation", author="user",
+                 content=types.Content(role="user", parts=[types.Part(text=text)]),
+                 actions=EventActions(state_delta=state_delta or {}))
+
+
+class TestCachedSqliteSessionService(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.db_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.db_dir.name, "sessions.db")
+        self.services = []
+
+    def tearDown(self):
+        for service in self.services:
+            service.close()
+        self.db_dir.cleanup()
+
+    def service(self, **kwargs) -> CachedSqliteSessionService:
+        service = CachedSqliteSessionService(self.db_path, **kwargs)
+        self.services.append(service)
+        return service
+
+    async def test_create_and_get_with_scoped_state(self):
+        """Test app, user and session state are stored apart and merged back"""
+        service = self.service()
+        await service.create_session(app_name=APP, user_id="u1", session_id="s1",
+                                     state={"step": 1, "user:name": "Ada", "app:version": 2, "temp:x": 1})
+        other = await service.create_session(app_name=APP, user_id="u1")
+        session = await service.get_session(app_name=APP, user_id="u1", session_id=other.id)
+        self.assertEqual(session.state, {"user:name": "Ada", "app:version": 2})
+        session = await service.get_session(app_name=APP, user_id="u1", session_id="s1")
+        self.assertEqual(session.state, {"step": 1, "user:name": "Ada", "app:version": 2})
+        with self.assertRaises(AlreadyExistsError):
+            await service.create_session(app_name=APP, user_id="u1", session_id="s1")
+
+    async def test_events_are_seen_by_other_workers(self):
+        """Test a cached session is reloaded once another worker appended to it"""
+        first, second = self.service(), self.service()
+        session = await first.create_session(app_name=APP, user_id="u1", session_id="s1")
+        await first.append_event(session, message("hello", {"turns": 1}))
+        cached = await second.get_session(app_name=APP, user_id="u1", session_id="s1")
+        self.assertEqual(len(cached.events), 1)
+
+        session = await first.get_session(app_name=APP, user_id="u1", session_id="s1")
+        await first.append_event(session, message("again", {"turns": 2}))
+        reloaded = await second.get_session(app_name=APP, user_id="u1", session_id="s1")
+        self.assertEqual([event.content.parts[0].text for event in reloaded.events], ["hello", "again"])
+        self.assertEqual(reloaded.state["turns"], 2)
+        recent = await second.get_session(app_name=APP, user_id="u1", session_id="s1",
+                                          config=GetSessionConfig(num_recent_events=1))
+        self.assertEqual([event.content.parts[0].text for event in recent.events], ["again"])
+
+    async def test_stale_session_is_rejected(self):
+        """Test appending to a session another worker changed since it was read fails"""
+        first, second = self.service(), self.service()
+        await first.create_session(app_name=APP, user_id="u1", session_id="s1")
+        stale = await second.get_session(app_name=APP, user_id="u1", session_id="s1")
+        session = await first.get_session(app_name=APP, user_id="u1", session_id="s1")
+        await first.append_event(session, message("first"))
+        with self.assertRaises(StaleSessionError):
+            await second.append_event(stale, message("second"))
+
+    async def test_concurrent_appends_share_transactions(self):
+        """Test events appended concurrently are committed in fewer transactions"""
+        service = self.service()
+        sessions = [await service.create_session(app_name=APP, user_id=f"u{i}") for i in range(20)]
+        await asyncio.gather(*(service.append_event(session, message("hi")) for session in sessions))
+        self.assertLess(service.batches_written, 20)
+        listed = await self.service(cache_size=0).list_sessions(app_name=APP)
+        self.assertEqual(len(listed.sessions), 20)
+        for session in sessions:
+            stored = await self.service(cache_size=0).get_session(app_name=APP, user_id=session.user_id,
+                                                                  session_id=session.id)
+            self.assertEqual(len(stored.events), 1)
+
+    async def test_write_behind_flushes_later(self):
+        """Test write-behind appends return at once and are written on flush"""
+        service = self.service(write_behind=True, flush_interval_ms=10_000)
+        reader = self.service(cache_size=0)
+        session = await service.create_session(app_name=APP, user_id="u1", session_id="s1")
+        await service.append_event(session, message("buffered"))
+        self.assertEqual((await reader.get_session(app_name=APP, user_id="u1", session_id="s1")).events, [])
+        self.assertEqual(len((await service.get_session(app_name=APP, user_id="u1", session_id="s1")).events), 1)
+        await service.flush()
+        self.assertEqual(len((await reader.get_session(app_name=APP, user_id="u1", session_id="s1")).events), 1)
+
+    async def test_database_is_readable_by_adk_sqlite_service(self):
+        """Test sessions written here can be opened with ADK's own SQLite service"""
+        service = session_service_factory(f"sqlite+wal:///{self.db_path}")
+        self.services.append(service)
+        session = await service.create_session(app_name=APP, user_id="u1", session_id="s1", state={"k": "v"})
+        await service.append_event(session, message("hello"))
+        loaded = await SqliteSessionService(self.db_path).get_session(app_name=APP, user_id="u1", session_id="s1")
+        self.assertEqual(loaded.state, {"k": "v"})
+        self.assertEqual(loaded.events[0].content.parts[0].text, "hello")
+        await service.delete_session(app_name=APP, user_id="u1", session_id="s1")
+        self.assertIsNone(await service.get_session(app_name=APP, user_id="u1", session_id="s1"))
+
+
+class TestAdkCompatibility(unittest.TestCase):
+    def test_private_helpers_are_still_there(self):
+        """Test the private BaseSessionService helpers the service relies on exist with the same arguments"""
+        for name in ADK_HELPERS:
+            helper = getattr(BaseSessionService, name, None)
+            self.assertTrue(callable(helper), f"BaseSessionService.{name} is gone")
+            parameters = list(inspect.signature(helper).parameters)
+            self.assertEqual(parameters, ["self", "event"] if name == "_trim_temp_delta_state"
+                             else ["self", "session", "event"], name)
+
+    def test_tables_match_adk_sqlite_service(self):
+        """Test the tables are the columns of ADK's own SQLite session service"""
+        def columns(db_path: str) -> dict:
+            with sqlite3.connect(db_path) as db:
+                tables = [row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+                return {table: [row[1:] for row in db.execute(f"PRAGMA table_info({table})")] for table in tables}
+
+        with tempfile.TemporaryDirectory() as db_dir:
+            adk_db, own_db = os.path.join(db_dir, "adk.db"), os.path.join(db_dir, "own.db")
+            with sqlite3.connect(adk_db) as db:
+                db.executescript(CREATE_SCHEMA_SQL)
+            service = CachedSqliteSessionService(own_db)
+            with service.pool.connection():
+                pass
+            service.close()
+            self.assertEqual(columns(own_db), columns(adk_db))
+
+
+if __name__ == "__main__":
+    unittest.main()
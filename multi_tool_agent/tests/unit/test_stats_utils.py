@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+
+from multi_tool_agent.stats_utils import EndpointAggregator, LatencyHistogram, format_summary
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles_within_relative_error(self):
+        """Test histogram percentiles stay within ~1% of exact percentiles"""
+        values = np.random.default_rng(7).lognormal(mean=5, sigma=1, size=100_000)
+        histogram = LatencyHistogram()
+        histogram.add(values)
+        for p, value in histogram.percentiles().items():
+            exact = np.percentile(values, p)
+            self.assertAlmostEqual(value / exact, 1.0, delta=0.01)
+        self.assertEqual(histogram.count, values.size)
+        self.assertAlmostEqual(histogram.max, values.max())
+
+    def test_merge_matches_single_histogram(self):
+        """Test merging two histograms equals histogramming all samples"""
+        values = np.random.default_rng(3).exponential(200, size=10_000)
+        whole, left, right = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        whole.add(values)
+        left.add(values[:4000])
+        right.add(values[4000:])
+        left.merge(right)
+        np.testing.assert_array_equal(left.counts, whole.counts)
+        self.assertEqual(left.percentiles(), whole.percentiles())
+
+    def test_round_trip_dict(self):
+        """Test the sparse dict form restores the same histogram"""
+        histogram = LatencyHistogram()
+        histogram.add([1, 5, 5, 100, 2500])
+        restored = LatencyHistogram.from_dict(histogram.to_dict())
+        np.testing.assert_array_equal(restored.counts, histogram.counts)
+        self.assertEqual(restored.min, 1)
+        self.assertEqual(restored.max, 2500)
+
+    def test_empty_histogram(self):
+        """Test an empty histogram reports no percentiles"""
+        self.assertEqual(LatencyHistogram().percentiles([50]), {50: None})
+
+
+class TestEndpointAggregator(unittest.TestCase):
+    def test_add_batch_groups_by_label(self):
+        """Test counts, errors and throughput are computed per label"""
+        aggregator = EndpointAggregator()
+        aggregator.add_batch(
+            labels=np.array(["a", "b", "a", "a"]),
+            elapsed=np.array([100, 200, 300, 400]),
+            success=np.array([True, False, True, False]),
+            start_timestamps=np.array([0, 0, 1000, 1600]),
+        )
+        report = aggregator.summary()
+        self.assertEqual(report["labels"]["a"]["samples"], 3)
+        self.assertEqual(report["labels"]["a"]["errors"], 1)
+        self.assertEqual(report["labels"]["a"]["throughput"], 1.5)
+        self.assertEqual(report["labels"]["b"]["error_rate"], 100.0)
+        self.assertEqual(report["total"]["samples"], 4)
+        self.assertIn("TOTAL", format_summary(report))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,6 @@
 import unittest
 import os
 import asyncio
-import subprocess
 from unittest.mock import patch, MagicMock
 from pathlib import Path
 from unittest import IsolatedAsyncioTestCase
@@ -10,6 +9,7 @@ from multi_tool_agent.jmeter_utils import run_jmeter
 from multi_tool_agent.locust_utils import run_locust_test
 from multi_tool_agent.k6_utils import run_k6_script
 from multi_tool_agent.gatling_utils import run_gatling_simulation
+from multi_tool_agent.process_utils import ProcessResult
 
 class TestJMeterUtils(IsolatedAsyncioTestCase):
     def setUp(self):
@@ -37,8 +37,8 @@ class TestLocustUtils(IsolatedAsyncioTestCase):
     async def test_run_locust_test(self):
         """Test running a Locust test"""
         mock_output = "Locust test output"
-        mock_result = MagicMock(stdout=mock_output, stderr="", returncode=0)
-        with patch('subprocess.run', return_value=mock_result) as mock_run:
+        mock_result = ProcessResult(returncode=0, stdout=mock_output, stderr="")
+        with patch('multi_tool_agent.locust_utils.run_process', return_value=mock_result) as mock_run:
             result = await run_locust_test(self.test_file)
             self.assertEqual(result["status"], "success")
             self.assertEqual(result["output"], mock_output)
@@ -46,12 +46,13 @@ class TestLocustUtils(IsolatedAsyncioTestCase):
     
     async def test_run_locust_test_failure(self):
         """Test Locust test failure"""
-        error_msg = None
-        with patch('subprocess.run', side_effect=subprocess.CalledProcessError(1, "cmd", error_msg)) as mock_run:
+        error_msg = "Locust test failed"
+        mock_result = ProcessResult(returncode=1, stdout="", stderr=error_msg)
+        with patch('multi_tool_agent.locust_utils.run_process', return_value=mock_result) as mock_run:
             result = await run_locust_test(self.test_file)
             self.assertEqual(result["status"], "error")
-            self.assertEqual(result["error"], None)  # Changed to expect None
-            self.assertIsNone(result["output"])  # Changed to expect None
+            self.assertEqual(result["error"], error_msg)
+            self.assertEqual(result["output"], "")
 
 
 class TestK6Utils(IsolatedAsyncioTestCase):
@@ -61,7 +62,7 @@ class TestK6Utils(IsolatedAsyncioTestCase):
     async def test_run_k6_script(self):
         """Test running a k6 script"""
         mock_output = "k6 test output"
-        with patch('subprocess.run', return_value=MagicMock(stdout=mock_output, stderr="", returncode=0)) as mock_run:
+        with patch('multi_tool_agent.k6_utils.run_process', return_value=ProcessResult(returncode=0, stdout=mock_output, stderr="")) as mock_run:
             result = await run_k6_script(self.test_js)
             self.assertIsInstance(result, str)
             self.assertIn("output", result.lower())
@@ -69,7 +70,7 @@ class TestK6Utils(IsolatedAsyncioTestCase):
     async def test_run_k6_script_failure(self):
         """Test k6 script failure"""
         error_msg = "k6 test failed"
-        with patch('subprocess.run', side_effect=subprocess.CalledProcessError(1, "cmd", error_msg)) as mock_run:
+        with patch('multi_tool_agent.k6_utils.run_process', return_value=ProcessResult(returncode=1, stdout="", stderr=error_msg)) as mock_run:
             result = await run_k6_script(self.test_js)
             self.assertIsInstance(result, str)
             self.assertIn("error", result.lower())
@@ -82,7 +83,7 @@ class TestGatlingUtils(IsolatedAsyncioTestCase):
     async def test_run_gatling_simulation(self):
         """Test running a Gatling simulation"""
         mock_output = "Gatling simulation output"
-        with patch('subprocess.run', return_value=MagicMock(stdout=mock_output, stderr="", returncode=0)) as mock_run:
+        with patch('multi_tool_agent.gatling_utils.run_process', return_value=ProcessResult(returncode=0, stdout=mock_output, stderr="")) as mock_run:
             result = await run_gatling_simulation(self.test_directory, self.test_class)
             self.assertIsInstance(result, str)
             self.assertIn("output", result.lower())
@@ -90,7 +91,7 @@ class TestGatlingUtils(IsolatedAsyncioTestCase):
     async def test_run_gatling_simulation_failure(self):
         """Test Gatling simulation failure"""
         error_msg = "Gatling simulation failed"
-        with patch('subprocess.run', side_effect=subprocess.CalledProcessError(1, "cmd", error_msg)) as mock_run:
+        with patch('multi_tool_agent.gatling_utils.run_process', return_value=ProcessResult(returncode=1, stdout="", stderr=error_msg)) as mock_run:
             result = await run_gatling_simulation(self.test_directory, self.test_class)
             self.assertIsInstance(result, str)
             self.assertIn("error", result.lower())